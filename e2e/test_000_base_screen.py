@@ -232,3 +232,20 @@ class TestBaseScreen(GraphicUnitTest):
         self.assertFalse("mock_button_0" in grid.ids)
 
         mock_get_locale.assert_called_once()
+
+    @patch("src.app.screens.base_screen.App.get_running_app")
+    def test_get_download_connections(self, mock_get_running_app):
+        get = mock_get_running_app.return_value.config.get
+        for value, connections in (
+            ("4", 4),
+            ("16", 16),
+            ("0", 1),
+            ("-3", 1),
+            ("64", 16),
+            ("2.5", 1),
+            ("", 1),
+        ):
+            get.return_value = value
+            self.assertEqual(BaseScreen.get_download_connections(), connections)
+
+        get.assert_called_with("download", "connections")
@@ -1,5 +1,4 @@
 import os
-import re
 from unittest.mock import patch, call, MagicMock
 from kivy.base import EventLoop, EventLoopBase
 from kivy.tests.common import GraphicUnitTest
@@ -529,13 +528,21 @@ class TestMainScreen(GraphicUnitTest):
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
     )
-    @patch("src.app.screens.base_screen.BaseScreen.get_destdir_assets")
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_destdir_assets",
+        return_value="mockdir",
+    )
+    @patch("src.app.screens.base_screen.BaseScreen.get_asset_cache")
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_partial_download",
+        return_value=False,
+    )
     @patch("src.app.screens.main_screen.re.findall", side_effect=[True])
-    @patch("src.app.screens.main_screen.os.path.isfile", side_effect=[False])
     def test_on_release_flash_to_download_stable_zip_screen(
         self,
-        mock_isfile,
         mock_findall,
+        mock_get_partial_download,
+        mock_get_asset_cache,
         mock_get_destdir_assets,
         mock_get_locale,
         mock_manager,
@@ -543,6 +550,7 @@ class TestMainScreen(GraphicUnitTest):
         mock_set_background,
     ):
         mock_manager.get_screen = MagicMock()
+        mock_get_asset_cache.return_value.find.return_value = None
 
         screen = MainScreen()
         screen.version = "v24.03.0"
@@ -559,14 +567,17 @@ class TestMainScreen(GraphicUnitTest):
         flash_action(flash_button)
 
         mock_get_locale.assert_any_call()
+        mock_get_asset_cache.assert_called_once()
+        mock_get_asset_cache.return_value.find.assert_called_once_with(
+            version="v24.03.0", name="krux-v24.03.0.zip"
+        )
         mock_get_destdir_assets.assert_called_once()
         mock_set_background.assert_called_once_with(wid="main_flash", rgba=(0, 0, 0, 1))
         mock_set_screen.assert_called_once_with(
             name="DownloadStableZipScreen", direction="left"
         )
         mock_findall.assert_called_once_with(r"^v\d+\.\d+\.\d$", "v24.03.0")
-        pattern = re.compile(r".*v24\.03\.0\.zip")
-        self.assertTrue(pattern.match(mock_isfile.call_args[0][0]))
+        mock_get_partial_download.assert_called_once()
 
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
     @patch("src.app.screens.main_screen.MainScreen.set_background")
@@ -575,13 +586,23 @@ class TestMainScreen(GraphicUnitTest):
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
     )
-    @patch("src.app.screens.base_screen.BaseScreen.get_destdir_assets")
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_destdir_assets",
+        return_value="mockdir",
+    )
+    @patch("src.app.screens.base_screen.BaseScreen.get_asset_cache")
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_partial_download",
+        return_value=True,
+    )
     @patch("src.app.screens.main_screen.re.findall", side_effect=[True])
-    @patch("src.app.screens.main_screen.os.path.isfile", side_effect=[True])
-    def test_on_release_flash_to_warning_already_downloaded_zip_screen(
+    @patch("src.app.screens.main_screen.partial")
+    def test_on_release_flash_to_download_stable_zip_screen_partial(
         self,
-        mock_isfile,
+        mock_partial,
         mock_findall,
+        mock_get_partial_download,
+        mock_get_asset_cache,
         mock_get_destdir_assets,
         mock_get_locale,
         mock_manager,
@@ -589,6 +610,7 @@ class TestMainScreen(GraphicUnitTest):
         mock_set_background,
     ):
         mock_manager.get_screen = MagicMock()
+        mock_get_asset_cache.return_value.find.return_value = None
 
         screen = MainScreen()
         screen.version = "v24.03.0"
@@ -605,14 +627,129 @@ class TestMainScreen(GraphicUnitTest):
         flash_action(flash_button)
 
         mock_get_locale.assert_any_call()
+        mock_get_asset_cache.assert_called_once()
+        mock_get_asset_cache.return_value.find.assert_called_once_with(
+            version="v24.03.0", name="krux-v24.03.0.zip"
+        )
         mock_get_destdir_assets.assert_called_once()
         mock_set_background.assert_called_once_with(wid="main_flash", rgba=(0, 0, 0, 1))
+        mock_set_screen.assert_called_once_with(
+            name="DownloadStableZipScreen", direction="left"
+        )
+        mock_findall.assert_called_once_with(r"^v\d+\.\d+\.\d$", "v24.03.0")
+        mock_get_partial_download.assert_called_once()
+
+        # the download screen is updated with the version and the device
+        update = mock_manager.get_screen.return_value.update
+        self.assertEqual(
+            [
+                c.kwargs["key"]
+                for c in mock_partial.call_args_list
+                if c.args == (update,)
+            ],
+            ["version", "device"],
+        )
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch("src.app.screens.main_screen.MainScreen.set_background")
+    @patch("src.app.screens.main_screen.MainScreen.set_screen")
+    @patch("src.app.screens.main_screen.MainScreen.manager")
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch("src.app.screens.base_screen.BaseScreen.get_asset_cache")
+    @patch("src.app.screens.main_screen.re.findall", side_effect=[True])
+    def test_on_release_flash_to_warning_already_downloaded_zip_screen(
+        self,
+        mock_findall,
+        mock_get_asset_cache,
+        mock_get_locale,
+        mock_manager,
+        mock_set_screen,
+        mock_set_background,
+    ):
+        mock_manager.get_screen = MagicMock()
+        mock_get_asset_cache.return_value.find.return_value = (
+            "mockdir/krux-v24.03.0.zip"
+        )
+
+        screen = MainScreen()
+        screen.version = "v24.03.0"
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+        window = EventLoop.window
+        grid = window.children[0].children[0]
+        flash_button = grid.children[3]
+
+        screen.update(name="SelectVersionScreen", key="device", value="m5stickv")
+        flash_action = getattr(screen, "on_release_main_flash")
+        flash_action(flash_button)
+
+        mock_get_locale.assert_any_call()
+        mock_get_asset_cache.assert_called_once()
+        mock_get_asset_cache.return_value.find.assert_called_once_with(
+            version="v24.03.0", name="krux-v24.03.0.zip"
+        )
+        mock_set_background.assert_called_once_with(wid="main_flash", rgba=(0, 0, 0, 1))
+        mock_set_screen.assert_called_once_with(
+            name="WarningAlreadyDownloadedScreen", direction="left"
+        )
+        mock_findall.assert_called_once_with(r"^v\d+\.\d+\.\d$", "v24.03.0")
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch("src.app.screens.main_screen.MainScreen.set_background")
+    @patch("src.app.screens.main_screen.MainScreen.set_screen")
+    @patch("src.app.screens.main_screen.MainScreen.manager")
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch("src.app.screens.base_screen.BaseScreen.get_asset_cache")
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_destdir_assets",
+        return_value="mockdir",
+    )
+    @patch("src.app.screens.main_screen.os.path.isfile", return_value=True)
+    @patch("src.app.screens.main_screen.re.findall", side_effect=[True])
+    def test_on_release_flash_to_warning_already_downloaded_not_indexed_zip(
+        self,
+        mock_findall,
+        mock_isfile,
+        mock_get_destdir_assets,
+        mock_get_asset_cache,
+        mock_get_locale,
+        mock_manager,
+        mock_set_screen,
+        mock_set_background,
+    ):
+        mock_manager.get_screen = MagicMock()
+        mock_get_asset_cache.return_value.find.return_value = None
+
+        screen = MainScreen()
+        screen.version = "v24.03.0"
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+        window = EventLoop.window
+        grid = window.children[0].children[0]
+        flash_button = grid.children[3]
+
+        screen.update(name="SelectVersionScreen", key="device", value="m5stickv")
+        flash_action = getattr(screen, "on_release_main_flash")
+        flash_action(flash_button)
+
+        # a zip downloaded before the cache existed is used as well
+        mock_get_locale.assert_any_call()
+        mock_get_destdir_assets.assert_called_once()
+        mock_isfile.assert_called_once_with(
+            os.path.join("mockdir", "krux-v24.03.0.zip")
+        )
         mock_set_screen.assert_called_once_with(
             name="WarningAlreadyDownloadedScreen", direction="left"
         )
         mock_findall.assert_called_once_with(r"^v\d+\.\d+\.\d$", "v24.03.0")
-        pattern = re.compile(r".*v24\.03\.0\.zip")
-        self.assertTrue(pattern.match(mock_isfile.call_args[0][0]))
 
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
     @patch("src.app.screens.main_screen.MainScreen.set_background")
@@ -658,6 +795,69 @@ class TestMainScreen(GraphicUnitTest):
             name="DownloadBetaScreen", direction="left"
         )
 
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch("src.app.screens.main_screen.MainScreen.set_background")
+    @patch("src.app.screens.main_screen.MainScreen.set_screen")
+    @patch("src.app.screens.main_screen.MainScreen.manager")
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch("src.app.screens.base_screen.BaseScreen.get_baudrate", return_value=1500000)
+    @patch("src.app.screens.base_screen.BaseScreen.get_asset_cache")
+    @patch(
+        "src.app.screens.main_screen.get_offline_releases",
+        return_value=["odudex/krux_binaries"],
+    )
+    @patch("src.app.screens.main_screen.partial")
+    def test_on_release_flash_cached_beta_offline(
+        self,
+        mock_partial,
+        mock_get_offline_releases,
+        mock_get_asset_cache,
+        mock_get_baudrate,
+        mock_get_locale,
+        mock_manager,
+        mock_set_screen,
+        mock_set_background,
+    ):
+        mock_manager.get_screen = MagicMock()
+        kboot = os.path.join("mockdir", "krux_binaries", "maixpy_amigo", "kboot.kfpkg")
+        mock_get_asset_cache.return_value.find.return_value = kboot
+
+        screen = MainScreen()
+        screen.version = "odudex/krux_binaries"
+        screen.device = "amigo"
+        screen.will_flash = True
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+        window = EventLoop.window
+        grid = window.children[0].children[0]
+        flash_button = grid.children[3]
+
+        flash_action = getattr(screen, "on_release_main_flash")
+        flash_action(flash_button)
+
+        # the cached binary is flashed, without downloading it
+        mock_get_locale.assert_any_call()
+        mock_get_offline_releases.assert_called()
+        mock_get_asset_cache.return_value.find.assert_called_once_with(
+            version="odudex/krux_binaries",
+            name=os.path.join("krux_binaries", "maixpy_amigo", "kboot.kfpkg"),
+        )
+        mock_get_baudrate.assert_called_once()
+        mock_manager.get_screen.assert_any_call("FlashScreen")
+        update = mock_manager.get_screen.return_value.update
+        mock_partial.assert_has_calls(
+            [
+                call(update, name="MainScreen", key="baudrate", value=1500000),
+                call(update, name="MainScreen", key="firmware", value=kboot),
+                call(update, name="MainScreen", key="flasher"),
+            ]
+        )
+        mock_set_screen.assert_called_once_with(name="FlashScreen", direction="left")
+
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
     @patch("src.app.screens.main_screen.MainScreen.set_background")
     @patch("src.app.screens.main_screen.MainScreen.set_screen")
@@ -697,3 +897,103 @@ class TestMainScreen(GraphicUnitTest):
         mock_get_locale.assert_any_call()
         mock_set_background.assert_has_calls(calls_set_background)
         mock_set_screen.assert_has_calls(calls_set_screen)
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_destdir_assets",
+        return_value="mockdir",
+    )
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_download_connections",
+        return_value=4,
+    )
+    @patch("src.app.screens.base_screen.BaseScreen.get_asset_cache")
+    @patch("src.app.screens.main_screen.ReleaseBundle")
+    @patch("src.app.screens.main_screen.prefetcher")
+    def test_update_version_prefetch(
+        self,
+        mock_prefetcher,
+        mock_release_bundle,
+        mock_get_asset_cache,
+        mock_get_download_connections,
+        mock_get_destdir_assets,
+        mock_get_locale,
+    ):
+        mock_prefetcher.get_enabled.return_value = True
+        mock_get_asset_cache.return_value.find.return_value = None
+        screen = MainScreen()
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+
+        # only a confirmed selection is prefetched
+        screen.update(name="MainScreen", key="version", value="v24.03.0")
+        mock_prefetcher.prefetch.assert_not_called()
+
+        screen.update(name="SelectVersionScreen", key="version", value="v24.03.0")
+
+        mock_get_locale.assert_any_call()
+        mock_get_destdir_assets.assert_any_call()
+        mock_get_download_connections.assert_any_call()
+        mock_release_bundle.assert_called_once_with(
+            version="v24.03.0",
+            destdir="mockdir",
+            connections=4,
+            cache=mock_get_asset_cache.return_value,
+        )
+        mock_prefetcher.prefetch.assert_called_once_with(
+            mock_release_bundle.return_value
+        )
+
+        # a cached release isnt downloaded again
+        mock_get_asset_cache.return_value.find.return_value = "mockdir/krux.zip"
+        screen.update(name="SelectOldVersionScreen", key="version", value="v23.09.0")
+        mock_prefetcher.prefetch.assert_called_once()
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_destdir_assets",
+        return_value="mockdir",
+    )
+    @patch("src.app.screens.main_screen.BetaDownloader")
+    @patch("src.app.screens.main_screen.prefetcher")
+    def test_update_device_prefetch_beta(
+        self,
+        mock_prefetcher,
+        mock_beta_downloader,
+        mock_get_destdir_assets,
+        mock_get_locale,
+    ):
+        mock_beta_downloader.VALID_DEVICES = ("amigo",)
+        mock_prefetcher.get_enabled.return_value = True
+        screen = MainScreen()
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+
+        # the device isnt known yet
+        screen.update(
+            name="SelectVersionScreen", key="version", value="odudex/krux_binaries"
+        )
+        mock_prefetcher.prefetch.assert_not_called()
+
+        screen.update(name="SelectDeviceScreen", key="device", value="amigo")
+
+        mock_get_locale.assert_any_call()
+        mock_get_destdir_assets.assert_any_call()
+        mock_beta_downloader.assert_called_once_with(
+            device="amigo",
+            binary_type="kboot.kfpkg",
+            destdir=os.path.join("mockdir", "krux_binaries", "maixpy_amigo"),
+        )
+        mock_prefetcher.prefetch.assert_called_once_with(
+            mock_beta_downloader.return_value
+        )
@@ -69,17 +69,17 @@ class TestSelectVersionScreen(GraphicUnitTest):
         mock_get_locale.assert_called_once()
 
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
-    @patch("src.utils.selector.requests")
+    @patch("src.utils.selector.get_session")
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
     )
     @patch("src.app.screens.select_version_screen.SelectVersionScreen.manager")
-    def test_render_buttons(self, mock_manager, mock_get_locale, mock_requests):
+    def test_render_buttons(self, mock_manager, mock_get_locale, mock_get_session):
         # Configure mocks
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
         mock_manager.get_screen = MagicMock()
 
         screen = SelectVersionScreen()
@@ -101,20 +101,20 @@ class TestSelectVersionScreen(GraphicUnitTest):
         mock_get_locale.assert_any_call()
 
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
-    @patch("src.utils.selector.requests")
+    @patch("src.utils.selector.get_session")
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
     )
     @patch("src.app.screens.select_version_screen.SelectVersionScreen.manager")
     @patch("src.app.screens.select_version_screen.SelectVersionScreen.set_background")
     def test_on_press(
-        self, mock_set_background, mock_manager, mock_get_locale, mock_requests
+        self, mock_set_background, mock_manager, mock_get_locale, mock_get_session
     ):
         # Configure mocks
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
         mock_manager.get_screen = MagicMock()
 
         screen = SelectVersionScreen()
@@ -142,7 +142,7 @@ class TestSelectVersionScreen(GraphicUnitTest):
         mock_get_locale.assert_any_call()
 
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
-    @patch("src.utils.selector.requests")
+    @patch("src.utils.selector.get_session")
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
     )
@@ -155,13 +155,13 @@ class TestSelectVersionScreen(GraphicUnitTest):
         mock_set_screen,
         mock_set_background,
         mock_get_locale,
-        mock_requests,
+        mock_get_session,
     ):
         # Configure mocks
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
         mock_manager.get_screen = MagicMock()
 
         screen = SelectVersionScreen()
@@ -206,18 +206,18 @@ class TestSelectVersionScreen(GraphicUnitTest):
         mock_get_locale.assert_any_call()
 
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
-    @patch("src.utils.selector.requests")
+    @patch("src.utils.selector.get_session")
     @patch("src.app.screens.select_version_screen.SelectVersionScreen.manager")
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
     )
     def test_update_locale_old_versions(
-        self, mock_get_locale, mock_manager, mock_requests
+        self, mock_get_locale, mock_manager, mock_get_session
     ):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         mock_manager.get_screen = MagicMock()
 
@@ -4,6 +4,7 @@ from kivy.base import EventLoop, EventLoopBase
 from kivy.tests.common import GraphicUnitTest
 from kivy.core.text import LabelBase, DEFAULT_FONT
 from src.app.screens.base_download_screen import BaseDownloadScreen
+from src.utils.downloader.cancel_token import CancelToken, DownloadCancelled
 
 
 class TestBaseDownloadScreen(GraphicUnitTest):
@@ -126,6 +127,7 @@ class TestBaseDownloadScreen(GraphicUnitTest):
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
     )
+    @patch("src.app.screens.base_download_screen.ProgressChannel")
     @patch("src.app.screens.base_download_screen.partial")
     @patch("src.app.screens.base_download_screen.Clock.create_trigger")
     @patch("src.app.screens.base_download_screen.Thread.start")
@@ -134,6 +136,7 @@ class TestBaseDownloadScreen(GraphicUnitTest):
         mock_thread,
         mock_create_trigger,
         mock_partial,
+        mock_channel,
         mock_get_locale,
     ):
         screen = BaseDownloadScreen(wid="mock_screen", name="MockScreen")
@@ -161,9 +164,102 @@ class TestBaseDownloadScreen(GraphicUnitTest):
         mock_get_locale.assert_any_call()
 
         on_progress = getattr(BaseDownloadScreen, "on_progress")
+        mock_channel.assert_called_once_with(
+            downloader=screen.downloader, on_event=on_progress
+        )
         mock_partial.assert_called_once_with(
-            screen.downloader.download, on_data=on_progress
+            screen.downloader.download, on_data=mock_channel.return_value.on_data
         )
+        self.assertIsInstance(screen.downloader.token, CancelToken)
+        self.assertEqual(screen.downloader.on_retry, mock_channel.return_value.on_retry)
         mock_create_trigger.assert_called()
         mock_thread.assert_called_once()
         # (name=screen.name, target=mock_partial())
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    def test_update_retry(self, mock_get_locale):
+        screen = BaseDownloadScreen(wid="mock_screen", name="MockScreen")
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+
+        screen.update_retry({"downloaded_len": 0, "retry": 2, "attempts": 5})
+        self.assertEqual(
+            screen.ids["mock_screen_progress"].text,
+            f"[size={screen.SIZE_G}sp]Connecting... (2/5)[/size]",
+        )
+        mock_get_locale.assert_any_call()
+
+    def test_format_throughput(self):
+        self.assertEqual(BaseDownloadScreen.format_throughput({}), "")
+        self.assertEqual(BaseDownloadScreen.format_throughput({"rate": 0.0}), "")
+        self.assertEqual(
+            BaseDownloadScreen.format_throughput({"rate": 1 << 20, "eta": None}),
+            " (1.00 MB/s)",
+        )
+        self.assertEqual(
+            BaseDownloadScreen.format_throughput({"rate": 3 << 19, "eta": 125.4}),
+            " (1.50 MB/s, 02:05)",
+        )
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    def test_update_received(self, mock_get_locale):
+        screen = BaseDownloadScreen(wid="mock_screen", name="MockScreen")
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+
+        screen.update_received(
+            {"downloaded_len": 3 << 20, "content_len": 0, "rate": 1 << 20, "eta": None}
+        )
+
+        text = "".join(
+            [
+                f"[size={screen.SIZE_G}sp][b]3.00 MB[/b][/size]",
+                "\n",
+                f"[size={screen.SIZE_MP}sp]",
+                " (1.00 MB/s)",
+                "[/size]",
+            ]
+        )
+        self.assertEqual(screen.ids["mock_screen_progress"].text, text)
+        mock_get_locale.assert_any_call()
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    def test_run_download_cancelled(self, mock_get_locale):
+        screen = BaseDownloadScreen(wid="mock_screen", name="MockScreen")
+        fn = MagicMock(side_effect=DownloadCancelled("Download cancelled at 21"))
+
+        # a cancelled download do not raise on the thread
+        screen.run_download(fn)
+        fn.assert_called_once()
+        mock_get_locale.assert_any_call()
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    def test_on_leave_cancel(self, mock_get_locale):
+        screen = BaseDownloadScreen(wid="mock_screen", name="MockScreen")
+        screen.downloader = MagicMock()
+        screen.thread = MagicMock()
+
+        screen.thread.is_alive.return_value = False
+        screen.on_leave()
+        screen.downloader.cancel.assert_not_called()
+
+        screen.thread.is_alive.return_value = True
+        screen.on_leave()
+        screen.downloader.cancel.assert_called_once()
+        mock_get_locale.assert_any_call()
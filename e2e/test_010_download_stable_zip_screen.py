@@ -39,7 +39,7 @@ class TestDownloadStableZipScreen(GraphicUnitTest):
         self.assertEqual(screen.thread, None)
         self.assertEqual(screen.trigger, None)
         self.assertEqual(screen.version, None)
-        self.assertEqual(screen.to_screen, "DownloadStableZipSha256Screen")
+        self.assertEqual(screen.to_screen, "VerifyStableZipScreen")
         self.assertEqual(grid.id, "download_stable_zip_screen_grid")
         self.assertEqual(grid.children[1].id, "download_stable_zip_screen_progress")
         self.assertEqual(grid.children[0].id, "download_stable_zip_screen_info")
@@ -117,10 +117,17 @@ class TestDownloadStableZipScreen(GraphicUnitTest):
         "src.app.screens.base_screen.BaseScreen.get_destdir_assets",
         return_value="mockdir",
     )
-    @patch("src.app.screens.download_stable_zip_screen.ZipDownloader")
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_download_connections",
+        return_value=4,
+    )
+    @patch("src.app.screens.base_screen.BaseScreen.get_asset_cache")
+    @patch("src.app.screens.download_stable_zip_screen.ReleaseBundle")
     def test_update_version(
         self,
         mock_downloader,
+        mock_get_asset_cache,
+        mock_get_download_connections,
         mock_get_destdir_assets,
         mock_get_locale,
     ):
@@ -138,7 +145,54 @@ class TestDownloadStableZipScreen(GraphicUnitTest):
         # patch assertions
         mock_get_locale.assert_any_call()
         mock_get_destdir_assets.assert_any_call()
-        mock_downloader.assert_called_once()
+        mock_get_download_connections.assert_any_call()
+        mock_get_asset_cache.assert_called_once()
+        mock_downloader.assert_called_once_with(
+            version="v0.0.1",
+            destdir="mockdir",
+            connections=4,
+            cache=mock_get_asset_cache.return_value,
+        )
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_destdir_assets",
+        return_value="mockdir",
+    )
+    @patch("src.app.screens.base_screen.BaseScreen.get_asset_cache")
+    @patch("src.app.screens.download_stable_zip_screen.ReleaseBundle")
+    @patch("src.app.screens.download_stable_zip_screen.get_manager")
+    def test_update_version_request(
+        self,
+        mock_get_manager,
+        mock_downloader,
+        mock_get_asset_cache,
+        mock_get_destdir_assets,
+        mock_get_locale,
+    ):
+        mock_request = mock_get_manager.return_value.request
+        mock_request.return_value.url = "https://mock.url/krux-v0.0.1.zip"
+        mock_request.return_value.destdir = "mockdir"
+        screen = DownloadStableZipScreen()
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+
+        # do tests
+        screen.update(name="ConfigKruxInstaller", key="version", value="v0.0.1")
+
+        # default assertions
+        self.assertEqual(screen.downloader, mock_request.return_value)
+
+        # patch assertions
+        mock_get_locale.assert_any_call()
+        mock_get_destdir_assets.assert_any_call()
+        mock_get_asset_cache.assert_called_once()
+        mock_request.assert_called_once_with(downloader=mock_downloader.return_value)
 
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
     @patch(
@@ -188,6 +242,82 @@ class TestDownloadStableZipScreen(GraphicUnitTest):
         # patch assertions
         mock_get_locale.assert_any_call()
 
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch(
+        "src.app.screens.download_stable_zip_screen.DownloadStableZipScreen.update_retry"
+    )
+    def test_update_progress_retry(self, mock_update_retry, mock_get_locale):
+        screen = DownloadStableZipScreen()
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+
+        value = {"downloaded_len": 210000, "content_len": 0, "retry": 2, "attempts": 5}
+        screen.update(name="ConfigKruxInstaller", key="progress", value=value)
+
+        # patch assertions
+        mock_update_retry.assert_called_once_with(value)
+        mock_get_locale.assert_any_call()
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    def test_update_progress_with_throughput(self, mock_get_locale):
+        screen = DownloadStableZipScreen()
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+        window = EventLoop.window
+
+        fontsize_g = 0
+        fontsize_mp = 0
+
+        if sys.platform in ("linux", "win32"):
+            fontsize_g = window.size[0] // 16
+            fontsize_mp = window.size[0] // 48
+
+        if sys.platform == "darwin":
+            fontsize_g = window.size[0] // 32
+            fontsize_mp = window.size[0] // 128
+
+        # do tests
+        screen.update(
+            name="ConfigKruxInstaller",
+            key="progress",
+            value={
+                "downloaded_len": 210000,
+                "content_len": 21000000,
+                "elapsed": 1.0,
+                "rate": 1 << 20,
+                "eta": 19.8,
+            },
+        )
+
+        # do tests
+        text = "".join(
+            [
+                f"[size={fontsize_g}sp][b]1.00 %[/b][/size]",
+                "\n",
+                f"[size={fontsize_mp}sp]",
+                "0.20",
+                " of ",
+                "20.03 MB",
+                " (1.00 MB/s, 00:20)",
+                "[/size]",
+            ]
+        )
+
+        self.assertEqual(screen.ids["download_stable_zip_screen_progress"].text, text)
+
+        # patch assertions
+        mock_get_locale.assert_any_call()
+
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
@@ -264,7 +394,7 @@ class TestDownloadStableZipScreen(GraphicUnitTest):
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
     )
-    @patch("src.app.screens.download_stable_zip_screen.ZipDownloader")
+    @patch("src.app.screens.download_stable_zip_screen.ReleaseBundle")
     @patch("src.app.screens.download_stable_zip_screen.partial")
     @patch("src.app.screens.download_stable_zip_screen.Clock.schedule_once")
     def test_on_progress(
@@ -288,7 +418,9 @@ class TestDownloadStableZipScreen(GraphicUnitTest):
 
         # default assertions
         # pylint: disable=no-member
-        DownloadStableZipScreen.on_progress(data=b"")
+        DownloadStableZipScreen.on_progress(
+            event={"downloaded_len": 8, "content_len": 21000000}
+        )
 
         # patch assertions
         mock_get_locale.assert_any_call()
@@ -312,19 +444,107 @@ class TestDownloadStableZipScreen(GraphicUnitTest):
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
     )
     @patch("src.app.screens.download_stable_zip_screen.time.sleep")
+    @patch(
+        "src.app.screens.download_stable_zip_screen.DownloadStableZipScreen.set_screen"
+    )
+    def test_on_trigger(
+        self,
+        mock_set_screen,
+        mock_sleep,
+        mock_get_locale,
+    ):
+        # screen
+        screen = DownloadStableZipScreen()
+        screen.version = "v0.0.1"
+
+        # pylint: disable=no-member
+        screen.trigger = screen.on_trigger
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+
+        # do tests
+        # pylint: disable=no-member
+        DownloadStableZipScreen.on_trigger(0)
+
+        # default assertions
+        self.assertFalse(screen.on_trigger is None)
+        self.assertFalse(screen.trigger is None)
+
+        # patch assertions
+        mock_get_locale.assert_any_call()
+        mock_sleep.assert_called_once_with(2.1)
+        mock_set_screen.assert_called_once_with(
+            name="VerifyStableZipScreen", direction="left"
+        )
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_destdir_assets",
+        return_value="mockdir",
+    )
+    @patch("src.app.screens.download_stable_zip_screen.PartialZipDownloader")
+    @patch("src.app.screens.download_stable_zip_screen.get_manager")
+    def test_update_device_request(
+        self,
+        mock_get_manager,
+        mock_downloader,
+        mock_get_destdir_assets,
+        mock_get_locale,
+    ):
+        mock_request = mock_get_manager.return_value.request
+        mock_request.return_value.url = "https://mock.url/krux-v0.0.1.zip"
+        mock_request.return_value.destdir = "mockdir"
+        screen = DownloadStableZipScreen()
+        screen.version = "v0.0.1"
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+
+        # do tests
+        screen.update(name="MainScreen", key="device", value="amigo")
+
+        # default assertions
+        self.assertEqual(screen.device, "amigo")
+        self.assertEqual(screen.downloader, mock_request.return_value)
+        self.assertEqual(
+            screen.filepath,
+            os.path.join("mockdir", "krux-v0.0.1", "maixpy_amigo", "kboot.kfpkg"),
+        )
+
+        # patch assertions
+        mock_get_locale.assert_any_call()
+        mock_get_destdir_assets.assert_any_call()
+        mock_downloader.assert_called_once_with(
+            version="v0.0.1", device="amigo", destdir="mockdir"
+        )
+        mock_request.assert_called_once_with(downloader=mock_downloader.return_value)
+
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch("src.app.screens.base_screen.BaseScreen.get_baudrate", return_value=1500000)
+    @patch("src.app.screens.download_stable_zip_screen.time.sleep")
     @patch("src.app.screens.download_stable_zip_screen.DownloadStableZipScreen.manager")
     @patch("src.app.screens.download_stable_zip_screen.partial")
     @patch("src.app.screens.download_stable_zip_screen.Clock.schedule_once")
     @patch(
         "src.app.screens.download_stable_zip_screen.DownloadStableZipScreen.set_screen"
     )
-    def test_on_trigger(
+    def test_on_trigger_device(
         self,
         mock_set_screen,
         mock_schedule_once,
         mock_partial,
         mock_manager,
         mock_sleep,
+        mock_get_baudrate,
         mock_get_locale,
     ):
         # Mocks
@@ -333,6 +553,8 @@ class TestDownloadStableZipScreen(GraphicUnitTest):
         # screen
         screen = DownloadStableZipScreen()
         screen.version = "v0.0.1"
+        screen.device = "amigo"
+        screen.downloader = MagicMock(destdir="mockdir")
 
         # pylint: disable=no-member
         screen.trigger = screen.on_trigger
@@ -345,28 +567,29 @@ class TestDownloadStableZipScreen(GraphicUnitTest):
         # pylint: disable=no-member
         DownloadStableZipScreen.on_trigger(0)
 
-        # default assertions
-        self.assertFalse(screen.on_trigger is None)
-        self.assertFalse(screen.trigger is None)
-
         # patch assertions
         mock_get_locale.assert_any_call()
+        mock_get_baudrate.assert_any_call()
         mock_sleep.assert_called_once_with(2.1)
-        mock_manager.get_screen.assert_called_once_with("DownloadStableZipSha256Screen")
+        mock_manager.get_screen.assert_called_once_with("FlashScreen")
+
+        p = os.path.join("mockdir", "krux-v0.0.1", "maixpy_amigo", "kboot.kfpkg")
         mock_partial.assert_has_calls(
             [
-                call(screen.update, name=screen.name, key="canvas"),
                 call(
                     mock_manager.get_screen().update,
                     name=screen.name,
-                    key="version",
-                    value="v0.0.1",
+                    key="baudrate",
+                    value=1500000,
+                ),
+                call(
+                    mock_manager.get_screen().update,
+                    name=screen.name,
+                    key="firmware",
+                    value=p,
                 ),
+                call(mock_manager.get_screen().update, name=screen.name, key="flasher"),
             ]
         )
-        mock_schedule_once.assert_has_calls(
-            [call(mock_partial(), 0), call(mock_partial(), 0)]
-        )
-        mock_set_screen.assert_called_once_with(
-            name="DownloadStableZipSha256Screen", direction="left"
-        )
+        mock_schedule_once.assert_has_calls([call(mock_partial(), 0)] * 3)
+        mock_set_screen.assert_called_once_with(name="FlashScreen", direction="left")
@@ -222,7 +222,9 @@ class TestDownloadStableZipSha256Screen(GraphicUnitTest):
 
         # default assertions
         # pylint: disable=no-member
-        DownloadStableZipSha256Screen.on_progress(data=b"")
+        DownloadStableZipSha256Screen.on_progress(
+            event={"downloaded_len": 8, "content_len": 21000000}
+        )
 
         # patch assertions
         mock_get_locale.assert_any_call()
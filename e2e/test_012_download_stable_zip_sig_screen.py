@@ -212,7 +212,9 @@ class TestDownloadStableZipSigScreen(GraphicUnitTest):
 
         # default assertions
         # pylint: disable=no-member
-        DownloadStableZipSigScreen.on_progress(data=b"")
+        DownloadStableZipSigScreen.on_progress(
+            event={"downloaded_len": 8, "content_len": 21000000}
+        )
 
         # patch assertions
         mock_get_locale.assert_any_call()
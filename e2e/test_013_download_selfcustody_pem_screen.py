@@ -212,7 +212,9 @@ class TestDownloadSelfcustodyPemScreen(GraphicUnitTest):
 
         # default assertions
         # pylint: disable=no-member
-        DownloadSelfcustodyPemScreen.on_progress(data=b"")
+        DownloadSelfcustodyPemScreen.on_progress(
+            event={"downloaded_len": 8, "content_len": 21000000}
+        )
 
         # patch assertions
         mock_get_locale.assert_any_call()
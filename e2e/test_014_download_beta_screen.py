@@ -245,6 +245,44 @@ class TestDownloadBetaScreen(GraphicUnitTest):
         mock_get_locale.assert_any_call()
         mock_destdir_assets.assert_any_call()
 
+    @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
+    )
+    @patch(
+        "src.app.screens.base_screen.BaseScreen.get_destdir_assets",
+        return_value="mockdir",
+    )
+    @patch("src.app.screens.download_beta_screen.get_manager")
+    def test_update_downloader_request(
+        self, mock_get_manager, mock_destdir_assets, mock_get_locale
+    ):
+        mock_request = mock_get_manager.return_value.request
+        mock_request.return_value.url = "https://mock.url/kboot.kfpkg"
+        mock_request.return_value.destdir = "mockdir"
+        screen = DownloadBetaScreen()
+        screen.firmware = "kboot.kfpkg"
+        screen.device = "amigo"
+        self.render(screen)
+
+        # get your Window instance safely
+        EventLoop.ensure_window()
+
+        # do tests
+        screen.update(name=screen.name, key="downloader")
+
+        # default assertions
+        self.assertEqual(screen.downloader, mock_request.return_value)
+
+        # patch assertions
+        mock_get_locale.assert_any_call()
+        mock_destdir_assets.assert_any_call()
+        beta = mock_request.call_args.kwargs["downloader"]
+        self.assertEqual(
+            beta.url,
+            "https://raw.githubusercontent.com/odudex/krux_binaries/main/maixpy_amigo/kboot.kfpkg",
+        )
+
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
     @patch(
         "src.app.screens.base_screen.BaseScreen.get_locale", return_value="en_US.UTF-8"
@@ -458,7 +496,9 @@ class TestDownloadBetaScreen(GraphicUnitTest):
         with patch.object(screen, "downloader") as mock_downloader:
             mock_downloader.downloaded_len = 21
             mock_downloader.content_len = 21000000
-            DownloadBetaScreen.on_progress(data=[])
+            DownloadBetaScreen.on_progress(
+                event={"downloaded_len": 21, "content_len": 21000000}
+            )
 
             # default assertions
             self.assertFalse(screen.on_progress is None)
@@ -5,6 +5,7 @@ from unittest.mock import patch, MagicMock, call, mock_open
 from kivy.base import EventLoop
 from kivy.tests.common import GraphicUnitTest
 from src.app.config_krux_installer import ConfigKruxInstaller
+from src.utils.session import DEFAULT_POOL_SIZE
 
 
 class TestConfigKruxInstaller(GraphicUnitTest):
@@ -380,6 +381,21 @@ class TestConfigKruxInstaller(GraphicUnitTest):
             [
                 call("destdir", {"assets": "mockdir"}),
                 call("flash", {"baudrate": 1500000}),
+                call(
+                    "download",
+                    {
+                        "connections": 1,
+                        "pool_size": 10,
+                        "backend": "requests",
+                        "mirrors": "",
+                        "limit": 0,
+                        "background_limit": 0,
+                        "prefetch": 0,
+                        "partial": 0,
+                        "beta_sync": 0,
+                    },
+                ),
+                call("cache", {"budget": 512, "bundle": "", "trust_pem": 0}),
                 call("locale", {"lang": lang}),
             ]
         )
@@ -405,6 +421,91 @@ class TestConfigKruxInstaller(GraphicUnitTest):
                 "section": "flash",
                 "key": "baudrate",
             },
+            {
+                "type": "numeric",
+                "title": "Download connections",
+                "desc": "Concurrent connections to download a release zip",
+                "section": "download",
+                "key": "connections",
+            },
+            {
+                "type": "numeric",
+                "title": "Pooled connections",
+                "desc": "Alive connections kept for each host between downloads",
+                "section": "download",
+                "key": "pool_size",
+            },
+            {
+                "type": "options",
+                "title": "Download backend",
+                "desc": "Threads with requests or a single asyncio event loop",
+                "section": "download",
+                "key": "backend",
+                "options": ["requests", "asyncio"],
+            },
+            {
+                "type": "string",
+                "title": "Mirrors",
+                "desc": "Base urls (http, https or file) tried before github",
+                "section": "download",
+                "key": "mirrors",
+            },
+            {
+                "type": "numeric",
+                "title": "Download limit",
+                "desc": "Kilobytes per second of all downloads, 0 is unlimited",
+                "section": "download",
+                "key": "limit",
+            },
+            {
+                "type": "numeric",
+                "title": "Background limit",
+                "desc": "Kilobytes per second of each background download",
+                "section": "download",
+                "key": "background_limit",
+            },
+            {
+                "type": "bool",
+                "title": "Prefetch",
+                "desc": "Download the selected release in background before flashing",
+                "section": "download",
+                "key": "prefetch",
+            },
+            {
+                "type": "bool",
+                "title": "Partial download",
+                "desc": "Fetch only the device's signed firmware (keeps its bootloader)",
+                "section": "download",
+                "key": "partial",
+            },
+            {
+                "type": "bool",
+                "title": "Beta sync",
+                "desc": "Keep a copy of every beta binary, updated when it changes",
+                "section": "download",
+                "key": "beta_sync",
+            },
+            {
+                "type": "numeric",
+                "title": "Cache budget",
+                "desc": "Megabytes of downloaded assets kept on destination path",
+                "section": "cache",
+                "key": "budget",
+            },
+            {
+                "type": "path",
+                "title": "Offline bundle",
+                "desc": "Directory or tarball of release assets to import",
+                "section": "cache",
+                "key": "bundle",
+            },
+            {
+                "type": "bool",
+                "title": "Trust bundle key",
+                "desc": "Use the selfcustody.pem of a bundle when none is installed",
+                "section": "cache",
+                "key": "trust_pem",
+            },
             {
                 "type": "options",
                 "title": "Locale",
@@ -431,6 +532,209 @@ class TestConfigKruxInstaller(GraphicUnitTest):
             [call("Settings", None, data=json.dumps(json_data))], any_order=True
         )
 
+    @patch("src.app.config_krux_installer.prefetcher.set_enabled")
+    @patch("src.app.config_krux_installer.set_background_rate")
+    @patch("src.app.config_krux_installer.get_limiter")
+    @patch("src.app.config_krux_installer.set_mirrors")
+    @patch("src.app.config_krux_installer.set_engine")
+    @patch("src.app.config_krux_installer.set_pool_size")
+    def test_setup_session(
+        self,
+        mock_set_pool_size,
+        mock_set_engine,
+        mock_set_mirrors,
+        mock_get_limiter,
+        mock_set_background_rate,
+        mock_set_enabled,
+    ):
+        app = ConfigKruxInstaller()
+        app.config = MagicMock()
+        app.config.get = MagicMock(
+            side_effect=[
+                "4",
+                "requests",
+                "https://a.mock, file:///mnt/b",
+                "512",
+                "64",
+                "1",
+            ]
+        )
+        app.setup_session()
+
+        app.config.get.assert_has_calls(
+            [
+                call("download", "pool_size"),
+                call("download", "backend"),
+                call("download", "mirrors"),
+                call("download", "limit"),
+                call("download", "background_limit"),
+                call("download", "prefetch"),
+            ]
+        )
+        mock_set_pool_size.assert_called_once_with(4)
+        mock_set_engine.assert_called_once_with(None)
+        mock_set_mirrors.assert_called_once_with(["https://a.mock", "file:///mnt/b"])
+        self.assertEqual(mock_get_limiter.return_value.rate, 512 << 10)
+        mock_set_background_rate.assert_called_once_with(64 << 10)
+        mock_set_enabled.assert_called_once_with(True)
+
+    @patch("src.app.config_krux_installer.get_limiter")
+    def test_on_config_change_limit(self, mock_get_limiter):
+        app = ConfigKruxInstaller()
+        app.on_config_change(None, "download", key="limit", value="100")
+        self.assertEqual(mock_get_limiter.return_value.rate, 100 << 10)
+
+        # negative limits are unlimited
+        app.on_config_change(None, "download", key="limit", value="-1")
+        self.assertEqual(mock_get_limiter.return_value.rate, 0)
+
+        # and so are invalid ones, instead of crashing
+        for value in ("1.5", ""):
+            mock_get_limiter.return_value.rate = 100 << 10
+            app.on_config_change(None, "download", key="limit", value=value)
+            self.assertEqual(mock_get_limiter.return_value.rate, 0)
+
+    @patch("src.app.config_krux_installer.set_background_rate")
+    def test_on_config_change_background_limit(self, mock_set_background_rate):
+        app = ConfigKruxInstaller()
+        app.on_config_change(None, "download", key="background_limit", value="32")
+        mock_set_background_rate.assert_called_once_with(32 << 10)
+
+        # invalid limits are unlimited, instead of crashing
+        app.on_config_change(None, "download", key="background_limit", value="1.5")
+        mock_set_background_rate.assert_called_with(0)
+
+    @patch(
+        "src.app.config_krux_installer.get_mirrors", return_value=["https://a.mock"]
+    )
+    @patch("src.app.config_krux_installer.start_warm_up")
+    def test_setup_warmup(self, mock_start_warm_up, mock_get_mirrors):
+        ConfigKruxInstaller.setup_warmup()
+        mock_get_mirrors.assert_called_once()
+        mock_start_warm_up.assert_called_once_with(
+            urls=[
+                "https://api.github.com",
+                "https://github.com",
+                "https://objects.githubusercontent.com",
+                "https://raw.githubusercontent.com",
+                "https://a.mock",
+            ]
+        )
+
+    @patch("src.app.config_krux_installer.prefetcher.set_enabled")
+    def test_on_config_change_prefetch(self, mock_set_enabled):
+        app = ConfigKruxInstaller()
+        app.on_config_change(None, "download", key="prefetch", value="1")
+        app.on_config_change(None, "download", key="prefetch", value="0")
+        app.on_config_change(None, "download", key="prefetch", value="")
+        mock_set_enabled.assert_has_calls([call(True), call(False), call(False)])
+
+    @patch("src.app.config_krux_installer.start_sync")
+    def test_setup_beta_sync(self, mock_start_sync):
+        app = ConfigKruxInstaller()
+        app.config = MagicMock()
+        app.config.get = MagicMock(side_effect=["0", "1", "mockdir"])
+        app.setup_beta_sync()
+        mock_start_sync.assert_not_called()
+
+        app.setup_beta_sync()
+        mock_start_sync.assert_called_once_with(
+            destdir=os.path.join("mockdir", "krux_binaries")
+        )
+        app.config.get.assert_has_calls(
+            [
+                call("download", "beta_sync"),
+                call("download", "beta_sync"),
+                call("destdir", "assets"),
+            ]
+        )
+
+    @patch("src.app.config_krux_installer.ConfigKruxInstaller.setup_beta_sync")
+    def test_on_config_change_beta_sync(self, mock_setup_beta_sync):
+        app = ConfigKruxInstaller()
+        app.on_config_change(None, "download", key="beta_sync", value="1")
+        mock_setup_beta_sync.assert_called_once()
+
+    @patch("src.app.config_krux_installer.set_mirrors")
+    def test_on_config_change_mirrors(self, mock_set_mirrors):
+        app = ConfigKruxInstaller()
+        app.on_config_change(None, "download", key="mirrors", value="https://a.mock")
+        mock_set_mirrors.assert_called_once_with(["https://a.mock"])
+
+    @patch("src.app.config_krux_installer.set_mirrors")
+    def test_on_config_change_invalid_mirrors(self, mock_set_mirrors):
+        mock_set_mirrors.side_effect = [ValueError("Invalid mirror: ftp://a"), None]
+        app = ConfigKruxInstaller()
+        app.on_config_change(None, "download", key="mirrors", value="ftp://a")
+        mock_set_mirrors.assert_has_calls([call(["ftp://a"]), call([])])
+
+    @patch("src.app.config_krux_installer.Thread")
+    def test_on_config_change_bundle(self, mock_thread):
+        app = ConfigKruxInstaller()
+        app.on_config_change(None, "cache", key="bundle", value="")
+        mock_thread.assert_not_called()
+
+        app.on_config_change(None, "cache", key="bundle", value="/mnt/bundle")
+        mock_thread.assert_called_once_with(
+            name="BundleImporter", target=app.run_import, args=("/mnt/bundle",)
+        )
+        mock_thread.return_value.start.assert_called_once()
+
+    @patch("src.app.config_krux_installer.BundleImporter")
+    @patch("src.app.config_krux_installer.get_cache")
+    def test_run_import(self, mock_get_cache, mock_importer):
+        mock_importer.return_value.import_bundle.side_effect = [
+            {"versions": ["v0.0.1"], "beta": [], "rejected": {}},
+            ValueError("Invalid bundle: /mnt/bundle"),
+        ]
+        app = ConfigKruxInstaller()
+        app.config = MagicMock()
+        app.config.get = MagicMock(side_effect=["mockdir", "512", "1", "mockdir", "512", "0"])
+        app.error = MagicMock()
+
+        app.run_import("/mnt/bundle")
+        mock_get_cache.assert_called_once_with(destdir="mockdir", budget=512 << 20)
+        mock_importer.assert_called_once_with(
+            cache=mock_get_cache.return_value, trust_pem=True
+        )
+        mock_importer.return_value.import_bundle.assert_called_once_with(
+            path="/mnt/bundle"
+        )
+        app.error.assert_not_called()
+
+        # a failed import is logged, not raised on the thread
+        app.run_import("/mnt/bundle")
+        app.error.assert_called_once_with(
+            "run_import::/mnt/bundle::Invalid bundle: /mnt/bundle"
+        )
+
+    @patch("src.app.config_krux_installer.get_engine", return_value=None)
+    @patch("src.app.config_krux_installer.set_engine")
+    @patch("src.app.config_krux_installer.AsyncEngine")
+    def test_on_config_change_backend(
+        self, mock_engine, mock_set_engine, mock_get_engine
+    ):
+        app = ConfigKruxInstaller()
+        app.on_config_change(None, "download", key="backend", value="asyncio")
+        mock_get_engine.assert_called_once()
+        mock_set_engine.assert_called_once_with(mock_engine.return_value)
+
+        mock_set_engine.reset_mock()
+        app.on_config_change(None, "download", key="backend", value="requests")
+        mock_set_engine.assert_called_once_with(None)
+
+    @patch("src.app.config_krux_installer.set_pool_size")
+    def test_on_config_change_pool_size(self, mock_set_pool_size):
+        app = ConfigKruxInstaller()
+        app.on_config_change(None, "download", key="pool_size", value="8")
+        mock_set_pool_size.assert_called_once_with(8)
+
+        # invalid sizes fall back to the default, instead of crashing
+        for value in ("0", "-1", "2.5", ""):
+            mock_set_pool_size.reset_mock()
+            app.on_config_change(None, "download", key="pool_size", value=value)
+            mock_set_pool_size.assert_called_once_with(DEFAULT_POOL_SIZE)
+
     @patch("src.app.config_krux_installer.partial")
     def test_skip_on_config_change_linux(self, mock_partial):
         app = ConfigKruxInstaller()
@@ -195,10 +195,22 @@ class TestConfigKruxInstaller(GraphicUnitTest):
         mock_schedule_once.assert_called_once_with(mock_partial(), 0)
 
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
+    @patch("src.app.KruxInstallerApp.setup_session")
+    @patch("src.app.KruxInstallerApp.setup_warmup")
+    @patch("src.app.KruxInstallerApp.setup_beta_sync")
     @patch("src.app.KruxInstallerApp.on_greetings")
-    def test_on_start(self, mock_on_greetings):
+    def test_on_start(
+        self,
+        mock_on_greetings,
+        mock_setup_beta_sync,
+        mock_setup_warmup,
+        mock_setup_session,
+    ):
         app = KruxInstallerApp()
         app.on_start()
+        mock_setup_session.assert_called_once()
+        mock_setup_warmup.assert_called_once()
+        mock_setup_beta_sync.assert_called_once()
         mock_on_greetings.assert_called_once()
 
     @patch.object(EventLoopBase, "ensure_window", lambda x: None)
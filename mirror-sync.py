@@ -0,0 +1,40 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+mirror-sync.py
+
+Headless entry point that fills a local mirror with the release assets
+(see `src/utils/mirror/mirror_sync.py`), without Kivy:
+
+    python mirror-sync.py /srv/krux
+    python mirror-sync.py /srv/krux --releases v24.07.0,v24.03.0 --no-beta
+"""
+
+if __name__ == "__main__":
+    import os
+    import sys
+
+    os.environ["KRUX_INSTALLER_HEADLESS"] = "1"
+
+    # pylint: disable=wrong-import-position
+    from src.utils.mirror.mirror_sync import main
+
+    sys.exit(main())
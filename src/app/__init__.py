@@ -76,6 +76,9 @@ class KruxInstallerApp(ConfigKruxInstaller):
 
     def on_start(self):
         """When application starts, verify system and check latest firmware version"""
+        self.setup_session()
+        self.setup_warmup()
+        self.setup_beta_sync()
         self.on_greetings()
 
     def setup_screen_manager(self):
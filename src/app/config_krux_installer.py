@@ -26,11 +26,22 @@ import sys
 import json
 import ctypes
 import locale
+import tarfile
 from functools import partial
+from threading import Thread
 from kivy import resources as kv_resources
 from kivy.clock import Clock
 from kivy.core.text import LabelBase, DEFAULT_FONT
 from src.utils.trigger import Trigger
+from src.utils.session import DEFAULT_POOL_SIZE, set_pool_size
+from src.utils.downloader.async_engine import AsyncEngine, get_engine, set_engine
+from src.utils.mirror import get_mirrors, parse_mirrors, set_mirrors
+from src.utils.warmup import WARM_URLS, start_warm_up
+from src.utils.downloader.rate_limiter import get_limiter, set_background_rate
+from src.utils.downloader import prefetcher
+from src.utils.downloader.beta_sync import start_sync
+from src.utils.cache import get_cache
+from src.utils.bundle import BundleImporter
 from src.app.base_krux_installer import BaseKruxInstaller
 
 
@@ -155,6 +166,9 @@ class ConfigKruxInstaller(BaseKruxInstaller, Trigger):
         config.setdefaults("flash", {"baudrate": baudrate})
         self.debug(f"{config}.baudrate={baudrate}")
 
+        self._build_download_config(config)
+        self._build_cache_config(config)
+
         lang = ConfigKruxInstaller.get_system_lang()
 
         # Check if system lang is supported in src/i18n
@@ -179,6 +193,53 @@ class ConfigKruxInstaller(BaseKruxInstaller, Trigger):
                 self.warning(f"{lang} not supported. Default {config}.lang=en_US")
                 config.setdefaults("locale", {"lang": "en_US"})
 
+    def _build_download_config(self, config):
+        """Create default configurations of downloads"""
+        connections = 1
+        pool_size = DEFAULT_POOL_SIZE
+        backend = "requests"
+        mirrors = ""
+        limit = 0
+        background_limit = 0
+        prefetch = 0
+        partial_zip = 0
+        beta_sync = 0
+        config.setdefaults(
+            "download",
+            {
+                "connections": connections,
+                "pool_size": pool_size,
+                "backend": backend,
+                "mirrors": mirrors,
+                "limit": limit,
+                "background_limit": background_limit,
+                "prefetch": prefetch,
+                "partial": partial_zip,
+                "beta_sync": beta_sync,
+            },
+        )
+        self.debug(f"{config}.connections={connections}")
+        self.debug(f"{config}.pool_size={pool_size}")
+        self.debug(f"{config}.backend={backend}")
+        self.debug(f"{config}.mirrors={mirrors}")
+        self.debug(f"{config}.limit={limit}")
+        self.debug(f"{config}.background_limit={background_limit}")
+        self.debug(f"{config}.prefetch={prefetch}")
+        self.debug(f"{config}.partial={partial_zip}")
+        self.debug(f"{config}.beta_sync={beta_sync}")
+
+    def _build_cache_config(self, config):
+        """Create default configurations of the asset cache"""
+        budget = 512
+        bundle = ""
+        trust_pem = 0
+        config.setdefaults(
+            "cache", {"budget": budget, "bundle": bundle, "trust_pem": trust_pem}
+        )
+        self.debug(f"{config}.budget={budget}")
+        self.debug(f"{config}.bundle={bundle}")
+        self.debug(f"{config}.trust_pem={trust_pem}")
+
     def build_settings(self, settings):
         """Create settings panel"""
         json_data = [
@@ -196,6 +257,91 @@ class ConfigKruxInstaller(BaseKruxInstaller, Trigger):
                 "section": "flash",
                 "key": "baudrate",
             },
+            {
+                "type": "numeric",
+                "title": "Download connections",
+                "desc": "Concurrent connections to download a release zip",
+                "section": "download",
+                "key": "connections",
+            },
+            {
+                "type": "numeric",
+                "title": "Pooled connections",
+                "desc": "Alive connections kept for each host between downloads",
+                "section": "download",
+                "key": "pool_size",
+            },
+            {
+                "type": "options",
+                "title": "Download backend",
+                "desc": "Threads with requests or a single asyncio event loop",
+                "section": "download",
+                "key": "backend",
+                "options": ["requests", "asyncio"],
+            },
+            {
+                "type": "string",
+                "title": "Mirrors",
+                "desc": "Base urls (http, https or file) tried before github",
+                "section": "download",
+                "key": "mirrors",
+            },
+            {
+                "type": "numeric",
+                "title": "Download limit",
+                "desc": "Kilobytes per second of all downloads, 0 is unlimited",
+                "section": "download",
+                "key": "limit",
+            },
+            {
+                "type": "numeric",
+                "title": "Background limit",
+                "desc": "Kilobytes per second of each background download",
+                "section": "download",
+                "key": "background_limit",
+            },
+            {
+                "type": "bool",
+                "title": "Prefetch",
+                "desc": "Download the selected release in background before flashing",
+                "section": "download",
+                "key": "prefetch",
+            },
+            {
+                "type": "bool",
+                "title": "Partial download",
+                "desc": "Fetch only the device's signed firmware (keeps its bootloader)",
+                "section": "download",
+                "key": "partial",
+            },
+            {
+                "type": "bool",
+                "title": "Beta sync",
+                "desc": "Keep a copy of every beta binary, updated when it changes",
+                "section": "download",
+                "key": "beta_sync",
+            },
+            {
+                "type": "numeric",
+                "title": "Cache budget",
+                "desc": "Megabytes of downloaded assets kept on destination path",
+                "section": "cache",
+                "key": "budget",
+            },
+            {
+                "type": "path",
+                "title": "Offline bundle",
+                "desc": "Directory or tarball of release assets to import",
+                "section": "cache",
+                "key": "bundle",
+            },
+            {
+                "type": "bool",
+                "title": "Trust bundle key",
+                "desc": "Use the selfcustody.pem of a bundle when none is installed",
+                "section": "cache",
+                "key": "trust_pem",
+            },
             {
                 "type": "options",
                 "title": "Locale",
@@ -221,6 +367,118 @@ class ConfigKruxInstaller(BaseKruxInstaller, Trigger):
         self.debug(f"{settings}.data={json_str}")
         settings.add_json_panel("Settings", self.config, data=json_str)
 
+    def setup_session(self):
+        """Apply the configured download settings to the shared HTTP session"""
+        self.setup_pool_size(self.config.get("download", "pool_size"))
+        ConfigKruxInstaller.setup_backend(self.config.get("download", "backend"))
+        self.setup_mirrors(self.config.get("download", "mirrors"))
+        ConfigKruxInstaller.setup_limit(self.config.get("download", "limit"))
+        ConfigKruxInstaller.setup_background_limit(
+            self.config.get("download", "background_limit")
+        )
+        ConfigKruxInstaller.setup_prefetch(self.config.get("download", "prefetch"))
+
+    def setup_pool_size(self, value: str):
+        """
+        Apply the configured pool size to the shared HTTP session. An
+        invalid one (not a positive integer) falls back to the default
+        """
+        pool_size = ConfigKruxInstaller._parse_int(value)
+        if pool_size < 1:
+            self.warning(f"setup_pool_size::invalid {value}, using {DEFAULT_POOL_SIZE}")
+            pool_size = DEFAULT_POOL_SIZE
+
+        self.debug(f"setup_pool_size::pool_size={pool_size}")
+        set_pool_size(pool_size)
+
+    @staticmethod
+    def setup_warmup():
+        """
+        Connect to github and to the mirrors in background, while
+        the first screens wait, so the first requests reuse them
+        """
+        start_warm_up(urls=list(WARM_URLS) + get_mirrors())
+
+    def setup_beta_sync(self):
+        """
+        Download in background the beta binaries that changed since
+        the last sync, when enabled, so any of them flash right away
+        """
+        if ConfigKruxInstaller._parse_int(self.config.get("download", "beta_sync")):
+            destdir = self.config.get("destdir", "assets")
+            start_sync(destdir=os.path.join(destdir, "krux_binaries"))
+
+    def setup_mirrors(self, value: str):
+        """Try the configured mirrors before github, ignoring invalid ones"""
+        try:
+            set_mirrors(parse_mirrors(value))
+        except ValueError as exc:
+            self.warning(f"setup_mirrors::{exc}")
+            set_mirrors([])
+
+    @staticmethod
+    def _parse_int(value: str) -> int:
+        """
+        Parse the integer of a setting. A bad saved value (like "1.5" or
+        an empty one) is 0, so it cant crash the app on start
+        """
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return 0
+
+    @staticmethod
+    def setup_limit(value: str):
+        """Limit all downloads to the configured kilobytes per second"""
+        get_limiter().rate = max(0, ConfigKruxInstaller._parse_int(value)) << 10
+
+    @staticmethod
+    def setup_background_limit(value: str):
+        """Limit each background download to the configured kilobytes per second"""
+        set_background_rate(max(0, ConfigKruxInstaller._parse_int(value)) << 10)
+
+    @staticmethod
+    def setup_prefetch(value: str):
+        """Prefetch the selected releases when enabled"""
+        prefetcher.set_enabled(bool(ConfigKruxInstaller._parse_int(value)))
+
+    def import_bundle(self, path: str):
+        """
+        Import an offline bundle of release assets on background,
+        so the stations without internet can list and flash them
+        """
+        if path:
+            thread = Thread(name="BundleImporter", target=self.run_import, args=(path,))
+            thread.start()
+
+    def run_import(self, path: str):
+        """Verify and store the assets of an offline bundle on the cache"""
+        cache = get_cache(
+            destdir=self.config.get("destdir", "assets"),
+            budget=int(self.config.get("cache", "budget")) << 20,
+        )
+        try:
+            importer = BundleImporter(
+                cache=cache,
+                trust_pem=bool(int(self.config.get("cache", "trust_pem"))),
+            )
+            summary = importer.import_bundle(path=path)
+            self.info(f"run_import::{path}::{summary}")
+        except (OSError, ValueError, tarfile.TarError) as exc:
+            self.error(f"run_import::{path}::{exc}")
+
+    @staticmethod
+    def setup_backend(value: str):
+        """
+        Stream downloads on the shared asyncio engine or, by default,
+        on the shared `requests` session
+        """
+        if value == "asyncio":
+            if get_engine() is None:
+                set_engine(AsyncEngine())
+        else:
+            set_engine(None)
+
     def on_config_change(self, config, section, key, value):
         if section == "locale" and key == "lang":
             main = self.screen_manager.get_screen("MainScreen")
@@ -308,5 +566,37 @@ class ConfigKruxInstaller(BaseKruxInstaller, Trigger):
             for fn in partials:
                 Clock.schedule_once(fn, 0)
 
+        elif section == "download":
+            self._on_download_config_change(key, value)
+
+        elif section == "cache" and key == "bundle":
+            self.import_bundle(value)
+
         else:
             self.debug(f"Skip on_config_change for {section}::{key}={value}")
+
+    def _on_download_config_change(self, key, value):
+        """Apply a changed setting of the download section"""
+        if key == "pool_size":
+            self.setup_pool_size(value)
+
+        elif key == "backend":
+            ConfigKruxInstaller.setup_backend(value)
+
+        elif key == "mirrors":
+            self.setup_mirrors(value)
+
+        elif key == "limit":
+            ConfigKruxInstaller.setup_limit(value)
+
+        elif key == "background_limit":
+            ConfigKruxInstaller.setup_background_limit(value)
+
+        elif key == "prefetch":
+            ConfigKruxInstaller.setup_prefetch(value)
+
+        elif key == "beta_sync":
+            self.setup_beta_sync()
+
+        else:
+            self.debug(f"Skip on_config_change for download::{key}={value}")
@@ -29,6 +29,8 @@ from kivy.weakproxy import WeakProxy
 from kivy.uix.label import Label
 from src.app.screens.base_screen import BaseScreen
 from src.utils.downloader.asset_downloader import AssetDownloader
+from src.utils.downloader.cancel_token import CancelToken, DownloadCancelled
+from src.utils.downloader.progress_channel import ProgressChannel
 
 
 class BaseDownloadScreen(BaseScreen):
@@ -141,25 +143,105 @@ class BaseDownloadScreen(BaseScreen):
         self.debug(f"deleter::trigger={self._trigger}")
         del self._trigger
 
+    @staticmethod
+    def format_throughput(value: dict) -> str:
+        """
+        Format the throughput and the remaining time of a progress event,
+        like ` (1.25 MB/s, 00:42)`. Return an empty string when the event
+        doesnt have a throughput yet
+        """
+        rate = value.get("rate")
+        if not rate:
+            return ""
+
+        eta = value.get("eta")
+        if eta is None:
+            return f" ({rate/(1<<20):,.2f} MB/s)"
+
+        minutes, seconds = divmod(int(round(eta)), 60)
+        return f" ({rate/(1<<20):,.2f} MB/s, {minutes:02d}:{seconds:02d})"
+
+    def update_received(self, value: dict):
+        """
+        Show the received data of a progress event whose `content_len` isnt
+        known yet (a chunked response), since no percentage can be computed
+        """
+        self.ids[f"{self.id}_progress"].text = "".join(
+            [
+                f"[size={self.SIZE_G}sp][b]{value['downloaded_len']/(1<<20):,.2f} MB",
+                "[/b][/size]",
+                "\n",
+                f"[size={self.SIZE_MP}sp]",
+                BaseDownloadScreen.format_throughput(value),
+                "[/size]",
+            ]
+        )
+
+    def update_retry(self, value: dict):
+        """
+        Show that a failed transfer is being retried, with the number
+        of the next attempt, like `Connecting... (2/5)`
+        """
+        connecting = self.translate("Connecting")
+        self.ids[f"{self.id}_progress"].text = "".join(
+            [
+                f"[size={self.SIZE_G}sp]",
+                f"{connecting}... ({value['retry']}/{value['attempts']})",
+                "[/size]",
+            ]
+        )
+
     def on_enter(self):
         """
         Event fired when the screen is displayed and the entering animation is complete.
 
         Every inherithed class should implement it own `on_trigger` and `on_progress`
-        staticmethods. The method `on_progress` should call `self.trigger` ath the end:
+        staticmethods. The method `on_progress` receives the coalesced events of a
+        `ProgressChannel` and should call `self.trigger` ath the end:
         """
         if self.downloader is not None:
             # on trigger should be defined on inherited classes
             self.trigger = getattr(self.__class__, "on_trigger")
 
             # on progress should be defined on inherited classes
+            # and is fed by a channel that limits how many
+            # events reach the kivy clock
             on_progress = getattr(self.__class__, "on_progress")
-            _fn = partial(self.downloader.download, on_data=on_progress)
+            channel = ProgressChannel(downloader=self.downloader, on_event=on_progress)
+            _fn = partial(self.downloader.download, on_data=channel.on_data)
+
+            # retries are shown as progress events too
+            self.downloader.on_retry = channel.on_retry
+
+            # a fresh token, so a download cancelled
+            # on a previous visit can run again
+            self.downloader.token = CancelToken()
 
             # Now run it as a partial function
             # on parallel thread to not block
             # the process during the kivy cycles
-            self.thread = Thread(name=self.name, target=_fn)
+            self.thread = Thread(name=self.name, target=self.run_download, args=(_fn,))
             self.thread.start()
         else:
             self.redirect_error("Downloader isnt configured. Use `update` method first")
+
+    def run_download(self, fn: typing.Callable):
+        """Run a download on the screen's thread; a cancelled one just stops"""
+        try:
+            fn()
+        except DownloadCancelled as exc:
+            self.debug(f"run_download::{exc}")
+
+    def on_leave(self, *args):
+        """
+        Event fired when the screen is left. A download still running is
+        cancelled, so an abandoned transfer stops using the network
+        and scheduling progress updates
+        """
+        if (
+            self.downloader is not None
+            and self.thread is not None
+            and self.thread.is_alive()
+        ):
+            self.debug(f"on_leave::cancel={self.downloader}")
+            self.downloader.cancel()
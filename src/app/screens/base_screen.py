@@ -38,6 +38,8 @@ from kivy.core.window import Window
 from kivy.weakproxy import WeakProxy
 from kivy.uix.screenmanager import Screen
 from src.utils.trigger import Trigger
+from src.utils.cache import AssetCache, get_cache
+from src.utils.downloader.segmented_downloader import SegmentedDownloader
 from src.i18n import T
 from src.utils.selector import VALID_DEVICES
 
@@ -277,6 +279,28 @@ class BaseScreen(Screen, Trigger):
         app = App.get_running_app()
         return int(app.config.get("flash", "baudrate"))
 
+    @staticmethod
+    def get_download_connections() -> int:
+        app = App.get_running_app()
+        try:
+            connections = int(app.config.get("download", "connections"))
+        except ValueError:
+            connections = 1
+
+        # a bad saved value must not break the download screens
+        return min(max(connections, 1), SegmentedDownloader.MAX_CONNECTIONS)
+
+    @staticmethod
+    def get_partial_download() -> bool:
+        app = App.get_running_app()
+        return bool(int(app.config.get("download", "partial")))
+
+    @staticmethod
+    def get_asset_cache() -> AssetCache:
+        app = App.get_running_app()
+        budget = int(app.config.get("cache", "budget")) << 20
+        return get_cache(destdir=app.config.get("destdir", "assets"), budget=budget)
+
     @staticmethod
     def get_locale() -> str:
         app = App.get_running_app()
@@ -21,6 +21,9 @@
 """
 check_internet_connection_screen.py
 """
+import re
+import typing
+from threading import Thread
 from functools import partial
 from kivy.clock import Clock
 from kivy.core.window import Window
@@ -29,7 +32,9 @@ from kivy.graphics.context_instructions import Color
 from kivy.app import App
 from kivy.cache import Cache
 from src.app.screens.base_screen import BaseScreen
-from src.utils.selector import Selector
+from src.utils.selector import Selector, get_offline_releases, set_offline_releases
+from src.utils.downloader.release_bundle import ReleaseBundle
+from src.utils.warmup import start_warm_up
 
 
 class CheckInternetConnectionScreen(BaseScreen):
@@ -45,6 +50,9 @@ class CheckInternetConnectionScreen(BaseScreen):
             **kwargs,
         )
 
+        # the thread where releases are fetched
+        self.thread = None
+
         # Build grid where buttons will be placed
         self.make_grid(wid=f"{self.id}_grid", rows=1)
 
@@ -61,15 +69,7 @@ class CheckInternetConnectionScreen(BaseScreen):
             row=0,
             id=f"{self.id}_button",
             root_widget=f"{self.id}_grid",
-            text="".join(
-                [
-                    f"[size={self.SIZE_MM}sp]",
-                    "[color=#efcc00]",
-                    self.translate("Checking your internet connection"),
-                    "[/color]",
-                    "[/size]",
-                ]
-            ),
+            text=self.make_checking_text(),
             markup=True,
             on_press=_press,
             on_release=_release,
@@ -101,24 +101,100 @@ class CheckInternetConnectionScreen(BaseScreen):
                 Rectangle(size=(Window.width, Window.height))
 
         elif key == "check-connection":
-            try:
-                selector = Selector()
-                main_screen = self.manager.get_screen("MainScreen")
-                fn = partial(
-                    main_screen.update,
-                    name="KruxInstallerApp",
-                    key="version",
-                    value=selector.releases[0],
-                )
-                Clock.schedule_once(fn, 0)
-                self.set_screen(name="MainScreen", direction="left")
-
-            except Exception as exc:
-                self.redirect_exception(exception=exc)
+            # the releases are fetched, and retried, on a parallel
+            # thread to not block the process during the kivy cycles
+            self.thread = Thread(name=self.name, target=self.run_check_connection)
+            self.thread.start()
+
+        elif key == "retry":
+            self.ids[f"{self.id}_button"].text = self.make_checking_text(
+                f" ({value['retry']}/{value['attempts']})"
+            )
+
+        elif key == "releases":
+            main_screen = self.manager.get_screen("MainScreen")
+            fn = partial(
+                main_screen.update,
+                name="KruxInstallerApp",
+                key="version",
+                value=value[0],
+            )
+            Clock.schedule_once(fn, 0)
+            self.warm_release(version=value[0])
+            self.set_screen(name="MainScreen", direction="left")
+
+        elif key == "error":
+            self.redirect_exception(exception=value)
 
         else:
             self.redirect_error(f"Invalid key: '{key}'")
 
+    def make_checking_text(self, suffix: str = "") -> str:
+        """Text of the button, with the attempt being made, if any"""
+        return "".join(
+            [
+                f"[size={self.SIZE_MM}sp]",
+                "[color=#efcc00]",
+                self.translate("Checking your internet connection"),
+                suffix,
+                "[/color]",
+                "[/size]",
+            ]
+        )
+
+    def run_check_connection(self):
+        """
+        Fetch the releases on the screen's thread and schedule
+        the result, or the error, to the kivy thread
+        """
+        try:
+            selector = self.make_selector(on_retry=self.on_retry)
+            fn = partial(
+                self.update, name=self.name, key="releases", value=selector.releases
+            )
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            fn = partial(self.update, name=self.name, key="error", value=exc)
+
+        Clock.schedule_once(fn, 0)
+
+    def on_retry(self, attempt: int, attempts: int, delay: float, exc: Exception):
+        """Show, on the kivy thread, that the releases are being fetched again"""
+        self.debug(f"on_retry::{attempt}/{attempts} in {delay:.2f}s::{exc}")
+        fn = partial(
+            self.update,
+            name=self.name,
+            key="retry",
+            value={"retry": attempt, "attempts": attempts},
+        )
+        Clock.schedule_once(fn, 0)
+
+    def warm_release(self, version: str):
+        """
+        Resolve, in background, where the assets of a stable release are
+        redirected to, so their downloads start on github's storage
+        """
+        if get_offline_releases() is None and re.findall(r"^v\d+\.\d+\.\d$", version):
+            bundle = ReleaseBundle(version=version)
+            self.debug(f"warm_release::version={version}")
+            start_warm_up(redirects=[d.url for d in bundle.downloaders])
+
+    def make_selector(self, on_retry: typing.Callable | None = None) -> Selector:
+        """
+        Get the github releases or, without internet, the versions of
+        cached (or imported) assets. If there is none, the connection
+        error is raised
+        """
+        try:
+            return Selector(on_retry=on_retry)
+        except RuntimeError as exc:
+            releases = CheckInternetConnectionScreen.get_asset_cache().releases()
+            if len(releases) == 0:
+                raise exc
+
+            self.warning(f"Working offline with {releases}: {exc}")
+            set_offline_releases(releases)
+            return Selector()
+
     def on_enter(self):
         """Simple update your canvas"""
         partials = [
@@ -30,6 +30,7 @@ from kivy.core.window import Window
 from kivy.graphics.vertex_instructions import Rectangle
 from kivy.graphics.context_instructions import Color
 from src.app.screens.base_download_screen import BaseDownloadScreen
+from src.utils.downloader.download_manager import get_manager
 from src.utils.downloader.beta_downloader import BetaDownloader
 
 
@@ -65,17 +66,14 @@ class DownloadBetaScreen(BaseDownloadScreen):
 
             self.set_screen(name=self.to_screen, direction="left")
 
-        def on_progress(data: bytes):
+        def on_progress(event: dict):
             # calculate downloaded percentage
             if self.downloader is not None:
                 fn = partial(
                     self.update,
                     name=self.name,
                     key="progress",
-                    value={
-                        "downloaded_len": self.downloader.downloaded_len,
-                        "content_len": self.downloader.content_len,
-                    },
+                    value=event,
                 )
                 Clock.schedule_once(fn, 0)
 
@@ -145,10 +143,14 @@ class DownloadBetaScreen(BaseDownloadScreen):
                     destdir, "krux_binaries", f"maixpy_{self.device}"
                 )
 
-                self.downloader = BetaDownloader(
-                    device=self.device,
-                    binary_type=self.firmware,
-                    destdir=destdir,
+                # attached to a transfer of the same binary
+                # in flight (like a prefetch), if any
+                self.downloader = get_manager().request(
+                    downloader=BetaDownloader(
+                        device=self.device,
+                        binary_type=self.firmware,
+                        destdir=destdir,
+                    )
                 )
 
                 downloading = self.translate("Downloading")
@@ -175,8 +177,14 @@ class DownloadBetaScreen(BaseDownloadScreen):
                 self.redirect_error("Downloader already initialized")
 
         elif key == "progress":
+            if value is not None and "retry" in value:
+                self.update_retry(value)
+
             # calculate percentage of download
-            if value is not None and self.downloader is not None:
+            elif value is not None and value["content_len"] == 0:
+                self.update_received(value)
+
+            elif value is not None and self.downloader is not None:
                 lens = [value["downloaded_len"], value["content_len"]]
                 percent = lens[0] / lens[1]
 
@@ -188,7 +196,9 @@ class DownloadBetaScreen(BaseDownloadScreen):
                     [
                         f"[size={self.SIZE_G}sp][b]{ percent * 100:,.2f} %[/b][/size]",
                         "\n",
-                        f"[size={self.SIZE_MP}sp]{downs[0]} of {downs[1]} MB[/size]",
+                        f"[size={self.SIZE_MP}sp]{downs[0]} of {downs[1]} MB",
+                        DownloadBetaScreen.format_throughput(value),
+                        "[/size]",
                     ]
                 )
 
@@ -31,6 +31,7 @@ from kivy.graphics.vertex_instructions import Rectangle
 from kivy.graphics.context_instructions import Color
 from src.app.screens.base_screen import BaseScreen
 from src.app.screens.base_download_screen import BaseDownloadScreen
+from src.utils.downloader.download_manager import get_manager
 from src.utils.downloader.pem_downloader import PemDownloader
 
 
@@ -52,16 +53,13 @@ class DownloadSelfcustodyPemScreen(BaseDownloadScreen):
             time.sleep(2.1)
             self.set_screen(name=self.to_screen, direction="left")
 
-        def on_progress(data: bytes):
+        def on_progress(event: dict):
             # calculate downloaded percentage
             fn = partial(
                 self.update,
                 name=self.name,
                 key="progress",
-                value={
-                    "downloaded_len": self.downloader.downloaded_len,
-                    "content_len": self.downloader.content_len,
-                },
+                value=event,
             )
             Clock.schedule_once(fn, 0)
 
@@ -101,8 +99,10 @@ class DownloadSelfcustodyPemScreen(BaseDownloadScreen):
 
         elif key == "public-key-certificate":
             if value is None:
-                self.downloader = PemDownloader(
-                    destdir=DownloadSelfcustodyPemScreen.get_destdir_assets()
+                self.downloader = get_manager().request(
+                    downloader=PemDownloader(
+                        destdir=DownloadSelfcustodyPemScreen.get_destdir_assets()
+                    )
                 )
 
                 if self.downloader is not None:
@@ -129,6 +129,12 @@ class DownloadSelfcustodyPemScreen(BaseDownloadScreen):
             else:
                 self.redirect_error(f"Invalid value for key '{key}': '{value}'")
 
+        elif key == "progress" and "retry" in value:
+            self.update_retry(value)
+
+        elif key == "progress" and value["content_len"] == 0:
+            self.update_received(value)
+
         elif key == "progress":
             # calculate percentage of download
             lens = [value["downloaded_len"], value["content_len"]]
@@ -30,17 +30,23 @@ from kivy.core.window import Window
 from kivy.graphics.vertex_instructions import Rectangle
 from kivy.graphics.context_instructions import Color
 from src.app.screens.base_download_screen import BaseDownloadScreen
-from src.utils.downloader.zip_downloader import ZipDownloader
+from src.utils.downloader.download_manager import get_manager
+from src.utils.downloader.release_bundle import ReleaseBundle
+from src.utils.downloader.partial_zip_downloader import PartialZipDownloader
 
 
 class DownloadStableZipScreen(BaseDownloadScreen):
-    """DownloadStableZipScreen download a official krux zip release"""
+    """
+    DownloadStableZipScreen download a official krux zip release
+    together with its sha256 sum, signature and selfcustody's certificate
+    """
 
     def __init__(self, **kwargs):
         super().__init__(
             wid="download_stable_zip_screen", name="DownloadStableZipScreen", **kwargs
         )
-        self.to_screen = "DownloadStableZipSha256Screen"
+        self.to_screen = "VerifyStableZipScreen"
+        self.device = None
 
         # Define some staticmethods in
         # dynamic way, so they can be
@@ -51,25 +57,35 @@ class DownloadStableZipScreen(BaseDownloadScreen):
         # when the download thread is finished
         def on_trigger(dt):
             time.sleep(2.1)
-            screen = self.manager.get_screen(self.to_screen)
-            fn = partial(
-                screen.update, name=self.name, key="version", value=self.version
-            )
-            Clock.schedule_once(fn, 0)
-            self.set_screen(name=self.to_screen, direction="left")
+            if self.device is None:
+                self.set_screen(name=self.to_screen, direction="left")
+                return
+
+            # the members were checked by the firmware
+            # signature, so flash them right away
+            screen = self.manager.get_screen("FlashScreen")
+            baudrate = DownloadStableZipScreen.get_baudrate()
+            partials = [
+                partial(screen.update, name=self.name, key="baudrate", value=baudrate),
+                partial(
+                    screen.update, name=self.name, key="firmware", value=self.filepath
+                ),
+                partial(screen.update, name=self.name, key="flasher"),
+            ]
+            for fn in partials:
+                Clock.schedule_once(fn, 0)
+
+            self.set_screen(name="FlashScreen", direction="left")
 
         # This is a function that will be called
-        # when a bunch of data are streamed from github
-        def on_progress(data: bytes):
+        # with the coalesced progress of data streamed from github
+        def on_progress(event: dict):
             if self.downloader is not None:
                 fn = partial(
                     self.update,
                     name=self.name,
                     key="progress",
-                    value={
-                        "downloaded_len": self.downloader.downloaded_len,
-                        "content_len": self.downloader.content_len,
-                    },
+                    value=event,
                 )
                 Clock.schedule_once(fn, 0)
 
@@ -119,40 +135,46 @@ class DownloadStableZipScreen(BaseDownloadScreen):
         elif key == "version":
             if value is not None:
                 self.version = value
-                self.downloader = ZipDownloader(
-                    version=self.version,
-                    destdir=DownloadStableZipScreen.get_destdir_assets(),
+                self.device = None
+                # attached to a transfer of the same release
+                # in flight (like a prefetch), if any
+                self.downloader = get_manager().request(
+                    downloader=ReleaseBundle(
+                        version=self.version,
+                        destdir=DownloadStableZipScreen.get_destdir_assets(),
+                        connections=DownloadStableZipScreen.get_download_connections(),
+                        cache=DownloadStableZipScreen.get_asset_cache(),
+                    )
                 )
+                self.update_info()
 
-                if self.downloader is not None:
-                    url = getattr(self.downloader, "url")
-                    destdir = getattr(self.downloader, "destdir")
-                    downloading = self.translate("Downloading")
-                    to = self.translate("to")
-                    filepath = os.path.join(destdir, f"krux-{self.version}.zip")
-
-                    self.ids[f"{self.id}_info"].text = "".join(
-                        [
-                            f"[size={self.SIZE_MP}sp]",
-                            downloading,
-                            "\n",
-                            f"[color=#00AABB][ref={url}]{url}[/ref][/color]",
-                            "\n",
-                            to,
-                            "\n",
-                            filepath,
-                            "[/size]",
-                        ]
-                    )
+            else:
+                self.redirect_error(f"Invalid value for key '{key}': '{value}'")
 
-                else:
-                    self.redirect_error("Invalid downloader")
+        elif key == "device":
+            if value is not None:
+                self.device = value
+                # only the device's members of the release zip
+                self.downloader = get_manager().request(
+                    downloader=PartialZipDownloader(
+                        version=self.version,
+                        device=self.device,
+                        destdir=DownloadStableZipScreen.get_destdir_assets(),
+                    )
+                )
+                self.update_info()
 
             else:
                 self.redirect_error(f"Invalid value for key '{key}': '{value}'")
 
         elif key == "progress":
-            if value is not None:
+            if value is not None and "retry" in value:
+                self.update_retry(value)
+
+            elif value is not None and value["content_len"] == 0:
+                self.update_received(value)
+
+            elif value is not None:
                 # calculate percentage of download
                 lens = [value["downloaded_len"], value["content_len"]]
                 percent = lens[0] / lens[1]
@@ -172,6 +194,7 @@ class DownloadStableZipScreen(BaseDownloadScreen):
                         f" {of} ",
                         downs[1],
                         " MB",
+                        DownloadStableZipScreen.format_throughput(value),
                         "[/size]",
                     ]
                 )
@@ -180,13 +203,11 @@ class DownloadStableZipScreen(BaseDownloadScreen):
                 # and then change screen
                 if percent == 1.00:
                     if self.downloader is not None:
-                        destdir = getattr(self.downloader, "destdir")
                         downloaded = self.translate("downloaded")
-                        filepath = os.path.join(destdir, f"krux-{self.version}.zip")
                         self.ids[f"{self.id}_info"].text = "".join(
                             [
                                 f"[size={self.SIZE_MP}sp]",
-                                filepath,
+                                self.filepath,
                                 "\n",
                                 downloaded,
                                 "[/size]",
@@ -201,3 +222,41 @@ class DownloadStableZipScreen(BaseDownloadScreen):
 
         else:
             self.redirect_error(f'Invalid key: "{key}"')
+
+    @property
+    def filepath(self) -> str:
+        """
+        Path of the downloaded release zip or, when only
+        the device's members are fetched, of its kboot.kfpkg
+        """
+        destdir = getattr(self.downloader, "destdir")
+        if self.device is None:
+            return os.path.join(destdir, f"krux-{self.version}.zip")
+
+        return os.path.join(
+            destdir, f"krux-{self.version}", f"maixpy_{self.device}", "kboot.kfpkg"
+        )
+
+    def update_info(self):
+        """Show where the downloader fetch from and where it is placed"""
+        if self.downloader is not None:
+            url = getattr(self.downloader, "url")
+            downloading = self.translate("Downloading")
+            to = self.translate("to")
+
+            self.ids[f"{self.id}_info"].text = "".join(
+                [
+                    f"[size={self.SIZE_MP}sp]",
+                    downloading,
+                    "\n",
+                    f"[color=#00AABB][ref={url}]{url}[/ref][/color]",
+                    "\n",
+                    to,
+                    "\n",
+                    self.filepath,
+                    "[/size]",
+                ]
+            )
+
+        else:
+            self.redirect_error("Invalid downloader")
@@ -31,6 +31,7 @@ from kivy.graphics.vertex_instructions import Rectangle
 from kivy.graphics.context_instructions import Color
 from src.app.screens.base_screen import BaseScreen
 from src.app.screens.base_download_screen import BaseDownloadScreen
+from src.utils.downloader.download_manager import get_manager
 from src.utils.downloader.sig_downloader import SigDownloader
 
 
@@ -54,16 +55,13 @@ class DownloadStableZipSigScreen(BaseDownloadScreen):
             Clock.schedule_once(fn, 0)
             self.set_screen(name=self.to_screen, direction="left")
 
-        def on_progress(data: bytes):
+        def on_progress(event: dict):
             # calculate downloaded percentage
             fn = partial(
                 self.update,
                 name=self.name,
                 key="progress",
-                value={
-                    "downloaded_len": self.downloader.downloaded_len,
-                    "content_len": self.downloader.content_len,
-                },
+                value=event,
             )
             Clock.schedule_once(fn, 0)
 
@@ -107,9 +105,11 @@ class DownloadStableZipSigScreen(BaseDownloadScreen):
         elif key == "version":
             if value is not None:
                 self.version = value
-                self.downloader = SigDownloader(
-                    version=self.version,
-                    destdir=DownloadStableZipSigScreen.get_destdir_assets(),
+                self.downloader = get_manager().request(
+                    downloader=SigDownloader(
+                        version=self.version,
+                        destdir=DownloadStableZipSigScreen.get_destdir_assets(),
+                    )
                 )
 
                 if self.downloader is not None:
@@ -137,7 +137,13 @@ class DownloadStableZipSigScreen(BaseDownloadScreen):
                 self.redirect_error(f"Invalid value for key '{key}': '{value}'")
 
         elif key == "progress":
-            if value is not None:
+            if value is not None and "retry" in value:
+                self.update_retry(value)
+
+            elif value is not None and value["content_len"] == 0:
+                self.update_received(value)
+
+            elif value is not None:
                 # calculate percentage of download
                 lens = [value["downloaded_len"], value["content_len"]]
                 percent = lens[0] / lens[1]
@@ -262,7 +262,9 @@ class FlashScreen(BaseFlashScreen):
 
         if name in (
             "ConfigKruxInstaller",
+            "MainScreen",
             "UnzipStableScreen",
+            "DownloadStableZipScreen",
             "DownloadBetaScreen",
             "FlashScreen",
         ):
@@ -29,7 +29,10 @@ from functools import partial
 from kivy.clock import Clock
 from kivy.app import App
 from .base_screen import BaseScreen
-from src.utils.selector import VALID_DEVICES
+from src.utils.selector import VALID_DEVICES, BETA, get_offline_releases
+from src.utils.downloader import prefetcher
+from src.utils.downloader.beta_downloader import BetaDownloader
+from src.utils.downloader.release_bundle import ReleaseBundle
 from src.i18n import T
 
 
@@ -166,11 +169,8 @@ class MainScreen(BaseScreen):
 
                         # Check if any release file exists
                         if re.findall(r"^v\d+\.\d+\.\d$", self.version):
-                            resources = MainScreen.get_destdir_assets()
-                            zipfile = os.path.join(
-                                resources, f"krux-{self.version}.zip"
-                            )
-                            if os.path.isfile(zipfile):
+                            zipfile = MainScreen.find_release_zip(self.version)
+                            if zipfile is not None:
                                 to_screen = "WarningAlreadyDownloadedScreen"
                             else:
                                 to_screen = "DownloadStableZipScreen"
@@ -185,29 +185,74 @@ class MainScreen(BaseScreen):
                                 )
                             )
 
+                            # fetch only the device's members of the zip
+                            if (
+                                to_screen == "DownloadStableZipScreen"
+                                and MainScreen.get_partial_download()
+                            ):
+                                partials.append(
+                                    partial(
+                                        screen.update,
+                                        name=self.name,
+                                        key="device",
+                                        value=self.device,
+                                    )
+                                )
+
                         # check if release is beta
                         elif re.findall("^odudex/krux_binaries", self.version):
-                            to_screen = "DownloadBetaScreen"
-                            screen = self.manager.get_screen(to_screen)
-                            partials.append(
-                                partial(
-                                    screen.update,
-                                    name=self.name,
-                                    key="firmware",
-                                    value="kboot.kfpkg",
+                            kboot = MainScreen.find_beta_kboot(self.device)
+
+                            # offline, flash the cached binary
+                            if kboot is not None:
+                                to_screen = "FlashScreen"
+                                screen = self.manager.get_screen(to_screen)
+                                partials.append(
+                                    partial(
+                                        screen.update,
+                                        name=self.name,
+                                        key="baudrate",
+                                        value=MainScreen.get_baudrate(),
+                                    )
                                 )
-                            )
-                            partials.append(
-                                partial(
-                                    screen.update,
-                                    name=self.name,
-                                    key="device",
-                                    value=self.device,
+                                partials.append(
+                                    partial(
+                                        screen.update,
+                                        name=self.name,
+                                        key="firmware",
+                                        value=kboot,
+                                    )
+                                )
+                                partials.append(
+                                    partial(
+                                        screen.update, name=self.name, key="flasher"
+                                    )
+                                )
+
+                            else:
+                                to_screen = "DownloadBetaScreen"
+                                screen = self.manager.get_screen(to_screen)
+                                partials.append(
+                                    partial(
+                                        screen.update,
+                                        name=self.name,
+                                        key="firmware",
+                                        value="kboot.kfpkg",
+                                    )
+                                )
+                                partials.append(
+                                    partial(
+                                        screen.update,
+                                        name=self.name,
+                                        key="device",
+                                        value=self.device,
+                                    )
+                                )
+                                partials.append(
+                                    partial(
+                                        screen.update, name=self.name, key="downloader"
+                                    )
                                 )
-                            )
-                            partials.append(
-                                partial(screen.update, name=self.name, key="downloader")
-                            )
 
                         # Execute the partials
                         for fn in partials:
@@ -290,6 +335,78 @@ class MainScreen(BaseScreen):
         self.debug(f"will_wipe = {value}")
         self._will_wipe = value
 
+    @staticmethod
+    def find_release_zip(version: str) -> str | None:
+        """
+        Get the zip of a release from the asset cache or, when it was
+        downloaded before the cache existed (so it isnt indexed), from
+        the assets directory. It is verified before flashing anyway
+        """
+        zipfile = MainScreen.get_asset_cache().find(
+            version=version, name=f"krux-{version}.zip"
+        )
+        if zipfile is None:
+            path = os.path.join(MainScreen.get_destdir_assets(), f"krux-{version}.zip")
+            if os.path.isfile(path):
+                zipfile = path
+
+        return zipfile
+
+    @staticmethod
+    def find_beta_kboot(device: str) -> str | None:
+        """
+        Get the cached kboot.kfpkg of the beta for :attr:`device` when
+        working offline. Online, DownloadBetaScreen revalidates it with
+        a conditional request, to flash the latest binary
+        """
+        if get_offline_releases() is None:
+            return None
+
+        return MainScreen.get_asset_cache().find(
+            version=BETA,
+            name=os.path.join("krux_binaries", f"maixpy_{device}", "kboot.kfpkg"),
+        )
+
+    def prefetch(self):
+        """
+        When prefetching is enabled, start downloading the selected release
+        in background (for beta, the selected device's kboot.kfpkg), so the
+        download screens attach to it instead of starting over
+        """
+        if not prefetcher.get_enabled():
+            return
+
+        destdir = MainScreen.get_destdir_assets()
+        if re.findall(r"^v\d+\.\d+\.\d$", self.version):
+            if MainScreen.find_release_zip(self.version):
+                return
+
+            downloader = ReleaseBundle(
+                version=self.version,
+                destdir=destdir,
+                connections=MainScreen.get_download_connections(),
+                cache=MainScreen.get_asset_cache(),
+            )
+
+        elif (
+            re.findall("^odudex/krux_binaries", self.version)
+            and self.device in BetaDownloader.VALID_DEVICES
+        ):
+            if MainScreen.find_beta_kboot(self.device):
+                return
+
+            downloader = BetaDownloader(
+                device=self.device,
+                binary_type="kboot.kfpkg",
+                destdir=os.path.join(destdir, "krux_binaries", f"maixpy_{self.device}"),
+            )
+
+        else:
+            return
+
+        self.debug(f"prefetch::url={downloader.url}")
+        prefetcher.prefetch(downloader)
+
     def update(self, *args, **kwargs):
         """Update buttons from selected device/versions on related screens"""
         name = kwargs.get("name")
@@ -330,6 +447,9 @@ class MainScreen(BaseScreen):
                         "[/color]",
                     ]
                 )
+                # a confirmed selection
+                if name in ("SelectVersionScreen", "SelectOldVersionScreen"):
+                    self.prefetch()
             else:
                 self.redirect_error(f"Invalid value for key '{key}': '{value}'")
 
@@ -358,6 +478,9 @@ class MainScreen(BaseScreen):
                         ["[color=#333333]", self.translate("Wipe"), "[/color]"]
                     )
 
+                if name == "SelectDeviceScreen" and self.will_flash:
+                    self.prefetch()
+
                 if value == "select a new one":
                     value = self.translate("select a new one")
 
@@ -30,6 +30,7 @@ from kivy.core.window import Window
 from kivy.uix.button import Button
 from kivy.graphics import Color, Line
 from src.utils.selector import Selector
+from src.utils.retry import RetryPolicy
 from src.app.screens.base_screen import BaseScreen
 
 
@@ -51,7 +52,8 @@ class SelectVersionScreen(BaseScreen):
     def fetch_releases(self):
         """Build a set of buttons to select version"""
         try:
-            selector = Selector()
+            # a press on the kivy thread dont wait on retries
+            selector = Selector(policy=RetryPolicy(attempts=1))
 
             old = self.translate("Old versions")
             back = self.translate("Back")
@@ -0,0 +1,441 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+bundle_importer.py
+"""
+import os
+import re
+import shutil
+import typing
+import tarfile
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from cryptography.exceptions import InvalidSignature
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, utils
+from ..cache import AssetCache
+from ..digest import remember
+from ..trigger import Trigger
+from ..downloader import (
+    ZipDownloader,
+    Sha256Downloader,
+    SigDownloader,
+    PemDownloader,
+    BetaDownloader,
+)
+from ..downloader.beta_sync import BetaSync, blob_sha
+
+
+def verify_release(
+    hexdigest: str, sha256_path: str, sig_path: str, pem: bytes
+) -> str | None:
+    """
+    Verify the SHA-256 :attr:`hexdigest` of a release zip against its
+    `.sha256.txt` and, prehashed, against its `.sig` and the :attr:`pem`
+    key. Get the reason of a failure or `None` when it is verified
+    """
+    with open(sha256_path, "r", encoding="utf8") as file:
+        provided = (file.read().split() or [""])[0]
+
+    if provided != hexdigest:
+        return "sha256 mismatch"
+
+    with open(sig_path, "rb") as file:
+        signature = file.read()
+
+    try:
+        pubkey = serialization.load_pem_public_key(pem)
+        pubkey.verify(
+            signature,
+            bytes.fromhex(hexdigest),
+            ec.ECDSA(utils.Prehashed(hashes.SHA256())),
+        )
+    except (ValueError, InvalidSignature):
+        return "invalid signature"
+
+    return None
+
+
+class BundleImporter(Trigger):
+    """
+    Import an offline bundle of release assets, for stations without
+    internet: a directory or a tarball holding `krux-<version>.zip`, its
+    `.sha256.txt` and `.sig`, the `selfcustody.pem` and, optionally, beta
+    binaries as `maixpy_<device>/<firmware.bin|kboot.kfpkg>`.
+
+    Files are staged on the cache directory with in-kernel copies
+    (`copy_file_range` or `sendfile`) and hashed by a pool of
+    :attr:`workers`. Each zip digest is checked against its `.sha256.txt`
+    and, prehashed, against its signature, so each file is read once.
+    Only verified versions are placed on the destination directory and
+    stored on the :class:`AssetCache` under their canonical urls.
+
+    Signatures are checked with the installed `selfcustody.pem`. The one
+    of the bundle is only used, when none is installed, if the user
+    confirmed it (:attr:`trust_pem`). Beta binaries are checked against
+    their git blob SHAs on odudex/krux_binaries (see :meth:`trusted_blobs`).
+    """
+
+    REGEXP_STABLE = r"^krux-(v\d+\.\d+\.\d+)\.zip(\.sha256\.txt|\.sig)?$"
+
+    def __init__(self, cache: AssetCache, workers: int = 4, trust_pem: bool = False):
+        super().__init__()
+        self.cache = cache
+        self.workers = workers
+        self.trust_pem = trust_pem
+
+    @property
+    def cache(self) -> AssetCache:
+        """Getter for the cache where imported assets are stored"""
+        self.debug(f"cache::getter={self._cache}")
+        return self._cache
+
+    @cache.setter
+    def cache(self, value: AssetCache):
+        """Setter for the cache where imported assets are stored"""
+        self.debug(f"cache::setter={value}")
+        self._cache = value
+
+    @property
+    def workers(self) -> int:
+        """Getter for the amount of files copied and hashed at same time"""
+        self.debug(f"workers::getter={self._workers}")
+        return self._workers
+
+    @workers.setter
+    def workers(self, value: int):
+        """Setter for the amount of files copied and hashed at same time"""
+        if not isinstance(value, int) or value < 1:
+            raise ValueError(f"Invalid workers: {value}")
+
+        self.debug(f"workers::setter={value}")
+        self._workers = value
+
+    @property
+    def trust_pem(self) -> bool:
+        """Getter for the confirmation of the bundle's public key"""
+        self.debug(f"trust_pem::getter={self._trust_pem}")
+        return self._trust_pem
+
+    @trust_pem.setter
+    def trust_pem(self, value: bool):
+        """
+        Setter for the confirmation of the bundle's public key,
+        used only when no public key is installed
+        """
+        self.debug(f"trust_pem::setter={value}")
+        self._trust_pem = value
+
+    def scan(self, names: typing.Iterable[str]) -> dict:
+        """
+        Map the recognized files of a bundle (`/` separated paths relative
+        to its root) to the url, version and destination name of their
+        assets. Other files are ignored
+        """
+        assets = {}
+        for name in names:
+            parts = name.split("/")
+            match = re.match(BundleImporter.REGEXP_STABLE, parts[-1])
+
+            if match is not None:
+                version = match.group(1)
+                downloader = {
+                    None: ZipDownloader,
+                    ".sha256.txt": Sha256Downloader,
+                    ".sig": SigDownloader,
+                }[match.group(2)]
+                asset = (downloader(version=version).url, version, parts[-1])
+
+            elif parts[-1] == "selfcustody.pem":
+                asset = (PemDownloader().url, None, parts[-1])
+
+            elif (
+                len(parts) > 1
+                and parts[-2][len("maixpy_") :] in BetaDownloader.VALID_DEVICES
+                and parts[-2].startswith("maixpy_")
+                and parts[-1] in BetaDownloader.VALID_BINARY_TYPES
+            ):
+                beta = BetaDownloader(
+                    device=parts[-2][len("maixpy_") :], binary_type=parts[-1]
+                )
+                asset = (
+                    beta.url,
+                    AssetCache.BETA,
+                    os.path.join("krux_binaries", parts[-2], parts[-1]),
+                )
+
+            else:
+                self.debug(f"scan::skip={name}")
+                continue
+
+            assets[name] = dict(zip(("url", "version", "name"), asset))
+
+        return assets
+
+    def import_bundle(self, path: str) -> dict:
+        """
+        Import the bundle at :attr:`path`, a directory or a tarball, and
+        get a summary with the imported `versions`, the imported `beta`
+        binaries and the `rejected` versions with their reasons
+        """
+        if not os.path.exists(path):
+            raise ValueError(f"Bundle {path} do not exist")
+
+        cachedir = os.path.join(self.cache.destdir, AssetCache.DIRNAME)
+        with tempfile.TemporaryDirectory(dir=cachedir, prefix="import-") as staging:
+            if os.path.isdir(path):
+                jobs = self.stage_dir(path=path, staging=staging)
+            elif tarfile.is_tarfile(path):
+                jobs = self.stage_tarball(path=path, staging=staging)
+            else:
+                raise ValueError(f"Invalid bundle: {path}")
+
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                digests = list(pool.map(self._stage, jobs))
+
+            staged = {
+                job[2]["url"]: (job[1], hexdigest, job[2])
+                for job, hexdigest in zip(jobs, digests)
+            }
+            summary = self.commit(staged=staged)
+
+        self.info(f"import_bundle::{path}::{summary}")
+        return summary
+
+    def stage_dir(self, path: str, staging: str) -> typing.List[tuple]:
+        """List the copies (source, staged path and asset) of a bundle directory"""
+        names = []
+        for root, _, files in os.walk(path):
+            rel = os.path.relpath(root, path)
+            for file in files:
+                names.append(file if rel == os.curdir else f"{rel}/{file}")
+
+        return [
+            (os.path.join(path, *name.split("/")), os.path.join(staging, str(i)), asset)
+            for i, (name, asset) in enumerate(self.scan(names=names).items())
+        ]
+
+    def stage_tarball(self, path: str, staging: str) -> typing.List[tuple]:
+        """
+        Extract the recognized regular files of a tarball to :attr:`staging`,
+        under names of our own (so its paths are never trusted), and list
+        them as copies already done
+        """
+        jobs = []
+        with tarfile.open(path, "r:*") as tar:
+            members = {m.name: m for m in tar.getmembers() if m.isreg()}
+            for i, (name, asset) in enumerate(self.scan(names=members).items()):
+                dest = os.path.join(staging, str(i))
+                with tar.extractfile(members[name]) as fsrc:
+                    with open(dest, "wb") as fdst:
+                        shutil.copyfileobj(fsrc, fdst, 1 << 20)
+                jobs.append((None, dest, asset))
+
+        return jobs
+
+    def _stage(self, job: tuple) -> str:
+        # Copy a file to staging (unless it is already there)
+        # and get its SHA-256, on a worker thread
+        src, dest, _ = job
+        if src is not None:
+            self.bulk_copy(src=src, dest=dest)
+        return AssetCache.sha256(path=dest)
+
+    def bulk_copy(self, src: str, dest: str) -> int:
+        """
+        Copy a file inside the kernel with `copy_file_range` or `sendfile`,
+        where available, falling back to a buffered copy. Get the copied size
+        """
+        with open(src, "rb") as fsrc, open(dest, "wb") as fdst:
+            size = os.fstat(fsrc.fileno()).st_size
+            for name in ("copy_file_range", "sendfile"):
+                if hasattr(os, name):
+                    try:
+                        return BundleImporter.kernel_copy(
+                            name=name, src=fsrc.fileno(), dest=fdst.fileno(), size=size
+                        )
+                    except OSError as exc:
+                        self.debug(f"bulk_copy::{name}::{exc}")
+                        fdst.truncate(0)
+
+            fsrc.seek(0)
+            fdst.seek(0)
+            shutil.copyfileobj(fsrc, fdst, 1 << 20)
+            return size
+
+    @staticmethod
+    def kernel_copy(name: str, src: int, dest: int, size: int) -> int:
+        """Copy :attr:`size` bytes between file descriptors with a system call"""
+        offset = 0
+        while offset < size:
+            if name == "copy_file_range":
+                sent = os.copy_file_range(src, dest, size - offset, offset, offset)
+            else:
+                sent = os.sendfile(dest, src, offset, size - offset)
+
+            if sent == 0:
+                break
+            offset += sent
+
+        return offset
+
+    def commit(self, staged: dict) -> dict:
+        """
+        Verify the staged versions and beta binaries
+        and move the verified ones to the cache
+        """
+        summary = {"versions": [], "beta": [], "rejected": {}}
+        pem = self.trusted_pem(staged=staged)
+        versions = {
+            asset["version"]
+            for _, _, asset in staged.values()
+            if asset["version"] not in (None, AssetCache.BETA)
+        }
+
+        for version in sorted(versions):
+            urls = [
+                ZipDownloader(version=version).url,
+                Sha256Downloader(version=version).url,
+                SigDownloader(version=version).url,
+            ]
+            reason = self.verify(urls=urls, staged=staged, pem=pem)
+            if reason is not None:
+                self.warning(f"commit::{version}::{reason}")
+                summary["rejected"][version] = reason
+                continue
+
+            for url in urls:
+                self.place(*staged[url])
+            summary["versions"].append(version)
+
+        betas = [job for job in staged.values() if job[2]["version"] == AssetCache.BETA]
+        if betas:
+            self.commit_betas(betas=betas, summary=summary)
+
+        pem_url = PemDownloader().url
+        if pem is not None and pem_url in staged and self.cache.lookup(pem_url) is None:
+            self.place(*staged[pem_url])
+
+        return summary
+
+    def commit_betas(self, betas: typing.List[tuple], summary: dict):
+        """
+        Move the staged beta binaries whose git blob SHA is a trusted
+        one to the cache. The others are rejected
+        """
+        blobs = {asset["name"]: blob_sha(path) for path, _, asset in betas}
+        trusted = self.trusted_blobs(blobs=blobs)
+
+        for path, hexdigest, asset in betas:
+            expected = trusted.get(asset["name"])
+            if blobs[asset["name"]] in expected:
+                self.place(path, hexdigest, asset)
+                summary["beta"].append(asset["name"])
+            else:
+                reason = "blob mismatch" if expected else "unknown blob"
+                self.warning(f"commit_betas::{asset['name']}::{reason}")
+                summary["rejected"][asset["name"]] = reason
+
+    def trusted_blobs(self, blobs: typing.Dict[str, str]) -> typing.Dict[str, set]:
+        """
+        Get, for each beta binary of :attr:`blobs` (names mapped to the git
+        blob SHAs of the staged files), the SHAs it can be verified with:
+        the one saved by the last :class:`BetaSync` of this station and,
+        when that doesnt match, the one on the tree of the repository (if
+        online). Anything the bundle itself lists is never trusted
+        """
+        beta_sync = BetaSync(destdir=os.path.join(self.cache.destdir, "krux_binaries"))
+        paths = {name: "/".join(name.split(os.sep)[1:]) for name in blobs}
+        manifest = beta_sync.load_manifest()
+        trusted = {
+            name: {manifest[path]} if path in manifest else set()
+            for name, path in paths.items()
+        }
+
+        if any(blobs[name] not in trusted[name] for name in blobs):
+            try:
+                tree = beta_sync.fetch_tree()
+            except (RuntimeError, ValueError) as exc:
+                self.warning(f"trusted_blobs::{exc}")
+                tree = {}
+
+            for name, path in paths.items():
+                if path in tree:
+                    trusted[name].add(tree[path])
+
+        self.debug(f"trusted_blobs={trusted}")
+        return trusted
+
+    def trusted_pem(self, staged: dict) -> bytes | None:
+        """
+        Get the public key that verifies the bundle: the installed one or,
+        only when none is and the user confirmed it (:attr:`trust_pem`),
+        the one of the bundle. So a bundle can't bring its own key
+        """
+        pem_url = PemDownloader().url
+        path = self.cache.lookup(pem_url)
+        if path is None and pem_url in staged:
+            if self.trust_pem:
+                path = staged[pem_url][0]
+            else:
+                self.warning("trusted_pem::selfcustody.pem of the bundle not confirmed")
+
+        if path is None:
+            return None
+
+        with open(path, "rb") as file:
+            return file.read()
+
+    def verify(
+        self, urls: typing.List[str], staged: dict, pem: bytes | None
+    ) -> str | None:
+        """
+        Verify a staged zip against its sha256 and signature. Get the
+        reason of a failure or `None` when it is verified
+        """
+        missing = [os.path.basename(url) for url in urls if url not in staged]
+        if missing:
+            return f"missing {', '.join(missing)}"
+
+        if pem is None and PemDownloader().url in staged:
+            return "untrusted selfcustody.pem"
+
+        if pem is None:
+            return "missing selfcustody.pem"
+
+        reason = verify_release(
+            hexdigest=staged[urls[0]][1],
+            sha256_path=staged[urls[1]][0],
+            sig_path=staged[urls[2]][0],
+            pem=pem,
+        )
+        if reason is not None:
+            self.debug(f"verify::{urls[0]}::{reason}")
+        return reason
+
+    def place(self, path: str, hexdigest: str, asset: dict):
+        """Move a staged file to its usual name and store it on cache"""
+        dest = os.path.join(self.cache.destdir, asset["name"])
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        os.replace(path, dest)
+        remember(path=dest, name="sha256", hexdigest=hexdigest)
+        self.cache.store(url=asset["url"], path=dest, version=asset["version"])
@@ -0,0 +1,377 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+asset_cache.py
+"""
+import os
+import re
+import json
+import time
+import typing
+import shutil
+import hashlib
+import threading
+from ..trigger import Trigger
+from ..digest import recall, remember
+
+_LOCK = threading.Lock()
+
+_STATE = {"caches": {}}
+
+
+class AssetCache(Trigger):
+    """
+    Content-addressed store of downloaded assets.
+
+    Each asset is kept once under `<destdir>/.cache/objects`, named by its
+    SHA-256, and hard linked (or copied, where links arent supported) to its
+    usual name on :attr:`destdir`, so the rest of the application keeps
+    reading `krux-<version>.zip` and friends. A JSON index maps each url to
+    its version, name, digest, size, mtime and last access. Lookups are a
+    dict access and a `stat`, never a rehash.
+
+    When the stored objects exceed :attr:`budget` bytes, the least recently
+    used versions are evicted together with their files.
+    """
+
+    DIRNAME = ".cache"
+
+    DEFAULT_BUDGET = 512 << 20
+
+    BETA = "odudex/krux_binaries"
+
+    # Seconds of last access that a lookup can leave unsaved
+    ACCESS_RESOLUTION = 60
+
+    def __init__(self, destdir: str, budget: int = DEFAULT_BUDGET):
+        super().__init__()
+        self._lock = threading.RLock()
+        self.destdir = destdir
+        self.budget = budget
+        self._entries = {}
+        self._versions = {}
+        self.load()
+
+    @property
+    def destdir(self) -> str:
+        """Getter for the directory where assets are placed"""
+        self.debug(f"destdir::getter={self._destdir}")
+        return self._destdir
+
+    @destdir.setter
+    def destdir(self, value: str):
+        """Setter for the directory where assets are placed"""
+        self.debug(f"destdir::setter={value}")
+        os.makedirs(os.path.join(value, AssetCache.DIRNAME, "objects"), exist_ok=True)
+        self._destdir = value
+
+    @property
+    def budget(self) -> int:
+        """Getter for the maximum amount of bytes kept in cache"""
+        self.debug(f"budget::getter={self._budget}")
+        return self._budget
+
+    @budget.setter
+    def budget(self, value: int):
+        """Setter for the maximum amount of bytes kept in cache"""
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"Invalid cache budget: {value}")
+
+        self.debug(f"budget::setter={value}")
+        self._budget = value
+
+    @property
+    def entries(self) -> dict:
+        """Getter for the index entries, keyed by url"""
+        self.debug(f"entries::getter={self._entries}")
+        return self._entries
+
+    @property
+    def index_path(self) -> str:
+        """Getter for the path of JSON index"""
+        return os.path.join(self.destdir, AssetCache.DIRNAME, "index.json")
+
+    @property
+    def size(self) -> int:
+        """Getter for the amount of bytes of stored objects"""
+        with self._lock:
+            sizes = {e["digest"]: e["size"] for e in self._entries.values()}
+            return sum(sizes.values())
+
+    def object_path(self, digest: str) -> str:
+        """Get the path where the object of a given SHA-256 is stored"""
+        return os.path.join(self.destdir, AssetCache.DIRNAME, "objects", digest)
+
+    def load(self):
+        """Load the index from :attr:`destdir`. A unreadable index is discarded"""
+        try:
+            with open(self.index_path, "r", encoding="utf8") as file:
+                entries = json.load(file)["entries"]
+        except (OSError, ValueError, KeyError) as exc:
+            self.debug(f"load::{exc}")
+            entries = {}
+
+        with self._lock:
+            self._entries = entries
+            self._versions = {
+                (e["version"], e["name"]): url for url, e in entries.items()
+            }
+
+    def save(self):
+        """Atomically write the index to :attr:`destdir`"""
+        tmpfile = f"{self.index_path}.tmp"
+        with self._lock:
+            with open(tmpfile, "w", encoding="utf8") as file:
+                json.dump({"entries": self._entries}, file)
+            os.replace(tmpfile, self.index_path)
+
+    def lookup(self, url: str) -> str | None:
+        """
+        Get the path of a cached asset given its url, or `None` if it isnt
+        cached or its file changed (size or mtime) since it was stored.
+        A hit updates the last access of its version and let the verifyers
+        reuse its digest. It is a dict access and a `stat`: the index is
+        only rewritten when the saved access is older than
+        :attr:`ACCESS_RESOLUTION`.
+        """
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None:
+                return None
+
+            path = os.path.join(self.destdir, entry["name"])
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                stat = None
+
+            if stat is None or (stat.st_size, stat.st_mtime_ns) != (
+                entry["size"],
+                entry["mtime_ns"],
+            ):
+                self.debug(f"lookup::{url}::changed")
+                self._remove(url=url)
+                self.save()
+                return None
+
+            # the recency of a version is the latest access of its
+            # assets, so only this entry is touched. It is written
+            # lazily: with the next store or once it is stale enough
+            now = time.time()
+            saved = entry["last_access"]
+            entry["last_access"] = max(saved, now)
+            if now - saved > AssetCache.ACCESS_RESOLUTION:
+                self.save()
+
+        remember(path=path, name="sha256", hexdigest=entry["digest"])
+        self.debug(f"lookup::{url}::{path}")
+        return path
+
+    def find(self, version: str, name: str) -> str | None:
+        """Get the path of a cached asset given its version and filename"""
+        with self._lock:
+            url = self._versions.get((version, name))
+
+        return self.lookup(url=url) if url is not None else None
+
+    def store(self, url: str, path: str, version: str | None = None) -> str:
+        """
+        Put a downloaded file on cache. The digest computed while
+        downloading is reused when available. If the same content is
+        already stored, :attr:`path` becomes a link to it.
+        """
+        digest = recall(path=path, name="sha256")
+        if digest is None:
+            digest = AssetCache.sha256(path=path)
+
+        obj = self.object_path(digest=digest)
+        name = self.relpath(path=path)
+
+        with self._lock:
+            if os.path.exists(obj):
+                AssetCache.place(src=obj, dest=path)
+            else:
+                AssetCache.place(src=path, dest=obj)
+
+            stat = os.stat(path)
+            old = self._entries.get(url)
+            if old is not None and old["digest"] != digest:
+                self._remove(url=url, keep=path)
+
+            self._entries[url] = {
+                "version": version,
+                "name": name,
+                "digest": digest,
+                "size": stat.st_size,
+                "mtime_ns": stat.st_mtime_ns,
+                "last_access": time.time(),
+            }
+            self._versions[(version, name)] = url
+            self.debug(f"store::{url}::{digest}")
+            self.evict(keep=AssetCache.group(url=url, entry=self._entries[url]))
+            self.save()
+
+        remember(path=path, name="sha256", hexdigest=digest)
+        return path
+
+    def releases(self) -> typing.List[str]:
+        """
+        Get the cached versions, newest first, the way :class:`Selector`
+        lists them: the stable ones with their zip, sha256 and signature
+        (and a cached public key), followed by the beta when any of its
+        binaries are cached. Used as the release list when offline
+        """
+        with self._lock:
+            names = set(self._versions)
+
+        stable = []
+        if any(name == "selfcustody.pem" for _, name in names):
+            for version in {v for v, _ in names}:
+                if re.match(r"^v\d+\.\d+\.\d+$", version or "") and all(
+                    (version, f"krux-{version}.zip{ext}") in names
+                    for ext in ("", ".sha256.txt", ".sig")
+                ):
+                    stable.append(version)
+
+        stable.sort(key=lambda v: tuple(int(n) for n in v[1:].split(".")), reverse=True)
+        if any(version == AssetCache.BETA for version, _ in names):
+            stable.append(AssetCache.BETA)
+
+        self.debug(f"releases={stable}")
+        return stable
+
+    def relpath(self, path: str) -> str:
+        """
+        Get the name of an asset: its path relative to :attr:`destdir`
+        (like the beta binaries under `krux_binaries/`) or, when it is
+        placed elsewhere, its basename
+        """
+        name = os.path.relpath(os.path.abspath(path), os.path.abspath(self.destdir))
+        if name.startswith(os.pardir):
+            return os.path.basename(path)
+        return name
+
+    def evict(self, keep: str | None = None):
+        """
+        Remove the least recently used versions until the stored objects
+        fit on :attr:`budget`. The group given as :attr:`keep` is never
+        evicted. Assets without version (like the public key) are shared
+        by the versions, so they are evicted on their own only when no
+        version is left
+        """
+        with self._lock:
+            while self.size > self.budget:
+                groups = {}
+                versioned = any(e["version"] for e in self._entries.values())
+                for url, entry in self._entries.items():
+                    key = AssetCache.group(url=url, entry=entry)
+                    if key != keep and (entry["version"] or not versioned):
+                        groups[key] = max(groups.get(key, 0), entry["last_access"])
+
+                if not groups:
+                    break
+
+                oldest = min(groups, key=groups.get)
+                self.debug(f"evict::{oldest}")
+                for url in [
+                    u
+                    for u, e in self._entries.items()
+                    if AssetCache.group(url=u, entry=e) == oldest
+                ]:
+                    self._remove(url=url)
+
+    def _remove(self, url: str, keep: str | None = None):
+        # Forget an entry and delete its file and object
+        # when no other entry references them
+        entry = self._entries.pop(url)
+        self._versions.pop((entry["version"], entry["name"]), None)
+        others = self._entries.values()
+
+        path = os.path.join(self.destdir, entry["name"])
+        if path != keep and not any(e["name"] == entry["name"] for e in others):
+            AssetCache.unlink(path=path)
+
+        if not any(e["digest"] == entry["digest"] for e in others):
+            AssetCache.unlink(path=self.object_path(digest=entry["digest"]))
+
+    @staticmethod
+    def group(url: str, entry: dict) -> str:
+        """Get the eviction group of an entry: its version, or its url"""
+        return entry["version"] or url
+
+    @staticmethod
+    def place(src: str, dest: str):
+        """Atomically make :attr:`dest` a hard link to (or a copy of) :attr:`src`"""
+        if os.path.exists(dest) and os.path.samefile(src, dest):
+            return
+
+        tmpfile = f"{dest}.tmp"
+        AssetCache.unlink(path=tmpfile)
+        try:
+            os.link(src, tmpfile)
+        except OSError:
+            shutil.copy2(src, tmpfile)
+        os.replace(tmpfile, dest)
+
+    @staticmethod
+    def unlink(path: str):
+        """Remove a file, if it exists"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    @staticmethod
+    def sha256(path: str) -> str:
+        """Compute the SHA-256 of a file"""
+        sha256_hash = hashlib.sha256()
+        with open(path, "rb") as file:
+            for block in iter(lambda: file.read(1 << 16), b""):
+                sha256_hash.update(block)
+        return sha256_hash.hexdigest()
+
+
+def get_cache(destdir: str, budget: int = AssetCache.DEFAULT_BUDGET) -> AssetCache:
+    """
+    Get the shared cache of :attr:`destdir`, created on first use, with
+    its :attr:`budget` updated. Every thread of the application uses it,
+    so writes to the same index are serialized by a single lock
+    """
+    key = os.path.abspath(destdir)
+    with _LOCK:
+        cache = _STATE["caches"].get(key)
+        if cache is None:
+            cache = AssetCache(destdir=destdir, budget=budget)
+            _STATE["caches"][key] = cache
+        else:
+            cache.budget = budget
+        return cache
+
+
+def set_cache(destdir: str, cache: AssetCache | None):
+    """Replace the shared cache of :attr:`destdir`. Use `None` to get a new one"""
+    key = os.path.abspath(destdir)
+    with _LOCK:
+        if cache is None:
+            _STATE["caches"].pop(key, None)
+        else:
+            _STATE["caches"][key] = cache
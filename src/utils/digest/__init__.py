@@ -0,0 +1,131 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+digest.py
+
+Digests computed while assets are downloaded, so verifyers
+can reuse them instead of reading the whole file again
+"""
+import os
+import hashlib
+import threading
+from ..trigger import Trigger
+
+_LOCK = threading.Lock()
+
+_DIGESTS = {}
+
+
+class DigestObserver(Trigger):
+    """
+    Observer of downloaded chunks that updates a :mod:`hashlib` object.
+    Register it on the `observers` of a downloader
+    """
+
+    def __init__(self, name: str = "sha256"):
+        super().__init__()
+        if name not in hashlib.algorithms_available:
+            raise ValueError(f"Invalid digest: {name}")
+
+        self._name = name
+        self._hash = hashlib.new(name)
+        self._size = 0
+
+    @property
+    def name(self) -> str:
+        """Getter for the digest algorithm name"""
+        self.debug(f"name::getter={self._name}")
+        return self._name
+
+    @property
+    def size(self) -> int:
+        """Getter for the amount of bytes observed"""
+        self.debug(f"size::getter={self._size}")
+        return self._size
+
+    @property
+    def hexdigest(self) -> str:
+        """Getter for the hex digest of observed bytes"""
+        value = self._hash.hexdigest()
+        self.debug(f"hexdigest::getter={value}")
+        return value
+
+    def reset(self):
+        """Discard observed bytes"""
+        self.debug("reset")
+        self._hash = hashlib.new(self._name)
+        self._size = 0
+
+    def update(self, data: bytes):
+        """Observe a chunk of bytes"""
+        self._hash.update(data)
+        self._size += len(data)
+
+
+def remember(path: str, name: str, hexdigest: str):
+    """
+    Keep the digest of a file together with its size and mtime,
+    so :func:`recall` know if the file was changed since then
+    """
+    stat = os.stat(path)
+    with _LOCK:
+        _DIGESTS[(os.path.abspath(path), name)] = (
+            stat.st_size,
+            stat.st_mtime_ns,
+            hexdigest,
+        )
+
+
+def recall(path: str, name: str) -> str | None:
+    """
+    Get the remembered digest of a file, or `None` if there is no one
+    or the file size or mtime changed since it was remembered
+    """
+    key = (os.path.abspath(path), name)
+    with _LOCK:
+        entry = _DIGESTS.get(key)
+
+    if entry is None:
+        return None
+
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        stat = None
+
+    if stat is None or (stat.st_size, stat.st_mtime_ns) != entry[:2]:
+        with _LOCK:
+            _DIGESTS.pop(key, None)
+        return None
+
+    return entry[2]
+
+
+def forget(path: str | None = None):
+    """Forget the remembered digests of a file, or of all files when `None`"""
+    with _LOCK:
+        if path is None:
+            _DIGESTS.clear()
+        else:
+            path = os.path.abspath(path)
+            for key in [k for k in _DIGESTS if k[0] == path]:
+                del _DIGESTS[key]
@@ -28,3 +28,28 @@ from .sha256_downloader import Sha256Downloader
 from .sig_downloader import SigDownloader
 from .pem_downloader import PemDownloader
 from .beta_downloader import BetaDownloader
+from .release_bundle import ReleaseBundle
+from .remote_zip import RemoteZip
+from .partial_zip_downloader import PartialZipDownloader
+from .progress_channel import ProgressChannel
+from .async_engine import AsyncEngine, get_engine, set_engine
+from .async_stream_downloader import AsyncStreamDownloader
+from .cancel_token import CancelToken, DownloadCancelled
+from .rate_limiter import (
+    RateLimiter,
+    Throttle,
+    get_limiter,
+    set_limiter,
+    get_background_rate,
+    set_background_rate,
+)
+from .download_manager import (
+    DownloadManager,
+    Request,
+    get_manager,
+    set_manager,
+    INTERACTIVE,
+    PREFETCH,
+    SYNC,
+)
+from .beta_sync import BetaSync, blob_sha, start_sync
@@ -23,19 +23,32 @@
 asset_downloader.py
 """
 import os
+import json
+import errno
 import typing
-from .stream_downloader import StreamDownloader
+from ..digest import DigestObserver, remember
+from ..mirror import sources
+from .cancel_token import DownloadCancelled
+from .segmented_downloader import SegmentedDownloader
 
 
-class AssetDownloader(StreamDownloader):
+class AssetDownloader(SegmentedDownloader):
     """
-    Subclass of :class:`StreamDownloader` for versioned asset releases.
+    Subclass of :class:`SegmentedDownloader` for versioned asset releases.
     """
 
-    def __init__(self, url: str, destdir: str, write_mode: str):
+    VALID_SINKS = ("buffer", "stream")
+
+    # When enabled, the validators of each downloaded file are kept on a
+    # `.validators.json` sidecar and sent on the next download, so an
+    # unchanged file isnt transferred again
+    CONDITIONAL = False
+
+    def __init__(self, url: str, destdir: str, write_mode: str, sink: str = "buffer"):
         super().__init__(url=url)
         self.destdir = destdir
         self.write_mode = write_mode
+        self.sink = sink
 
     @property
     def destdir(self) -> str:
@@ -67,11 +80,49 @@ class AssetDownloader(StreamDownloader):
         else:
             raise ValueError(f"Write Mode '{value}' not supported")
 
+    @property
+    def sink(self) -> str:
+        """Getter for the sink where chunks are written ('buffer' or 'stream')"""
+        self.debug(f"sink::getter={self._sink}")
+        return self._sink
+
+    @sink.setter
+    def sink(self, value: str):
+        """Setter for the sink where chunks are written ('buffer' or 'stream')"""
+        if value in AssetDownloader.VALID_SINKS:
+            self.debug(f"sink::setter={value}")
+            self._sink = value
+        else:
+            raise ValueError(f"Sink '{value}' not supported")
+
+    @staticmethod
+    def preallocate(file: typing.BinaryIO, size: int):
+        """
+        Reserve :attr:`size` bytes on disk for an opened file, so a full disk
+        fails before the transfer starts instead of in the middle of it.
+        Filesystems without `posix_fallocate` support get a sparse file.
+        """
+        if hasattr(os, "posix_fallocate"):
+            try:
+                os.posix_fallocate(file.fileno(), 0, size)
+                return
+            except OSError as exc:
+                if exc.errno == errno.ENOSPC:
+                    raise
+
+        file.truncate(size)
+
     def download(self, on_data: typing.Callable) -> str:
         """
         Download some zip release given its version and put it
         on a destination directory (default: OS temporary dir)
+
+        Raise :class:`DownloadCancelled` if :meth:`cancel` is called
+        before or while it runs
         """
+        self.token.raise_if_cancelled(f"Download of {self.url} cancelled")
+        if self.sink == "stream":
+            return self.download_to_file(on_data=on_data)
 
         # Before the download the file stream,
         # you can define some method to be called
@@ -80,24 +131,320 @@ class AssetDownloader(StreamDownloader):
             self.buffer.write(data)
             on_data(data)
 
+        destfile = os.path.join(self.destdir, os.path.basename(self.url))
+        conditions = self.load_conditions(destfile=destfile)
+
         self.on_data = local_on_data
-        self.download_file_stream(url=self.url)
+        try:
+            modified = self.download_file_stream(url=self.url, conditions=conditions)
+        except DownloadCancelled:
+            self.buffer.seek(0)
+            self.buffer.truncate()
+            raise
+
+        if not modified:
+            return self.not_modified(destfile=destfile, on_data=on_data)
 
-        # Once the data is downloaded, you can
-        # put it on a file
-        destfile = os.path.join(self.destdir, self.filename)
+        # Once the data is downloaded, you can put it on a file. It is
+        # written aside and renamed, since the destfile can be a hard
+        # link to an object of the asset cache, that must not change
         self.debug(f"download::destfile={destfile}")
-        self.debug(f"download::write::{self.write_mode}={self.buffer.getvalue()}")
+        tmpfile = f"{destfile}.tmp"
 
         if self.write_mode == "wb":
             # pylint: disable=unspecified-encoding
-            with open(destfile, self.write_mode) as file:
+            with open(tmpfile, self.write_mode) as file:
                 file.write(self.buffer.getvalue())
 
         if self._write_mode == "w":
-            with open(destfile, self.write_mode, encoding="utf8") as file:
+            with open(tmpfile, self.write_mode, encoding="utf8") as file:
                 value = self.buffer.getvalue()
                 text = value.decode("utf8")
                 file.write(text)
 
+        os.replace(tmpfile, destfile)
+        self.save_conditions(destfile=destfile)
         return destfile
+
+    def download_to_file(self, on_data: typing.Callable) -> str:
+        """
+        Stream each chunk straight to a `.part` file on :attr:`destdir`,
+        preallocated from the Content-Length, then fsync it and atomically
+        rename it to its final name. Nothing is kept in :attr:`buffer`,
+        so memory usage do not grow with the asset size.
+
+        If the transfer is interrupted, the `.part` file is kept together with
+        a `.part.json` sidecar (url, ETag, Last-Modified and byte offset), so
+        the next call continues from where the last one stopped.
+
+        When :attr:`connections` is greater than one and the server accepts
+        byte ranges, the file is fetched in segments (see
+        :meth:`download_segmented_to_file`).
+        """
+        destfile = os.path.join(self.destdir, os.path.basename(self.url))
+        partfile = f"{destfile}.part"
+
+        for observer in self.observers:
+            observer.reset()
+
+        if self.connections > 1:
+            probe = self.probe(url=sources(self.url)[0])
+            if (
+                probe is not None
+                and probe[1] >= 2 * SegmentedDownloader.MIN_SEGMENT_SIZE
+            ):
+                return self.download_segmented_to_file(
+                    url=probe[0], size=probe[1], partfile=partfile, on_data=on_data
+                )
+
+        offset, validator = self.load_resume_state(partfile=partfile)
+        self.debug(f"download_to_file::partfile={partfile}, offset={offset}")
+        conditions = self.load_conditions(destfile=destfile) if offset == 0 else None
+
+        # pylint: disable=consider-using-with
+        file = open(partfile, "r+b" if offset > 0 else "wb")
+        started = False
+
+        def local_on_data(data: bytes):
+            nonlocal started
+            if not started:
+                started = True
+                self._start_part(file=file, partfile=partfile)
+            file.write(data)
+            on_data(data)
+
+        self.on_data = local_on_data
+
+        try:
+            modified = self.download_file_stream(
+                url=self.url, offset=offset, validator=validator, conditions=conditions
+            )
+            if modified and not started:
+                self._start_part(file=file, partfile=partfile)
+
+            # Content-Length could differ from decoded data
+            # so drop any preallocated space that wasnt used
+            file.truncate(file.tell())
+            file.flush()
+            os.fsync(file.fileno())
+            file.close()
+
+        except Exception:
+            # A cancelled download was abandoned, so drop what was received
+            if self.token.cancelled:
+                file.close()
+                AssetDownloader.remove_part(partfile=partfile)
+                AssetDownloader.remove_part(partfile=f"{partfile}.json")
+                raise
+
+            # Keep what was received, so the next call can resume from it
+            if started:
+                file.flush()
+                os.fsync(file.fileno())
+                self.save_resume_state(partfile=partfile, offset=file.tell())
+            file.close()
+
+            if not started and offset == 0:
+                AssetDownloader.remove_part(partfile=partfile)
+            raise
+
+        if not modified:
+            AssetDownloader.remove_part(partfile=partfile)
+            return self.not_modified(destfile=destfile, on_data=on_data)
+
+        self.debug(f"download_to_file::replace={partfile}->{destfile}")
+        os.replace(partfile, destfile)
+        AssetDownloader.remove_part(partfile=f"{partfile}.json")
+        self.remember_digests(destfile=destfile)
+        self.save_conditions(destfile=destfile)
+        return destfile
+
+    def download_segmented_to_file(
+        self, url: str, size: int, partfile: str, on_data: typing.Callable
+    ) -> str:
+        """
+        Preallocate :attr:`partfile` with :attr:`size` bytes and fill it
+        with :attr:`connections` concurrent range requests, then fsync it
+        and atomically rename it to its final name. A failed segmented
+        transfer isnt resumable, so its partial file is removed.
+        """
+        destfile = partfile[: -len(".part")]
+        self.debug(f"download_segmented_to_file::{url}->{partfile}")
+        self.filename = os.path.basename(destfile)
+        self.on_data = on_data
+
+        with open(partfile, "wb") as file:
+            AssetDownloader.preallocate(file, size)
+
+        try:
+            self.download_segments(url=url, size=size, filepath=partfile)
+            with open(partfile, "r+b") as file:
+                os.fsync(file.fileno())
+
+        except Exception:
+            AssetDownloader.remove_part(partfile=partfile)
+            raise
+
+        AssetDownloader.remove_part(partfile=f"{partfile}.json")
+        self.debug(f"download_segmented_to_file::replace={partfile}->{destfile}")
+        os.replace(partfile, destfile)
+        return destfile
+
+    def _start_part(self, file: typing.BinaryIO, partfile: str):
+        # When the server ignored the Range header
+        # the offset is zero and the old data is overwritten
+        if self.offset > 0:
+            self._observe_part(file=file, size=self.offset)
+
+        file.seek(self.offset)
+        if self.content_len > 0:
+            AssetDownloader.preallocate(file, self.content_len)
+        self.save_resume_state(partfile=partfile, offset=self.offset)
+
+    def _observe_part(self, file: typing.BinaryIO, size: int):
+        # A resumed transfer only streams the missing bytes,
+        # so feed the observers with the ones already on disk
+        file.seek(0)
+        while size > 0:
+            block = file.read(min(size, 1 << 16))
+            if not block:
+                break
+
+            for observer in self.observers:
+                observer.update(block)
+            size -= len(block)
+
+    def remember_digests(self, destfile: str):
+        """
+        Remember the digests observed while downloading :attr:`destfile`
+        (see :func:`src.utils.digest.recall`). Digests that didnt see every
+        byte of the file, like the ones of segmented transfers, are skipped.
+        """
+        size = os.path.getsize(destfile)
+        for observer in self.observers:
+            if isinstance(observer, DigestObserver) and observer.size == size:
+                self.debug(f"remember_digests::{destfile}::{observer.name}")
+                remember(
+                    path=destfile, name=observer.name, hexdigest=observer.hexdigest
+                )
+
+    def load_conditions(self, destfile: str) -> typing.Dict[str, str | None] | None:
+        """
+        Read the validators kept for :attr:`destfile` on its `.validators.json`
+        sidecar, to be sent on a conditional request. Return `None` when
+        requests arent :attr:`CONDITIONAL`, or the file is missing or was
+        changed (other url or size) since the validators were saved
+        """
+        if not self.CONDITIONAL:
+            return None
+
+        try:
+            with open(f"{destfile}.validators.json", "r", encoding="utf8") as file:
+                state = json.load(file)
+            size = os.path.getsize(destfile)
+        except (OSError, ValueError) as exc:
+            self.debug(f"load_conditions::{exc}")
+            return None
+
+        if state.get("url") != self.url or state.get("size") != size:
+            return None
+
+        conditions = {
+            "etag": state.get("etag"),
+            "last_modified": state.get("last_modified"),
+        }
+        self.debug(f"load_conditions::{destfile}::{conditions}")
+        return conditions if any(conditions.values()) else None
+
+    def save_conditions(self, destfile: str):
+        """
+        Atomically write the validators of the last response next to a
+        downloaded :attr:`destfile`, when requests are :attr:`CONDITIONAL`
+        """
+        if not self.CONDITIONAL:
+            return
+
+        state = {
+            "url": self.url,
+            "size": os.path.getsize(destfile),
+            "etag": self.validators.get("etag"),
+            "last_modified": self.validators.get("last_modified"),
+        }
+        tmpfile = f"{destfile}.validators.json.tmp"
+        with open(tmpfile, "w", encoding="utf8") as file:
+            json.dump(state, file)
+        os.replace(tmpfile, f"{destfile}.validators.json")
+
+    def not_modified(self, destfile: str, on_data: typing.Callable) -> str:
+        """
+        A `304 Not Modified` answer is a zero-byte hit: report the kept
+        :attr:`destfile` as fully downloaded, so listeners of :attr:`on_data`
+        still see the completion
+        """
+        self.debug(f"not_modified::{destfile}")
+        self.mark_complete(size=os.path.getsize(destfile))
+        on_data(b"")
+        return destfile
+
+    def cancel(self):
+        """
+        Cancel the download from any thread: the open response is closed,
+        no more chunks reach :attr:`on_data`, and the partial output is
+        deleted instead of being kept for a resume
+        """
+        self.debug(f"cancel::{self.url}")
+        self.token.cancel()
+
+    def load_resume_state(self, partfile: str) -> typing.Tuple[int, str | None]:
+        """
+        Read the `.part.json` sidecar of a interrupted download and return
+        the offset to continue from and the validator to be sent as `If-Range`
+        """
+        statefile = f"{partfile}.json"
+        if not os.path.isfile(partfile) or not os.path.isfile(statefile):
+            return (0, None)
+
+        try:
+            with open(statefile, "r", encoding="utf8") as file:
+                state = json.load(file)
+        except (OSError, ValueError) as exc:
+            self.warning(f"load_resume_state::ignoring {statefile}: {exc}")
+            return (0, None)
+
+        # A complete part would be answered with 416 (Range Not Satisfiable)
+        offset = state.get("offset", 0)
+        if (
+            state.get("url") != self.url
+            or offset > os.path.getsize(partfile)
+            or offset >= state.get("content_len", offset + 1)
+        ):
+            self.debug(f"load_resume_state::{statefile} is stale")
+            return (0, None)
+
+        # Weak ETags can't be used with If-Range
+        etag = state.get("etag")
+        if etag is not None and not etag.startswith("W/"):
+            return (offset, etag)
+
+        return (offset, state.get("last_modified"))
+
+    def save_resume_state(self, partfile: str, offset: int):
+        """Write the `.part.json` sidecar used to resume a interrupted download"""
+        state = {
+            "url": self.url,
+            "offset": offset,
+            "content_len": self.content_len,
+            **self.validators,
+        }
+        self.debug(f"save_resume_state::{partfile}.json={state}")
+
+        tmpfile = f"{partfile}.json.tmp"
+        with open(tmpfile, "w", encoding="utf8") as file:
+            json.dump(state, file)
+        os.replace(tmpfile, f"{partfile}.json")
+
+    @staticmethod
+    def remove_part(partfile: str):
+        """Remove a partial file, if it exists"""
+        if os.path.exists(partfile):
+            os.remove(partfile)
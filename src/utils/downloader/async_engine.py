@@ -0,0 +1,257 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+async_engine.py
+
+Process-wide asyncio engine: one event loop, owned by a daemon thread,
+where many transfers run together. Synchronous downloaders use it
+through :class:`SyncStreamResponse`, a blocking facade with the parts of
+`requests.Response` that :class:`StreamDownloader` needs
+"""
+import time
+import typing
+import asyncio
+import threading
+import concurrent.futures
+import requests
+from ..trigger import Trigger
+from .async_http import AsyncResponse, close_idle, open_stream
+
+# asyncio.TimeoutError is only an alias of TimeoutError since python 3.11
+TIMEOUT_ERRORS = (asyncio.TimeoutError, concurrent.futures.TimeoutError)
+
+_LOCK = threading.Lock()
+
+_STATE = {"engine": None}
+
+
+class AsyncEngine(Trigger):
+    """
+    Run coroutines on a single event loop, started on a daemon thread on
+    first use, and wait for them from any other thread
+    """
+
+    def __init__(self, name: str = "download-engine"):
+        super().__init__()
+        self._name = name
+        self._lock = threading.Lock()
+        self._loop = None
+        self._thread = None
+
+    @property
+    def name(self) -> str:
+        """Getter for the name of the event loop thread"""
+        self.debug(f"name::getter={self._name}")
+        return self._name
+
+    @property
+    def running(self) -> bool:
+        """Getter for the state of the event loop thread"""
+        running = self._thread is not None and self._thread.is_alive()
+        self.debug(f"running::getter={running}")
+        return running
+
+    @property
+    def loop(self) -> asyncio.AbstractEventLoop:
+        """Getter for the event loop, started if it isnt yet"""
+        with self._lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._thread = threading.Thread(
+                    name=self._name, target=self._loop.run_forever, daemon=True
+                )
+                self._thread.start()
+                self.debug(f"loop::started={self._name}")
+
+        return self._loop
+
+    def submit(self, coro: typing.Coroutine) -> concurrent.futures.Future:
+        """Schedule a coroutine on the event loop and return its future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro: typing.Coroutine, timeout: float | None = None) -> typing.Any:
+        """
+        Run a coroutine on the event loop and wait for its result. If it
+        doesnt finish in :attr:`timeout` seconds, it is cancelled and
+        `TimeoutError` is raised
+        """
+        future = self.submit(coro)
+        try:
+            return future.result(timeout=timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def open(
+        self,
+        url: str,
+        headers: typing.Dict[str, str],
+        timeout: float = 30,
+        deadline: float | None = None,
+    ) -> "SyncStreamResponse":
+        """
+        Open a streamed GET request on the event loop, waiting at most
+        :attr:`timeout` seconds for each step (connection, headers and every
+        read). With a :attr:`deadline`, the whole transfer must finish in
+        that many seconds. Failures are raised as `requests` exceptions
+        """
+        limit = SyncStreamResponse.limit(
+            timeout=timeout,
+            deadline=None if deadline is None else time.monotonic() + deadline,
+        )
+        try:
+            response = self.run(
+                asyncio.wait_for(open_stream(url=url, headers=headers), limit[0])
+            )
+        except TIMEOUT_ERRORS as exc:
+            raise requests.exceptions.ConnectTimeout(str(exc)) from exc
+        except OSError as exc:
+            raise requests.exceptions.ConnectionError(str(exc)) from exc
+
+        return SyncStreamResponse(
+            response=response, engine=self, timeout=timeout, deadline=limit[1]
+        )
+
+    def close(self):
+        """Stop the event loop and wait for its thread"""
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread = None, None
+
+        if loop is not None:
+            loop.call_soon_threadsafe(close_idle)
+            loop.call_soon_threadsafe(loop.stop)
+            thread.join()
+            loop.close()
+            self.debug(f"close::stopped={self._name}")
+
+
+class SyncStreamResponse:
+    """
+    Blocking facade of an :class:`AsyncResponse`, so downloaders written
+    for `requests` can read it: `status_code`, `headers`, `url`,
+    `raise_for_status`, `iter_content`, `raw.read` and `close`
+    """
+
+    def __init__(
+        self,
+        response: AsyncResponse,
+        engine: AsyncEngine,
+        timeout: float,
+        deadline: float | None = None,
+    ):
+        self._response = response
+        self._engine = engine
+        self._timeout = timeout
+        self._deadline = deadline
+
+    @staticmethod
+    def limit(
+        timeout: float, deadline: float | None
+    ) -> typing.Tuple[float, float | None]:
+        """
+        Return the seconds that the next step can take, given a :attr:`timeout`
+        for each step and a monotonic :attr:`deadline` for all of them,
+        together with that deadline
+        """
+        if deadline is None:
+            return (timeout, None)
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            raise requests.exceptions.Timeout("Deadline exceeded")
+
+        return (min(timeout, remaining), deadline)
+
+    @property
+    def status_code(self) -> int:
+        """Getter for the response status"""
+        return self._response.status_code
+
+    @property
+    def headers(self) -> typing.Mapping[str, str]:
+        """Getter for the case-insensitive response headers"""
+        return self._response.headers
+
+    @property
+    def url(self) -> str:
+        """Getter for the final url, after redirects"""
+        return self._response.url
+
+    @property
+    def raw(self) -> "SyncStreamResponse":
+        """The facade is its own raw stream"""
+        return self
+
+    def raise_for_status(self):
+        """Raise `requests.exceptions.HTTPError` for 4xx and 5xx answers"""
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} for url: {self.url}", response=self
+            )
+
+    def read(self, size: int, decode_content: bool = True) -> bytes:
+        """
+        Read up to :attr:`size` bytes, blocking until they arrive. The body
+        is always received with the identity encoding, so
+        :attr:`decode_content` is only kept for compatibility with `urllib3`
+        """
+        # pylint: disable=unused-argument
+        timeout, _ = SyncStreamResponse.limit(self._timeout, self._deadline)
+        try:
+            return self._engine.run(
+                asyncio.wait_for(self._response.read(size), timeout)
+            )
+        except TIMEOUT_ERRORS as exc:
+            raise requests.exceptions.ReadTimeout(str(exc)) from exc
+        except OSError as exc:
+            raise requests.exceptions.ConnectionError(str(exc)) from exc
+
+    def iter_content(self, chunk_size: int) -> typing.Iterator[bytes]:
+        """Iterate over the body in chunks of, at most, :attr:`chunk_size` bytes"""
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        """Close the connection on the event loop"""
+        self._engine.loop.call_soon_threadsafe(self._response.close)
+
+
+def get_engine() -> AsyncEngine | None:
+    """
+    Get the shared engine. When there is none, downloaders
+    use the shared `requests` session instead
+    """
+    with _LOCK:
+        return _STATE["engine"]
+
+
+def set_engine(engine: AsyncEngine | None):
+    """Replace the shared engine, closing the old one. Use `None` to drop it"""
+    with _LOCK:
+        old, _STATE["engine"] = _STATE["engine"], engine
+
+    if old is not None and old is not engine:
+        old.close()
@@ -0,0 +1,312 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+async_http.py
+
+A small HTTP/1.1 client on top of asyncio streams, enough to stream
+release assets (redirects, Content-Length, chunked and close-delimited
+bodies) without a thread per transfer. Connections are kept alive and
+reused per host, in a small pool of each event loop
+"""
+import ssl
+import asyncio
+import typing
+import weakref
+from urllib.parse import urlsplit, urljoin
+import certifi
+from requests.structures import CaseInsensitiveDict
+
+REDIRECTS = (301, 302, 303, 307, 308)
+
+MAX_REDIRECTS = 10
+
+USER_AGENT = "krux-installer"
+
+# idle connections kept per (scheme, host, port)
+POOL_SIZE = 4
+
+# event loop -> {(scheme, host, port): [(reader, writer), ...]}
+_POOLS = weakref.WeakKeyDictionary()
+
+
+def _idle(key: typing.Tuple[str, str, int]) -> list:
+    pools = _POOLS.setdefault(asyncio.get_running_loop(), {})
+    return pools.setdefault(key, [])
+
+
+def _acquire(
+    key: typing.Tuple[str, str, int]
+) -> typing.Tuple[asyncio.StreamReader, asyncio.StreamWriter] | None:
+    idle = _idle(key)
+    while idle:
+        reader, writer = idle.pop()
+        if not reader.at_eof() and not writer.is_closing():
+            return (reader, writer)
+        writer.close()
+    return None
+
+
+def _release(
+    key: typing.Tuple[str, str, int],
+    reader: asyncio.StreamReader,
+    writer: asyncio.StreamWriter,
+):
+    idle = _idle(key)
+    if len(idle) < POOL_SIZE and not reader.at_eof():
+        idle.append((reader, writer))
+    else:
+        writer.close()
+
+
+def close_idle():
+    """Close the idle connections pooled on the running event loop"""
+    for idle in _POOLS.pop(asyncio.get_running_loop(), {}).values():
+        for _, writer in idle:
+            writer.close()
+
+
+# pylint: disable=too-many-instance-attributes
+class AsyncResponse:
+    """
+    Streamed response of :func:`open_stream`. The body is read, already
+    de-chunked, with :meth:`read` until it returns an empty bytes.
+    Given a pool :attr:`key`, a fully read keep-alive connection goes
+    back to the pool on :meth:`close`
+    """
+
+    # pylint: disable=too-many-arguments,too-many-positional-arguments
+    def __init__(
+        self,
+        url: str,
+        status_code: int,
+        headers: CaseInsensitiveDict,
+        reader: asyncio.StreamReader,
+        writer: asyncio.StreamWriter,
+        key: typing.Tuple[str, str, int] | None = None,
+    ):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self._reader = reader
+        self._writer = writer
+        self._key = key
+        if "close" in headers.get("Connection", "").lower():
+            self._key = None
+        self._chunked = "chunked" in headers.get("Transfer-Encoding", "").lower()
+        self._chunk_left = 0
+
+        # None means the body ends when the server closes the connection
+        self._remaining = None
+        if status_code in (204, 304) or 100 <= status_code < 200:
+            self._remaining = 0
+        elif not self._chunked and headers.get("Content-Length"):
+            self._remaining = int(headers["Content-Length"])
+
+    async def read(self, size: int) -> bytes:
+        """Read up to :attr:`size` bytes of the body; empty bytes on its end"""
+        if self._chunked:
+            return await self._read_chunked(size)
+
+        if self._remaining is None:
+            return await self._reader.read(size)
+
+        if self._remaining == 0:
+            return b""
+
+        data = await self._reader.read(min(size, self._remaining))
+        if not data:
+            raise ConnectionError(
+                f"Connection closed with {self._remaining} bytes left"
+            )
+
+        self._remaining -= len(data)
+        return data
+
+    async def _read_chunked(self, size: int) -> bytes:
+        if self._chunk_left == 0:
+            line = await self._reader.readline()
+            try:
+                self._chunk_left = int(line.split(b";", 1)[0].strip(), 16)
+            except ValueError as exc:
+                raise ConnectionError(f"Invalid chunk size: {line!r}") from exc
+
+            if self._chunk_left == 0:
+                # skip trailers until the blank line
+                while (await self._reader.readline()).strip():
+                    pass
+                self._chunked = False
+                self._remaining = 0
+                return b""
+
+        data = await self._reader.read(min(size, self._chunk_left))
+        if not data:
+            raise ConnectionError("Connection closed inside a chunk")
+
+        self._chunk_left -= len(data)
+        if self._chunk_left == 0:
+            await self._reader.readexactly(2)
+
+        return data
+
+    def close(self):
+        """Release the underlying connection to the pool or close it"""
+        key, self._key = self._key, None
+        if key is not None and self._remaining == 0 and not self._chunked:
+            _release(key, self._reader, self._writer)
+        else:
+            self._writer.close()
+
+
+def _pool_key(url: str) -> typing.Tuple[str, str, int]:
+    parts = urlsplit(url)
+    return (
+        parts.scheme,
+        parts.hostname,
+        parts.port or (443 if parts.scheme == "https" else 80),
+    )
+
+
+async def _connect(
+    key: typing.Tuple[str, str, int]
+) -> typing.Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    scheme, host, port = key
+    context = None
+    if scheme == "https":
+        context = ssl.create_default_context(cafile=certifi.where())
+
+    return await asyncio.open_connection(host, port, ssl=context)
+
+
+async def _send(
+    url: str, headers: typing.Dict[str, str], reuse: bool = True
+) -> typing.Tuple[asyncio.StreamReader, asyncio.StreamWriter, bool]:
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        raise ValueError(f"Unsupported scheme: {parts.scheme}")
+
+    key = _pool_key(url)
+    conn = _acquire(key) if reuse else None
+    reused = conn is not None
+    reader, writer = conn if reused else await _connect(key)
+
+    path = parts.path or "/"
+    if parts.query:
+        path = f"{path}?{parts.query}"
+
+    # The body is never decoded here, so ask for the identity encoding,
+    # and keep the connection alive for the next request to this host
+    lines = [
+        f"GET {path} HTTP/1.1",
+        f"Host: {parts.netloc}",
+        f"User-Agent: {USER_AGENT}",
+        "Accept-Encoding: identity",
+        "Connection: keep-alive",
+    ]
+    for name, value in headers.items():
+        if name.lower() not in ("host", "accept-encoding", "connection"):
+            lines.append(f"{name}: {value}")
+
+    try:
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode("latin-1"))
+        await writer.drain()
+    except OSError:
+        writer.close()
+        if not reused:
+            raise
+        return await _send(url=url, headers=headers, reuse=False)
+
+    return (reader, writer, reused)
+
+
+async def _receive_head(
+    reader: asyncio.StreamReader,
+) -> typing.Tuple[str, int, CaseInsensitiveDict]:
+    status_line = await reader.readline()
+    try:
+        version, status, _ = (status_line.decode("latin-1").rstrip() + " ").split(
+            " ", 2
+        )
+        status_code = int(status)
+    except ValueError as exc:
+        raise ConnectionError(f"Invalid status line: {status_line!r}") from exc
+
+    headers = CaseInsensitiveDict()
+    while True:
+        line = (await reader.readline()).decode("latin-1").rstrip("\r\n")
+        if not line:
+            break
+
+        key, _, value = line.partition(":")
+        headers[key.strip()] = value.strip()
+
+    return (version, status_code, headers)
+
+
+async def _request(url: str, headers: typing.Dict[str, str]) -> tuple:
+    # A pooled connection the server already dropped fails on its first
+    # read, so the request is sent once more on a new connection
+    reader, writer, reused = await _send(url=url, headers=headers)
+    try:
+        return (reader, writer, await _receive_head(reader))
+    except OSError:
+        writer.close()
+        if not reused:
+            raise
+    except BaseException:
+        writer.close()
+        raise
+
+    reader, writer, _ = await _send(url=url, headers=headers, reuse=False)
+    try:
+        return (reader, writer, await _receive_head(reader))
+    except BaseException:
+        writer.close()
+        raise
+
+
+async def open_stream(
+    url: str, headers: typing.Dict[str, str] | None = None
+) -> AsyncResponse:
+    """
+    Send a GET request to :attr:`url` with the given :attr:`headers`,
+    following redirects, and return the streamed response once its
+    status and headers are received
+    """
+    for _ in range(MAX_REDIRECTS + 1):
+        reader, writer, head = await _request(url=url, headers=headers or {})
+        version, status_code, res_headers = head
+
+        if status_code in REDIRECTS and "Location" in res_headers:
+            writer.close()
+            url = urljoin(url, res_headers["Location"])
+            continue
+
+        return AsyncResponse(
+            url=url,
+            status_code=status_code,
+            headers=res_headers,
+            reader=reader,
+            writer=writer,
+            key=_pool_key(url) if version == "HTTP/1.1" else None,
+        )
+
+    raise ConnectionError(f"Too many redirects for {url}")
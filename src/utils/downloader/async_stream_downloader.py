@@ -0,0 +1,142 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+async_stream_downloader.py
+"""
+import os
+import asyncio
+from .async_http import open_stream
+from .async_engine import TIMEOUT_ERRORS
+from .stream_downloader import StreamDownloader
+
+
+class AsyncStreamDownloader(StreamDownloader):
+    """
+    Coroutine counterpart of :class:`StreamDownloader`, with the same
+    :attr:`on_data`, :attr:`content_len` and :attr:`downloaded_len`
+    contract, so many transfers can share one event loop (see
+    :class:`AsyncEngine`). A transfer can be cancelled from any thread
+    with :meth:`cancel` and, with a :attr:`deadline`, it fails when it
+    takes longer than that many seconds.
+    """
+
+    def __init__(self, url: str, deadline: float | None = None):
+        super().__init__(url=url)
+        self._deadline = deadline
+        self._task = None
+
+    @property
+    def deadline(self) -> float | None:
+        """Getter for the seconds that a whole transfer can take"""
+        self.debug(f"deadline::getter={self._deadline}")
+        return self._deadline
+
+    @deadline.setter
+    def deadline(self, value: float | None):
+        """Setter for the seconds that a whole transfer can take"""
+        if value is not None and value <= 0:
+            raise ValueError(f"Invalid deadline: {value}")
+
+        self.debug(f"deadline::setter={value}")
+        self._deadline = value
+
+    @property
+    def running(self) -> bool:
+        """Getter for the state of the current transfer"""
+        running = self._task is not None
+        self.debug(f"running::getter={running}")
+        return running
+
+    async def fetch(self, url: str | None = None, offset: int = 0) -> bool:
+        """
+        Stream :attr:`url` (default: :attr:`url`) the same way as
+        :meth:`StreamDownloader.download_file_stream`, calling
+        :attr:`on_data` with each chunk. Raise `asyncio.CancelledError`
+        when cancelled and `RuntimeError` on any failure or when the
+        :attr:`deadline` is exceeded
+        """
+        url = url or self.url
+        self._task = asyncio.current_task()
+        try:
+            if self.deadline is None:
+                return await self._fetch(url=url, offset=offset)
+
+            return await asyncio.wait_for(
+                self._fetch(url=url, offset=offset), self.deadline
+            )
+
+        except TIMEOUT_ERRORS as exc:
+            raise RuntimeError(
+                f"Download deadline of {self.deadline}s exceeded "
+                + f"at {self.downloaded_len}"
+            ) from exc
+
+        except OSError as exc:
+            raise RuntimeError(
+                f"Download interrupted at {self.downloaded_len}: {exc}"
+            ) from exc
+
+        finally:
+            self._task = None
+
+    async def _fetch(self, url: str, offset: int) -> bool:
+        self.filename = os.path.basename(url)
+        res = await open_stream(url=url, headers=self.make_headers(offset=offset))
+        try:
+            if res.status_code >= 400:
+                raise RuntimeError(f"HTTP error {res.status_code}: {url}")
+
+            if not self._process_headers(res=res, url=url, offset=offset):
+                return False
+
+            while True:
+                chunk = await res.read(self.chunk_size)
+                if not chunk:
+                    break
+
+                # Waiting for bandwidth blocks, so
+                # it cannot happen on the event loop
+                if self.throttle.limited:
+                    await asyncio.to_thread(self.throttle.consume, len(chunk))
+                self._process_chunk(chunk=chunk)
+
+            # Without a Content-Length, the
+            # end of stream is the completion
+            if self.content_len == 0:
+                self.mark_complete(size=self.downloaded_len)
+                self._process_chunk(chunk=b"")
+
+            return True
+
+        finally:
+            res.close()
+
+    def cancel(self):
+        """
+        Cancel the running transfer, if any, from any thread. Its
+        connection is closed and `asyncio.CancelledError` is raised
+        on whoever awaits :meth:`fetch`
+        """
+        task = self._task
+        if task is not None:
+            self.debug(f"cancel::{self.url}")
+            task.get_loop().call_soon_threadsafe(task.cancel)
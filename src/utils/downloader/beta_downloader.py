@@ -33,6 +33,8 @@ class BetaDownloader(AssetDownloader):
 
     VALID_BINARY_TYPES = ("firmware.bin", "kboot.kfpkg")
 
+    CONDITIONAL = True
+
     def __init__(
         self,
         device: str,
@@ -41,9 +43,10 @@ class BetaDownloader(AssetDownloader):
     ):
         base_url = "https://raw.githubusercontent.com/odudex/krux_binaries/main"
         url = f"{base_url}/maixpy_{device}/{binary_type}"
-        super().__init__(url=url, destdir=destdir, write_mode="wb")
+        super().__init__(url=url, destdir=destdir, write_mode="wb", sink="stream")
         self.device = device
         self.binary_type = binary_type
+        self.adaptive = True
 
     @property
     def device(self):
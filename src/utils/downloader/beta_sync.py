@@ -0,0 +1,250 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+beta_sync.py
+"""
+import os
+import json
+import typing
+import hashlib
+import threading
+import requests
+from ..trigger import Trigger
+from ..session import get_session
+from ..retry import get_policy
+from .beta_downloader import BetaDownloader
+from .download_manager import get_manager, SYNC
+
+
+def blob_sha(path: str) -> str:
+    """Get the git blob SHA-1 of a file, as github lists it on a tree"""
+    digest = hashlib.sha1(f"blob {os.path.getsize(path)}\0".encode())
+    with open(path, "rb") as file:
+        for chunk in iter(lambda: file.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class BetaSync(Trigger):
+    """
+    Keep a local copy of the beta binaries of odudex/krux_binaries, placed
+    on :attr:`destdir` with the repository's layout (`maixpy_<device>/<binary>`).
+
+    The tree of the `main` branch is asked once for the blob SHAs of the
+    binaries, which are compared with the ones saved on a manifest by the
+    last sync. Only the binaries whose blob changed (or are missing) are
+    downloaded, in parallel, with the :attr:`SYNC` priority of the
+    :class:`DownloadManager`, and checked against their blob SHA.
+    """
+
+    TREE_URL = (
+        "https://api.github.com/repos/odudex/krux_binaries/git/trees/main?recursive=1"
+    )
+
+    HEADERS = {
+        "Accept": "application/vnd.github+json",
+        "X-GitHub-Api-Version": "2022-11-28",
+    }
+
+    MANIFEST = ".manifest.json"
+
+    def __init__(
+        self,
+        destdir: str,
+        devices: typing.Iterable[str] = BetaDownloader.VALID_DEVICES,
+        binary_types: typing.Iterable[str] = BetaDownloader.VALID_BINARY_TYPES,
+    ):
+        super().__init__()
+        self._destdir = destdir
+        self._paths = [
+            f"maixpy_{device}/{binary_type}"
+            for device in devices
+            for binary_type in binary_types
+        ]
+
+    @property
+    def destdir(self) -> str:
+        """Getter for the directory of the local copy"""
+        self.debug(f"destdir::getter={self._destdir}")
+        return self._destdir
+
+    @property
+    def paths(self) -> typing.List[str]:
+        """Getter for the paths of the synced binaries on the repository"""
+        self.debug(f"paths::getter={self._paths}")
+        return self._paths
+
+    def fetch_tree(self, timeout: int = 10) -> typing.Dict[str, str]:
+        """
+        Get the blob SHAs of the synced binaries on the `main` branch,
+        retrying transient failures (see :mod:`src.utils.retry`)
+        """
+        response = get_policy().run(fn=lambda: self._request_tree(timeout))
+        res = response.json()
+        if res.get("truncated"):
+            self.warning(f"fetch_tree::{BetaSync.TREE_URL} is truncated")
+
+        tree = {
+            item["path"]: item["sha"]
+            for item in res.get("tree", [])
+            if item.get("type") == "blob" and item.get("path") in self.paths
+        }
+        self.debug(f"fetch_tree={tree}")
+        return tree
+
+    def _request_tree(self, timeout: int) -> requests.Response:
+        """Ask the github api for the tree, once"""
+        try:
+            response = get_session().get(
+                url=BetaSync.TREE_URL, headers=BetaSync.HEADERS, timeout=timeout
+            )
+            response.raise_for_status()
+
+        except requests.exceptions.Timeout as t_exc:
+            raise RuntimeError(t_exc) from t_exc
+
+        except requests.exceptions.ConnectionError as c_exc:
+            raise RuntimeError(c_exc) from c_exc
+
+        except requests.exceptions.HTTPError as h_exc:
+            raise RuntimeError(h_exc) from h_exc
+
+        return response
+
+    def load_manifest(self) -> typing.Dict[str, str]:
+        """Get the blob SHAs of the last sync, or nothing if there was none"""
+        try:
+            path = os.path.join(self.destdir, BetaSync.MANIFEST)
+            with open(path, "r", encoding="utf8") as file:
+                manifest = json.load(file)
+        except (OSError, ValueError) as exc:
+            self.debug(f"load_manifest::{exc}")
+            return {}
+
+        return manifest if isinstance(manifest, dict) else {}
+
+    def save_manifest(self, manifest: typing.Dict[str, str]):
+        """Atomically write the blob SHAs of the synced binaries"""
+        os.makedirs(self.destdir, exist_ok=True)
+        path = os.path.join(self.destdir, BetaSync.MANIFEST)
+        with open(f"{path}.part", "w", encoding="utf8") as file:
+            json.dump(manifest, file, indent=2, sort_keys=True)
+        os.replace(f"{path}.part", path)
+
+    def outdated(
+        self, tree: typing.Dict[str, str], manifest: typing.Dict[str, str]
+    ) -> typing.List[str]:
+        """
+        Get the paths of :attr:`tree` whose blob differs from the
+        :attr:`manifest` or whose file is missing. Files that aren't on the
+        manifest yet (like the ones downloaded by the application) are
+        hashed, and kept on it when they are the same blob
+        """
+        outdated = []
+        for path, sha in tree.items():
+            destfile = os.path.join(self.destdir, path)
+            if not os.path.isfile(destfile):
+                outdated.append(path)
+
+            elif path not in manifest and blob_sha(destfile) == sha:
+                manifest[path] = sha
+
+            elif manifest.get(path) != sha:
+                outdated.append(path)
+
+        self.debug(f"outdated={outdated}")
+        return outdated
+
+    @staticmethod
+    def remove_binary(destfile: str):
+        """
+        Remove a binary and its `.validators.json` sidecar, so a rejected
+        one is neither flashed nor revalidated on the next sync
+        """
+        for path in (destfile, f"{destfile}.validators.json"):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def sync(self) -> typing.Dict[str, typing.Any]:
+        """
+        Download the outdated binaries and save the manifest. Return the
+        paths that were `updated`, the `unchanged` ones, the `failed` ones
+        with their errors and the `missing` ones (not on the tree)
+        """
+        tree = self.fetch_tree()
+        manifest = self.load_manifest()
+        outdated = self.outdated(tree=tree, manifest=manifest)
+
+        pending = {}
+        for path in outdated:
+            device, binary_type = path.split("/")
+            pending[path] = get_manager().request(
+                downloader=BetaDownloader(
+                    device=device[len("maixpy_") :],
+                    binary_type=binary_type,
+                    destdir=os.path.join(self.destdir, device),
+                ),
+                priority=SYNC,
+            )
+            pending[path].start()
+
+        updated = []
+        failed = {}
+        for path, request in pending.items():
+            try:
+                destfile = request.download(on_data=lambda data: None)
+                if blob_sha(destfile) != tree[path]:
+                    BetaSync.remove_binary(destfile)
+                    raise RuntimeError(f"Blob SHA of {destfile} is not {tree[path]}")
+
+                manifest[path] = tree[path]
+                updated.append(path)
+
+            except (RuntimeError, OSError) as exc:
+                self.warning(f"sync::{path} failed: {exc}")
+                manifest.pop(path, None)
+                failed[path] = str(exc)
+
+        self.save_manifest(manifest)
+        summary = {
+            "updated": updated,
+            "unchanged": [p for p in tree if p not in outdated],
+            "failed": failed,
+            "missing": [p for p in self.paths if p not in tree],
+        }
+        self.info(f"sync::{summary}")
+        return summary
+
+
+def start_sync(destdir: str) -> threading.Thread:
+    """Run a :class:`BetaSync` on a daemon thread, so nothing waits for it"""
+    beta_sync = BetaSync(destdir=destdir)
+
+    def _run():
+        try:
+            beta_sync.sync()
+        except (RuntimeError, OSError) as exc:
+            beta_sync.warning(f"start_sync::{exc}")
+
+    thread = threading.Thread(target=_run, name="beta-sync", daemon=True)
+    thread.start()
+    return thread
@@ -0,0 +1,97 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+cancel_token.py
+"""
+import typing
+import threading
+from ..trigger import Trigger
+
+
+class DownloadCancelled(RuntimeError):
+    """Raised by a downloader when its :class:`CancelToken` is cancelled"""
+
+
+class CancelToken(Trigger):
+    """
+    Thread-safe flag shared between a downloader, that checks it between
+    chunks, and whoever may abandon the download (like a screen that is
+    left). Callbacks registered with :meth:`on_cancel`, like the `close`
+    of an open response, are called once it is cancelled, so a blocked
+    read is interrupted too
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks = []
+
+    @property
+    def cancelled(self) -> bool:
+        """Getter for the state of the token"""
+        return self._event.is_set()
+
+    def cancel(self):
+        """Cancel the token and call its registered callbacks, once"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self._event.set()
+            callbacks, self._callbacks = self._callbacks, []
+
+        self.debug(f"cancel::callbacks={len(callbacks)}")
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                self.warning(f"cancel::{callback} failed: {exc}")
+
+    def on_cancel(self, callback: typing.Callable):
+        """
+        Register a callback to be called when the token is cancelled;
+        if it already is, the callback is called right away
+        """
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+
+        callback()
+
+    def remove(self, callback: typing.Callable):
+        """Unregister a callback, if it still is registered"""
+        with self._lock:
+            if callback in self._callbacks:
+                self._callbacks.remove(callback)
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Sleep up to :attr:`timeout` seconds, waking up early if the token
+        is cancelled meanwhile. Return whether it is cancelled
+        """
+        return self._event.wait(timeout)
+
+    def raise_if_cancelled(self, msg: str = "Download cancelled"):
+        """Raise :class:`DownloadCancelled` if the token is cancelled"""
+        if self._event.is_set():
+            raise DownloadCancelled(msg)
@@ -0,0 +1,96 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+chunk_reader.py
+
+Low-copy reading of response bodies: when the undecoded body can be
+read with `readinto` (HTTP responses of urllib3 without a
+Content-Encoding and `file://` responses), chunks are read into a
+buffer allocated once per transfer and given as :class:`memoryview`
+slices of it, instead of a new `bytes` object for each one
+"""
+import typing
+import http.client
+import requests
+import urllib3
+from ..session.file_adapter import FileRaw
+
+
+def raw_readinto(res: requests.Response) -> typing.Callable | None:
+    """
+    Get the `readinto` of the body of :attr:`res`, or None when
+    it cant be read without copies (encoded bodies, other transports)
+    """
+    if res.headers.get("Content-Encoding", "identity") != "identity":
+        return None
+
+    if isinstance(res.raw, FileRaw):
+        return res.raw.readinto
+
+    # urllib3 implements `readinto` with a `read`, so
+    # read from the `http.client` response beneath it
+    if isinstance(res.raw, urllib3.response.HTTPResponse) and isinstance(
+        getattr(res.raw, "_fp", None), http.client.HTTPResponse
+    ):
+        return res.raw._fp.readinto  # pylint: disable=protected-access
+
+    return None
+
+
+def read_into(readinto: typing.Callable, view: memoryview) -> memoryview:
+    """
+    Read the next chunk into :attr:`view` and return the slice that was
+    filled (empty at the end of the body). Read errors are raised as
+    the `ProtocolError` that urllib3 would raise for them
+    """
+    try:
+        return view[: readinto(view)]
+    except (OSError, http.client.HTTPException) as exc:
+        raise urllib3.exceptions.ProtocolError(
+            f"Connection broken: {exc!r}", exc
+        ) from exc
+
+
+def release(res: requests.Response):
+    """
+    Give the connection of a fully read response back to its pool, as
+    urllib3 does when it reads the end of a body by itself
+    """
+    if isinstance(res.raw, urllib3.response.HTTPResponse):
+        res.raw.release_conn()
+
+
+def iter_into(
+    res: requests.Response, readinto: typing.Callable, size: int
+) -> typing.Iterator[memoryview]:
+    """
+    Yield the body of :attr:`res` in chunks of up to :attr:`size` bytes,
+    all read into the same buffer: each chunk is only valid until the
+    next one is read, so it must be copied to be kept
+    """
+    view = memoryview(bytearray(size))
+    while True:
+        chunk = read_into(readinto=readinto, view=view)
+        if not chunk:
+            release(res)
+            return
+        yield chunk
@@ -0,0 +1,511 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+download_manager.py
+
+Process-wide download manager: transfers run on a bounded pool of worker
+threads, taken from a queue by priority class, and a url is downloaded
+only once at a time, however many times it is requested
+"""
+import heapq
+import typing
+import itertools
+import threading
+from ..trigger import Trigger
+from .cancel_token import CancelToken, DownloadCancelled
+from .rate_limiter import Throttle
+
+# priority classes, the lowest first
+INTERACTIVE = 0
+PREFETCH = 1
+SYNC = 2
+
+PRIORITIES = (INTERACTIVE, PREFETCH, SYNC)
+
+_LOCK = threading.Lock()
+
+_STATE = {"manager": None}
+
+
+class Transfer(Trigger):
+    """
+    A download run once by a :class:`DownloadManager` for all the
+    :class:`Request` of the same url. Its progress, retries and result are
+    shared by them, and it is a foreground transfer (see :class:`Throttle`)
+    while any of them is interactive.
+
+    The downloader's token and retry callback are only replaced once a
+    worker takes the transfer, so a cancelled transfer of the same
+    downloader, still running, is never resumed by a new one
+    """
+
+    def __init__(
+        self, downloader: typing.Any, priority: int, cond: threading.Condition
+    ):
+        super().__init__()
+        self._downloader = downloader
+        self._cond = cond
+        self._requests = []
+        self._state = {
+            "priority": None,
+            "started": False,
+            "done": False,
+            "result": None,
+            "error": None,
+        }
+        self.priority = priority
+
+    @property
+    def downloader(self) -> typing.Any:
+        """Getter for the downloader shared by the requests"""
+        return self._downloader
+
+    @property
+    def requests(self) -> typing.List["Request"]:
+        """Getter for the requests attached to the transfer"""
+        return self._requests
+
+    @property
+    def priority(self) -> int:
+        """Getter for the priority class of the transfer"""
+        return self._state["priority"]
+
+    @priority.setter
+    def priority(self, value: int):
+        """Setter for the priority class, that sets the transfer's throttle"""
+        if value != self._state["priority"]:
+            self.debug(f"priority::setter={value}")
+            self._state["priority"] = value
+            self._downloader.throttle = Throttle(background=value != INTERACTIVE)
+
+    @property
+    def started(self) -> bool:
+        """Getter for whether a worker took the transfer"""
+        return self._state["started"]
+
+    @property
+    def done(self) -> bool:
+        """Getter for whether the transfer is finished, successfully or not"""
+        return self._state["done"]
+
+    @property
+    def result(self) -> typing.Any:
+        """Getter for the result of the download, once it is done"""
+        return self._state["result"]
+
+    @property
+    def exception(self) -> Exception | None:
+        """Getter for the error of the download, if it failed"""
+        return self._state["error"]
+
+    def start(self):
+        """
+        Mark the transfer as taken by a worker, with a fresh token, so a
+        downloader cancelled before can run again
+        """
+        self._state["started"] = True
+        self._downloader.token = CancelToken()
+        self._downloader.on_retry = self._on_retry
+
+    def run(self) -> typing.Tuple[typing.Any, Exception | None]:
+        """Run the download and return its result or its error"""
+        try:
+            return self._downloader.download(on_data=self._on_data), None
+        except Exception as exc:  # pylint: disable=broad-exception-caught
+            self.debug(f"run::{self._downloader.url} failed: {exc}")
+            return None, exc
+
+    def finish(self, result: typing.Any, error: Exception | None):
+        """Keep the result or the error of the download"""
+        self._state.update(done=True, result=result, error=error)
+
+    def _callbacks(self, name: str) -> typing.List[typing.Callable]:
+        """Get a callback of each attached request that has one"""
+        with self._cond:
+            callbacks = [getattr(r, name) for r in self._requests]
+        return [callback for callback in callbacks if callback is not None]
+
+    def _on_data(self, data: bytes):
+        """Forward the progress of the download to the attached requests"""
+        for on_data in self._callbacks("listener"):
+            on_data(data)
+
+    def _on_retry(self, *args):
+        """Forward the retries of the download to the attached requests"""
+        for on_retry in self._callbacks("on_retry"):
+            on_retry(*args)
+
+
+class Request(Trigger):
+    """
+    A requester's handle on a download of a :class:`DownloadManager`.
+    It quacks like its downloader (a :class:`ReleaseBundle` or an
+    :class:`AssetDownloader`), so a download screen can use it instead:
+    :meth:`download` attaches to the transfer of the same url in flight,
+    or queues a new one, and waits for it.
+
+    Cancelling it detaches it from the transfer, that is only cancelled
+    when no request is left attached
+    """
+
+    def __init__(
+        self, manager: "DownloadManager", downloader: typing.Any, priority: int
+    ):
+        super().__init__()
+        self._manager = manager
+        self._downloader = downloader
+        self._priority = priority
+        self._token = CancelToken()
+        self._on_retry = None
+        self._listener = None
+        self._transfer = None
+
+    @property
+    def downloader(self) -> typing.Any:
+        """Getter for the downloader used if no transfer of its url is in flight"""
+        self.debug(f"downloader::getter={self._downloader}")
+        return self._downloader
+
+    @property
+    def priority(self) -> int:
+        """Getter for the priority class of the request"""
+        return self._priority
+
+    @property
+    def key(self) -> typing.Tuple[str, str, str]:
+        """
+        Getter for what identifies the transfer: the url, and the kind of
+        downloader and its destination dir, so a :class:`ReleaseBundle` and
+        the zip it bundles don't share a transfer
+        """
+        return (type(self._downloader).__name__, self.url, self.destdir)
+
+    @property
+    def transfer(self) -> Transfer | None:
+        """Getter for the transfer the request is attached to, if any"""
+        return self._transfer
+
+    @property
+    def url(self) -> str:
+        """Getter for the url of the downloader"""
+        return self._downloader.url
+
+    @property
+    def destdir(self) -> str:
+        """Getter for destination dir of the downloader"""
+        return self._downloader.destdir
+
+    @property
+    def downloaded_len(self) -> int:
+        """Getter for the amount of bytes downloaded by the transfer"""
+        return self._current().downloaded_len
+
+    @property
+    def content_len(self) -> int:
+        """Getter for the size of the content of the transfer"""
+        return self._current().content_len
+
+    @property
+    def done(self) -> bool:
+        """Getter for whether the transfer is finished, successfully or not"""
+        return self._transfer is not None and self._transfer.done
+
+    @property
+    def failed(self) -> bool:
+        """Getter for whether the transfer is finished with an error"""
+        return self.done and self._transfer.exception is not None
+
+    @property
+    def token(self) -> CancelToken:
+        """Getter for the :class:`CancelToken` of the request"""
+        return self._token
+
+    @token.setter
+    def token(self, value: CancelToken):
+        """Setter for the :class:`CancelToken` of the request"""
+        self.debug(f"token::setter={value}")
+        self._token = value
+
+    @property
+    def on_retry(self) -> typing.Callable | None:
+        """Getter for the callback called before each retry of the transfer"""
+        return self._on_retry
+
+    @on_retry.setter
+    def on_retry(self, value: typing.Callable | None):
+        """Setter for the callback called before each retry of the transfer"""
+        self._on_retry = value
+
+    @property
+    def listener(self) -> typing.Callable | None:
+        """Getter for the `on_data` callback of a running :meth:`download`"""
+        return self._listener
+
+    def _current(self) -> typing.Any:
+        """Get the downloader of the transfer, or the own one before it"""
+        if self._transfer is not None:
+            return self._transfer.downloader
+        return self._downloader
+
+    def start(self) -> "Request":
+        """Attach to the transfer of the url, without waiting for it"""
+        self._transfer = self._manager.join(self)
+        return self
+
+    def download(self, on_data: typing.Callable) -> typing.Any:
+        """
+        Attach to the transfer of the url, with :attr:`on_data` called on
+        its progress, and return its result once it is finished (the last
+        `on_data` call is made after it is, so a transfer that finished
+        meanwhile is reported too). Raise the error of the transfer if
+        it failed, or :class:`DownloadCancelled` if :attr:`token` is
+        cancelled before it is finished
+        """
+        token = self.token
+        self._listener = on_data
+        self.start()
+        token.on_cancel(self._manager.wake)
+
+        try:
+            transfer = self._manager.wait(self._transfer, token)
+        finally:
+            token.remove(self._manager.wake)
+            self._listener = None
+            self._manager.leave(self)
+
+        if not transfer.done:
+            raise DownloadCancelled(f"Download of {self.url} cancelled")
+
+        if transfer.exception is not None:
+            raise transfer.exception
+
+        on_data(b"")
+        return transfer.result
+
+    def cancel(self):
+        """Detach from the transfer; it is cancelled if no request is left"""
+        self.debug(f"cancel::{self.url}")
+        self.token.cancel()
+        self._manager.leave(self)
+
+
+class DownloadManager(Trigger):
+    """
+    Run the transfers of many :class:`Request` on :attr:`workers` daemon
+    threads, started on first use. Queued transfers are taken by priority
+    class (:data:`INTERACTIVE`, then :data:`PREFETCH`, then :data:`SYNC`),
+    and one worker is kept for interactive ones, so they never wait for
+    prefetches or syncs.
+
+    Requests of a url that is already in flight attach to its transfer
+    (single-flight): a new request of a higher priority class promotes it
+    """
+
+    MAX_WORKERS = 3
+
+    def __init__(self, workers: int = MAX_WORKERS):
+        super().__init__()
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError(f"Invalid workers: {workers}")
+
+        self._workers = workers
+        self._cond = threading.Condition()
+        self._counter = itertools.count()
+        self._queue = []
+        self._transfers = {}
+        self._running = {}
+        self._threads = []
+        self._state = {"background": 0}
+
+    @property
+    def workers(self) -> int:
+        """Getter for the size of the worker pool"""
+        self.debug(f"workers::getter={self._workers}")
+        return self._workers
+
+    @property
+    def transfers(self) -> typing.Dict[typing.Tuple[str, str, str], Transfer]:
+        """Getter for a copy of the transfers in flight, by key"""
+        with self._cond:
+            return dict(self._transfers)
+
+    def request(self, downloader: typing.Any, priority: int = INTERACTIVE) -> Request:
+        """Make a :class:`Request` of :attr:`downloader`, without starting it"""
+        if priority not in PRIORITIES:
+            raise ValueError(f"Invalid priority: {priority}")
+        return Request(manager=self, downloader=downloader, priority=priority)
+
+    def join(self, request: Request) -> Transfer:
+        """
+        Attach :attr:`request` to the transfer of its key in flight, or to
+        a new one, queued, with its downloader. A request still attached
+        (started before) keeps its transfer, even if it is finished
+        """
+        with self._cond:
+            if request.transfer is not None and request in request.transfer.requests:
+                return request.transfer
+
+            transfer = self._transfers.get(request.key)
+            if transfer is None:
+                self.debug(f"join::new={request.url}")
+                transfer = Transfer(
+                    downloader=request.downloader,
+                    priority=request.priority,
+                    cond=self._cond,
+                )
+                self._transfers[request.key] = transfer
+                self._push(transfer)
+
+            if request not in transfer.requests:
+                transfer.requests.append(request)
+
+            if request.priority < transfer.priority:
+                self.debug(f"join::promote={request.url}")
+                transfer.priority = request.priority
+                if not transfer.started:
+                    self._push(transfer)
+
+            self._ensure_workers()
+            return transfer
+
+    def leave(self, request: Request):
+        """
+        Detach :attr:`request` from its transfer. A transfer without requests
+        left is cancelled (finished as such, if it wasnt started), and a new
+        request of its url gets a new one
+        """
+        transfer = request.transfer
+        if transfer is None:
+            return
+
+        with self._cond:
+            if request in transfer.requests:
+                transfer.requests.remove(request)
+
+            if transfer.done:
+                return
+
+            if transfer.requests:
+                transfer.priority = min(r.priority for r in transfer.requests)
+                return
+
+            if self._transfers.get(request.key) is transfer:
+                del self._transfers[request.key]
+
+            if not transfer.started:
+                self.debug(f"leave::abandon={request.url}")
+                error = DownloadCancelled(f"Download of {request.url} cancelled")
+                transfer.finish(result=None, error=error)
+                self._cond.notify_all()
+                return
+
+        self.debug(f"leave::cancel={request.url}")
+        transfer.downloader.cancel()
+
+    def wait(self, transfer: Transfer, token: CancelToken) -> Transfer:
+        """Wait until :attr:`transfer` is finished or :attr:`token` is cancelled"""
+        with self._cond:
+            self._cond.wait_for(lambda: transfer.done or token.cancelled)
+        return transfer
+
+    def wake(self):
+        """Wake up the waiting requests, so they check their tokens"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def _push(self, transfer: Transfer):
+        """Queue :attr:`transfer` with its current priority"""
+        heapq.heappush(self._queue, (transfer.priority, next(self._counter), transfer))
+        self._cond.notify_all()
+
+    def _ensure_workers(self):
+        """Start the worker threads, if they aren't yet"""
+        while len(self._threads) < self._workers:
+            thread = threading.Thread(
+                target=self._work,
+                name=f"download-manager-{len(self._threads)}",
+                daemon=True,
+            )
+            self._threads.append(thread)
+            thread.start()
+
+    def _next(self) -> Transfer | None:
+        """
+        Take the first queued transfer whose downloader isnt still running
+        a previous one, unless it isnt interactive and every worker but
+        one is busy with transfers that arent either
+        """
+        self._queue = [
+            entry for entry in self._queue if not (entry[2].started or entry[2].done)
+        ]
+        heapq.heapify(self._queue)
+
+        for entry in sorted(self._queue):
+            transfer = entry[2]
+            if id(transfer.downloader) in self._running:
+                continue
+
+            if transfer.priority != INTERACTIVE:
+                if self._state["background"] >= max(1, self._workers - 1):
+                    return None
+
+            self._queue.remove(entry)
+            heapq.heapify(self._queue)
+            self._running[id(transfer.downloader)] = transfer
+            transfer.start()
+            return transfer
+
+        return None
+
+    def _work(self):
+        """Run the queued transfers, forever"""
+        while True:
+            with self._cond:
+                transfer = self._cond.wait_for(self._next)
+                background = transfer.priority != INTERACTIVE
+                self._state["background"] += background
+
+            result, error = transfer.run()
+
+            # so no request attach to it once it is done
+            with self._cond:
+                self._state["background"] -= background
+                del self._running[id(transfer.downloader)]
+                transfer.finish(result=result, error=error)
+                for key, value in list(self._transfers.items()):
+                    if value is transfer:
+                        del self._transfers[key]
+                self._cond.notify_all()
+
+
+def get_manager() -> DownloadManager:
+    """Get the shared download manager, created on first use"""
+    with _LOCK:
+        if _STATE["manager"] is None:
+            _STATE["manager"] = DownloadManager()
+        return _STATE["manager"]
+
+
+def set_manager(manager: DownloadManager | None):
+    """Replace the shared download manager. Use `None` to get a new one"""
+    with _LOCK:
+        _STATE["manager"] = manager
@@ -0,0 +1,231 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+partial_zip_downloader.py
+"""
+import os
+import json
+import typing
+import zipfile
+import tempfile
+from ..trigger import Trigger
+from ..verifyer.sig_verifyer import SigVerifyer
+from .cancel_token import CancelToken
+from .rate_limiter import Throttle
+from .remote_zip import RemoteZip
+from .zip_downloader import ZipDownloader
+from .pem_downloader import PemDownloader
+
+
+class PartialZipDownloader(Trigger):
+    """
+    Download only the members of a release zip needed to flash a device
+    (its `kboot.kfpkg`, `firmware.bin` and `firmware.bin.sig`) with a
+    :class:`RemoteZip`, instead of the whole multi-device archive.
+
+    Since the signature of the whole zip can't be checked, `firmware.bin`
+    is checked against its own signature and selfcustody's certificate,
+    and `kboot.kfpkg` must carry the same `firmware.bin`. Members that
+    fail the checks are deleted.
+
+    The other members of `kboot.kfpkg` (bootloaders and config) aren't
+    covered by any signature, so the package is repacked with only the
+    signed firmware, at :attr:`FIRMWARE_ADDRESS`: the device keeps its
+    installed bootloader
+    """
+
+    MEMBERS = ("kboot.kfpkg", "firmware.bin", "firmware.bin.sig")
+
+    FIRMWARE_ADDRESS = 0x80000
+
+    def __init__(self, version: str, device: str, destdir: str = tempfile.gettempdir()):
+        super().__init__()
+        self._version = version
+        self._device = device
+        self._pem = PemDownloader(destdir=destdir)
+        self._remote = RemoteZip(url=ZipDownloader(version=version).url)
+        self._downloaded_len = 0
+        self._content_len = 0
+
+        # so a single cancel stops both of them
+        self.token = CancelToken()
+
+    @property
+    def url(self) -> str:
+        """Getter for the url of the release zip"""
+        return self._remote.url
+
+    @property
+    def destdir(self) -> str:
+        """Getter for destination dir where the members will be extracted"""
+        return self._pem.destdir
+
+    @property
+    def members(self) -> typing.List[str]:
+        """Getter for the names of the needed members on the zip"""
+        prefix = f"krux-{self._version}/maixpy_{self._device}"
+        return [f"{prefix}/{name}" for name in PartialZipDownloader.MEMBERS]
+
+    @property
+    def token(self) -> CancelToken:
+        """Getter for the :class:`CancelToken` shared by all requests"""
+        return self._remote.token
+
+    @token.setter
+    def token(self, value: CancelToken):
+        """Setter for the :class:`CancelToken` shared by all requests"""
+        self.debug(f"token::setter={value}")
+        self._pem.token = value
+        self._remote.token = value
+
+    @property
+    def on_retry(self) -> typing.Callable | None:
+        """Getter for the callback called before each retry of any request"""
+        return self._remote.on_retry
+
+    @on_retry.setter
+    def on_retry(self, value: typing.Callable | None):
+        """Setter for the callback called before each retry of any request"""
+        self.debug(f"on_retry::setter={value}")
+        self._pem.on_retry = value
+        self._remote.on_retry = value
+
+    @property
+    def throttle(self) -> Throttle:
+        """Getter for the :class:`Throttle` of the zip requests"""
+        return self._remote.throttle
+
+    @throttle.setter
+    def throttle(self, value: Throttle):
+        """Setter for the :class:`Throttle` of all requests"""
+        self.debug(f"throttle::setter={value}")
+        self._pem.throttle = value
+        self._remote.throttle = value
+
+    @property
+    def downloaded_len(self) -> int:
+        """Getter for the amount of bytes of the members downloaded"""
+        self.debug(f"downloaded_len::getter={self._downloaded_len}")
+        return self._downloaded_len
+
+    @property
+    def content_len(self) -> int:
+        """Getter for the compressed size of the members, once known"""
+        self.debug(f"content_len::getter={self._content_len}")
+        return self._content_len
+
+    def download(self, on_data: typing.Callable) -> typing.List[str]:
+        """
+        Download the certificate and the members, check them and return
+        the paths of the members. :attr:`on_data` is called with each
+        received chunk of the members, but :attr:`downloaded_len` only
+        reaches :attr:`content_len` on its last call, once checked
+        """
+        self._downloaded_len = 0
+        self._content_len = 0
+
+        pem = self._pem.download(on_data=lambda data: None)
+        entries = self._remote.open()
+        missing = [name for name in self.members if name not in entries]
+        if missing:
+            raise RuntimeError(f"Members not found in {self.url}: {missing}")
+
+        self._content_len = sum(entries[name].compressed_size for name in self.members)
+
+        def local_on_data(data: bytes):
+            received = self._downloaded_len + len(data)
+            self._downloaded_len = min(received, self._content_len - 1)
+            on_data(data)
+
+        paths = []
+        try:
+            for name in self.members:
+                paths.append(
+                    self._remote.extract(
+                        name=name, output=self.destdir, on_data=local_on_data
+                    )
+                )
+            PartialZipDownloader.check(kboot=paths[0], firmware=paths[1], pem=pem)
+            PartialZipDownloader.repack(kboot=paths[0], firmware=paths[1])
+
+        except (RuntimeError, ValueError):
+            for path in paths:
+                os.remove(path)
+            raise
+
+        self._downloaded_len = self._content_len
+        on_data(b"")
+        return paths
+
+    @staticmethod
+    def check(kboot: str, firmware: str, pem: str):
+        """
+        Check :attr:`firmware` against its signature (on the same directory)
+        and the certificate at :attr:`pem`, and that :attr:`kboot` carries it
+        """
+        # pylint: disable=unspecified-encoding
+        with open(f"{firmware}.sig", "rb") as sig_file, open(pem, "rb") as pem_file:
+            sig_verifyer = SigVerifyer(
+                filename=firmware,
+                regexp=r"^.*firmware\.bin$",
+                signature=sig_file.read(),
+                pubkey=pem_file.read(),
+            )
+
+        sig_verifyer.load()
+        if not sig_verifyer.verify():
+            raise RuntimeError(f"Invalid signature of {firmware}")
+
+        try:
+            with zipfile.ZipFile(kboot) as kfpkg:
+                packed = kfpkg.read("firmware.bin")
+        except (zipfile.BadZipFile, KeyError) as exc:
+            raise RuntimeError(f"Invalid kboot package {kboot}: {exc}") from exc
+
+        if packed != sig_verifyer.data:
+            raise RuntimeError(f"{kboot} does not carry the signed firmware")
+
+    @staticmethod
+    def repack(kboot: str, firmware: str):
+        """
+        Atomically replace :attr:`kboot` with a package that only flashes
+        the (checked) :attr:`firmware`, at :attr:`FIRMWARE_ADDRESS`
+        """
+        flash_list = {
+            "version": "0.1.1",
+            "files": [
+                {
+                    "address": PartialZipDownloader.FIRMWARE_ADDRESS,
+                    "bin": "firmware.bin",
+                    "sha256Prefix": True,
+                }
+            ],
+        }
+        tmpfile = f"{kboot}.tmp"
+        with zipfile.ZipFile(tmpfile, "w", zipfile.ZIP_DEFLATED) as kfpkg:
+            kfpkg.writestr("flash-list.json", json.dumps(flash_list))
+            kfpkg.write(firmware, arcname="firmware.bin")
+        os.replace(tmpfile, kboot)
+
+    def cancel(self):
+        """Cancel the requests; extracted members are kept only once checked"""
+        self.token.cancel()
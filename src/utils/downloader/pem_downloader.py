@@ -29,6 +29,8 @@ from .asset_downloader import AssetDownloader
 class PemDownloader(AssetDownloader):
     """Download .pem public certificate file"""
 
+    CONDITIONAL = True
+
     def __init__(self, destdir: str = tempfile.gettempdir()):
         base_url = "https://raw.githubusercontent.com/selfcustody/krux/main"
         url = f"{base_url}/selfcustody.pem"
@@ -0,0 +1,85 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+prefetcher.py
+
+Speculative downloads of the selected release. This module only decides
+what is prefetched (if enabled, the last selection); the transfers are made
+by the shared :class:`DownloadManager` with the :data:`PREFETCH` priority,
+so they only use the bandwidth left by interactive transfers and the
+download screens attach to them instead of starting over
+"""
+import typing
+import threading
+from .download_manager import PREFETCH, Request, get_manager
+
+_LOCK = threading.Lock()
+
+_STATE = {"enabled": False, "prefetch": None}
+
+
+def get_enabled() -> bool:
+    """Get whether selected releases are prefetched"""
+    with _LOCK:
+        return _STATE["enabled"]
+
+
+def set_enabled(value: bool):
+    """
+    Set whether selected releases are prefetched. Disabling it stops
+    a prefetch in flight, unless a screen is attached to it
+    """
+    with _LOCK:
+        _STATE["enabled"] = bool(value)
+        if value:
+            return
+        current, _STATE["prefetch"] = _STATE["prefetch"], None
+
+    if current is not None:
+        current.cancel()
+
+
+def prefetch(downloader: typing.Any) -> Request | None:
+    """
+    Start prefetching with :attr:`downloader`, unless prefetching is
+    disabled. Only the last selection is prefetched: one of another url
+    is stopped (unless a screen is attached to it), and one of the same
+    url goes on (unless it failed)
+    """
+    with _LOCK:
+        if not _STATE["enabled"]:
+            return None
+
+        previous = _STATE["prefetch"]
+        if previous is not None and previous.url == downloader.url:
+            if not previous.failed:
+                return previous
+
+        _STATE["prefetch"] = get_manager().request(
+            downloader=downloader, priority=PREFETCH
+        )
+        current = _STATE["prefetch"].start()
+
+    if previous is not None and previous.url != current.url and not previous.done:
+        previous.cancel()
+
+    return current
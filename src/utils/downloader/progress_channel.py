@@ -0,0 +1,199 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+progress_channel.py
+"""
+import time
+import typing
+import threading
+from ..trigger import Trigger
+
+
+class ProgressChannel(Trigger):
+    """
+    Coalesce the per-chunk `on_data` calls of a downloader into, at most,
+    :attr:`rate` progress events per second. When :attr:`step` is given, an
+    event is also emitted every time the download advances this fraction
+    of the content, regardless the rate.
+
+    Each event is a dict with `downloaded_len`, `content_len`, `elapsed`
+    (seconds since the channel was created), `rate` (a smoothed throughput
+    in bytes per second) and `eta` (seconds to finish, or None while the
+    throughput is unknown). The final event, where `downloaded_len` equals
+    `content_len`, is always delivered, and only once.
+
+    A zero `content_len` means the size isnt known yet (see
+    :meth:`StreamDownloader.download_file_stream`): events only report the
+    received bytes and the throughput, with no `eta`, until the downloader
+    set it on the end of stream.
+
+    Retries of a failed transfer (see :meth:`on_retry`) are events too,
+    never coalesced, with the `retry` number and the total of `attempts`.
+    """
+
+    SMOOTHING = 0.3
+
+    def __init__(
+        self,
+        downloader: typing.Any,
+        on_event: typing.Callable,
+        rate: float = 10.0,
+        step: float | None = None,
+    ):
+        super().__init__()
+        if rate <= 0:
+            raise ValueError(f"Invalid rate: {rate}")
+
+        if step is not None and not 0 < step <= 1:
+            raise ValueError(f"Invalid step: {step}")
+
+        self._downloader = downloader
+        self._on_event = on_event
+        self._interval = 1.0 / rate
+        self._step = step
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self._state = {
+            "time": None,
+            "downloaded_len": 0,
+            "fraction": 0.0,
+            "rate": 0.0,
+            "done": False,
+        }
+
+    @property
+    def interval(self) -> float:
+        """Getter for the minimum amount of seconds between two events"""
+        self.debug(f"interval::getter={self._interval}")
+        return self._interval
+
+    @property
+    def step(self) -> float | None:
+        """Getter for the fraction of content that always emits an event"""
+        self.debug(f"step::getter={self._step}")
+        return self._step
+
+    @property
+    def done(self) -> bool:
+        """Getter for the state of the final event"""
+        self.debug(f"done::getter={self._state['done']}")
+        return self._state["done"]
+
+    def on_data(self, data: bytes):
+        """Callback to be given as `on_data` to the downloader"""
+        # pylint: disable=unused-argument
+        self.publish(
+            downloaded_len=self._downloader.downloaded_len,
+            content_len=self._downloader.content_len,
+        )
+
+    def on_retry(
+        self, attempt: int, attempts: int, delay: float, exc: Exception
+    ) -> dict | None:
+        """
+        Callback to be given as `on_retry` to the downloader: emit, right
+        away, an event of the current progress with the number of the
+        next `retry`, the total of `attempts` and its `delay`
+        """
+        self.debug(f"on_retry::{attempt}/{attempts}::{exc}")
+        with self._lock:
+            if self._state["done"]:
+                return None
+
+            event = self._make_event(
+                time.monotonic(),
+                self._downloader.downloaded_len,
+                self._downloader.content_len,
+            )
+            event.update({"retry": attempt, "attempts": attempts, "delay": delay})
+            self._on_event(event)
+            return event
+
+    def publish(self, downloaded_len: int, content_len: int) -> dict | None:
+        """
+        Emit an event for the given progress if it is due and return it;
+        return None if it was coalesced. Events are delivered under a lock,
+        so they are never out of order between download threads
+        """
+        now = time.monotonic()
+        with self._lock:
+            if self._state["done"]:
+                return None
+
+            if content_len > 0:
+                done = downloaded_len >= content_len
+                fraction = downloaded_len / content_len
+            else:
+                done = False
+                fraction = self._state["fraction"]
+
+            if not done and self._state["time"] is not None:
+                due = now - self._state["time"] >= self._interval
+                stepped = (
+                    self._step is not None
+                    and fraction - self._state["fraction"] >= self._step
+                )
+                if not (due or stepped):
+                    return None
+
+            event = self._make_event(now, downloaded_len, content_len)
+            self._state.update(
+                {
+                    "time": now,
+                    "downloaded_len": downloaded_len,
+                    "fraction": fraction,
+                    "rate": event["rate"],
+                    "done": done,
+                }
+            )
+            self._on_event(event)
+            return event
+
+    def _make_event(self, now: float, downloaded_len: int, content_len: int) -> dict:
+        """Build an event with an exponential moving average of throughput"""
+        rate = self._state["rate"]
+        if self._state["time"] is not None and now > self._state["time"]:
+            sample = max(downloaded_len - self._state["downloaded_len"], 0) / (
+                now - self._state["time"]
+            )
+            if rate > 0:
+                rate = self.SMOOTHING * sample + (1 - self.SMOOTHING) * rate
+            else:
+                rate = sample
+
+        remaining = content_len - downloaded_len
+        if content_len <= 0:
+            eta = None
+        elif remaining <= 0:
+            eta = 0.0
+        elif rate > 0:
+            eta = remaining / rate
+        else:
+            eta = None
+
+        return {
+            "downloaded_len": downloaded_len,
+            "content_len": content_len,
+            "elapsed": now - self._started,
+            "rate": rate,
+            "eta": eta,
+        }
@@ -0,0 +1,201 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+rate_limiter.py
+
+Token buckets that limit the bandwidth of downloads: one for each
+transfer that should be limited on its own and one shared by the whole
+process, where foreground transfers (the screen the user is watching)
+take priority over background ones (like prefetches and warmups)
+"""
+import time
+import threading
+from ..trigger import Trigger
+
+# Seconds that a foreground transfer is considered active
+# after it last took tokens from a shared bucket
+FOREGROUND_GRACE = 1.0
+
+
+class RateLimiter(Trigger):
+    """
+    Token bucket of :attr:`rate` bytes per second (zero is unlimited)
+    holding up to :attr:`burst` bytes. :meth:`consume` blocks until the
+    bucket has the tokens of a chunk; a chunk larger than the bucket
+    is let through once it is full, leaving a debt.
+
+    Background consumers only take what foreground consumers leave:
+    while a foreground transfer is active they keep half of the bucket
+    for it, so they are starved when it uses the whole rate and use
+    whatever it doesnt
+    """
+
+    def __init__(self, rate: int = 0, burst: int | None = None):
+        super().__init__()
+        self._cond = threading.Condition()
+        self._state = {
+            "tokens": 0.0,
+            "time": time.monotonic(),
+            "foreground": float("-inf"),
+        }
+        self.rate = rate
+        self.burst = burst
+        self._state["tokens"] = float(self.burst)
+
+    @property
+    def rate(self) -> int:
+        """Getter for the bytes per second, zero when unlimited"""
+        return self._rate
+
+    @rate.setter
+    def rate(self, value: int):
+        """Setter for the bytes per second, zero when unlimited"""
+        if not isinstance(value, int) or value < 0:
+            raise ValueError(f"Invalid rate: {value}")
+
+        self.debug(f"rate::setter={value}")
+        with self._cond:
+            self._rate = value
+            self._cond.notify_all()
+
+    @property
+    def burst(self) -> int:
+        """Getter for the bytes that the bucket holds (one second of rate by default)"""
+        return self._burst if self._burst is not None else self.rate
+
+    @burst.setter
+    def burst(self, value: int | None):
+        """Setter for the bytes that the bucket holds"""
+        if value is not None and (not isinstance(value, int) or value < 1):
+            raise ValueError(f"Invalid burst: {value}")
+
+        self.debug(f"burst::setter={value}")
+        self._burst = value
+
+    def consume(self, size: int, background: bool = False) -> float:
+        """
+        Take the tokens of :attr:`size` bytes, waiting for them
+        when needed, and return how many seconds were waited
+        """
+        if self.rate == 0 or size <= 0:
+            return 0.0
+
+        started = time.monotonic()
+        with self._cond:
+            if not background:
+                self._state["foreground"] = started
+
+            while self.rate > 0:
+                now = time.monotonic()
+                self._refill(now=now)
+                reserve = 0.0
+                if background and now - self._state["foreground"] < FOREGROUND_GRACE:
+                    reserve = self.burst / 2
+
+                need = min(size + reserve, self.burst)
+                if self._state["tokens"] >= need:
+                    self._state["tokens"] -= size
+                    break
+
+                self._cond.wait((need - self._state["tokens"]) / self.rate)
+
+        waited = time.monotonic() - started
+        if waited > 0.001:
+            self.debug(f"consume::{size}::waited={waited:.3f}")
+        return waited
+
+    def _refill(self, now: float):
+        # Add the tokens of the elapsed time, up to the bucket size
+        elapsed = now - self._state["time"]
+        self._state["time"] = now
+        self._state["tokens"] = min(
+            float(self.burst), self._state["tokens"] + elapsed * self.rate
+        )
+
+
+_LOCK = threading.Lock()
+
+_STATE = {"limiter": RateLimiter(), "background_rate": 0}
+
+
+def get_limiter() -> RateLimiter:
+    """Get the bucket shared by all downloads of the process"""
+    with _LOCK:
+        return _STATE["limiter"]
+
+
+def set_limiter(limiter: RateLimiter):
+    """Set the bucket shared by all downloads of the process"""
+    with _LOCK:
+        _STATE["limiter"] = limiter
+
+
+def get_background_rate() -> int:
+    """Get the bytes per second of each background transfer, zero when unlimited"""
+    with _LOCK:
+        return _STATE["background_rate"]
+
+
+def set_background_rate(value: int):
+    """Set the bytes per second of each background transfer, zero when unlimited"""
+    if not isinstance(value, int) or value < 0:
+        raise ValueError(f"Invalid rate: {value}")
+
+    with _LOCK:
+        _STATE["background_rate"] = value
+
+
+class Throttle(Trigger):
+    """
+    Bandwidth limits of one transfer: its own bucket, of :attr:`rate`
+    bytes per second (by default, the configured background rate for
+    background transfers and unlimited for foreground ones), and then
+    the bucket shared by the process, with the transfer's priority
+    """
+
+    def __init__(self, rate: int | None = None, background: bool = False):
+        super().__init__()
+        if rate is None:
+            rate = get_background_rate() if background else 0
+
+        self._limiter = RateLimiter(rate=rate)
+        self._background = background
+
+    @property
+    def limiter(self) -> RateLimiter:
+        """Getter for the bucket of this transfer only"""
+        return self._limiter
+
+    @property
+    def background(self) -> bool:
+        """Getter for the priority of the transfer on the shared bucket"""
+        return self._background
+
+    @property
+    def limited(self) -> bool:
+        """Getter for whether any of the buckets can make the transfer wait"""
+        return self.limiter.rate > 0 or get_limiter().rate > 0
+
+    def consume(self, size: int) -> float:
+        """Take the tokens of :attr:`size` bytes from both buckets"""
+        waited = self.limiter.consume(size)
+        return waited + get_limiter().consume(size, background=self.background)
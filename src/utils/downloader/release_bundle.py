@@ -0,0 +1,197 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+release_bundle.py
+"""
+import typing
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ..trigger import Trigger
+from ..cache import AssetCache
+from .asset_downloader import AssetDownloader
+from .cancel_token import CancelToken
+from .rate_limiter import Throttle
+from .zip_downloader import ZipDownloader
+from .sha256_downloader import Sha256Downloader
+from .sig_downloader import SigDownloader
+from .pem_downloader import PemDownloader
+
+
+class ReleaseBundle(Trigger):
+    """
+    Download a release zip together with its sha256 sum, its signature and
+    the selfcustody's certificate. The four assets are fetched in parallel,
+    so the small ones are done while the zip is transferred, and progress
+    is reported as the sum of all of them.
+
+    When an :class:`AssetCache` is given, the downloaded assets are stored
+    on it; the certificate is shared by all versions.
+    """
+
+    def __init__(
+        self,
+        version: str,
+        destdir: str = tempfile.gettempdir(),
+        connections: int = 1,
+        cache: AssetCache | None = None,
+    ):
+        super().__init__()
+        self._version = version
+        self._cache = cache
+        self._lock = threading.Lock()
+        self._downloaded_len = 0
+        self._content_len = 0
+        self._downloaders = [
+            ZipDownloader(version=version, destdir=destdir, connections=connections),
+            Sha256Downloader(version=version, destdir=destdir),
+            SigDownloader(version=version, destdir=destdir),
+            PemDownloader(destdir=destdir),
+        ]
+
+        # so a single cancel stops all of them
+        self.token = CancelToken()
+
+    @property
+    def downloaders(self) -> typing.List[AssetDownloader]:
+        """Getter for the bundled downloaders (zip, sha256, sig and pem)"""
+        self.debug(f"downloaders::getter={self._downloaders}")
+        return self._downloaders
+
+    @property
+    def cache(self) -> AssetCache | None:
+        """Getter for the cache where downloaded assets are stored"""
+        self.debug(f"cache::getter={self._cache}")
+        return self._cache
+
+    @property
+    def token(self) -> CancelToken:
+        """Getter for the :class:`CancelToken` shared by all assets"""
+        return self._downloaders[0].token
+
+    @token.setter
+    def token(self, value: CancelToken):
+        """Setter for the :class:`CancelToken` shared by all assets"""
+        self.debug(f"token::setter={value}")
+        for downloader in self._downloaders:
+            downloader.token = value
+
+    @property
+    def on_retry(self) -> typing.Callable | None:
+        """Getter for the callback called before each retry of any asset"""
+        return self._downloaders[0].on_retry
+
+    @on_retry.setter
+    def on_retry(self, value: typing.Callable | None):
+        """Setter for the callback called before each retry of any asset"""
+        self.debug(f"on_retry::setter={value}")
+        for downloader in self._downloaders:
+            downloader.on_retry = value
+
+    @property
+    def throttle(self) -> Throttle:
+        """Getter for the :class:`Throttle` of the release zip"""
+        return self._downloaders[0].throttle
+
+    @throttle.setter
+    def throttle(self, value: Throttle):
+        """Setter for the :class:`Throttle` of all assets"""
+        self.debug(f"throttle::setter={value}")
+        for downloader in self._downloaders:
+            downloader.throttle = value
+
+    @property
+    def url(self) -> str:
+        """Getter for the url of the release zip"""
+        return self._downloaders[0].url
+
+    @property
+    def destdir(self) -> str:
+        """Getter for destination dir where the downloaded files will be placed"""
+        return self._downloaders[0].destdir
+
+    @property
+    def downloaded_len(self) -> int:
+        """Getter for the amount of bytes downloaded by all assets"""
+        self.debug(f"downloaded_len::getter={self._downloaded_len}")
+        return self._downloaded_len
+
+    @property
+    def content_len(self) -> int:
+        """
+        Getter for the size of all assets. It is zero until every asset
+        know its own size, so the combined progress never reach 100%
+        before the slowest response arrives
+        """
+        self.debug(f"content_len::getter={self._content_len}")
+        return self._content_len
+
+    def download(self, on_data: typing.Callable) -> typing.List[str]:
+        """
+        Download all assets in parallel and return their paths once the
+        slowest one is finished. :attr:`on_data` is called from the download
+        threads only when the combined progress changes, so the last call
+        is the only one where :attr:`downloaded_len` equals
+        :attr:`content_len`. If any asset fails, the first error is raised
+        after the others are finished.
+        """
+        self._downloaded_len = 0
+        self._content_len = 0
+
+        def local_on_data(data: bytes):
+            with self._lock:
+                lens = [(d.downloaded_len, d.content_len) for d in self.downloaders]
+                if any(content_len == 0 for _, content_len in lens):
+                    return
+
+                downloaded_len = sum(downloaded_len for downloaded_len, _ in lens)
+                if downloaded_len == self._downloaded_len:
+                    return
+
+                self._downloaded_len = downloaded_len
+                self._content_len = sum(content_len for _, content_len in lens)
+                on_data(data)
+
+        with ThreadPoolExecutor(
+            max_workers=len(self.downloaders), thread_name_prefix="bundle"
+        ) as executor:
+            futures = [
+                executor.submit(d.download, on_data=local_on_data)
+                for d in self.downloaders
+            ]
+
+        errors = [f.exception() for f in futures if f.exception() is not None]
+        if errors:
+            raise errors[0]
+
+        paths = [f.result() for f in futures]
+        if self._cache is not None:
+            versions = [self._version] * (len(paths) - 1) + [None]
+            for downloader, path, version in zip(self.downloaders, paths, versions):
+                self._cache.store(url=downloader.url, path=path, version=version)
+
+        return paths
+
+    def cancel(self):
+        """Cancel all assets; their partial files are deleted"""
+        for downloader in self.downloaders:
+            downloader.cancel()
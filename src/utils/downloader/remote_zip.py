@@ -0,0 +1,350 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+remote_zip.py
+"""
+import os
+import zlib
+import zipfile
+import struct
+import typing
+import requests
+import urllib3
+from ..trigger import Trigger
+from ..session import get_session
+from ..mirror import sources
+from ..retry import get_policy
+from .cancel_token import CancelToken
+from .rate_limiter import Throttle
+
+# End of central directory record, without its comment
+EOCD = struct.Struct("<4s4H2LH")
+
+# Central directory file header, without its name, extra field and comment
+CENTRAL_HEADER = struct.Struct("<4s6H3L5H2L")
+
+# Local file header, without its name and extra field
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+
+
+class ZipEntry(typing.NamedTuple):
+    """A member listed on the central directory of a zip"""
+
+    name: str
+    method: int
+    flags: int
+    crc: int
+    compressed_size: int
+    size: int
+    offset: int
+
+
+# pylint: disable=too-many-instance-attributes
+class RemoteZip(Trigger):
+    """
+    Read the members of a zip served over HTTP (or by a mirror) with `Range`
+    requests, without downloading the whole archive: :meth:`open` fetches
+    its tail, with the End of Central Directory record and usually the
+    central directory itself, and :meth:`read` fetches the local header
+    and the data of a single member, checked by its CRC-32.
+
+    Only stored and deflated members of non ZIP64 archives are supported,
+    which is what the release zips are made of.
+    """
+
+    # EOCD record and the largest comment it can have
+    TAIL_SIZE = EOCD.size + 0xFFFF
+
+    # Local extra fields are rarely larger than the central ones,
+    # so a member is usually fetched on a single request
+    HEADER_SLACK = 1 << 10
+
+    def __init__(self, url: str, chunk_size: int = 64 << 10):
+        super().__init__()
+        self._url = url
+        self._chunk_size = chunk_size
+        self._source = None
+        self._entries = {}
+        self.token = CancelToken()
+        self.throttle = Throttle()
+        self.on_retry = None
+
+    @property
+    def url(self) -> str:
+        """Getter for the canonical url of the zip"""
+        self.debug(f"url::getter={self._url}")
+        return self._url
+
+    @property
+    def source(self) -> str | None:
+        """Getter for the url where the zip is read from, once opened"""
+        self.debug(f"source::getter={self._source}")
+        return self._source
+
+    @property
+    def entries(self) -> typing.Dict[str, ZipEntry]:
+        """Getter for the members of the zip by name, once opened"""
+        return self._entries
+
+    @property
+    def token(self) -> CancelToken:
+        """Getter for the :class:`CancelToken` checked between chunks"""
+        return self._token
+
+    @token.setter
+    def token(self, value: CancelToken):
+        """Setter for the :class:`CancelToken` checked between chunks"""
+        self.debug(f"token::setter={value}")
+        self._token = value
+
+    @property
+    def throttle(self) -> Throttle:
+        """Getter for the bandwidth limits of the requests"""
+        return self._throttle
+
+    @throttle.setter
+    def throttle(self, value: Throttle):
+        """Setter for the bandwidth limits of the requests"""
+        self.debug(f"throttle::setter={value}")
+        self._throttle = value
+
+    @property
+    def on_retry(self) -> typing.Callable | None:
+        """Getter for the callback called before each retry of a request"""
+        return self._on_retry
+
+    @on_retry.setter
+    def on_retry(self, value: typing.Callable | None):
+        """Setter for the callback called before each retry of a request"""
+        self.debug(f"on_retry::setter={value}")
+        self._on_retry = value
+
+    def namelist(self) -> typing.List[str]:
+        """Get the names of the members, in the order of the central directory"""
+        return list(self.entries)
+
+    def open(self) -> typing.Dict[str, ZipEntry]:
+        """
+        Find a source that answers ranges of the zip (the fastest mirror,
+        if any, or the url where github redirects to) and read its
+        central directory
+        """
+        self._source, size = self._locate()
+        start = max(0, size - RemoteZip.TAIL_SIZE)
+        tail = self.fetch(start=start, end=size - 1)
+
+        index = tail.rfind(b"PK\x05\x06")
+        if index < 0 or len(tail) - index < EOCD.size:
+            raise RuntimeError(f"End of central directory not found in {self.url}")
+
+        (_, _, _, _, count, cd_size, cd_offset, _) = EOCD.unpack_from(tail, index)
+        if count == 0xFFFF or 0xFFFFFFFF in (cd_size, cd_offset):
+            raise RuntimeError(f"ZIP64 archives are not supported: {self.url}")
+
+        if cd_offset + cd_size > start + index:
+            raise RuntimeError(f"Invalid central directory in {self.url}")
+
+        if cd_offset >= start:
+            directory = tail[cd_offset - start : cd_offset - start + cd_size]
+        else:
+            directory = self.fetch(start=cd_offset, end=cd_offset + cd_size - 1)
+
+        self._entries = RemoteZip.parse_directory(directory=directory, count=count)
+        self.debug(f"open::{self._source}={len(self._entries)} entries")
+        return self._entries
+
+    @staticmethod
+    def parse_directory(directory: bytes, count: int) -> typing.Dict[str, ZipEntry]:
+        """Parse :attr:`count` central directory headers"""
+        entries = {}
+        position = 0
+        for _ in range(count):
+            if directory[position : position + 4] != b"PK\x01\x02":
+                raise RuntimeError(f"Invalid central directory header at {position}")
+
+            fields = CENTRAL_HEADER.unpack_from(directory, position)
+            (_, _, _, flags, method, _, _, crc, csize, size) = fields[:10]
+            name_len, extra_len, comment_len = fields[10:13]
+            start = position + CENTRAL_HEADER.size
+            raw_name = directory[start : start + name_len]
+            name = raw_name.decode("utf8" if flags & 0x800 else "cp437")
+            entries[name] = ZipEntry(
+                name=name,
+                method=method,
+                flags=flags,
+                crc=crc,
+                compressed_size=csize,
+                size=size,
+                offset=fields[-1],
+            )
+            position = start + name_len + extra_len + comment_len
+
+        return entries
+
+    def read(self, name: str, on_data: typing.Callable | None = None) -> bytes:
+        """
+        Fetch and decompress the member :attr:`name`, giving each received
+        chunk (of compressed data) to :attr:`on_data`
+        """
+        entry = self.entries.get(name)
+        if entry is None:
+            raise RuntimeError(f"Member not found in {self.url}: {name}")
+
+        if entry.flags & 0x1:
+            raise RuntimeError(f"Encrypted member not supported: {name}")
+
+        if entry.method not in (zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            raise RuntimeError(f"Compression {entry.method} not supported: {name}")
+
+        end = (
+            entry.offset
+            + LOCAL_HEADER.size
+            + len(name.encode("utf8"))
+            + RemoteZip.HEADER_SLACK
+            + entry.compressed_size
+        )
+        data = self.fetch(start=entry.offset, end=end - 1, on_data=on_data)
+        if data[:4] != b"PK\x03\x04":
+            raise RuntimeError(f"Invalid local header of {name}")
+
+        name_len, extra_len = LOCAL_HEADER.unpack_from(data)[-2:]
+        start = entry.offset + LOCAL_HEADER.size + name_len + extra_len
+        if start - entry.offset + entry.compressed_size > len(data):
+            data += self.fetch(
+                start=entry.offset + len(data),
+                end=start + entry.compressed_size - 1,
+                on_data=on_data,
+            )
+
+        compressed = data[
+            start - entry.offset : start - entry.offset + entry.compressed_size
+        ]
+        if entry.method == zipfile.ZIP_DEFLATED:
+            content = zlib.decompress(compressed, -zlib.MAX_WBITS)
+        else:
+            content = bytes(compressed)
+
+        if len(content) != entry.size or zlib.crc32(content) != entry.crc:
+            raise RuntimeError(f"Bad CRC-32 of {name}")
+
+        return content
+
+    def extract(
+        self, name: str, output: str, on_data: typing.Callable | None = None
+    ) -> str:
+        """
+        Read the member :attr:`name` and write it under the :attr:`output`
+        directory, on the same path that :class:`zipfile.ZipFile` would
+        """
+        parts = name.split("/")
+        if name.startswith("/") or ".." in parts or "\\" in name:
+            raise RuntimeError(f"Unsafe member name: {name}")
+
+        path = os.path.join(output, *parts)
+        content = self.read(name=name, on_data=on_data)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(f"{path}.part", "wb") as file:
+            file.write(content)
+        os.replace(f"{path}.part", path)
+
+        self.debug(f"extract::{name}={path}")
+        return path
+
+    def fetch(
+        self, start: int, end: int, on_data: typing.Callable | None = None
+    ) -> bytes:
+        """
+        Fetch the bytes from :attr:`start` to :attr:`end` (inclusive, or up
+        to the end of the zip) of the opened source. Transient failures are
+        retried as the :class:`RetryPolicy` of the process allows, asking
+        for the bytes not received yet
+        """
+        received = bytearray()
+
+        def _fetch():
+            self.token.raise_if_cancelled()
+            headers = {
+                "Range": f"bytes={start + len(received)}-{end}",
+                "Accept-Encoding": "identity",
+            }
+            self.debug(f"fetch::{self._source}::{headers['Range']}")
+            try:
+                with get_session().get(
+                    self._source, headers=headers, stream=True, timeout=30
+                ) as res:
+                    res.raise_for_status()
+                    if res.status_code != 206:
+                        raise RuntimeError(
+                            f"Ranges not supported by {self._source}: "
+                            + f"HTTP {res.status_code}"
+                        )
+
+                    last = int(res.headers["Content-Range"].split("/")[0].split("-")[1])
+                    for chunk in res.iter_content(chunk_size=self._chunk_size):
+                        self.token.raise_if_cancelled()
+                        self.throttle.consume(len(chunk))
+                        received.extend(chunk)
+                        if on_data is not None:
+                            on_data(chunk)
+
+                    # A dropped connection can end the body without errors
+                    if start + len(received) <= last:
+                        raise RuntimeError(
+                            f"Range interrupted at {start + len(received)} of {last}"
+                        ) from urllib3.exceptions.IncompleteRead(
+                            len(received), last + 1 - start - len(received)
+                        )
+
+            except (KeyError, IndexError, ValueError) as exc:
+                raise RuntimeError(
+                    f"Invalid Content-Range from {self._source}"
+                ) from exc
+
+            except requests.exceptions.RequestException as exc:
+                raise RuntimeError(f"Range request failed: {exc}") from exc
+
+        get_policy().run(_fetch, on_retry=self.on_retry, wait=self.token.wait)
+        return bytes(received)
+
+    def _locate(self) -> typing.Tuple[str, int]:
+        """Get the first source (after redirects) that answers and its size"""
+        urls = sources(self.url)
+        for index, url in enumerate(urls):
+            try:
+                res = get_session().head(url, allow_redirects=True, timeout=30)
+                res.raise_for_status()
+                size = int(res.headers["Content-Length"])
+                if res.headers.get("Accept-Ranges") != "bytes":
+                    raise RuntimeError(f"Ranges not supported by {url}")
+                return (res.url, size)
+
+            except (requests.exceptions.RequestException, KeyError, ValueError) as exc:
+                if index == len(urls) - 1:
+                    raise RuntimeError(f"Unable to open {self.url}: {exc}") from exc
+                self.warning(f"_locate::{url} failed: {exc}")
+
+            except RuntimeError:
+                if index == len(urls) - 1:
+                    raise
+                self.warning(f"_locate::{url} does not answer ranges")
+
+        raise RuntimeError(f"No sources of {self.url}")
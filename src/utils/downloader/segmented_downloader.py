@@ -0,0 +1,202 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+segmented_downloader.py
+"""
+import threading
+import typing
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import requests
+import urllib3
+from ..session import get_session
+from .chunk_reader import raw_readinto, iter_into
+from .stream_downloader import StreamDownloader
+
+
+class SegmentedDownloader(StreamDownloader):
+    """
+    Download files in a stream mode, optionally splitting them in
+    byte ranges fetched by concurrent connections
+    """
+
+    MIN_SEGMENT_SIZE = 1 << 20
+
+    MAX_CONNECTIONS = 16
+
+    def __init__(self, url: str, connections: int = 1):
+        super().__init__(url=url)
+        self.connections = connections
+        self._lock = threading.Lock()
+
+    @property
+    def connections(self) -> int:
+        """Getter for the amount of concurrent connections of a segmented download"""
+        self.debug(f"connections::getter={self._connections}")
+        return self._connections
+
+    @connections.setter
+    def connections(self, value: int):
+        """Setter for the amount of concurrent connections of a segmented download"""
+        if isinstance(value, int) and 1 <= value <= SegmentedDownloader.MAX_CONNECTIONS:
+            self.debug(f"connections::setter={value}")
+            self._connections = value
+        else:
+            raise ValueError(
+                f"Connections must be between 1 and {SegmentedDownloader.MAX_CONNECTIONS}"
+            )
+
+    def probe(self, url: str) -> typing.Tuple[str, int] | None:
+        """
+        Ask with a HEAD request if the server accept byte ranges for :attr:`url`.
+        Return the url after redirects and the content's length, or None when the
+        download should be done in a single stream
+        """
+        try:
+            self.debug(f"probe::session.head=< url: {url}, timeout: 30 >")
+            res = get_session().head(url=url, allow_redirects=True, timeout=30)
+            res.raise_for_status()
+
+        except requests.exceptions.RequestException as exc:
+            self.warning(f"probe::{url} failed, using single stream: {exc}")
+            return None
+
+        accept_ranges = res.headers.get("Accept-Ranges", "none")
+        content_len = res.headers.get("Content-Length")
+        self.debug(f"probe::accept_ranges={accept_ranges}, content_len={content_len}")
+
+        if accept_ranges.lower() != "bytes" or not content_len:
+            return None
+
+        return (res.url, int(content_len))
+
+    def split_ranges(self, size: int) -> typing.List[typing.Tuple[int, int]]:
+        """
+        Split :attr:`size` bytes in inclusive (start, end) ranges, one for each
+        connection, without making segments smaller than :attr:`MIN_SEGMENT_SIZE`
+        """
+        count = min(
+            self.connections, max(1, size // SegmentedDownloader.MIN_SEGMENT_SIZE)
+        )
+        step = size // count
+        ranges = [(i * step, (i + 1) * step - 1) for i in range(count)]
+        ranges[-1] = (ranges[-1][0], size - 1)
+        self.debug(f"split_ranges::{size}={ranges}")
+        return ranges
+
+    def download_segments(self, url: str, size: int, filepath: str):
+        """
+        Fetch :attr:`size` bytes of :attr:`url` with concurrent range requests,
+        writing each one directly into its offset of :attr:`filepath` (that
+        should already exist with the full size).
+
+        :attr:`on_data` is called once per chunk, in arrival order (not in file
+        order), with :attr:`downloaded_len` already summing all connections
+        """
+        self.offset = 0
+        self.downloaded_len = 0
+        self.content_len = size
+
+        ranges = self.split_ranges(size=size)
+        failed = threading.Event()
+        errors = []
+
+        with ThreadPoolExecutor(
+            max_workers=len(ranges), thread_name_prefix="segment"
+        ) as pool:
+            futures = [
+                pool.submit(self._download_segment, url, _range, filepath, failed)
+                for _range in ranges
+            ]
+
+            for future in as_completed(futures):
+                if future.exception() is not None:
+                    failed.set()
+                    errors.append(future.exception())
+
+        if len(errors) > 0:
+            raise errors[0]
+
+    def _download_segment(
+        self,
+        url: str,
+        _range: typing.Tuple[int, int],
+        filepath: str,
+        failed: threading.Event,
+    ):
+        start, end = _range
+        headers = {"Accept-Encoding": "identity", "Range": f"bytes={start}-{end}"}
+        res = self._request_stream(url=url, headers=headers)
+        self.token.on_cancel(res.close)
+
+        try:
+            if res.status_code != 206:
+                raise RuntimeError(f"Range {start}-{end} not honoured by {url}")
+
+            got, _ = StreamDownloader.parse_content_range(
+                res.headers.get("Content-Range", "")
+            )
+            if got != start:
+                raise RuntimeError(f"Expected range from {start}, got from {got}")
+
+            # Segments are never encoded, so their chunks are read
+            # into a single buffer when the transport allows it
+            readinto = raw_readinto(res)
+            if readinto is not None:
+                chunks = iter_into(res=res, readinto=readinto, size=self.chunk_size)
+            else:
+                chunks = res.iter_content(chunk_size=self.chunk_size)
+
+            with open(filepath, "r+b") as file:
+                file.seek(start)
+                for chunk in chunks:
+                    if failed.is_set():
+                        return
+
+                    self.token.raise_if_cancelled(
+                        f"Range {start}-{end} cancelled at {file.tell()}"
+                    )
+
+                    if file.tell() + len(chunk) > end + 1:
+                        raise RuntimeError(f"Range {start}-{end} overflowed")
+
+                    self.throttle.consume(len(chunk))
+                    file.write(chunk)
+                    with self._lock:
+                        self.downloaded_len += len(chunk)
+                        self.on_data(data=chunk)  # pylint: disable=not-callable
+
+                self.token.raise_if_cancelled(
+                    f"Range {start}-{end} cancelled at {file.tell()}"
+                )
+                if file.tell() != end + 1:
+                    raise RuntimeError(f"Range {start}-{end} ended at {file.tell()}")
+
+        except (
+            requests.exceptions.RequestException,
+            urllib3.exceptions.HTTPError,
+        ) as r_exc:
+            self.token.raise_if_cancelled(f"Range {start}-{end} cancelled")
+            raise RuntimeError(f"Range {start}-{end} interrupted: {r_exc}") from r_exc
+
+        finally:
+            self.token.remove(res.close)
+            res.close()
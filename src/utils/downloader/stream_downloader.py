@@ -23,16 +23,32 @@
 stream_downloader.py
 """
 import os
+import time
 import typing
 import requests
+import urllib3
+from ..session import get_session
+from ..mirror import sources
+from ..retry import get_policy
+from .async_engine import get_engine
+from .chunk_reader import raw_readinto, read_into, release
+from .cancel_token import DownloadCancelled
 from .trigger_downloader import TriggerDownloader
 
 
+# pylint: disable=too-many-instance-attributes
 class StreamDownloader(TriggerDownloader):
     """
     Download files in a stream mode
     """
 
+    def __init__(self, url: str):
+        super().__init__(url=url)
+        self._on_data = None
+        self._on_retry = None
+        self._offset = 0
+        self._validators = {}
+
     @property
     def on_data(self) -> typing.Callable:
         """Getter for callback to be used in each increment of downloaded stream"""
@@ -45,7 +61,74 @@ class StreamDownloader(TriggerDownloader):
         self.debug(f"on_data::setter={value}")
         self._on_data = value
 
-    def download_file_stream(self, url: str):
+    @property
+    def on_retry(self) -> typing.Callable | None:
+        """
+        Getter for the callback called before each retry of a failed
+        transfer, with the number of the next attempt, the total of
+        attempts, the delay before it and the error
+        """
+        self.debug(f"on_retry::getter={self._on_retry}")
+        return self._on_retry
+
+    @on_retry.setter
+    def on_retry(self, value: typing.Callable | None):
+        """Setter for the callback called before each retry of a failed transfer"""
+        self.debug(f"on_retry::setter={value}")
+        self._on_retry = value
+
+    @property
+    def offset(self) -> int:
+        """Getter for the byte offset where the last response started"""
+        self.debug(f"offset::getter={self._offset}")
+        return self._offset
+
+    @offset.setter
+    def offset(self, value: int):
+        """Setter for the byte offset where the last response started"""
+        self.debug(f"offset::setter={value}")
+        self._offset = value
+
+    @property
+    def validators(self) -> typing.Dict[str, str | None]:
+        """Getter for the ETag and Last-Modified headers of the last response"""
+        self.debug(f"validators::getter={self._validators}")
+        return self._validators
+
+    @validators.setter
+    def validators(self, value: typing.Dict[str, str | None]):
+        """Setter for the ETag and Last-Modified headers of the last response"""
+        self.debug(f"validators::setter={value}")
+        self._validators = value
+
+    def mark_complete(self, size: int):
+        """Report :attr:`size` bytes as the whole content, already downloaded"""
+        self.content_len = size
+        self.downloaded_len = size
+
+    @staticmethod
+    def parse_content_range(value: str) -> typing.Tuple[int, int]:
+        """
+        Parse a `Content-Range: bytes <start>-<end>/<total>` header
+        and return its start and total values
+        """
+        try:
+            unit, _range = value.split(" ", 1)
+            span, total = _range.split("/", 1)
+            start = span.split("-", 1)[0]
+            if unit != "bytes":
+                raise ValueError(f"Unit '{unit}' not supported")
+            return (int(start), int(total))
+        except ValueError as exc:
+            raise RuntimeError(f"Invalid Content-Range: {value}") from exc
+
+    def download_file_stream(
+        self,
+        url: str,
+        offset: int = 0,
+        validator: str | None = None,
+        conditions: typing.Dict[str, str | None] | None = None,
+    ) -> bool:
         """
         Given a :attr:`url`, download a large file in a streaming manner to given
         destination folder (:attr:`dest_dir`)
@@ -54,28 +137,174 @@ class StreamDownloader(TriggerDownloader):
         some information with :attr:`on_data` as function (total_len, downloaded_len, start_time)
         until reaches the 100%.
 
-        Then return the name
+        The data given to :attr:`on_data` can be a :class:`memoryview` of a
+        buffer reused for the next chunk (see :meth:`iter_chunks`), so copy
+        it with `bytes(data)` to keep it after the call returns.
+
+        If :attr:`offset` is greater than zero, ask the server to continue from
+        that byte with a `Range` header (and `If-Range` when a :attr:`validator`,
+        an ETag or Last-Modified value, is given). If the server ignores it and
+        answers the full content, :attr:`offset` is reset to zero, so callers
+        should check it before writing the first chunk.
+
+        When the response has no `Content-Length` (like chunked responses of
+        caching proxies and mirrors), :attr:`content_len` is zero while data is
+        streamed and is set to :attr:`downloaded_len` once the stream ends, with
+        a last empty call to :attr:`on_data` to signal the completion.
+
+        If :attr:`conditions` (the :attr:`validators` of a previous response)
+        are given, the request is conditional (`If-None-Match` and
+        `If-Modified-Since`) and `False` is returned, without any data, when
+        the server answers `304 Not Modified`. Otherwise return `True`.
+
+        When mirrors are configured (see :mod:`src.utils.mirror`), :attr:`url`
+        is fetched from the fastest healthy one. If it fails, the next one is
+        tried; once some data was given to :attr:`on_data`, the next one must
+        continue from there with a `206 Partial Content` answer.
+
+        Transient failures (timeouts, dropped connections, HTTP 5xx) of all
+        sources are retried as the :class:`RetryPolicy` of the process allows
+        (see :mod:`src.utils.retry`), continuing from the received data in
+        the same way, and :attr:`on_retry` is called before each retry.
         """
         # Get the filename by url and construct the request
         # Check for any HTTPError and then process chunks of data
+        self.filename = os.path.basename(url)
+        self.debug(f"download_file_stream::filename={self.filename}")
+        self.offset = offset
+        self.downloaded_len = offset
+
+        urls = sources(url)
+        state = {
+            "offset": offset,
+            "strict": False,
+            "headers": self.make_headers(
+                offset=offset, validator=validator, conditions=conditions
+            ),
+        }
+        policy = get_policy()
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return self._stream_sources(urls=urls, state=state)
+
+            except DownloadCancelled:
+                raise
+
+            except RuntimeError as exc:
+                delay = policy.next_delay(
+                    exc=exc, attempt=attempt, elapsed=time.monotonic() - started
+                )
+                if delay is None:
+                    raise
+
+                attempt += 1
+                self.warning(
+                    f"download_file_stream::retry {attempt}/{policy.attempts} "
+                    + f"in {delay:.2f}s: {exc}"
+                )
+                if self.on_retry is not None:
+                    # pylint: disable=not-callable
+                    self.on_retry(attempt, policy.attempts, delay, exc)
+
+                if self.token.wait(delay):
+                    raise DownloadCancelled(
+                        f"Download cancelled at {self.downloaded_len}"
+                    ) from exc
+
+    def _stream_sources(self, urls: typing.List[str], state: dict) -> bool:
+        for index, source in enumerate(urls):
+            try:
+                return self._stream_source(
+                    url=source,
+                    headers=state["headers"],
+                    offset=state["offset"],
+                    strict=state["strict"],
+                )
+
+            except DownloadCancelled:
+                raise
+
+            except RuntimeError as exc:
+                # Validators of a source mean nothing to others (nor to the
+                # same one later, behind a load balancer), so continue with
+                # a plain `Range` from the received data
+                if state["strict"] or self.downloaded_len > self.offset:
+                    state["strict"] = True
+                    state["offset"] = self.downloaded_len
+                    state["headers"] = self.make_headers(offset=self.downloaded_len)
+
+                if index == len(urls) - 1:
+                    raise
+
+                self.warning(f"download_file_stream::{source} failed: {exc}")
+
+        return False
+
+    def _stream_source(
+        self, url: str, headers: typing.Dict[str, str], offset: int, strict: bool
+    ) -> bool:
+        res = self._request_stream(url=url, headers=headers)
+        if not self._process_headers(res=res, url=url, offset=offset, strict=strict):
+            return False
+
+        self._process_chunks(res=res)
+        return True
+
+    def make_headers(
+        self,
+        offset: int = 0,
+        validator: str | None = None,
+        conditions: typing.Dict[str, str | None] | None = None,
+    ) -> typing.Dict[str, str]:
+        """
+        Build the request headers for :attr:`filename`, with the `Range`
+        and conditional ones (see :meth:`download_file_stream`)
+        """
+        headers = {
+            "Content-Disposition": f"attachment filename={self.filename}",
+            "Connection": "keep-alive",
+            "Cache-Control": "max-age=0",
+            "Accept-Encoding": "gzip, deflate, br",
+        }
+
+        # Ranges apply to the encoded representation
+        # so ask for the identity one when resuming
+        if offset > 0:
+            headers["Accept-Encoding"] = "identity"
+            headers["Range"] = f"bytes={offset}-"
+            if validator is not None:
+                headers["If-Range"] = validator
+
+        if conditions is not None:
+            if conditions.get("etag"):
+                headers["If-None-Match"] = conditions["etag"]
+            if conditions.get("last_modified"):
+                headers["If-Modified-Since"] = conditions["last_modified"]
+
+        return headers
+
+    def _request_stream(self, url: str, headers: dict) -> requests.Response:
         try:
-            self.filename = os.path.basename(url)
-            self.debug(f"download_file_stream::filename={self.filename}")
-
-            headers = {
-                "Content-Disposition": f"attachment filename={self.filename}",
-                "Connection": "keep-alive",
-                "Cache-Control": "max-age=0",
-                "Accept-Encoding": "gzip, deflate, br",
-            }
-            self.debug(
-                "download_file_stream::requests.get=< url: "
-                + f"{url}, stream: True, headers: {headers}, timeout: 30 >"
-            )
-            res = requests.get(url=url, stream=True, headers=headers, timeout=30)
+            # With an asyncio engine, the response is read on
+            # its event loop, through a blocking facade
+            engine = get_engine()
+            if engine is not None and not url.startswith("file:"):
+                self.debug(f"download_file_stream::engine.open=< url: {url} >")
+                res = engine.open(url=url, headers=headers, timeout=30)
+            else:
+                self.debug(
+                    "download_file_stream::session.get=< url: "
+                    + f"{url}, stream: True, headers: {headers}, timeout: 30 >"
+                )
+                res = get_session().get(
+                    url=url, stream=True, headers=headers, timeout=30
+                )
 
             self.debug("download_file_stream::raise_for_status")
             res.raise_for_status()
+            return res
 
         except requests.exceptions.Timeout as t_exc:
             raise RuntimeError(f"Download timeout error: {t_exc.__cause__ }") from t_exc
@@ -90,27 +319,180 @@ class StreamDownloader(TriggerDownloader):
                 f"HTTP error {res.status_code}: {h_exc.__cause__}"
             ) from h_exc
 
+    def _process_headers(
+        self, res: requests.Response, url: str, offset: int, strict: bool = False
+    ) -> bool:
+        self.validators = {
+            "etag": res.headers.get("ETag"),
+            "last_modified": res.headers.get("Last-Modified"),
+        }
+
+        if res.status_code == 304:
+            self.debug("download_file_stream::not_modified")
+            res.close()
+            return False
+
         # get some contents to calculate the amount
-        # of downloaded data
-        content_len = res.headers.get("Content-Length")
-        if content_len:
-            self.content_len = int(content_len)
+        # of downloaded data. A 206 answer continues
+        # from the requested offset, anything else
+        # means the server sent the whole content again
+        if offset > 0 and res.status_code == 206:
+            start, total = StreamDownloader.parse_content_range(
+                res.headers.get("Content-Range", "")
+            )
+            if start != offset:
+                res.close()
+                raise RuntimeError(f"Expected range from {offset}, got from {start}")
+
+            self.offset = offset
+            self.downloaded_len = offset
+            self.content_len = total
+
+        elif strict:
+            # The received data cannot be thrown away
+            res.close()
+            raise RuntimeError(f"{url} cannot continue from {offset}")
+
         else:
-            raise RuntimeError(f"Empty Content-Length response for {url}")
+            self.offset = 0
+            self.downloaded_len = 0
+            content_len = res.headers.get("Content-Length")
+            if content_len:
+                self.content_len = int(content_len)
+            else:
+                self.debug(f"download_file_stream::unknown length for {url}")
+                self.content_len = 0
 
+        self.debug(f"download_file_stream::offset={self.offset}")
         self.debug(f"download_file_stream::content_len={self.content_len}")
+        return True
 
+    def _process_chunks(self, res: requests.Response):
         # Get the chunks of bytes data
         # and pass it to a post-processing
-        # method defined as `on_data`
-        for chunk in res.iter_content(chunk_size=self.chunk_size):
-            self.downloaded_len += len(chunk)
-            self.debug(f"download_file_stream::downloaded_len={self.downloaded_len}")
-            if self.on_data is not None:
-                self.on_data(data=chunk)  # pylint: disable=not-callable
+        # method defined as `on_data`.
+        # Closing the response on cancel
+        # interrupts a blocked read
+        self.token.on_cancel(res.close)
+        try:
+            for chunk in self.iter_chunks(res=res):
+                self._process_chunk(chunk=chunk)
+
+            # A closed response can look like a short one
+            self.token.raise_if_cancelled(
+                f"Download cancelled at {self.downloaded_len}"
+            )
+
+            # A connection closed early isnt always detected by urllib3,
+            # so check the length (unless it was of the encoded data)
+            if (
+                0 < self.downloaded_len < self.content_len
+                and res.headers.get("Content-Encoding", "identity") == "identity"
+            ):
+                raise RuntimeError(
+                    f"Download interrupted at {self.downloaded_len} "
+                    + f"of {self.content_len}"
+                ) from urllib3.exceptions.IncompleteRead(
+                    self.downloaded_len, self.content_len - self.downloaded_len
+                )
+
+            # Without a Content-Length, the
+            # end of stream is the completion
+            if self.content_len == 0:
+                self.debug("download_file_stream::eof")
+                self.mark_complete(size=self.downloaded_len)
+                self._process_chunk(chunk=b"")
+
+        except (
+            OSError,
+            ValueError,
+            AttributeError,
+            urllib3.exceptions.HTTPError,
+        ) as r_exc:
+            # A response closed by a cancel fails in many ways
+            if self.token.cancelled:
+                raise DownloadCancelled(
+                    f"Download cancelled at {self.downloaded_len}"
+                ) from r_exc
+
+            if isinstance(
+                r_exc,
+                (requests.exceptions.RequestException, urllib3.exceptions.HTTPError),
+            ):
+                raise RuntimeError(
+                    f"Download interrupted at {self.downloaded_len}: {r_exc}"
+                ) from r_exc
+
+            raise
+
+        finally:
+            # Now you can close connection
+            self.debug("downloaded_file_stream::closing_connection")
+            self.token.remove(res.close)
+            res.close()
+
+    def iter_chunks(self, res: requests.Response) -> typing.Iterator[bytes]:
+        """
+        Yield the chunks of the body of :attr:`res`, throttled (see
+        :attr:`throttle`). When possible, they are :class:`memoryview` slices
+        of a buffer allocated once per transfer (see :mod:`chunk_reader`),
+        only valid until the next chunk is read. When :attr:`adaptive`, the
+        chunk size changes between chunks, given the time spent reading
+        each one and processing it
+        """
+        readinto = raw_readinto(res)
+        if readinto is None and not self.adaptive:
+            for chunk in res.iter_content(chunk_size=self.chunk_size):
+                self.throttle.consume(len(chunk))
+                yield chunk
+            return
+
+        # `iter_content` fix the chunk size for the whole
+        # transfer, so read the raw stream directly to be
+        # able to change it between chunks
+        if self.adaptive:
+            self.chunk_sizes.clear()
+            self.chunk_sizes.append((self.downloaded_len, self.chunk_size))
+
+        view = None
+        if readinto is not None:
+            size = TriggerDownloader.MAX_CHUNK_SIZE if self.adaptive else 0
+            view = memoryview(bytearray(max(size, self.chunk_size)))
+
+        while True:
+            started = time.perf_counter()
+            if view is not None:
+                chunk = read_into(readinto=readinto, view=view[: self.chunk_size])
             else:
-                raise RuntimeError("on_data cannot be empty")
+                chunk = res.raw.read(self.chunk_size, decode_content=True)
+
+            # Waiting for bandwidth counts as a slow read,
+            # so a limited transfer keeps small chunks
+            self.throttle.consume(len(chunk))
+            read = time.perf_counter()
+
+            if not chunk:
+                break
+
+            yield chunk
+            if self.adaptive:
+                self.adapt_chunk_size(
+                    elapsed=read - started, callback_elapsed=time.perf_counter() - read
+                )
+
+        if view is not None:
+            release(res)
+
+    def _process_chunk(self, chunk: bytes):
+        self.token.raise_if_cancelled(f"Download cancelled at {self.downloaded_len}")
+        self.downloaded_len += len(chunk)
+        self.debug(f"download_file_stream::downloaded_len={self.downloaded_len}")
+        if self.on_data is not None:
+            self.on_data(data=chunk)  # pylint: disable=not-callable
+        else:
+            raise RuntimeError("on_data cannot be empty")
 
-        # Now you can close connection
-        self.debug("downloaded_file_stream::closing_connection")
-        res.close()
+        # Observers run after `on_data`, so it can
+        # feed them any data kept from a previous call
+        for observer in self.observers:
+            observer.update(chunk)
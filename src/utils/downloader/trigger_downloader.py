@@ -22,20 +22,38 @@
 """
 trigger_downloader.py
 """
+import typing
+from ..digest import DigestObserver
 from .base_downloader import BaseDownloader
+from .cancel_token import CancelToken
+from .rate_limiter import Throttle
 
 
+# pylint: disable=too-many-instance-attributes
 class TriggerDownloader(BaseDownloader):
     """
     Downloader with some configurations adds
     """
 
+    MIN_CHUNK_SIZE = 1 << 10
+    MAX_CHUNK_SIZE = 1 << 20
+
+    # Seconds that reading and processing one chunk should take
+    # when the chunk size is adaptive
+    TARGET_CHUNK_TIME = 0.05
+
     def __init__(self, url: str):
         super().__init__(url=url)
         self._content_len = 0
         self._filename = ""
         self._downloaded_len = 0
         self._chunk_size = 1024
+        # Chosen chunk sizes are only recorded
+        # (and the chunk size only changes) when adaptive
+        self._chunk_sizes = None
+        self._observers = []
+        self._token = CancelToken()
+        self._throttle = Throttle()
 
     @property
     def content_len(self) -> int:
@@ -90,3 +108,104 @@ class TriggerDownloader(BaseDownloader):
             self._chunk_size = value
         else:
             raise ValueError(f"{value} isnt a power of 2")
+
+    @property
+    def observers(self) -> typing.List[typing.Any]:
+        """
+        Getter for the observers of downloaded data: objects with an
+        `update(data)` method (like :class:`DigestObserver`) that are
+        called with each chunk, in order
+        """
+        self.debug(f"observers::getter={self._observers}")
+        return self._observers
+
+    @property
+    def token(self) -> CancelToken:
+        """
+        Getter for the :class:`CancelToken` checked between chunks.
+        Once cancelled, it stays cancelled: give a new one to download again
+        """
+        self.debug(f"token::getter={self._token}")
+        return self._token
+
+    @token.setter
+    def token(self, value: CancelToken):
+        """Setter for the :class:`CancelToken` checked between chunks"""
+        self.debug(f"token::setter={value}")
+        self._token = value
+
+    @property
+    def throttle(self) -> Throttle:
+        """
+        Getter for the :class:`Throttle` that limits the bandwidth of each
+        chunk. By default, it is a foreground transfer limited only by
+        the bucket shared by the whole process
+        """
+        self.debug(f"throttle::getter={self._throttle}")
+        return self._throttle
+
+    @throttle.setter
+    def throttle(self, value: Throttle):
+        """Setter for the :class:`Throttle` that limits the bandwidth of each chunk"""
+        self.debug(f"throttle::setter={value}")
+        self._throttle = value
+
+    def hexdigest(self, name: str = "sha256") -> str | None:
+        """Get the hex digest computed by the :class:`DigestObserver` of a given name"""
+        for observer in self.observers:
+            if isinstance(observer, DigestObserver) and observer.name == name:
+                return observer.hexdigest
+
+        return None
+
+    @property
+    def adaptive(self) -> bool:
+        """Getter for adaptive chunk sizing"""
+        adaptive = self._chunk_sizes is not None
+        self.debug(f"adaptive::getter={adaptive}")
+        return adaptive
+
+    @adaptive.setter
+    def adaptive(self, value: bool):
+        """Setter for adaptive chunk sizing"""
+        self.debug(f"adaptive::setter={value}")
+        self._chunk_sizes = [] if value else None
+
+    @property
+    def chunk_sizes(self) -> typing.List[typing.Tuple[int, int]]:
+        """
+        Getter for the chunk sizes chosen on the last adaptive transfer, as
+        `(downloaded_len, chunk_size)` pairs recorded when it starts and
+        on each change. Empty when not :attr:`adaptive`
+        """
+        self.debug(f"chunk_sizes::getter={self._chunk_sizes}")
+        return self._chunk_sizes if self._chunk_sizes is not None else []
+
+    def adapt_chunk_size(self, elapsed: float, callback_elapsed: float) -> int:
+        """
+        Double or halve :attr:`chunk_size`, within :attr:`MIN_CHUNK_SIZE` and
+        :attr:`MAX_CHUNK_SIZE`, given the seconds spent reading the last chunk
+        and processing it. Fast transfers and expensive callbacks grow the
+        chunks, so there are fewer loop iterations per MB; slow transfers
+        shrink them, so progress is still reported often.
+        """
+        size = self.chunk_size
+        total = elapsed + callback_elapsed
+
+        if (
+            total < TriggerDownloader.TARGET_CHUNK_TIME / 2
+            or callback_elapsed > elapsed
+        ) and size < TriggerDownloader.MAX_CHUNK_SIZE:
+            size <<= 1
+
+        elif (
+            total > TriggerDownloader.TARGET_CHUNK_TIME * 2
+            and size > TriggerDownloader.MIN_CHUNK_SIZE
+        ):
+            size >>= 1
+
+        if size != self.chunk_size:
+            self.chunk_size = size
+            self.chunk_sizes.append((self.downloaded_len, size))
+
+        return size
@@ -23,13 +23,19 @@
 zip_downloader.py
 """
 import tempfile
+from ..digest import DigestObserver
 from .asset_downloader import AssetDownloader
 
 
 class ZipDownloader(AssetDownloader):
     """Download .zip release file"""
 
-    def __init__(self, version: str, destdir: str = tempfile.gettempdir()):
+    def __init__(
+        self, version: str, destdir: str = tempfile.gettempdir(), connections: int = 1
+    ):
         base_url = "https://github.com/selfcustody/krux/releases/download"
         url = f"{base_url}/{version}/krux-{version}.zip"
-        super().__init__(url=url, destdir=destdir, write_mode="wb")
+        super().__init__(url=url, destdir=destdir, write_mode="wb", sink="stream")
+        self.connections = connections
+        self.adaptive = True
+        self.observers.append(DigestObserver(name="sha256"))
@@ -0,0 +1,193 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+mirror
+
+Ordered list of mirrors of the release assets (local HTTP caches,
+internal artifact servers or `file://` directories). A mirror keeps
+the upstream host and path under its base url, e.g. the zip
+
+    https://github.com/selfcustody/krux/releases/download/v24.07.0/krux-v24.07.0.zip
+
+is looked up on the mirror `file:///srv/krux` as
+
+    file:///srv/krux/github.com/selfcustody/krux/releases/download/v24.07.0/krux-v24.07.0.zip
+
+Mirrors do not need to be trusted: downloaded releases are verified
+with their sha256 sum and signature, against the selfcustody's
+certificate. Being the trust anchor, the certificate is never looked
+up on mirrors (see :data:`TRUST_ANCHORS`), otherwise a mirror could
+serve its own key along with releases signed by it. Neither are the
+beta binaries (see :data:`UNSIGNED`), that have no signature to check
+"""
+import re
+import time
+import typing
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from urllib.parse import urlsplit
+import requests
+from ..session import get_session
+from ..warmup import redirect_target
+
+VALID_SCHEMES = ("http", "https", "file")
+
+# Assets only downloaded from upstream
+TRUST_ANCHORS = (
+    "https://raw.githubusercontent.com/selfcustody/krux/main/selfcustody.pem",
+)
+
+# Prefixes of the unsigned assets, only downloaded from upstream too
+UNSIGNED = ("https://raw.githubusercontent.com/odudex/krux_binaries/",)
+
+PROBE_TIMEOUT = 5
+
+# Seconds that the result of a race is reused, so the probes
+# of a download (like a segmented one) dont race twice
+RACE_TTL = 30
+
+_LOCK = threading.Lock()
+
+_STATE = {"mirrors": [], "raced": {}}
+
+
+def parse_mirrors(value: str) -> typing.List[str]:
+    """Split a comma or whitespace separated list of mirrors"""
+    return [m for m in re.split(r"[\s,]+", value or "") if m]
+
+
+def get_mirrors() -> typing.List[str]:
+    """Get the ordered list of mirror base urls"""
+    with _LOCK:
+        return list(_STATE["mirrors"])
+
+
+def set_mirrors(value: typing.List[str]):
+    """Set the ordered list of mirror base urls, forgetting previous races"""
+    for mirror in value:
+        if urlsplit(mirror).scheme not in VALID_SCHEMES:
+            raise ValueError(f"Invalid mirror: {mirror}")
+
+    with _LOCK:
+        _STATE["mirrors"] = [m.rstrip("/") for m in value]
+        _STATE["raced"] = {}
+
+
+def mirror_url(base: str, url: str) -> str:
+    """Get the url of an upstream :attr:`url` on the mirror :attr:`base`"""
+    parts = urlsplit(url)
+    return f"{base.rstrip('/')}/{parts.netloc}{parts.path}"
+
+
+def candidates(url: str) -> typing.List[str]:
+    """
+    Get the :attr:`url` on each mirror, in order, followed by itself.
+    Trust anchors and unsigned assets are only :attr:`url`
+    """
+    if url in TRUST_ANCHORS or url.startswith(UNSIGNED):
+        return [url]
+
+    return [mirror_url(base=m, url=url) for m in get_mirrors()] + [url]
+
+
+def probe(url: str, timeout: float = PROBE_TIMEOUT) -> float | None:
+    """
+    Send a HEAD request (following redirects) and return the seconds
+    it took, or None when the source isnt healthy
+    """
+    started = time.perf_counter()
+    try:
+        res = get_session().head(url=url, allow_redirects=True, timeout=timeout)
+        res.close()
+        res.raise_for_status()
+    except requests.exceptions.RequestException:
+        return None
+
+    return time.perf_counter() - started
+
+
+def race(urls: typing.List[str], timeout: float = PROBE_TIMEOUT) -> typing.List[str]:
+    """
+    Probe all :attr:`urls` at the same time and return them with the first
+    healthy one to answer at the front, followed by the others in their
+    original order (to fail over to). Slower probes are not waited for
+    """
+    if len(urls) < 2:
+        return list(urls)
+
+    pool = ThreadPoolExecutor(max_workers=len(urls), thread_name_prefix="mirror")
+    futures = {pool.submit(probe, url, timeout): url for url in urls}
+    winner = None
+    try:
+        for future in as_completed(futures, timeout=timeout + 1):
+            if future.result() is not None:
+                winner = futures[future]
+                break
+    except FutureTimeoutError:
+        pass
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+    if winner is None:
+        return list(urls)
+
+    return [winner] + [url for url in urls if url != winner]
+
+
+def sources(url: str) -> typing.List[str]:
+    """
+    Get where :attr:`url` should be downloaded from, in order: the fastest
+    healthy mirror (or upstream) first. Without mirrors, it is just :attr:`url`.
+
+    A cached redirect target of :attr:`url` (see :mod:`src.utils.warmup`)
+    is tried right before it, saving the redirect, and isnt raced
+    """
+    return redirected(url=url, urls=ordered(url))
+
+
+def ordered(url: str) -> typing.List[str]:
+    """Get the candidates of :attr:`url`, the fastest healthy one first"""
+    urls = candidates(url)
+    if len(urls) < 2:
+        return urls
+
+    with _LOCK:
+        raced = _STATE["raced"].get(url)
+
+    if raced is not None and time.monotonic() - raced[0] < RACE_TTL:
+        return raced[1]
+
+    raced = race(urls)
+    with _LOCK:
+        _STATE["raced"][url] = (time.monotonic(), raced)
+    return raced
+
+
+def redirected(url: str, urls: typing.List[str]) -> typing.List[str]:
+    """Put the cached redirect target of :attr:`url`, if any, before it"""
+    target = redirect_target(url)
+    if target is None or url not in urls:
+        return urls
+
+    index = urls.index(url)
+    return urls[:index] + [target] + urls[index:]
@@ -0,0 +1,266 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+mirror_sync.py
+
+Fill a local mirror (see :mod:`src.utils.mirror`) with every release known
+to :class:`Selector` and the beta binaries of every device, so installer
+stations can be pointed at it. Run it with `python mirror-sync.py`
+"""
+import os
+import re
+import sys
+import json
+import typing
+import logging
+import argparse
+from urllib.parse import urlsplit
+from concurrent.futures import ThreadPoolExecutor
+from ..trigger import Trigger
+from ..constants import VALID_DEVICES_VERSIONS
+from ..selector import Selector, BETA, set_offline_releases
+from ..digest import recall
+from ..cache import AssetCache
+from ..bundle.bundle_importer import verify_release
+from ..downloader import (
+    ZipDownloader,
+    Sha256Downloader,
+    SigDownloader,
+    PemDownloader,
+    BetaDownloader,
+    BetaSync,
+    DownloadManager,
+    set_manager,
+)
+
+REGEXP_STABLE = r"^v\d+\.\d+\.\d+$"
+
+
+class MirrorSync(Trigger):
+    """
+    Download the zip, sha256 sum and signature of each stable release,
+    on :attr:`workers` threads, and the selfcustody's certificate under
+    :attr:`base`, with the `<base>/<host>/<path>` layout of mirrors.
+    Releases already present and verified are skipped; downloaded ones
+    that fail the verification are removed. The beta binaries are
+    synced by their git blob SHA (see :class:`BetaSync`), although they
+    are never downloaded from mirrors (see :data:`src.utils.mirror.UNSIGNED`).
+    """
+
+    def __init__(self, base: str, workers: int = 4):
+        super().__init__()
+        if not isinstance(workers, int) or workers < 1:
+            raise ValueError(f"Invalid workers: {workers}")
+
+        self._base = os.path.abspath(base)
+        self._workers = workers
+
+    @property
+    def base(self) -> str:
+        """Getter for the root directory of the mirror"""
+        self.debug(f"base::getter={self._base}")
+        return self._base
+
+    @property
+    def workers(self) -> int:
+        """Getter for the number of releases downloaded at once"""
+        self.debug(f"workers::getter={self._workers}")
+        return self._workers
+
+    @property
+    def devices(self) -> typing.List[str]:
+        """Getter for the devices of any release that have beta binaries"""
+        devices = {d for ds in VALID_DEVICES_VERSIONS.values() for d in ds}
+        return [d for d in BetaDownloader.VALID_DEVICES if d in devices]
+
+    def local_path(self, url: str) -> str:
+        """Get where a canonical :attr:`url` is kept on the mirror"""
+        parts = urlsplit(url)
+        return os.path.join(self.base, parts.netloc, *parts.path.strip("/").split("/"))
+
+    def local_dir(self, url: str) -> str:
+        """Get the directory of a canonical :attr:`url` on the mirror"""
+        return os.path.dirname(self.local_path(url))
+
+    def verified(self, version: str, pem: bytes) -> str | None:
+        """
+        Verify the assets of a release on the mirror. Get the
+        reason of a failure or `None` when it is verified
+        """
+        paths = [
+            self.local_path(ZipDownloader(version=version).url),
+            self.local_path(Sha256Downloader(version=version).url),
+            self.local_path(SigDownloader(version=version).url),
+        ]
+        missing = [os.path.basename(p) for p in paths if not os.path.isfile(p)]
+        if missing:
+            return f"missing {', '.join(missing)}"
+
+        hexdigest = recall(path=paths[0], name="sha256")
+        if hexdigest is None:
+            hexdigest = AssetCache.sha256(paths[0])
+
+        return verify_release(
+            hexdigest=hexdigest, sha256_path=paths[1], sig_path=paths[2], pem=pem
+        )
+
+    def sync_release(self, version: str, pem: bytes) -> str:
+        """
+        Download the assets of a release, unless they are already present
+        and verified. Return `skipped` or `synced`; raise a `RuntimeError`
+        if the downloaded ones can't be verified
+        """
+        if self.verified(version=version, pem=pem) is None:
+            self.debug(f"sync_release::{version}::skipped")
+            return "skipped"
+
+        downloaders = [
+            ZipDownloader(version=version),
+            Sha256Downloader(version=version),
+            SigDownloader(version=version),
+        ]
+        paths = []
+        for downloader in downloaders:
+            downloader.destdir = self.local_dir(downloader.url)
+            paths.append(downloader.download(on_data=lambda data: None))
+
+        reason = self.verified(version=version, pem=pem)
+        if reason is not None:
+            for path in paths:
+                os.remove(path)
+            raise RuntimeError(reason)
+
+        self.info(f"sync_release::{version}::synced")
+        return "synced"
+
+    def sync_pem(self) -> str:
+        """
+        Download the selfcustody's certificate, always from upstream (see
+        :data:`src.utils.mirror.TRUST_ANCHORS`), and return its path
+        """
+        downloader = PemDownloader()
+        downloader.destdir = self.local_dir(downloader.url)
+        return downloader.download(on_data=lambda data: None)
+
+    def sync_beta(self) -> dict:
+        """
+        Sync the beta binaries of :attr:`devices` and return the summary
+        of :meth:`BetaSync.sync`, or the error that prevented it
+        """
+        url = BetaDownloader(device="amigo", binary_type="kboot.kfpkg").url
+        beta_sync = BetaSync(
+            destdir=os.path.dirname(self.local_dir(url)), devices=self.devices
+        )
+        try:
+            return beta_sync.sync()
+        except (RuntimeError, ValueError) as exc:
+            self.warning(f"sync_beta::{exc}")
+            return {"error": str(exc)}
+
+    def sync(self, releases: typing.List[str]) -> dict:
+        """
+        Mirror the certificate, the stable :attr:`releases` and, if the
+        beta is one of them, the beta binaries. Return a summary of
+        what was synced, skipped or failed
+        """
+        summary = {
+            "base": self.base,
+            "pem": self.sync_pem(),
+            "releases": {"synced": [], "skipped": [], "failed": {}},
+            "beta": None,
+        }
+        with open(summary["pem"], "rb") as file:
+            pem = file.read()
+
+        versions = [r for r in releases if re.findall(REGEXP_STABLE, r)]
+        with ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="mirror"
+        ) as executor:
+            futures = {
+                version: executor.submit(self.sync_release, version=version, pem=pem)
+                for version in versions
+            }
+
+        for version, future in futures.items():
+            try:
+                summary["releases"][future.result()].append(version)
+            except (RuntimeError, OSError) as exc:
+                self.warning(f"sync::{version} failed: {exc}")
+                summary["releases"]["failed"][version] = str(exc)
+
+        beta = self.sync_beta() if BETA in releases else {}
+        summary["beta"] = beta or None
+        summary["ok"] = not summary["releases"]["failed"] and not (
+            beta.get("error") or beta.get("failed")
+        )
+        return summary
+
+
+def parse_args(argv: typing.List[str]) -> argparse.Namespace:
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        prog="mirror-sync",
+        description=(
+            "Fill a local mirror with every krux release and the beta binaries "
+            "of every device, so installer stations can download from it"
+        ),
+    )
+    parser.add_argument("base", help="root directory of the mirror")
+    parser.add_argument(
+        "--releases",
+        type=lambda v: [r for r in v.split(",") if r],
+        default=None,
+        help="comma separated versions, instead of asking github",
+    )
+    parser.add_argument("--no-beta", action="store_true", help="skip the beta binaries")
+    parser.add_argument("--workers", type=int, default=4, help="releases at once")
+    parser.add_argument("--verbose", action="store_true", help="log to stderr")
+    return parser.parse_args(argv)
+
+
+def main(argv: typing.List[str] | None = None) -> int:
+    """
+    Sync the mirror, print the summary as JSON on stdout and
+    return the exit status: 0 when nothing failed, 1 otherwise
+    """
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    logging.basicConfig(
+        level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stderr
+    )
+
+    try:
+        if args.releases is not None:
+            set_offline_releases(args.releases + [BETA])
+        releases = Selector().releases
+        if args.no_beta:
+            releases = [r for r in releases if r != BETA]
+
+        # one worker of the manager is kept for interactive
+        # transfers, that this command does not have
+        set_manager(DownloadManager(workers=args.workers + 1))
+        summary = MirrorSync(base=args.base, workers=args.workers).sync(releases)
+
+    except (RuntimeError, ValueError, OSError) as exc:
+        summary = {"base": os.path.abspath(args.base), "ok": False, "error": str(exc)}
+
+    print(json.dumps(summary, indent=2, sort_keys=True))
+    return 0 if summary["ok"] else 1
@@ -0,0 +1,181 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+retry
+
+Retry policy of network requests: exponential backoff with full jitter,
+a maximum number of attempts and a budget of elapsed seconds. Whether
+an error is worth a retry is looked up on a decision table by its class
+(or the class of its causes, since errors are usually re-raised as
+`RuntimeError`) and, for HTTP errors, by their status code
+"""
+import time
+import random
+import typing
+import threading
+import requests
+import urllib3
+from ..trigger import Trigger
+
+
+class RetryPolicy(Trigger):
+    """
+    Retry a failed request up to :attr:`attempts` times in total, waiting
+    a random delay between zero and `base * 2 ** (attempt - 1)` seconds
+    (at most :attr:`cap`) before each new attempt, while the whole
+    operation took less than :attr:`max_elapsed` seconds
+    """
+
+    # First match wins; `None` means that the status code decides
+    DECISIONS = (
+        (requests.exceptions.HTTPError, None),
+        (requests.exceptions.Timeout, True),
+        (requests.exceptions.ChunkedEncodingError, True),
+        (requests.exceptions.ContentDecodingError, False),
+        (requests.exceptions.ConnectionError, True),
+        (urllib3.exceptions.HTTPError, True),
+        (TimeoutError, True),
+        (ConnectionError, True),
+    )
+
+    RETRY_STATUS = (408, 425, 429, 500, 502, 503, 504)
+
+    def __init__(
+        self,
+        attempts: int = 5,
+        base: float = 0.5,
+        cap: float = 8.0,
+        max_elapsed: float = 60.0,
+    ):
+        super().__init__()
+        if not isinstance(attempts, int) or attempts < 1:
+            raise ValueError(f"Invalid attempts: {attempts}")
+
+        for name, value in (("base", base), ("cap", cap), ("max_elapsed", max_elapsed)):
+            if value <= 0:
+                raise ValueError(f"Invalid {name}: {value}")
+
+        self._attempts = attempts
+        self._base = base
+        self._cap = cap
+        self._max_elapsed = max_elapsed
+
+    @property
+    def attempts(self) -> int:
+        """Getter for the maximum number of attempts, the first one included"""
+        self.debug(f"attempts::getter={self._attempts}")
+        return self._attempts
+
+    @property
+    def max_elapsed(self) -> float:
+        """Getter for the seconds after which no attempt is started"""
+        self.debug(f"max_elapsed::getter={self._max_elapsed}")
+        return self._max_elapsed
+
+    def retryable(self, exc: BaseException) -> bool:
+        """Look up :attr:`exc` and its causes on :attr:`DECISIONS`"""
+        while exc is not None:
+            for cls, decision in RetryPolicy.DECISIONS:
+                if not isinstance(exc, cls):
+                    continue
+
+                if decision is None:
+                    response = getattr(exc, "response", None)
+                    status = getattr(response, "status_code", None)
+                    decision = status in RetryPolicy.RETRY_STATUS
+
+                self.debug(f"retryable::{type(exc).__name__}={decision}")
+                return decision
+
+            exc = exc.__cause__
+
+        return False
+
+    def backoff(self, attempt: int) -> float:
+        """Get a jittered delay before the :attr:`attempt` after the first one"""
+        ceiling = min(self._cap, self._base * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def next_delay(
+        self, exc: BaseException, attempt: int, elapsed: float
+    ) -> float | None:
+        """
+        Get the seconds to wait before retrying after the :attr:`attempt`
+        that failed with :attr:`exc`, or None to give up: the error isnt
+        retryable, no attempts are left or the budget would be exceeded
+        """
+        if attempt >= self.attempts or not self.retryable(exc):
+            return None
+
+        delay = self.backoff(attempt)
+        if elapsed + delay >= self.max_elapsed:
+            self.debug(f"next_delay::budget exceeded after {elapsed:.2f}s")
+            return None
+
+        return delay
+
+    def run(
+        self,
+        fn: typing.Callable,
+        on_retry: typing.Callable | None = None,
+        wait: typing.Callable = time.sleep,
+    ) -> typing.Any:
+        """
+        Call :attr:`fn` until it returns, retrying failures as the policy
+        allows. Before each retry, :attr:`on_retry` is called with the
+        number of the next attempt, the total of attempts, the delay and
+        the error, and then :attr:`wait` is called with the delay
+        """
+        started = time.monotonic()
+        attempt = 1
+        while True:
+            try:
+                return fn()
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                delay = self.next_delay(
+                    exc=exc, attempt=attempt, elapsed=time.monotonic() - started
+                )
+                if delay is None:
+                    raise
+
+                attempt += 1
+                self.warning(f"run::retry {attempt}/{self.attempts} in {delay:.2f}s")
+                if on_retry is not None:
+                    on_retry(attempt, self.attempts, delay, exc)
+                wait(delay)
+
+
+_LOCK = threading.Lock()
+
+_STATE = {"policy": RetryPolicy()}
+
+
+def get_policy() -> RetryPolicy:
+    """Get the retry policy of all downloads of the process"""
+    with _LOCK:
+        return _STATE["policy"]
+
+
+def set_policy(policy: RetryPolicy):
+    """Set the retry policy of all downloads of the process"""
+    with _LOCK:
+        _STATE["policy"] = policy
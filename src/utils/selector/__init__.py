@@ -26,8 +26,11 @@ Generic selector to select devices or versions
 """
 
 import typing
+import threading
 from http.client import HTTPResponse
 import requests
+from ..session import get_session
+from ..retry import RetryPolicy, get_policy
 from ..trigger import Trigger
 
 VALID_DEVICES = (
@@ -42,6 +45,39 @@ VALID_DEVICES = (
     "wonder_mv",
 )
 
+BETA = "odudex/krux_binaries"
+
+_LOCK = threading.Lock()
+
+_OFFLINE = {"releases": None}
+
+
+def get_offline_releases() -> typing.List[str] | None:
+    """Get the release list used instead of asking github, if offline"""
+    with _LOCK:
+        releases = _OFFLINE["releases"]
+        return list(releases) if releases is not None else None
+
+
+def set_offline_releases(value: typing.List[str] | None):
+    """
+    Work offline with a given release list (like the versions of cached
+    assets), newest first, instead of asking github. The beta, only when
+    listed (its binaries are cached), is kept as the last release. `None`
+    goes back online
+    """
+    if value is not None:
+        if len(value) == 0:
+            raise ValueError(f"Invalid offline releases: {value}")
+
+        releases = [v for v in value if v != BETA]
+        if BETA in value:
+            releases.append(BETA)
+        value = releases
+
+    with _LOCK:
+        _OFFLINE["releases"] = value
+
 
 class Selector(Trigger):
     """
@@ -54,10 +90,18 @@ class Selector(Trigger):
         "X-GitHub-Api-Version": "2022-11-28",
     }
 
-    def __init__(self):
+    def __init__(
+        self,
+        policy: RetryPolicy | None = None,
+        on_retry: typing.Callable | None = None,
+    ):
         super().__init__()
         self.device = None
-        self.releases = self._fetch_releases()
+        offline = get_offline_releases()
+        if offline is not None:
+            self.releases = offline
+        else:
+            self.releases = self._fetch_releases(policy=policy, on_retry=on_retry)
         self.firmware = None
 
     @property
@@ -105,18 +149,50 @@ class Selector(Trigger):
         self.debug(f"releases::setter={value}")
         self._releases = value
 
-    def _fetch_releases(self, timeout: int = 10) -> HTTPResponse:
+    def _fetch_releases(
+        self,
+        timeout: int = 10,
+        policy: RetryPolicy | None = None,
+        on_retry: typing.Callable | None = None,
+    ) -> HTTPResponse:
         """
         Get the all available releases at
-        https://github.com/selfcustody/krux/releases
+        https://github.com/selfcustody/krux/releases,
+        retrying transient failures with :attr:`policy` (the global one
+        of :mod:`src.utils.retry` by default). The retries sleep, so
+        only a single attempt policy should be given on the kivy thread
         """
+        policy = policy if policy is not None else get_policy()
+        response = policy.run(
+            fn=lambda: self._request_releases(timeout), on_retry=on_retry
+        )
+        res = response.json()
+        self.debug(f"releases::getter::response='{res}'")
+
+        if len(res) == 0:
+            raise ValueError(f"{Selector.URL} returned empty data")
+
+        obj = []
+        for data in res:
+            if not data.get("tag_name"):
+                raise KeyError("Invalid key: 'tag_name' do not exist on api")
+
+            obj.append(data["tag_name"])
+
+        self.debug(f"releases::getter={obj}")
+        self.debug(f"releases::getter::append={BETA}")
+        obj.append(BETA)
+        return obj
+
+    def _request_releases(self, timeout: int) -> requests.Response:
+        """Ask the github api for the releases, once"""
         try:
             self.debug(f"releases::getter::URL={Selector.URL}")
             accept = Selector.HEADERS["Accept"]
             api = Selector.HEADERS["X-GitHub-Api-Version"]
             self.debug(f"releases::getter::HEADER=Accept: {accept}")
             self.debug(f"releases::getter::HEADER=X-Github-Api-Version: {api}")
-            response = requests.get(
+            response = get_session().get(
                 url=Selector.URL, headers=Selector.HEADERS, timeout=timeout
             )
             response.raise_for_status()
@@ -130,20 +206,4 @@ class Selector(Trigger):
         except requests.exceptions.HTTPError as h_exc:
             raise RuntimeError(h_exc) from h_exc
 
-        res = response.json()
-        self.debug(f"releases::getter::response='{res}'")
-
-        if len(res) == 0:
-            raise ValueError(f"{Selector.URL} returned empty data")
-
-        obj = []
-        for data in res:
-            if not data.get("tag_name"):
-                raise KeyError("Invalid key: 'tag_name' do not exist on api")
-
-            obj.append(data["tag_name"])
-
-        self.debug(f"releases::getter={obj}")
-        self.debug("releases::getter::append=odudex/krux_binaries")
-        obj.append("odudex/krux_binaries")
-        return obj
+        return response
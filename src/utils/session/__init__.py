@@ -0,0 +1,92 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+session.py
+
+Process-wide HTTP session, shared by downloaders and selector,
+so connections to github are pooled and kept alive between requests
+"""
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from .file_adapter import FileAdapter
+
+DEFAULT_POOL_SIZE = 10
+
+_LOCK = threading.Lock()
+
+_STATE = {"session": None, "pool_size": DEFAULT_POOL_SIZE}
+
+
+def make_session(pool_size: int) -> requests.Session:
+    """
+    Create a :class:`requests.Session` that keeps up to :attr:`pool_size`
+    alive connections for each host. `file://` urls are served from disk
+    (see :class:`FileAdapter`), so a local directory can be a mirror
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.mount("file://", FileAdapter())
+    return session
+
+
+def get_session() -> requests.Session:
+    """
+    Get the shared session, creating it on first use. Any object with the
+    same `get`/`head` interface can be injected with :func:`set_session`
+    """
+    with _LOCK:
+        if _STATE["session"] is None:
+            _STATE["session"] = make_session(pool_size=_STATE["pool_size"])
+        return _STATE["session"]
+
+
+def set_session(session: requests.Session | None):
+    """
+    Replace the shared session (e.g. with a local stand-in on tests).
+    Use `None` to drop it, so the next :func:`get_session` creates a new one
+    """
+    with _LOCK:
+        old, _STATE["session"] = _STATE["session"], session
+
+    if old is not None and old is not session:
+        old.close()
+
+
+def get_pool_size() -> int:
+    """Get the amount of pooled connections for each host"""
+    return _STATE["pool_size"]
+
+
+def set_pool_size(value: int):
+    """
+    Set the amount of pooled connections for each host.
+    The shared session is recreated on the next :func:`get_session`
+    """
+    if not isinstance(value, int) or value < 1:
+        raise ValueError(f"Invalid pool size: {value}")
+
+    if value != _STATE["pool_size"]:
+        _STATE["pool_size"] = value
+        set_session(None)
@@ -0,0 +1,154 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+file_adapter.py
+
+Transport adapter that serves `file://` urls, so a local directory
+can be used as a mirror by the same code that streams from HTTP
+"""
+import io
+import os
+import re
+import typing
+from email.utils import formatdate
+from urllib.parse import urlsplit
+from urllib.request import url2pathname
+from requests import PreparedRequest, Response
+from requests.adapters import BaseAdapter
+from requests.structures import CaseInsensitiveDict
+
+RANGE_REGEXP = r"^bytes=(\d+)-(\d*)$"
+
+
+class FileRaw:
+    """
+    Raw stream of a (part of a) local file, read like an `urllib3`
+    response: `read(amt, decode_content)` (or `readinto`) until it
+    returns empty bytes
+    """
+
+    def __init__(self, path: str, start: int, length: int):
+        # pylint: disable=consider-using-with
+        self._file = open(path, "rb")
+        self._file.seek(start)
+        self._left = length
+
+    def read(self, amt: int | None = None, decode_content: bool = True) -> bytes:
+        """Read up to :attr:`amt` bytes (all, when None) of the range"""
+        # pylint: disable=unused-argument
+        if self._file.closed:
+            return b""
+
+        size = self._left if amt is None else min(amt, self._left)
+        data = self._file.read(size)
+        self._left -= len(data)
+        return data
+
+    def readinto(self, buffer: typing.Any) -> int:
+        """Read up to the length of :attr:`buffer` bytes of the range into it"""
+        if self._file.closed:
+            return 0
+
+        size = self._file.readinto(memoryview(buffer)[: self._left])
+        self._left -= size
+        return size
+
+    def close(self):
+        """Close the file"""
+        self._file.close()
+
+
+class FileAdapter(BaseAdapter):
+    """
+    Answer GET and HEAD requests for `file://` urls with the file's
+    content, honouring `Range` and `If-None-Match` headers, with
+    `Content-Length`, `Accept-Ranges`, `Last-Modified` and a `ETag` made
+    from size and modification time
+    """
+
+    def send(
+        self,
+        request: PreparedRequest,
+        stream: bool = False,
+        timeout: typing.Any = None,
+        verify: typing.Any = True,
+        cert: typing.Any = None,
+        proxies: typing.Any = None,
+    ) -> Response:
+        # pylint: disable=too-many-arguments,too-many-positional-arguments
+        # pylint: disable=unused-argument
+        response = Response()
+        response.url = request.url
+        response.request = request
+        response.headers = CaseInsensitiveDict()
+        response.raw = io.BytesIO(b"")
+
+        path = url2pathname(urlsplit(request.url).path)
+        if request.method not in ("GET", "HEAD"):
+            return FileAdapter.answer(response, 405, "Method Not Allowed")
+
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return FileAdapter.answer(response, 404, "Not Found")
+
+        if not os.path.isfile(path):
+            return FileAdapter.answer(response, 404, "Not Found")
+
+        start, end = 0, stat.st_size - 1
+        response.headers["Accept-Ranges"] = "bytes"
+        response.headers["Last-Modified"] = formatdate(stat.st_mtime, usegmt=True)
+        response.headers["ETag"] = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+
+        if request.headers.get("If-None-Match") == response.headers["ETag"]:
+            return FileAdapter.answer(response, 304, "Not Modified")
+
+        byte_range = request.headers.get("Range")
+        if byte_range is not None:
+            match = re.match(RANGE_REGEXP, byte_range.strip())
+            if match is None or int(match.group(1)) >= stat.st_size:
+                response.headers["Content-Range"] = f"bytes */{stat.st_size}"
+                return FileAdapter.answer(response, 416, "Range Not Satisfiable")
+
+            start = int(match.group(1))
+            if match.group(2):
+                end = min(int(match.group(2)), end)
+            response.headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+            FileAdapter.answer(response, 206, "Partial Content")
+        else:
+            FileAdapter.answer(response, 200, "OK")
+
+        response.headers["Content-Length"] = str(end - start + 1)
+        if request.method == "GET":
+            response.raw = FileRaw(path=path, start=start, length=end - start + 1)
+
+        return response
+
+    def close(self):
+        """Nothing is pooled"""
+
+    @staticmethod
+    def answer(response: Response, status_code: int, reason: str) -> Response:
+        """Set the status of a response and return it"""
+        response.status_code = status_code
+        response.reason = reason
+        return response
@@ -22,12 +22,21 @@
 """
 trigger.py
 
-Base class to be used accross project
+Base class to be used accross project.
+
+Headless entry points (like `mirror-sync.py`) set `KRUX_INSTALLER_HEADLESS`
+before importing it, so the standard `logging` is used instead of Kivy's
+logger and Kivy is never imported
 """
 import os
-from kivy.logger import Logger
+import logging
 from src.utils.info import mro
 
+if os.environ.get("KRUX_INSTALLER_HEADLESS"):
+    Logger = logging.getLogger("krux-installer")
+else:
+    from kivy.logger import Logger
+
 
 class Trigger:
     """
@@ -25,6 +25,7 @@ sha256_verifyer.py
 
 import os
 import hashlib
+from ..digest import recall
 from .base_verifyer import BaseVerifyer
 
 
@@ -38,7 +39,16 @@ class Sha256Verifyer(BaseVerifyer):
             raise ValueError(f"File {filename} do not exist")
 
     def load(self):
-        """Load data from file and assigns its sha256sum"""
+        """
+        Load data from file and assigns its sha256sum. If it was computed
+        while downloading and the file is unchanged, the file isnt read again
+        """
+        digest = recall(path=self.filename, name="sha256")
+        if digest is not None:
+            self.debug(f"load::{self.filename}::recalled={digest}")
+            self.data = digest
+            return
+
         sha256_hash = hashlib.sha256()
 
         self.debug(f"load::{self.filename}::{self.read_mode}")
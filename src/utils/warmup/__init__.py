@@ -0,0 +1,179 @@
+# The MIT License (MIT)
+
+# Copyright (c) 2021-2024 Krux contributors
+
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+
+# The above copyright notice and this permission notice shall be included in
+# all copies or substantial portions of the Software.
+
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
+# THE SOFTWARE.
+"""
+warmup
+
+Connection warmup, run in background while the first screens wait: the
+known hosts are resolved and connected (DNS, TCP and TLS) through the
+shared session (see :mod:`src.utils.session`), so their connections are
+pooled by the time of the first real request.
+
+The redirect of a release asset, like
+
+    https://github.com/selfcustody/krux/releases/download/v24.07.0/krux-v24.07.0.zip
+
+to its signed url on github's storage can be resolved ahead too. The
+target is cached for a while (see :data:`REDIRECT_TTL`) and downloads try
+it before the asset url (see :func:`src.utils.mirror.sources`)
+"""
+import time
+import typing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin, urlsplit
+import requests
+from ..session import get_session
+
+WARM_URLS = (
+    "https://api.github.com",
+    "https://github.com",
+    "https://objects.githubusercontent.com",
+    "https://raw.githubusercontent.com",
+)
+
+WARM_TIMEOUT = 5
+
+# Seconds that a redirect target is reused. The signed
+# urls of release assets expire in about five minutes
+REDIRECT_TTL = 240
+
+_LOCK = threading.Lock()
+
+_STATE = {"redirects": {}, "warmed": set()}
+
+
+def warm(url: str, timeout: float = WARM_TIMEOUT) -> bool:
+    """
+    Open a pooled connection to the host of :attr:`url`, with a HEAD
+    request of its root, and return whether the host answered. Only
+    http(s) hosts are warmed
+    """
+    parts = urlsplit(url)
+    if parts.scheme not in ("http", "https"):
+        return False
+
+    try:
+        res = get_session().head(
+            f"{parts.scheme}://{parts.netloc}/", allow_redirects=False, timeout=timeout
+        )
+        res.close()
+    except requests.exceptions.RequestException:
+        return False
+
+    with _LOCK:
+        _STATE["warmed"].add(parts.netloc)
+    return True
+
+
+def resolve(url: str, timeout: float = WARM_TIMEOUT) -> str | None:
+    """
+    Send a HEAD request of :attr:`url` (without following redirects) and
+    cache where it is redirected to, if it is. Return the target or None
+    """
+    try:
+        res = get_session().head(url, allow_redirects=False, timeout=timeout)
+        res.close()
+    except requests.exceptions.RequestException:
+        return None
+
+    if not res.is_redirect:
+        return None
+
+    target = urljoin(url, res.headers["Location"])
+    with _LOCK:
+        _STATE["redirects"][url] = (time.monotonic(), target)
+    return target
+
+
+def redirect_target(url: str) -> str | None:
+    """Get the cached redirect target of :attr:`url`, unless it is stale"""
+    with _LOCK:
+        cached = _STATE["redirects"].get(url)
+        if cached is None:
+            return None
+
+        if time.monotonic() - cached[0] >= REDIRECT_TTL:
+            del _STATE["redirects"][url]
+            return None
+
+        return cached[1]
+
+
+def warmed() -> typing.Set[str]:
+    """Get the hosts whose connections were warmed"""
+    with _LOCK:
+        return set(_STATE["warmed"])
+
+
+def forget():
+    """Forget the cached redirect targets and the warmed hosts"""
+    with _LOCK:
+        _STATE["redirects"] = {}
+        _STATE["warmed"] = set()
+
+
+def warm_up(
+    urls: typing.Iterable[str] = (),
+    redirects: typing.Iterable[str] = (),
+    timeout: float = WARM_TIMEOUT,
+) -> typing.Dict[str, str | None]:
+    """
+    Warm the hosts of :attr:`urls` and resolve the :attr:`redirects`, all
+    at the same time, and then warm the hosts of their targets that were
+    not yet. Return the targets by redirected url
+    """
+    urls, redirects = list(urls), list(redirects)
+    if not urls and not redirects:
+        return {}
+
+    with ThreadPoolExecutor(
+        max_workers=len(urls) + len(redirects), thread_name_prefix="warmup"
+    ) as pool:
+        for url in urls:
+            pool.submit(warm, url, timeout)
+        targets = dict(
+            zip(redirects, pool.map(lambda u: resolve(u, timeout), redirects))
+        )
+
+    hosts = {urlsplit(t).netloc: t for t in targets.values() if t is not None}
+    cold = [t for host, t in hosts.items() if host not in warmed()]
+    if cold:
+        with ThreadPoolExecutor(
+            max_workers=len(cold), thread_name_prefix="warmup"
+        ) as pool:
+            pool.map(lambda u: warm(u, timeout), cold)
+
+    return targets
+
+
+def start_warm_up(
+    urls: typing.Iterable[str] = (), redirects: typing.Iterable[str] = ()
+) -> threading.Thread:
+    """Run :func:`warm_up` on a daemon thread, so nothing waits for it"""
+    thread = threading.Thread(
+        target=warm_up,
+        kwargs={"urls": list(urls), "redirects": list(redirects)},
+        name="warmup",
+        daemon=True,
+    )
+    thread.start()
+    return thread
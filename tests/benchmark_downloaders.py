@@ -0,0 +1,220 @@
+"""
+benchmark_downloaders.py
+
+Throughput benchmark of `ZipDownloader` and `BetaDownloader` against the
+local stand-in server (see `http_server.py`), across chunk sizes and modes:
+
+- `stream`: a single stream read with a fixed chunk size;
+- `adaptive`: a single stream whose chunk size adapts to the reads;
+- `segmented`: four concurrent range requests;
+- `asyncio`: a single stream read on the asyncio engine.
+
+Each case runs in a fresh process, so its CPU time and peak RSS aren't
+mixed with the server's or with other cases. Run it with
+
+    poe benchmark
+    python -m tests.benchmark_downloaders --sizes 8,64 --bandwidth 20 --json out.json
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import statistics
+import multiprocessing
+
+os.environ.setdefault("KIVY_NO_ARGS", "1")
+os.environ.setdefault("KCFG_KIVY_LOG_LEVEL", "warning")
+
+# pylint: disable=wrong-import-position
+from src.utils.downloader import ZipDownloader, BetaDownloader
+from src.utils.downloader.async_engine import AsyncEngine, set_engine
+from .http_server import StandInServer, routing, synthetic_zip
+
+MODES = ("stream", "adaptive", "segmented", "asyncio")
+
+
+def peak_rss() -> float | None:
+    """Peak resident memory of this process in MB, where it can be known"""
+    try:
+        import resource  # pylint: disable=import-outside-toplevel
+    except ImportError:
+        return None
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / (1 << 10)
+
+
+def make_downloader(case: dict, destdir: str):
+    """Build the downloader of a benchmark case"""
+    mode = case.get("mode", "stream")
+    if case["asset"] == "zip":
+        downloader = ZipDownloader(
+            version=case.get("version", "v0.0.1"),
+            destdir=destdir,
+            connections=4 if mode == "segmented" else 1,
+        )
+    else:
+        downloader = BetaDownloader(
+            device="amigo", binary_type="kboot.kfpkg", destdir=destdir
+        )
+
+    downloader.adaptive = mode == "adaptive"
+    downloader.chunk_size = case["chunk_size"]
+    return downloader
+
+
+def run_case(base_url: str, case: dict) -> dict:
+    """
+    Download the asset of a case from the stand-in server at
+    :attr:`base_url` and measure its throughput, CPU time and how much
+    the transfer raised the peak RSS (each case runs on a fresh process,
+    whose imports alone dominate the peak)
+    """
+    engine = AsyncEngine() if case.get("mode") == "asyncio" else None
+    set_engine(engine)
+
+    try:
+        with tempfile.TemporaryDirectory() as destdir, routing(base_url):
+            downloader = make_downloader(case=case, destdir=destdir)
+            rss_start = peak_rss()
+            cpu, wall = time.process_time(), time.perf_counter()
+            downloader.download(on_data=lambda data: None)
+            wall = time.perf_counter() - wall
+            cpu = time.process_time() - cpu
+            rss = peak_rss()
+    finally:
+        set_engine(None)
+
+    return {
+        **case,
+        "seconds": wall,
+        "mbps": case["size"] / wall / (1 << 20),
+        "cpu": cpu,
+        "rss_mb": rss,
+        "rss_delta_mb": rss - rss_start if rss is not None else None,
+    }
+
+
+def make_cases(args: argparse.Namespace) -> list:
+    """Build the cases of the benchmark (without sizes of the served assets)"""
+    cases = []
+    for index, size in enumerate(args.sizes):
+        for mode in args.modes:
+            # the adaptive mode start as the application does
+            chunk_sizes = [1 << 10] if mode == "adaptive" else args.chunk_sizes
+            for chunk_size in chunk_sizes:
+                cases.append(
+                    {
+                        "asset": "zip",
+                        "version": f"v0.{index}.0",
+                        "mb": size,
+                        "mode": mode,
+                        "chunk_size": chunk_size,
+                    }
+                )
+
+    for mode in [m for m in args.modes if m in ("stream", "adaptive")]:
+        chunk_sizes = [1 << 10] if mode == "adaptive" else args.chunk_sizes
+        for chunk_size in chunk_sizes:
+            cases.append(
+                {
+                    "asset": "beta",
+                    "mb": args.beta_size,
+                    "mode": mode,
+                    "chunk_size": chunk_size,
+                }
+            )
+
+    return cases
+
+
+def serve_cases(server: StandInServer, cases: list):
+    """Serve the assets of the cases and set their actual sizes"""
+    served = {}
+    for case in cases:
+        if case["asset"] == "zip":
+            url = ZipDownloader(version=case["version"]).url
+            data = served.get(url) or synthetic_zip(case["version"], case["mb"] << 20)
+        else:
+            url = BetaDownloader(device="amigo", binary_type="kboot.kfpkg").url
+            data = served.get(url) or os.urandom(case["mb"] << 20)
+
+        served[url] = data
+        server.add(url, data)
+        case["size"] = len(data)
+
+
+def run(args: argparse.Namespace) -> list:
+    """Run each case :attr:`args.repeat` times and keep the median run"""
+    cases = make_cases(args)
+    results = []
+    context = multiprocessing.get_context("spawn")
+    with StandInServer(latency=args.latency, bandwidth=args.bandwidth) as server:
+        serve_cases(server=server, cases=cases)
+        for case in cases:
+            runs = []
+            for _ in range(args.repeat):
+                with context.Pool(processes=1) as pool:
+                    runs.append(pool.apply(run_case, (server.base_url, case)))
+
+            median = statistics.median_low([r["seconds"] for r in runs])
+            result = next(r for r in runs if r["seconds"] == median)
+            results.append(result)
+            print_result(result)
+
+    return results
+
+
+def print_result(result: dict):
+    """Print a row of the benchmark table"""
+    delta = result["rss_delta_mb"]
+    rss = f"{delta:10.1f}" if delta is not None else " " * 10
+    print(
+        f"{result['asset']:<5} {result['mode']:<10} {result['mb']:>6} MB "
+        + f"{result['chunk_size'] >> 10:>6} KB {result['mbps']:>10.2f} MB/s "
+        + f"{result['cpu']:>8.3f} s cpu {rss} MB peak RSS growth",
+        flush=True,
+    )
+
+
+def parse_args(argv: list) -> argparse.Namespace:
+    """Parse command line arguments"""
+
+    def numbers(value: str) -> list:
+        return [int(v) for v in value.split(",") if v]
+
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[1])
+    parser.add_argument("--sizes", type=numbers, default=[8, 32], help="zip MB")
+    parser.add_argument("--beta-size", type=int, default=2, help="beta binary MB")
+    parser.add_argument("--chunk-sizes", type=numbers, default=[8, 64, 1024], help="KB")
+    parser.add_argument(
+        "--modes",
+        type=lambda v: [m for m in v.split(",") if m in MODES],
+        default=list(MODES),
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds")
+    parser.add_argument("--bandwidth", type=float, default=None, help="MB/s cap")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", default=None, help="write results to a file")
+
+    args = parser.parse_args(argv)
+    args.chunk_sizes = [size << 10 for size in args.chunk_sizes]
+    if args.bandwidth is not None:
+        args.bandwidth = int(args.bandwidth * (1 << 20))
+    return args
+
+
+def main(argv: list | None = None):
+    """Run the benchmark from the command line"""
+    args = parse_args(sys.argv[1:] if argv is None else argv)
+    results = run(args)
+    if args.json is not None:
+        with open(args.json, "w", encoding="utf8") as file:
+            json.dump(results, file, indent=2)
+
+
+if __name__ == "__main__":
+    main()
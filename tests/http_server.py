@@ -0,0 +1,287 @@
+"""
+http_server.py
+
+Local HTTP stand-in of github for the downloader tests and benchmarks.
+
+Assets are served on the mirror layout of `src.utils.mirror`
+(`/<host>/<path>`), so a canonical url like
+
+    https://github.com/selfcustody/krux/releases/download/v0.0.1/krux-v0.0.1.zip
+
+is served at
+
+    http://127.0.0.1:<port>/github.com/selfcustody/krux/releases/download/v0.0.1/krux-v0.0.1.zip
+
+with byte ranges (`Range`, `If-Range`), ETags (`If-None-Match`),
+redirects and, optionally, chunked transfer encoding. Latency, per connection bandwidth
+caps and dropped connections can be injected to reproduce slow or
+unreliable networks.
+"""
+
+import io
+import time
+import random
+import typing
+import zipfile
+import hashlib
+import threading
+import contextlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest.mock import patch
+from src.utils.mirror import mirror_url
+
+DEVICES = ("m5stickv", "amigo", "dock", "bit", "yahboom", "cube", "wonder_mv")
+
+LAST_MODIFIED = "Mon, 01 Jul 2024 00:00:00 GMT"
+
+
+def synthetic_zip(version: str, size: int) -> bytes:
+    """
+    Build a release zip of about :attr:`size` bytes, laid out like the real
+    ones, with (deterministic) incompressible binaries for each device
+    """
+    rng = random.Random(size)
+    part = max(1, size // (2 * len(DEVICES)))
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_STORED) as zip_file:
+        for device in DEVICES:
+            for name in ("firmware.bin", "kboot.kfpkg"):
+                zip_file.writestr(
+                    f"krux-{version}/maixpy_{device}/{name}", rng.randbytes(part)
+                )
+    return buffer.getvalue()
+
+
+def parse_range(value: str, size: int) -> typing.Tuple[int, int] | None:
+    """Parse a single `bytes=start-[end]` range, or None if unsatisfiable"""
+    unit, _, spec = value.partition("=")
+    start, _, end = spec.partition("-")
+    if unit.strip() != "bytes" or not start.isdigit() or int(start) >= size:
+        return None
+
+    end = min(int(end), size - 1) if end.isdigit() else size - 1
+    return (int(start), end) if int(start) <= end else None
+
+
+@contextlib.contextmanager
+def routing(base_url: str):
+    """
+    Send the downloads to the server at :attr:`base_url` only, as a single
+    mirror without fallback to upstream, so they never reach the network
+    """
+    with contextlib.ExitStack() as stack:
+        for module in ("stream_downloader", "asset_downloader", "remote_zip"):
+            stack.enter_context(
+                patch(
+                    f"src.utils.downloader.{module}.sources",
+                    side_effect=lambda url: [mirror_url(base=base_url, url=url)],
+                )
+            )
+        yield base_url
+
+
+class StandInHandler(BaseHTTPRequestHandler):
+    """Answer GET and HEAD requests with the assets of a :class:`StandInServer`"""
+
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.stand_in.connect()
+
+    def do_HEAD(self):  # pylint: disable=invalid-name
+        self.answer(body=False)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.answer(body=True)
+
+    def send_empty(self, code: int, headers: typing.Dict[str, str] | None = None):
+        """Send a response without body"""
+        self.send_response(code)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def answer(self, body: bool):
+        """Answer a request for an asset, honouring ranges and conditions"""
+        server = self.server.stand_in
+        server.record(method=self.command, path=self.path, headers=self.headers)
+        time.sleep(server.options["latency"])
+
+        location = server.redirects.get(self.path)
+        if location is not None:
+            self.send_empty(302, {"Location": location})
+            return
+
+        data = server.assets.get(self.path)
+        if data is None:
+            self.send_empty(404)
+            return
+
+        etag = f'"{hashlib.sha256(data).hexdigest()[:16]}"'
+        if self.headers.get("If-None-Match") == etag:
+            self.send_empty(304, {"ETag": etag})
+            return
+
+        start, end, status = 0, len(data) - 1, 200
+        if "Range" in self.headers and self.headers.get("If-Range", etag) == etag:
+            _range = parse_range(self.headers["Range"], len(data))
+            if _range is None:
+                self.send_empty(416, {"Content-Range": f"bytes */{len(data)}"})
+                return
+            start, end = _range
+            status = 206
+
+        chunked = server.options["chunked"] and status == 200
+        self.send_response(status)
+        self.send_header("Accept-Ranges", "bytes")
+        self.send_header("ETag", etag)
+        self.send_header("Last-Modified", LAST_MODIFIED)
+        if status == 206:
+            self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.send_header("Content-Length", str(end - start + 1))
+        self.end_headers()
+
+        if body:
+            self.send_body(memoryview(data)[start : end + 1], chunked=chunked)
+
+    def send_body(self, data: memoryview, chunked: bool):
+        """
+        Write :attr:`data` in blocks, paced by the bandwidth cap, and
+        close the connection midway when a drop is due
+        """
+        options = self.server.stand_in.options
+        drop_after = self.server.stand_in.take_drop()
+        started = time.perf_counter()
+        sent = 0
+
+        while sent < len(data):
+            block = data[sent : sent + options["block"]]
+            if drop_after is not None and sent + len(block) > drop_after:
+                block = block[: max(0, drop_after - sent)]
+
+            if chunked:
+                self.wfile.write(f"{len(block):x}\r\n".encode())
+            self.wfile.write(block)
+            if chunked:
+                self.wfile.write(b"\r\n")
+            sent += len(block)
+
+            if drop_after is not None and sent >= drop_after:
+                self.wfile.flush()
+                self.close_connection = True
+                return
+
+            if options["bandwidth"]:
+                ahead = sent / options["bandwidth"] - (time.perf_counter() - started)
+                if ahead > 0:
+                    time.sleep(ahead)
+
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+
+class StandInServer:
+    """
+    Threaded local HTTP server of synthetic assets (see module docs).
+
+    :attr:`options` can be changed between requests: `latency` (seconds
+    before each answer), `bandwidth` (bytes per second of each connection,
+    or None), `chunked` (answer full contents without Content-Length),
+    `drop_after` and `drops` (close that many responses after sending
+    `drop_after` bytes of their bodies) and `block` (bytes per write).
+    """
+
+    def __init__(self, **options):
+        self.assets = {}
+        self.redirects = {}
+        self.options = {
+            "latency": 0.0,
+            "bandwidth": None,
+            "chunked": False,
+            "drop_after": None,
+            "drops": 1,
+            "block": 64 << 10,
+        }
+        self.options.update(options)
+        self.requests = []
+        self.connections = 0
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), StandInHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.stand_in = self
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        """Base url of the server, usable as a mirror"""
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StandInServer":
+        """Serve on a daemon thread"""
+        self._thread = threading.Thread(
+            target=self._httpd.serve_forever,
+            args=(0.05,),
+            name="stand-in",
+            daemon=True,
+        )
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop serving and close the listening socket"""
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._thread.join()
+
+    def __enter__(self) -> "StandInServer":
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def local(self, url: str) -> str:
+        """Get where a canonical :attr:`url` is served"""
+        return mirror_url(base=self.base_url, url=url)
+
+    def add(self, url: str, data: bytes) -> str:
+        """Serve :attr:`data` for a canonical :attr:`url` and get its local url"""
+        local = self.local(url)
+        self.assets[local[len(self.base_url) :]] = data
+        return local
+
+    def redirect(self, url: str, location: str) -> str:
+        """Redirect the requests of a canonical :attr:`url` to :attr:`location`"""
+        local = self.local(url)
+        self.redirects[local[len(self.base_url) :]] = location
+        return local
+
+    def record(self, method: str, path: str, headers: typing.Mapping[str, str]):
+        """Keep the method, path and headers of a request"""
+        with self._lock:
+            self.requests.append((method, path, dict(headers)))
+
+    def connect(self):
+        """Count an accepted connection"""
+        with self._lock:
+            self.connections += 1
+
+    def take_drop(self) -> int | None:
+        """Get after how many body bytes the current response is dropped"""
+        with self._lock:
+            if self.options["drop_after"] is None or self.options["drops"] <= 0:
+                return None
+            self.options["drops"] -= 1
+            return self.options["drop_after"]
+
+    def routing(self) -> typing.ContextManager:
+        """Send the downloads to this server only (see :func:`routing`)"""
+        return routing(base_url=self.base_url)
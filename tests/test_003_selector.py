@@ -1,7 +1,8 @@
 from unittest import TestCase
 from unittest.mock import MagicMock, patch
 import requests
-from src.utils.selector import Selector
+from src.utils.selector import Selector, get_offline_releases, set_offline_releases
+from src.utils.retry import RetryPolicy
 
 
 MOCKED_EMPTY_API = []
@@ -19,16 +20,16 @@ MOCKED_FOUND_API = [
 
 class TestSelector(TestCase):
 
-    @patch("src.utils.selector.requests")
-    def test_init(self, mock_requests):
+    @patch("src.utils.selector.get_session")
+    def test_init(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         selector = Selector()
 
-        mock_requests.get.assert_called_once_with(
+        mock_get_session.return_value.get.assert_called_once_with(
             url="https://api.github.com/repos/selfcustody/krux/releases",
             headers={
                 "Accept": "application/vnd.github+json",
@@ -41,12 +42,12 @@ class TestSelector(TestCase):
         self.assertEqual(selector.releases[1], "v0.1.0")
         self.assertEqual(selector.releases[2], "v1.0.0")
 
-    @patch("src.utils.selector.requests")
-    def test_fail_init_empty_data(self, mock_requests):
+    @patch("src.utils.selector.get_session")
+    def test_fail_init_empty_data(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_EMPTY_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(ValueError) as exc_info:
             Selector()
@@ -56,12 +57,12 @@ class TestSelector(TestCase):
             "https://api.github.com/repos/selfcustody/krux/releases returned empty data",
         )
 
-    @patch("src.utils.selector.requests")
-    def test_fail_init_wrong_data(self, mock_requests):
+    @patch("src.utils.selector.get_session")
+    def test_fail_init_wrong_data(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_WRONG_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(KeyError) as exc_info:
             Selector()
@@ -70,68 +71,100 @@ class TestSelector(TestCase):
             str(exc_info.exception), "\"Invalid key: 'tag_name' do not exist on api\""
         )
 
-    @patch("src.utils.selector.requests")
-    def test_fail_init_http_error_404(self, mock_requests):
+    @patch("src.utils.selector.get_session")
+    def test_fail_init_http_error_404(self, mock_get_session):
         mock_response = MagicMock(status_code=404)
         mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
             "Mocked 404"
         )
-        mock_requests.exceptions = requests.exceptions
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(RuntimeError) as exc_info:
             Selector()
 
         self.assertEqual(str(exc_info.exception), "Mocked 404")
 
-    @patch("src.utils.selector.requests")
-    def test_fail_init_http_error_500(self, mock_requests):
+    @patch("src.utils.selector.get_session")
+    def test_fail_init_http_error_500(self, mock_get_session):
         mock_response = MagicMock(status_code=500)
         mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
             "Mocked 500"
         )
-        mock_requests.exceptions = requests.exceptions
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(RuntimeError) as exc_info:
             Selector()
 
         self.assertEqual(str(exc_info.exception), "Mocked 500")
 
-    @patch("src.utils.selector.requests")
-    def test_fail_init_timeout(self, mock_requests):
+    @patch(
+        "src.utils.selector.get_policy",
+        new=lambda: RetryPolicy(attempts=3, base=0.001),
+    )
+    @patch("src.utils.selector.get_session")
+    def test_fail_init_timeout(self, mock_get_session):
         mock_response = MagicMock(status_code=404)
         mock_response.raise_for_status.side_effect = requests.exceptions.Timeout(
             "Mocked timeout"
         )
-        mock_requests.exceptions = requests.exceptions
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(RuntimeError) as exc_info:
             Selector()
 
         self.assertEqual(str(exc_info.exception), "Mocked timeout")
-
-    @patch("src.utils.selector.requests")
-    def test_fail_init_http_connection_error(self, mock_requests):
+        self.assertEqual(mock_get_session.return_value.get.call_count, 3)
+
+    @patch(
+        "src.utils.selector.get_policy",
+        new=lambda: RetryPolicy(attempts=3, base=0.001),
+    )
+    @patch("src.utils.selector.get_session")
+    def test_fail_init_http_connection_error(self, mock_get_session):
         mock_response = MagicMock(status_code=404)
         mock_response.raise_for_status.side_effect = (
             requests.exceptions.ConnectionError("Mocked connection")
         )
-        mock_requests.exceptions = requests.exceptions
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(RuntimeError) as exc_info:
             Selector()
 
         self.assertEqual(str(exc_info.exception), "Mocked connection")
+        self.assertEqual(mock_get_session.return_value.get.call_count, 3)
+
+    @patch("src.utils.selector.get_policy")
+    @patch("src.utils.selector.get_session")
+    def test_init_policy_on_retry(self, mock_get_session, mock_get_policy):
+        mock_timeout = MagicMock(status_code=504)
+        mock_timeout.raise_for_status.side_effect = requests.exceptions.Timeout(
+            "Mocked timeout"
+        )
+        mock_response = MagicMock(status_code=200)
+        mock_response.json.return_value = MOCKED_FOUND_API
+        mock_get_session.return_value.get.side_effect = [mock_timeout, mock_response]
+        on_retry = MagicMock()
 
-    @patch("src.utils.selector.requests")
-    def test_set_get_device(self, mock_requests):
+        selector = Selector(
+            policy=RetryPolicy(attempts=3, base=0.001), on_retry=on_retry
+        )
+        self.assertEqual(selector.releases[0], "v0.0.1")
+        on_retry.assert_called_once()
+        self.assertEqual(on_retry.call_args.args[:2], (2, 3))
+        mock_get_policy.assert_not_called()
+
+        # a single attempt policy dont retry
+        mock_get_session.return_value.get.side_effect = [mock_timeout, mock_response]
+        with self.assertRaises(RuntimeError):
+            Selector(policy=RetryPolicy(attempts=1), on_retry=on_retry)
+        on_retry.assert_called_once()
+
+    @patch("src.utils.selector.get_session")
+    def test_set_get_device(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         selector = Selector()
 
@@ -139,12 +172,12 @@ class TestSelector(TestCase):
             selector.device = device
             self.assertEqual(selector.device, device)
 
-    @patch("src.utils.selector.requests")
-    def test_fail_set_device(self, mock_requests):
+    @patch("src.utils.selector.get_session")
+    def test_fail_set_device(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(ValueError) as exc_info:
             selector = Selector()
@@ -152,27 +185,55 @@ class TestSelector(TestCase):
 
         self.assertEqual(str(exc_info.exception), "Device 'mock' is not valid")
 
-    @patch("src.utils.selector.requests")
-    def test_set_get_firmware(self, mock_requests):
+    @patch("src.utils.selector.get_session")
+    def test_set_get_firmware(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         selector = Selector()
         for version in ("v0.0.1", "v0.1.0", "v1.0.0"):
             selector.firmware = version
             self.assertTrue(selector.firmware in ("v0.0.1", "v0.1.0", "v1.0.0"))
 
-    @patch("src.utils.selector.requests")
-    def test_fail_set_firmware(self, mock_requests):
+    @patch("src.utils.selector.get_session")
+    def test_fail_set_firmware(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(ValueError) as exc_info:
             selector = Selector()
             selector.firmware = "v0.0.111"
 
         self.assertEqual(str(exc_info.exception), "Firmware 'v0.0.111' is not valid")
+
+    @patch("src.utils.selector.get_session")
+    def test_init_offline(self, mock_get_session):
+        try:
+            set_offline_releases(["v0.0.2", "odudex/krux_binaries", "v0.0.1"])
+            self.assertEqual(
+                get_offline_releases(), ["v0.0.2", "v0.0.1", "odudex/krux_binaries"]
+            )
+
+            selector = Selector()
+            mock_get_session.assert_not_called()
+            self.assertEqual(
+                selector.releases, ["v0.0.2", "v0.0.1", "odudex/krux_binaries"]
+            )
+            # the beta is listed only when given
+            set_offline_releases(["v0.0.2", "v0.0.1"])
+            self.assertEqual(Selector().releases, ["v0.0.2", "v0.0.1"])
+        finally:
+            set_offline_releases(None)
+
+        self.assertIsNone(get_offline_releases())
+
+    def test_fail_set_offline_releases(self):
+        with self.assertRaises(ValueError) as exc_info:
+            set_offline_releases([])
+
+        self.assertEqual(str(exc_info.exception), "Invalid offline releases: []")
+        self.assertIsNone(get_offline_releases())
@@ -1,5 +1,7 @@
+import hashlib
 from unittest import TestCase
-from unittest.mock import patch
+from unittest.mock import MagicMock, patch
+from src.utils.digest import DigestObserver
 from src.utils.downloader.trigger_downloader import TriggerDownloader
 from .shared_mocks import PropertyInstanceMock
 
@@ -46,3 +48,74 @@ class TestTriggerDownloader(TestCase):
             downloader.chunk_size = 1025
 
         self.assertEqual(str(exc_info.exception), "1025 isnt a power of 2")
+
+    def test_init_adaptive(self):
+        downloader = TriggerDownloader(url=URL)
+        self.assertFalse(downloader.adaptive)
+        self.assertEqual(downloader.chunk_sizes, [])
+
+        downloader.adaptive = True
+        self.assertTrue(downloader.adaptive)
+
+    def test_adapt_chunk_size_grow_on_fast_transfer(self):
+        downloader = TriggerDownloader(url=URL)
+        downloader.adaptive = True
+        downloader.downloaded_len = 4096
+
+        size = downloader.adapt_chunk_size(elapsed=0.001, callback_elapsed=0.0001)
+
+        self.assertEqual(size, 2048)
+        self.assertEqual(downloader.chunk_size, 2048)
+        self.assertEqual(downloader.chunk_sizes, [(4096, 2048)])
+
+    def test_adapt_chunk_size_grow_on_expensive_callback(self):
+        downloader = TriggerDownloader(url=URL)
+        downloader.adaptive = True
+        downloader.chunk_size = 4096
+
+        size = downloader.adapt_chunk_size(elapsed=0.04, callback_elapsed=0.06)
+        self.assertEqual(size, 8192)
+
+    def test_adapt_chunk_size_shrink_on_slow_transfer(self):
+        downloader = TriggerDownloader(url=URL)
+        downloader.adaptive = True
+        downloader.chunk_size = 4096
+
+        size = downloader.adapt_chunk_size(elapsed=0.5, callback_elapsed=0.001)
+        self.assertEqual(size, 2048)
+        self.assertEqual(downloader.chunk_sizes, [(0, 2048)])
+
+    def test_adapt_chunk_size_keep(self):
+        downloader = TriggerDownloader(url=URL)
+        downloader.adaptive = True
+        downloader.chunk_size = 4096
+
+        size = downloader.adapt_chunk_size(elapsed=0.05, callback_elapsed=0.001)
+        self.assertEqual(size, 4096)
+        self.assertEqual(downloader.chunk_sizes, [])
+
+    def test_adapt_chunk_size_bounds(self):
+        downloader = TriggerDownloader(url=URL)
+        downloader.adaptive = True
+
+        downloader.chunk_size = TriggerDownloader.MAX_CHUNK_SIZE
+        size = downloader.adapt_chunk_size(elapsed=0.0, callback_elapsed=0.0)
+        self.assertEqual(size, TriggerDownloader.MAX_CHUNK_SIZE)
+
+        downloader.chunk_size = TriggerDownloader.MIN_CHUNK_SIZE
+        size = downloader.adapt_chunk_size(elapsed=1.0, callback_elapsed=0.0)
+        self.assertEqual(size, TriggerDownloader.MIN_CHUNK_SIZE)
+        self.assertEqual(downloader.chunk_sizes, [])
+
+    def test_hexdigest(self):
+        downloader = TriggerDownloader(url=URL)
+        self.assertEqual(downloader.observers, [])
+        self.assertIsNone(downloader.hexdigest())
+
+        observer = DigestObserver(name="sha256")
+        observer.update(b"krux")
+        downloader.observers.append(MagicMock())
+        downloader.observers.append(observer)
+
+        self.assertEqual(downloader.hexdigest(), hashlib.sha256(b"krux").hexdigest())
+        self.assertIsNone(downloader.hexdigest(name="sha512"))
@@ -2,7 +2,10 @@ import io
 from unittest import TestCase
 from unittest.mock import patch, MagicMock, call
 import requests
+import urllib3
+from src.utils.downloader.cancel_token import DownloadCancelled
 from src.utils.downloader.stream_downloader import StreamDownloader
+from src.utils.retry import RetryPolicy
 
 URL = "https://github.com/selfcustody/krux"
 
@@ -43,18 +46,18 @@ class TestStreamDownloader(TestCase):
 
         on_data.assert_has_calls(calls, any_order=True)
 
-    @patch("src.utils.downloader.stream_downloader.requests")
-    def test_download_file_stream(self, mock_requests):
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_file_stream(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.headers = {"Content-Length": "210000"}
         mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         sd = StreamDownloader(url=URL)
         sd.download_file_stream(url="https://any.call/test.zip")
 
-        mock_requests.get.assert_called_once_with(
+        mock_get_session.return_value.get.assert_called_once_with(
             url="https://any.call/test.zip",
             stream=True,
             headers={
@@ -65,10 +68,12 @@ class TestStreamDownloader(TestCase):
             },
             timeout=30,
         )
-        mock_requests.get.return_value.iter_content.assert_called_with(chunk_size=1024)
+        mock_get_session.return_value.get.return_value.iter_content.assert_called_with(
+            chunk_size=1024
+        )
 
-    @patch("src.utils.downloader.stream_downloader.requests")
-    def test_download_file_stream_process_data(self, mock_requests):
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_file_stream_process_data(self, mock_get_session):
         # fake a zip file to be downloaded
         file = io.BytesIO()
 
@@ -87,7 +92,7 @@ class TestStreamDownloader(TestCase):
         mock_response.headers = {"Content-Length": "210000"}
         mock_response.json.return_value = MOCKED_FOUND_API
         mock_response.iter_content.return_value = stream
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         sd = StreamDownloader(url=URL)
 
@@ -99,7 +104,7 @@ class TestStreamDownloader(TestCase):
         # download
         sd.download_file_stream(url="https://any.call/test.zip")
 
-        mock_requests.get.assert_called_once_with(
+        mock_get_session.return_value.get.assert_called_once_with(
             url="https://any.call/test.zip",
             stream=True,
             headers={
@@ -110,46 +115,157 @@ class TestStreamDownloader(TestCase):
             },
             timeout=30,
         )
-        mock_requests.get.return_value.iter_content.assert_called_with(chunk_size=1024)
+        mock_get_session.return_value.get.return_value.iter_content.assert_called_with(
+            chunk_size=1024
+        )
         assert len(on_data.mock_calls) > 0
         on_data.assert_has_calls([call()(data=[])], any_order=True)
 
-    @patch("src.utils.downloader.stream_downloader.requests")
-    def test_fail_download_file_stream_no_content_len_header(self, mock_requests):
+    @patch("src.utils.downloader.stream_downloader.time.perf_counter")
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_file_stream_adaptive(self, mock_get_session, mock_perf_counter):
+        data = io.BytesIO(b"0" * 7168)
+
         mock_response = MagicMock()
         mock_response.status_code = 200
-        mock_response.headers = MagicMock()
-        mock_response.headers = {"No-Content-Length": "210000"}
-        mock_response.json.return_value = MOCKED_FOUND_API
-        mock_requests.get.return_value = mock_response
+        mock_response.headers = {"Content-Length": "7168"}
+        mock_response.raw.read.side_effect = lambda amt, decode_content: data.read(amt)
+        mock_get_session.return_value.get.return_value = mock_response
+
+        # every read and callback takes 1ms, so chunks grow
+        mock_perf_counter.side_effect = [i * 0.001 for i in range(100)]
+
+        sd = StreamDownloader(url=URL)
+        sd.adaptive = True
+        sd.on_data = MagicMock()
+        sd.download_file_stream(url="https://any.call/test.zip")
+
+        mock_response.iter_content.assert_not_called()
+        mock_response.raw.read.assert_has_calls(
+            [
+                call(1024, decode_content=True),
+                call(2048, decode_content=True),
+                call(4096, decode_content=True),
+                call(8192, decode_content=True),
+            ]
+        )
+        self.assertEqual(
+            [c.kwargs["data"] for c in sd.on_data.call_args_list],
+            [b"0" * 1024, b"0" * 2048, b"0" * 4096],
+        )
+        self.assertEqual(sd.downloaded_len, 7168)
+        self.assertEqual(
+            sd.chunk_sizes, [(0, 1024), (1024, 2048), (3072, 4096), (7168, 8192)]
+        )
+        mock_response.close.assert_called_once()
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=1),
+    )
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_download_file_stream_adaptive_interrupted(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "7168"}
+        mock_response.raw.read.side_effect = urllib3.exceptions.ProtocolError(
+            "Connection broken"
+        )
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd = StreamDownloader(url=URL)
+        sd.adaptive = True
+        sd.on_data = MagicMock()
 
         with self.assertRaises(RuntimeError) as exc_info:
-            sd = StreamDownloader(url=URL)
             sd.download_file_stream(url="https://any.call/test.zip")
 
         self.assertEqual(
-            str(exc_info.exception),
-            "Empty Content-Length response for https://any.call/test.zip",
+            str(exc_info.exception), "Download interrupted at 0: Connection broken"
         )
+        mock_response.close.assert_called_once()
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_file_stream_not_modified(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 304
+        mock_response.headers = {"ETag": '"mocked"'}
+        mock_get_session.return_value.get.return_value = mock_response
 
-        mock_requests.get.assert_called_once_with(
+        sd = StreamDownloader(url=URL)
+        sd.on_data = MagicMock()
+        modified = sd.download_file_stream(
             url="https://any.call/test.zip",
-            stream=True,
-            headers={
-                "Content-Disposition": "attachment filename=test.zip",
-                "Connection": "keep-alive",
-                "Cache-Control": "max-age=0",
-                "Accept-Encoding": "gzip, deflate, br",
+            conditions={
+                "etag": '"mocked"',
+                "last_modified": "Wed, 21 Oct 2015 07:28:00 GMT",
             },
-            timeout=30,
         )
 
-    @patch("src.utils.downloader.stream_downloader.requests")
-    def test_fail_server_error_download_file_stream(self, mock_requests):
+        self.assertFalse(modified)
+        headers = mock_get_session.return_value.get.call_args.kwargs["headers"]
+        self.assertEqual(headers["If-None-Match"], '"mocked"')
+        self.assertEqual(headers["If-Modified-Since"], "Wed, 21 Oct 2015 07:28:00 GMT")
+        self.assertEqual(sd.validators, {"etag": '"mocked"', "last_modified": None})
+        sd.on_data.assert_not_called()
+        mock_response.iter_content.assert_not_called()
+        mock_response.close.assert_called_once()
+
+    def test_mark_complete(self):
+        sd = StreamDownloader(url=URL)
+        sd.mark_complete(size=4)
+        self.assertEqual(sd.downloaded_len, 4)
+        self.assertEqual(sd.content_len, 4)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_file_stream_no_content_len_header(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Transfer-Encoding": "chunked"}
+        mock_response.iter_content.return_value = [b"a" * 3, b"b" * 4]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd = StreamDownloader(url=URL)
+        progress = []
+        sd.on_data = MagicMock(
+            side_effect=lambda data: progress.append(
+                (data, sd.downloaded_len, sd.content_len)
+            )
+        )
+        self.assertTrue(sd.download_file_stream(url="https://any.call/test.zip"))
+
+        # length is unknown while streaming and
+        # the end of stream is signaled with no data
+        self.assertEqual(progress, [(b"aaa", 3, 0), (b"bbbb", 7, 0), (b"", 7, 7)])
+        self.assertEqual(sd.downloaded_len, 7)
+        self.assertEqual(sd.content_len, 7)
+        mock_response.close.assert_called_once()
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_file_stream_no_content_len_header_adaptive(
+        self, mock_get_session
+    ):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {}
+        mock_response.raw.read.side_effect = [b"a" * 5, b""]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd = StreamDownloader(url=URL)
+        sd.adaptive = True
+        sd.on_data = MagicMock()
+        sd.download_file_stream(url="https://any.call/test.zip")
+
+        self.assertEqual(sd.content_len, 5)
+        self.assertEqual(
+            sd.on_data.call_args_list, [call(data=b"aaaaa"), call(data=b"")]
+        )
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_server_error_download_file_stream(self, mock_get_session):
         mock_response = MagicMock(status_code=500)
         mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError()
-        mock_requests.exceptions = requests.exceptions
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(RuntimeError) as exc_info:
             sd = StreamDownloader(url=URL)
@@ -157,12 +273,15 @@ class TestStreamDownloader(TestCase):
 
         self.assertEqual(str(exc_info.exception), "HTTP error 500: None")
 
-    @patch("src.utils.downloader.stream_downloader.requests")
-    def test_fail_timeout_download_file_stream(self, mock_requests):
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=3, base=0.001),
+    )
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_timeout_download_file_stream(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.raise_for_status.side_effect = requests.exceptions.Timeout()
-        mock_requests.exceptions = requests.exceptions
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(RuntimeError) as exc_info:
             sd = StreamDownloader(url=URL)
@@ -170,17 +289,345 @@ class TestStreamDownloader(TestCase):
 
         self.assertEqual(str(exc_info.exception), "Download timeout error: None")
 
-    @patch("src.utils.downloader.stream_downloader.requests")
-    def test_fail_connection_download_file_stream(self, mock_requests):
+        # transient errors are retried before giving up
+        self.assertEqual(mock_get_session.return_value.get.call_count, 3)
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=3, base=0.001),
+    )
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_connection_download_file_stream(self, mock_get_session):
         mock_response = MagicMock()
         mock_response.raise_for_status.side_effect = (
             requests.exceptions.ConnectionError()
         )
-        mock_requests.exceptions = requests.exceptions
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         with self.assertRaises(RuntimeError) as exc_info:
             sd = StreamDownloader(url=URL)
             sd.download_file_stream(url="https://any.request/test.zip")
 
         self.assertEqual(str(exc_info.exception), "Download connection error: None")
+
+        # transient errors are retried before giving up
+        self.assertEqual(mock_get_session.return_value.get.call_count, 3)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_file_stream_range(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 206
+        mock_response.headers = {
+            "Content-Length": "10000",
+            "Content-Range": "bytes 200000-209999/210000",
+            "ETag": '"mocked"',
+        }
+        mock_response.iter_content.return_value = [b"0" * 10000]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd = StreamDownloader(url=URL)
+        sd.on_data = MagicMock()
+        sd.download_file_stream(
+            url="https://any.call/test.zip", offset=200000, validator='"mocked"'
+        )
+
+        mock_get_session.return_value.get.assert_called_once_with(
+            url="https://any.call/test.zip",
+            stream=True,
+            headers={
+                "Content-Disposition": "attachment filename=test.zip",
+                "Connection": "keep-alive",
+                "Cache-Control": "max-age=0",
+                "Accept-Encoding": "identity",
+                "Range": "bytes=200000-",
+                "If-Range": '"mocked"',
+            },
+            timeout=30,
+        )
+        self.assertEqual(sd.offset, 200000)
+        self.assertEqual(sd.downloaded_len, 210000)
+        self.assertEqual(sd.content_len, 210000)
+        self.assertEqual(sd.validators, {"etag": '"mocked"', "last_modified": None})
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_file_stream_range_ignored(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "210000"}
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd = StreamDownloader(url=URL)
+        sd.download_file_stream(url="https://any.call/test.zip", offset=200000)
+
+        self.assertEqual(sd.offset, 0)
+        self.assertEqual(sd.downloaded_len, 0)
+        self.assertEqual(sd.content_len, 210000)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_download_file_stream_range_mismatch(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 206
+        mock_response.headers = {"Content-Range": "bytes 0-209999/210000"}
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with self.assertRaises(RuntimeError) as exc_info:
+            sd = StreamDownloader(url=URL)
+            sd.download_file_stream(url="https://any.call/test.zip", offset=200000)
+
+        self.assertEqual(
+            str(exc_info.exception), "Expected range from 200000, got from 0"
+        )
+
+    def test_fail_parse_content_range(self):
+        with self.assertRaises(RuntimeError) as exc_info:
+            StreamDownloader.parse_content_range("items 0-1/2")
+
+        self.assertEqual(str(exc_info.exception), "Invalid Content-Range: items 0-1/2")
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=1),
+    )
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_download_file_stream_interrupted(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "210000"}
+        mock_response.iter_content.side_effect = (
+            requests.exceptions.ChunkedEncodingError("mocked")
+        )
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with self.assertRaises(RuntimeError) as exc_info:
+            sd = StreamDownloader(url=URL)
+            sd.on_data = MagicMock()
+            sd.download_file_stream(url="https://any.call/test.zip")
+
+        self.assertEqual(str(exc_info.exception), "Download interrupted at 0: mocked")
+        mock_response.close.assert_called_once()
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_cancel_between_chunks(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "12"}
+        mock_response.iter_content.return_value = [b"kr", b"ux", b"!!"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd = StreamDownloader(url=URL)
+        sd.on_data = MagicMock(side_effect=lambda data: sd.token.cancel())
+
+        with self.assertRaises(DownloadCancelled) as exc_info:
+            sd.download_file_stream(url="https://any.call/test.zip")
+
+        self.assertEqual(str(exc_info.exception), "Download cancelled at 2")
+        sd.on_data.assert_called_once_with(data=b"kr")
+
+        # the cancel closed the response
+        # and it was closed again at the end
+        self.assertEqual(mock_response.close.call_count, 2)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_cancel_blocked_read(self, mock_get_session):
+        sd = StreamDownloader(url=URL)
+
+        def iter_content(**_):
+            yield b"kr"
+            # a cancel from other thread close the
+            # response and the blocked read fails
+            sd.token.cancel()
+            raise AttributeError("'NoneType' object has no attribute 'read'")
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "12"}
+        mock_response.iter_content.side_effect = iter_content
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd.on_data = MagicMock()
+        with self.assertRaises(DownloadCancelled) as exc_info:
+            sd.download_file_stream(url="https://any.call/test.zip")
+
+        self.assertEqual(str(exc_info.exception), "Download cancelled at 2")
+
+    @patch("src.utils.downloader.stream_downloader.sources")
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_failover_before_data(self, mock_get_session, mock_sources):
+        mock_sources.return_value = ["http://mirror/test.zip", URL]
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "4"}
+        mock_response.iter_content.return_value = [b"krux"]
+        mock_get_session.return_value.get.side_effect = [
+            requests.exceptions.ConnectionError(),
+            mock_response,
+        ]
+
+        sd = StreamDownloader(url=URL)
+        sd.on_data = MagicMock()
+        self.assertTrue(sd.download_file_stream(url=URL))
+
+        urls = [c.kwargs["url"] for c in mock_get_session.return_value.get.mock_calls]
+        self.assertEqual(urls, ["http://mirror/test.zip", URL])
+        sd.on_data.assert_called_once_with(data=b"krux")
+        self.assertEqual(sd.downloaded_len, 4)
+
+    @patch("src.utils.downloader.stream_downloader.sources")
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_failover_mid_transfer(self, mock_get_session, mock_sources):
+        mock_sources.return_value = ["http://mirror/test.zip", URL]
+
+        def broken(**_):
+            yield b"kr"
+            raise requests.exceptions.ChunkedEncodingError("mocked")
+
+        first = MagicMock()
+        first.status_code = 200
+        first.headers = {"Content-Length": "5", "ETag": '"mirror"'}
+        first.iter_content.side_effect = broken
+
+        second = MagicMock()
+        second.status_code = 206
+        second.headers = {"Content-Range": "bytes 2-4/5", "Content-Length": "3"}
+        second.iter_content.return_value = [b"ux!"]
+        mock_get_session.return_value.get.side_effect = [first, second]
+
+        sd = StreamDownloader(url=URL)
+        sd.on_data = MagicMock()
+        self.assertTrue(sd.download_file_stream(url=URL))
+
+        # continue from the received data, without the
+        # validator of the first source
+        headers = mock_get_session.return_value.get.call_args.kwargs["headers"]
+        self.assertEqual(headers["Range"], "bytes=2-")
+        self.assertNotIn("If-Range", headers)
+        self.assertEqual(
+            sd.on_data.call_args_list, [call(data=b"kr"), call(data=b"ux!")]
+        )
+        self.assertEqual(sd.downloaded_len, 5)
+        self.assertEqual(sd.offset, 2)
+
+    @patch("src.utils.downloader.stream_downloader.sources")
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_failover_mid_transfer_without_range(
+        self, mock_get_session, mock_sources
+    ):
+        mock_sources.return_value = ["http://mirror/test.zip", URL]
+
+        def broken(**_):
+            yield b"kr"
+            raise requests.exceptions.ChunkedEncodingError("mocked")
+
+        first = MagicMock()
+        first.status_code = 200
+        first.headers = {"Content-Length": "5"}
+        first.iter_content.side_effect = broken
+
+        # the last source ignores the Range
+        second = MagicMock()
+        second.status_code = 200
+        second.headers = {"Content-Length": "5"}
+        mock_get_session.return_value.get.side_effect = [first, second]
+
+        sd = StreamDownloader(url=URL)
+        sd.on_data = MagicMock()
+        with self.assertRaises(RuntimeError) as exc_info:
+            sd.download_file_stream(url=URL)
+
+        self.assertEqual(str(exc_info.exception), f"{URL} cannot continue from 2")
+        second.iter_content.assert_not_called()
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=1),
+    )
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_download_file_stream_short_body(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "10"}
+        mock_response.iter_content.return_value = [b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd = StreamDownloader(url=URL)
+        sd.on_data = MagicMock()
+        with self.assertRaises(RuntimeError) as exc_info:
+            sd.download_file_stream(url="https://any.call/test.zip")
+
+        self.assertEqual(str(exc_info.exception), "Download interrupted at 4 of 10")
+        mock_response.close.assert_called_once()
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=3, base=0.001),
+    )
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_retry_download_file_stream_resume(self, mock_get_session):
+        def broken():
+            yield b"kr"
+            raise requests.exceptions.ChunkedEncodingError("mocked")
+
+        first = MagicMock()
+        first.status_code = 200
+        first.headers = {"Content-Length": "4", "ETag": '"mocked"'}
+        first.iter_content.side_effect = lambda chunk_size: broken()
+
+        second = MagicMock()
+        second.status_code = 206
+        second.headers = {"Content-Range": "bytes 2-3/4"}
+        second.iter_content.return_value = [b"ux"]
+        mock_get_session.return_value.get.side_effect = [first, second]
+
+        sd = StreamDownloader(url=URL)
+        sd.on_data = MagicMock()
+        sd.on_retry = MagicMock()
+        self.assertTrue(sd.download_file_stream(url="https://any.call/test.zip"))
+
+        self.assertEqual(
+            [c.kwargs["data"] for c in sd.on_data.call_args_list], [b"kr", b"ux"]
+        )
+        self.assertEqual(sd.downloaded_len, 4)
+        self.assertEqual(sd.on_retry.call_args.args[:2], (2, 3))
+
+        # the retry continues from the received data
+        headers = mock_get_session.return_value.get.call_args.kwargs["headers"]
+        self.assertEqual(headers["Range"], "bytes=2-")
+        self.assertEqual(headers["Accept-Encoding"], "identity")
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=3, base=0.001),
+    )
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_retry_download_file_stream_http_status(self, mock_get_session):
+        for status, calls in ((503, 3), (404, 1)):
+            mock_get_session.reset_mock()
+            mock_response = MagicMock(status_code=status)
+            mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
+                response=mock_response
+            )
+            mock_get_session.return_value.get.return_value = mock_response
+
+            sd = StreamDownloader(url=URL)
+            with self.assertRaises(RuntimeError) as exc_info:
+                sd.download_file_stream(url="https://any.call/test.zip")
+
+            self.assertEqual(str(exc_info.exception), f"HTTP error {status}: None")
+            self.assertEqual(mock_get_session.return_value.get.call_count, calls)
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=3, base=10.0),
+    )
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_cancel_while_retrying(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.raise_for_status.side_effect = requests.exceptions.Timeout()
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd = StreamDownloader(url=URL)
+        sd.on_retry = MagicMock(side_effect=lambda *args: sd.token.cancel())
+        with self.assertRaises(DownloadCancelled):
+            sd.download_file_stream(url="https://any.call/test.zip")
+
+        mock_get_session.return_value.get.assert_called_once()
@@ -1,8 +1,18 @@
 import io
+import os
+import json
+import hashlib
 import sys
+import tempfile
 from unittest import TestCase
 from unittest.mock import MagicMock, patch, mock_open
+import requests
+from src.utils import digest
+from src.utils.digest import DigestObserver
 from src.utils.downloader.asset_downloader import AssetDownloader
+from src.utils.downloader.cancel_token import DownloadCancelled
+from src.utils.downloader.segmented_downloader import SegmentedDownloader
+from src.utils.retry import RetryPolicy
 from .shared_mocks import PropertyInstanceMock
 
 MOCKED_FOUND_API = [
@@ -59,10 +69,13 @@ class TestAssetDownloader(TestCase):
 
         self.assertEqual(str(exc_info.exception), "Write Mode 'r' not supported")
 
+    @patch("src.utils.downloader.asset_downloader.os.replace")
     @patch("builtins.open", new_callable=mock_open)
     @patch("tempfile.gettempdir")
-    @patch("src.utils.downloader.stream_downloader.requests")
-    def test_download_wb(self, mock_requests, mock_gettempdir, open_mock):
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_wb(
+        self, mock_get_session, mock_gettempdir, open_mock, mock_replace
+    ):
         if sys.platform in ("linux", "darwin"):
             mock_gettempdir.return_value = "/tmp/dir"
 
@@ -83,7 +96,7 @@ class TestAssetDownloader(TestCase):
         mock_response.headers = {"Content-Length": "210000"}
         mock_response.json.return_value = MOCKED_FOUND_API
         mock_response.iter_content.return_value = stream
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         a = AssetDownloader(
             url="https://github.com/selfcustody/krux/asset.zip",
@@ -95,15 +108,24 @@ class TestAssetDownloader(TestCase):
         a.download(on_data=mock_on_data)
 
         if sys.platform in ("linux", "darwin"):
-            open_mock.assert_called_once_with("/tmp/dir/asset.zip", "wb")
+            open_mock.assert_called_once_with("/tmp/dir/asset.zip.tmp", "wb")
+            mock_replace.assert_called_once_with(
+                "/tmp/dir/asset.zip.tmp", "/tmp/dir/asset.zip"
+            )
 
         if sys.platform == "win32":
-            open_mock.assert_called_once_with("C:\\tmp\\dir\\asset.zip", "wb")
+            open_mock.assert_called_once_with("C:\\tmp\\dir\\asset.zip.tmp", "wb")
+            mock_replace.assert_called_once_with(
+                "C:\\tmp\\dir\\asset.zip.tmp", "C:\\tmp\\dir\\asset.zip"
+            )
 
+    @patch("src.utils.downloader.asset_downloader.os.replace")
     @patch("builtins.open", new_callable=mock_open)
     @patch("tempfile.gettempdir")
-    @patch("src.utils.downloader.stream_downloader.requests")
-    def test_download_w(self, mock_requests, mock_gettempdir, open_mock):
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_w(
+        self, mock_get_session, mock_gettempdir, open_mock, mock_replace
+    ):
         if sys.platform in ("linux", "darwin"):
             mock_gettempdir.return_value = "/tmp/dir"
 
@@ -122,7 +144,7 @@ class TestAssetDownloader(TestCase):
         mock_response = MagicMock()
         mock_response.status_code = 200
         mock_response.iter_content.return_value = stream
-        mock_requests.get.return_value = mock_response
+        mock_get_session.return_value.get.return_value = mock_response
 
         a = AssetDownloader(
             url="https://github.com/selfcustody/krux/asset.txt",
@@ -135,10 +157,600 @@ class TestAssetDownloader(TestCase):
 
         if sys.platform in ("linux", "darwin"):
             open_mock.assert_called_once_with(
-                "/tmp/dir/asset.txt", "w", encoding="utf8"
+                "/tmp/dir/asset.txt.tmp", "w", encoding="utf8"
+            )
+            mock_replace.assert_called_once_with(
+                "/tmp/dir/asset.txt.tmp", "/tmp/dir/asset.txt"
             )
 
         if sys.platform == "win32":
             open_mock.assert_called_once_with(
-                "C:\\tmp\\dir\\asset.txt", "w", encoding="utf8"
+                "C:\\tmp\\dir\\asset.txt.tmp", "w", encoding="utf8"
+            )
+            mock_replace.assert_called_once_with(
+                "C:\\tmp\\dir\\asset.txt.tmp", "C:\\tmp\\dir\\asset.txt"
+            )
+
+    @patch("tempfile.gettempdir")
+    def test_fail_init_sink(self, mock_gettempdir):
+        mock_gettempdir.return_value = "/tmp/dir"
+
+        with self.assertRaises(ValueError) as exc_info:
+            AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=mock_gettempdir(),
+                write_mode="wb",
+                sink="memory",
+            )
+
+        self.assertEqual(str(exc_info.exception), "Sink 'memory' not supported")
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_stream_sink(self, mock_get_session):
+        stream = [b"PK\x03\x04", b"\x14\x00\x00\x00", b"\x08\x00"]
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "10"}
+        mock_response.iter_content.return_value = stream
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+
+            mock_on_data = MagicMock()
+            destfile = a.download(on_data=mock_on_data)
+
+            self.assertEqual(destfile, os.path.join(tmpdir, "asset.zip"))
+            self.assertFalse(os.path.exists(f"{destfile}.part"))
+            with open(destfile, "rb") as file:
+                self.assertEqual(file.read(), b"".join(stream))
+
+            self.assertEqual(a.buffer.getvalue(), b"")
+            self.assertEqual(len(mock_on_data.mock_calls), 3)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_buffer_sink_keep_links(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "3"}
+        mock_response.iter_content.return_value = [b"new"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            # a file hard linked to another one, like assets to the cache
+            obj = os.path.join(tmpdir, "object")
+            with open(obj, "wb") as file:
+                file.write(b"old")
+            os.link(obj, os.path.join(tmpdir, "asset.sig"))
+
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.sig",
+                destdir=tmpdir,
+                write_mode="wb",
+            )
+            destfile = a.download(on_data=MagicMock())
+
+            with open(destfile, "rb") as file:
+                self.assertEqual(file.read(), b"new")
+            with open(obj, "rb") as file:
+                self.assertEqual(file.read(), b"old")
+            self.assertFalse(os.path.exists(f"{destfile}.tmp"))
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_stream_sink_digest(self, mock_get_session):
+        stream = [b"PK\x03\x04", b"\x14\x00\x00\x00", b"\x08\x00"]
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "10"}
+        mock_response.iter_content.return_value = stream
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+            a.observers.append(DigestObserver(name="sha256"))
+            destfile = a.download(on_data=MagicMock())
+
+            sha256 = hashlib.sha256(b"".join(stream)).hexdigest()
+            self.assertEqual(a.hexdigest(name="sha256"), sha256)
+            self.assertEqual(digest.recall(path=destfile, name="sha256"), sha256)
+            digest.forget(path=destfile)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_stream_sink_truncate_unused_space(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "4096", "Content-Encoding": "gzip"}
+        mock_response.iter_content.return_value = [b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+            destfile = a.download(on_data=MagicMock())
+            self.assertEqual(os.path.getsize(destfile), 4)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_download_stream_sink_keep_part(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "10", "ETag": '"mocked"'}
+        mock_response.iter_content.return_value = [b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+
+            with self.assertRaises(RuntimeError):
+                a.download(on_data=MagicMock(side_effect=RuntimeError("mocked")))
+
+            partfile = os.path.join(tmpdir, "asset.zip.part")
+            with open(partfile, "rb") as file:
+                self.assertEqual(file.read(4), b"krux")
+
+            with open(f"{partfile}.json", "r", encoding="utf8") as file:
+                state = json.load(file)
+
+            self.assertEqual(
+                state,
+                {
+                    "url": "https://github.com/selfcustody/krux/asset.zip",
+                    "offset": 4,
+                    "content_len": 10,
+                    "etag": '"mocked"',
+                    "last_modified": None,
+                },
+            )
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=1),
+    )
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_download_stream_sink_remove_empty_part(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.raise_for_status.side_effect = requests.exceptions.Timeout()
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+
+            with self.assertRaises(RuntimeError):
+                a.download(on_data=MagicMock())
+
+            self.assertEqual(os.listdir(tmpdir), [])
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_cancel_download_stream_sink_remove_part(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "10", "ETag": '"mocked"'}
+        mock_response.iter_content.return_value = [b"krux", b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+
+            with self.assertRaises(DownloadCancelled):
+                a.download(on_data=MagicMock(side_effect=lambda data: a.cancel()))
+
+            # nothing is kept to be resumed
+            self.assertEqual(os.listdir(tmpdir), [])
+            mock_response.close.assert_called()
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_cancel_download_buffer_sink(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "8"}
+        mock_response.iter_content.return_value = [b"krux", b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
             )
+
+            with self.assertRaises(DownloadCancelled):
+                a.download(on_data=MagicMock(side_effect=lambda data: a.cancel()))
+
+            self.assertEqual(a.buffer.getvalue(), b"")
+            self.assertEqual(os.listdir(tmpdir), [])
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_cancel_before_download(self, mock_get_session):
+        a = AssetDownloader(
+            url="https://github.com/selfcustody/krux/asset.zip",
+            destdir=tempfile.gettempdir(),
+            write_mode="wb",
+        )
+        a.cancel()
+
+        with self.assertRaises(DownloadCancelled) as exc_info:
+            a.download(on_data=MagicMock())
+
+        self.assertEqual(
+            str(exc_info.exception),
+            "Download of https://github.com/selfcustody/krux/asset.zip cancelled",
+        )
+        mock_get_session.return_value.get.assert_not_called()
+
+    @staticmethod
+    def make_part(tmpdir: str, data: bytes, state: dict) -> str:
+        partfile = os.path.join(tmpdir, "asset.zip.part")
+        with open(partfile, "wb") as file:
+            file.write(data)
+
+        with open(f"{partfile}.json", "w", encoding="utf8") as file:
+            json.dump(state, file)
+
+        return partfile
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_stream_sink_resume(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 206
+        mock_response.headers = {
+            "Content-Length": "2",
+            "Content-Range": "bytes 2-3/4",
+            "ETag": '"mocked"',
+        }
+        mock_response.iter_content.return_value = [b"ux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            partfile = TestAssetDownloader.make_part(
+                tmpdir,
+                b"kr",
+                {
+                    "url": "https://github.com/selfcustody/krux/asset.zip",
+                    "offset": 2,
+                    "etag": '"mocked"',
+                    "last_modified": None,
+                },
+            )
+
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+            a.observers.append(DigestObserver(name="sha256"))
+            destfile = a.download(on_data=MagicMock())
+
+            headers = mock_get_session.return_value.get.call_args.kwargs["headers"]
+            self.assertEqual(headers["Range"], "bytes=2-")
+            self.assertEqual(headers["If-Range"], '"mocked"')
+            self.assertEqual(a.downloaded_len, 4)
+            self.assertEqual(a.content_len, 4)
+
+            with open(destfile, "rb") as file:
+                self.assertEqual(file.read(), b"krux")
+
+            self.assertFalse(os.path.exists(partfile))
+            self.assertFalse(os.path.exists(f"{partfile}.json"))
+
+            # the observers see the bytes kept from the interrupted download
+            self.assertEqual(a.hexdigest(), hashlib.sha256(b"krux").hexdigest())
+            digest.forget(path=destfile)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_stream_sink_resume_ignored_range(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "4"}
+        mock_response.iter_content.return_value = [b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            TestAssetDownloader.make_part(
+                tmpdir,
+                b"xxxxxxxx",
+                {
+                    "url": "https://github.com/selfcustody/krux/asset.zip",
+                    "offset": 8,
+                    "etag": None,
+                    "last_modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+                },
+            )
+
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+            destfile = a.download(on_data=MagicMock())
+
+            headers = mock_get_session.return_value.get.call_args.kwargs["headers"]
+            self.assertEqual(headers["Range"], "bytes=8-")
+            self.assertEqual(headers["If-Range"], "Wed, 21 Oct 2015 07:28:00 GMT")
+            self.assertEqual(a.offset, 0)
+
+            with open(destfile, "rb") as file:
+                self.assertEqual(file.read(), b"krux")
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_stream_sink_ignore_complete_state(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "4"}
+        mock_response.iter_content.return_value = [b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            TestAssetDownloader.make_part(
+                tmpdir,
+                b"krux",
+                {
+                    "url": "https://github.com/selfcustody/krux/asset.zip",
+                    "offset": 4,
+                    "content_len": 4,
+                    "etag": '"mocked"',
+                },
+            )
+
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+            a.download(on_data=MagicMock())
+
+            headers = mock_get_session.return_value.get.call_args.kwargs["headers"]
+            self.assertNotIn("Range", headers)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_stream_sink_ignore_stale_state(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "4"}
+        mock_response.iter_content.return_value = [b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            TestAssetDownloader.make_part(
+                tmpdir,
+                b"kr",
+                {
+                    "url": "https://github.com/selfcustody/krux/other.zip",
+                    "offset": 2,
+                    "etag": '"mocked"',
+                },
+            )
+
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+            a.download(on_data=MagicMock())
+
+            headers = mock_get_session.return_value.get.call_args.kwargs["headers"]
+            self.assertNotIn("Range", headers)
+
+    @patch.object(SegmentedDownloader, "MIN_SEGMENT_SIZE", 4)
+    @patch("src.utils.downloader.segmented_downloader.get_session")
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_stream_sink_segmented(
+        self, mock_get_session, mock_head_get_session
+    ):
+        data = b"kruxkrux"
+
+        def mock_get(*_args, headers, **_kwargs):
+            start, end = [int(n) for n in headers["Range"][6:].split("-")]
+            res = MagicMock()
+            res.status_code = 206
+            res.headers = {"Content-Range": f"bytes {start}-{end}/{len(data)}"}
+            res.iter_content.return_value = [data[start : end + 1]]
+            return res
+
+        mock_head = MagicMock()
+        mock_head.url = "https://objects.githubusercontent.com/asset.zip"
+        mock_head.headers = {"Accept-Ranges": "bytes", "Content-Length": "8"}
+        mock_head_get_session.return_value.head.return_value = mock_head
+        mock_get_session.return_value.get.side_effect = mock_get
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+            a.connections = 2
+            a.observers.append(DigestObserver(name="sha256"))
+            destfile = a.download(on_data=MagicMock())
+
+            with open(destfile, "rb") as file:
+                self.assertEqual(file.read(), data)
+
+            self.assertEqual(os.listdir(tmpdir), ["asset.zip"])
+
+            # segments arrive out of order, so there is no digest to reuse
+            self.assertIsNone(digest.recall(path=destfile, name="sha256"))
+
+        self.assertEqual(mock_get_session.return_value.get.call_count, 2)
+        for _call in mock_get_session.return_value.get.call_args_list:
+            self.assertEqual(
+                _call.kwargs["url"], "https://objects.githubusercontent.com/asset.zip"
+            )
+
+    @patch("src.utils.downloader.segmented_downloader.get_session")
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_stream_sink_segmented_fallback(
+        self, mock_get_session, mock_head_get_session
+    ):
+        mock_head = MagicMock()
+        mock_head.headers = {"Content-Length": "4"}
+        mock_head_get_session.return_value.head.return_value = mock_head
+
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "4"}
+        mock_response.iter_content.return_value = [b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            a = AssetDownloader(
+                url="https://github.com/selfcustody/krux/asset.zip",
+                destdir=tmpdir,
+                write_mode="wb",
+                sink="stream",
+            )
+            a.connections = 4
+            destfile = a.download(on_data=MagicMock())
+
+            with open(destfile, "rb") as file:
+                self.assertEqual(file.read(), b"krux")
+
+        mock_get_session.return_value.get.assert_called_once()
+        self.assertNotIn(
+            "Range", mock_get_session.return_value.get.call_args.kwargs["headers"]
+        )
+
+    @staticmethod
+    def conditional_downloader(tmpdir: str, sink: str) -> AssetDownloader:
+        a = AssetDownloader(
+            url="https://raw.githubusercontent.com/selfcustody/krux/main/asset.pem",
+            destdir=tmpdir,
+            write_mode="wb",
+            sink=sink,
+        )
+        a.CONDITIONAL = True
+        return a
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_conditional_save_validators(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {
+            "Content-Length": "4",
+            "ETag": '"mocked"',
+            "Last-Modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+        }
+        mock_response.iter_content.return_value = [b"krux"]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        for sink in AssetDownloader.VALID_SINKS:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                a = TestAssetDownloader.conditional_downloader(tmpdir, sink)
+                destfile = a.download(on_data=MagicMock())
+
+                headers = mock_get_session.return_value.get.call_args.kwargs["headers"]
+                self.assertNotIn("If-None-Match", headers)
+                self.assertNotIn("If-Modified-Since", headers)
+
+                with open(f"{destfile}.validators.json", "r", encoding="utf8") as f:
+                    self.assertEqual(
+                        json.load(f),
+                        {
+                            "url": a.url,
+                            "size": 4,
+                            "etag": '"mocked"',
+                            "last_modified": "Wed, 21 Oct 2015 07:28:00 GMT",
+                        },
+                    )
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_conditional_not_modified(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 304
+        mock_response.headers = {"ETag": '"mocked"'}
+        mock_get_session.return_value.get.return_value = mock_response
+
+        for sink in AssetDownloader.VALID_SINKS:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                a = TestAssetDownloader.conditional_downloader(tmpdir, sink)
+                with open(os.path.join(tmpdir, "asset.pem"), "wb") as file:
+                    file.write(b"krux")
+                a.validators = {"etag": '"mocked"', "last_modified": None}
+                a.save_conditions(destfile=os.path.join(tmpdir, "asset.pem"))
+
+                mock_on_data = MagicMock()
+                destfile = a.download(on_data=mock_on_data)
+
+                headers = mock_get_session.return_value.get.call_args.kwargs["headers"]
+                self.assertEqual(headers["If-None-Match"], '"mocked"')
+                self.assertNotIn("If-Modified-Since", headers)
+
+                # a zero-byte hit still reports the completion
+                mock_on_data.assert_called_once_with(b"")
+                self.assertEqual(a.downloaded_len, 4)
+                self.assertEqual(a.content_len, 4)
+                mock_response.iter_content.assert_not_called()
+
+                with open(destfile, "rb") as file:
+                    self.assertEqual(file.read(), b"krux")
+
+                self.assertEqual(
+                    sorted(os.listdir(tmpdir)),
+                    ["asset.pem", "asset.pem.validators.json"],
+                )
+
+    def test_load_conditions(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            destfile = os.path.join(tmpdir, "asset.pem")
+            a = TestAssetDownloader.conditional_downloader(tmpdir, "buffer")
+
+            # no file, no conditions
+            self.assertIsNone(a.load_conditions(destfile=destfile))
+
+            with open(destfile, "wb") as file:
+                file.write(b"krux")
+            a.validators = {"etag": None, "last_modified": "mocked"}
+            a.save_conditions(destfile=destfile)
+            self.assertEqual(
+                a.load_conditions(destfile=destfile),
+                {"etag": None, "last_modified": "mocked"},
+            )
+
+            # not conditional
+            a.CONDITIONAL = False
+            self.assertIsNone(a.load_conditions(destfile=destfile))
+            a.CONDITIONAL = True
+
+            # changed file
+            with open(destfile, "ab") as file:
+                file.write(b"!")
+            self.assertIsNone(a.load_conditions(destfile=destfile))
+
+            # no validators received
+            a.validators = {"etag": None, "last_modified": None}
+            a.save_conditions(destfile=destfile)
+            self.assertIsNone(a.load_conditions(destfile=destfile))
@@ -28,3 +28,32 @@ class TestZipDownloader(TestCase):
 
         z = ZipDownloader(version="v0.0.1", destdir=mock_gettempdir())
         self.assertEqual(z.write_mode, "wb")
+
+    @patch("tempfile.gettempdir")
+    def test_init_sink(self, mock_gettempdir):
+        mock_gettempdir.return_value = "/tmp/dir"
+
+        z = ZipDownloader(version="v0.0.1", destdir=mock_gettempdir())
+        self.assertEqual(z.sink, "stream")
+
+    @patch("tempfile.gettempdir")
+    def test_init_connections(self, mock_gettempdir):
+        mock_gettempdir.return_value = "/tmp/dir"
+
+        z = ZipDownloader(version="v0.0.1", destdir=mock_gettempdir(), connections=4)
+        self.assertEqual(z.connections, 4)
+
+    @patch("tempfile.gettempdir")
+    def test_init_adaptive(self, mock_gettempdir):
+        mock_gettempdir.return_value = "/tmp/dir"
+
+        z = ZipDownloader(version="v0.0.1", destdir=mock_gettempdir())
+        self.assertTrue(z.adaptive)
+
+    @patch("tempfile.gettempdir")
+    def test_init_observers(self, mock_gettempdir):
+        mock_gettempdir.return_value = "/tmp/dir"
+
+        z = ZipDownloader(version="v0.0.1", destdir=mock_gettempdir())
+        self.assertEqual(len(z.observers), 1)
+        self.assertEqual(z.observers[0].name, "sha256")
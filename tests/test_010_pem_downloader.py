@@ -28,3 +28,6 @@ class TestPemDownloader(TestCase):
 
         z = PemDownloader(destdir=mock_gettempdir())
         self.assertEqual(z.write_mode, "w")
+
+    def test_conditional(self):
+        self.assertTrue(PemDownloader.CONDITIONAL)
@@ -88,3 +88,7 @@ class TestBetaDownloader(TestCase):
         )
         self.assertEqual(b.device, "m5stickv")
         self.assertEqual(b.binary_type, "kboot.kfpkg")
+        self.assertTrue(b.adaptive)
+
+    def test_conditional(self):
+        self.assertTrue(BetaDownloader.CONDITIONAL)
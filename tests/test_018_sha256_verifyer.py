@@ -1,5 +1,8 @@
+import os
+import tempfile
 from unittest import TestCase
 from unittest.mock import patch, mock_open
+from src.utils import digest
 from src.utils.verifyer.sha256_verifyer import Sha256Verifyer
 
 MOCK_SHA = "4ab12c3cc56b2641e7b216666186558cf40a36e76947edfd1b37cc1b190255ac"
@@ -47,3 +50,20 @@ class TestSha256VerifyerDownloader(TestCase):
         open_mock.assert_called_once_with("test.mock", "rb")
         verify = sha.verify(MOCK_SHA)
         self.assertTrue(verify)
+
+    def test_load_recalled(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "krux.zip")
+            with open(path, "wb") as file:
+                file.write(MOCK_ZIP)
+
+            digest.remember(path=path, name="sha256", hexdigest=MOCK_SHA)
+            sha = Sha256Verifyer(filename=path)
+
+            with patch("builtins.open", new_callable=mock_open) as open_mock:
+                sha.load()
+
+            digest.forget(path=path)
+
+        open_mock.assert_not_called()
+        self.assertEqual(sha.data, MOCK_SHA)
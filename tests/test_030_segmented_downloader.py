@@ -0,0 +1,151 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+import requests
+from src.utils.downloader.cancel_token import DownloadCancelled
+from src.utils.downloader.segmented_downloader import SegmentedDownloader
+
+URL = "https://github.com/selfcustody/krux/releases/download/v0.0.1/krux-v0.0.1.zip"
+DATA = bytes(range(256)) * 4
+
+
+def mock_range_get(status_code: int = 206):
+    """Mock `requests.get` answering the requested Range of DATA"""
+
+    def _get(*_args, headers, **_kwargs):
+        start, end = [int(n) for n in headers["Range"][6:].split("-")]
+        res = MagicMock()
+        res.status_code = status_code
+        res.headers = {"Content-Range": f"bytes {start}-{end}/{len(DATA)}"}
+        res.iter_content.return_value = [
+            DATA[i : min(i + 100, end + 1)] for i in range(start, end + 1, 100)
+        ]
+        return res
+
+    return _get
+
+
+class TestSegmentedDownloader(TestCase):
+
+    def test_init_connections(self):
+        s = SegmentedDownloader(url=URL, connections=4)
+        self.assertEqual(s.connections, 4)
+
+    def test_fail_init_connections(self):
+        for value in (0, 17, "4"):
+            with self.assertRaises(ValueError) as exc_info:
+                SegmentedDownloader(url=URL, connections=value)
+
+            self.assertEqual(
+                str(exc_info.exception), "Connections must be between 1 and 16"
+            )
+
+    def test_split_ranges(self):
+        s = SegmentedDownloader(url=URL, connections=4)
+        size = 5 * SegmentedDownloader.MIN_SEGMENT_SIZE + 3
+        ranges = s.split_ranges(size=size)
+
+        self.assertEqual(len(ranges), 4)
+        self.assertEqual(ranges[0][0], 0)
+        self.assertEqual(ranges[-1][1], size - 1)
+        for previous, current in zip(ranges, ranges[1:]):
+            self.assertEqual(previous[1] + 1, current[0])
+
+    def test_split_ranges_small_file(self):
+        s = SegmentedDownloader(url=URL, connections=8)
+        size = SegmentedDownloader.MIN_SEGMENT_SIZE + 1
+        self.assertEqual(s.split_ranges(size=size), [(0, size - 1)])
+
+    @patch("src.utils.downloader.segmented_downloader.get_session")
+    def test_probe(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.url = "https://objects.githubusercontent.com/krux.zip"
+        mock_response.headers = {"Accept-Ranges": "bytes", "Content-Length": "1024"}
+        mock_get_session.return_value.head.return_value = mock_response
+
+        s = SegmentedDownloader(url=URL, connections=4)
+        self.assertEqual(
+            s.probe(url=URL), ("https://objects.githubusercontent.com/krux.zip", 1024)
+        )
+        mock_get_session.return_value.head.assert_called_once_with(
+            url=URL, allow_redirects=True, timeout=30
+        )
+
+    @patch("src.utils.downloader.segmented_downloader.get_session")
+    def test_probe_no_ranges(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.headers = {"Content-Length": "1024"}
+        mock_get_session.return_value.head.return_value = mock_response
+
+        s = SegmentedDownloader(url=URL, connections=4)
+        self.assertEqual(s.probe(url=URL), None)
+
+    @patch("src.utils.downloader.segmented_downloader.get_session")
+    def test_fail_probe(self, mock_get_session):
+        mock_get_session.return_value.head.side_effect = (
+            requests.exceptions.ConnectionError()
+        )
+
+        s = SegmentedDownloader(url=URL, connections=4)
+        self.assertEqual(s.probe(url=URL), None)
+
+    @patch.object(SegmentedDownloader, "MIN_SEGMENT_SIZE", 128)
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_download_segments(self, mock_get_session):
+        mock_get_session.return_value.get.side_effect = mock_range_get()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, "krux.zip")
+            with open(filepath, "wb") as file:
+                file.truncate(len(DATA))
+
+            s = SegmentedDownloader(url=URL, connections=4)
+            s.on_data = MagicMock()
+            s.download_segments(url=URL, size=len(DATA), filepath=filepath)
+
+            with open(filepath, "rb") as file:
+                self.assertEqual(file.read(), DATA)
+
+        self.assertEqual(mock_get_session.return_value.get.call_count, 4)
+        self.assertEqual(s.downloaded_len, len(DATA))
+        self.assertEqual(s.content_len, len(DATA))
+        self.assertEqual(
+            sum(len(c.kwargs["data"]) for c in s.on_data.call_args_list), len(DATA)
+        )
+
+    @patch.object(SegmentedDownloader, "MIN_SEGMENT_SIZE", 128)
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_fail_download_segments_range_ignored(self, mock_get_session):
+        mock_get_session.return_value.get.side_effect = mock_range_get(status_code=200)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, "krux.zip")
+            with open(filepath, "wb") as file:
+                file.truncate(len(DATA))
+
+            s = SegmentedDownloader(url=URL, connections=2)
+            s.on_data = MagicMock()
+
+            with self.assertRaises(RuntimeError) as exc_info:
+                s.download_segments(url=URL, size=len(DATA), filepath=filepath)
+
+        self.assertIn("not honoured by", str(exc_info.exception))
+
+    @patch.object(SegmentedDownloader, "MIN_SEGMENT_SIZE", 128)
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_cancel_download_segments(self, mock_get_session):
+        mock_get_session.return_value.get.side_effect = mock_range_get()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filepath = os.path.join(tmpdir, "krux.zip")
+            with open(filepath, "wb") as file:
+                file.truncate(len(DATA))
+
+            s = SegmentedDownloader(url=URL, connections=2)
+            s.on_data = MagicMock(side_effect=lambda data: s.token.cancel())
+
+            with self.assertRaises(DownloadCancelled):
+                s.download_segments(url=URL, size=len(DATA), filepath=filepath)
+
+        self.assertTrue(s.downloaded_len < len(DATA))
@@ -0,0 +1,116 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+from src.utils import session
+
+
+class TestSession(TestCase):
+
+    def setUp(self):
+        session.set_session(None)
+        session.set_pool_size(session.DEFAULT_POOL_SIZE)
+
+    def tearDown(self):
+        session.set_session(None)
+        session.set_pool_size(session.DEFAULT_POOL_SIZE)
+
+    def test_make_session(self):
+        s = session.make_session(pool_size=4)
+        adapter = s.get_adapter("https://github.com")
+        manager = adapter.poolmanager
+        self.assertEqual(manager.connection_pool_kw["maxsize"], 4)
+
+        # only the 4 most recently used hosts keep a pool
+        for i in range(6):
+            manager.connection_from_host(f"host{i}.mock", port=443, scheme="https")
+        self.assertEqual(len(manager.pools), 4)
+        self.assertIs(s.get_adapter("http://github.com"), adapter)
+
+    def test_get_session_reuse(self):
+        first = session.get_session()
+        second = session.get_session()
+        self.assertIs(first, second)
+
+    @patch("src.utils.session.make_session")
+    def test_get_session_pool_size(self, mock_make_session):
+        session.set_pool_size(3)
+        session.get_session()
+        mock_make_session.assert_called_once_with(pool_size=3)
+
+    def test_set_session(self):
+        old = MagicMock()
+        new = MagicMock()
+        session.set_session(old)
+        self.assertIs(session.get_session(), old)
+
+        session.set_session(new)
+        self.assertIs(session.get_session(), new)
+        old.close.assert_called_once()
+        new.close.assert_not_called()
+
+    def test_set_pool_size_drop_session(self):
+        old = MagicMock()
+        session.set_session(old)
+        session.set_pool_size(2)
+
+        self.assertEqual(session.get_pool_size(), 2)
+        old.close.assert_called_once()
+        self.assertIsNot(session.get_session(), old)
+
+    def test_set_same_pool_size_keep_session(self):
+        old = MagicMock()
+        session.set_session(old)
+        session.set_pool_size(session.DEFAULT_POOL_SIZE)
+
+        old.close.assert_not_called()
+        self.assertIs(session.get_session(), old)
+
+    def test_fail_set_pool_size(self):
+        for value in (0, -1, "10", 1.5):
+            with self.assertRaises(ValueError) as exc_info:
+                session.set_pool_size(value)
+
+            self.assertEqual(str(exc_info.exception), f"Invalid pool size: {value}")
+
+    def test_file_adapter(self):
+        s = session.make_session(pool_size=1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "krux.bin")
+            with open(path, "wb") as file:
+                file.write(b"0123456789")
+
+            res = s.get(f"file://{path}", stream=True)
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.headers["Content-Length"], "10")
+            self.assertEqual(res.headers["Accept-Ranges"], "bytes")
+            self.assertEqual(b"".join(res.iter_content(chunk_size=4)), b"0123456789")
+
+            res = s.get(f"file://{path}", stream=True, headers={"Range": "bytes=3-"})
+            self.assertEqual(res.status_code, 206)
+            self.assertEqual(res.headers["Content-Range"], "bytes 3-9/10")
+            self.assertEqual(res.raw.read(4, decode_content=True), b"3456")
+
+            res = s.head(f"file://{path}", allow_redirects=True)
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.content, b"")
+
+            res = s.get(
+                f"file://{path}", headers={"If-None-Match": res.headers["ETag"]}
+            )
+            self.assertEqual(res.status_code, 304)
+
+    def test_fail_file_adapter(self):
+        s = session.make_session(pool_size=1)
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "krux.bin")
+            self.assertEqual(s.get(f"file://{path}").status_code, 404)
+            self.assertEqual(s.get(f"file://{tmpdir}").status_code, 404)
+
+            with open(path, "wb") as file:
+                file.write(b"0123456789")
+
+            res = s.get(f"file://{path}", headers={"Range": "bytes=10-"})
+            self.assertEqual(res.status_code, 416)
+            self.assertEqual(res.headers["Content-Range"], "bytes */10")
+            self.assertEqual(s.post(f"file://{path}").status_code, 405)
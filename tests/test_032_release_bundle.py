@@ -0,0 +1,204 @@
+import tempfile
+from contextlib import ExitStack
+from unittest import TestCase
+from unittest.mock import MagicMock, call, patch
+from src.utils.downloader.release_bundle import ReleaseBundle
+
+MODULE = "src.utils.downloader.release_bundle"
+
+
+def mock_asset(name: str, size: int, error: Exception | None = None):
+    """Mock an AssetDownloader that streams :attr:`size` bytes in two chunks"""
+    asset = MagicMock()
+    asset.url = f"https://mock/{name}"
+    asset.destdir = "mockdir"
+    asset.downloaded_len = 0
+    asset.content_len = 0
+
+    def _download(on_data):
+        asset.content_len = size
+        for chunk in (b"0" * (size // 2), b"0" * (size - size // 2)):
+            asset.downloaded_len += len(chunk)
+            on_data(chunk)
+
+        if error is not None:
+            raise error
+
+        return f"mockdir/{name}"
+
+    asset.download = MagicMock(side_effect=_download)
+    return asset
+
+
+def make_bundle(assets: list, **kwargs) -> ReleaseBundle:
+    """Build a ReleaseBundle of v0.0.1 over the mocked zip, sha256, sig and pem"""
+    with ExitStack() as stack:
+        for name, asset in zip(
+            ("ZipDownloader", "Sha256Downloader", "SigDownloader", "PemDownloader"),
+            assets,
+        ):
+            stack.enter_context(patch(f"{MODULE}.{name}", return_value=asset))
+        return ReleaseBundle(version="v0.0.1", **kwargs)
+
+
+class TestReleaseBundle(TestCase):
+
+    @patch(f"{MODULE}.PemDownloader")
+    @patch(f"{MODULE}.SigDownloader")
+    @patch(f"{MODULE}.Sha256Downloader")
+    @patch(f"{MODULE}.ZipDownloader")
+    def test_init(self, mock_zip, mock_sha256, mock_sig, mock_pem):
+        bundle = ReleaseBundle(version="v0.0.1", destdir="mockdir", connections=4)
+
+        mock_zip.assert_called_once_with(
+            version="v0.0.1", destdir="mockdir", connections=4
+        )
+        mock_sha256.assert_called_once_with(version="v0.0.1", destdir="mockdir")
+        mock_sig.assert_called_once_with(version="v0.0.1", destdir="mockdir")
+        mock_pem.assert_called_once_with(destdir="mockdir")
+        self.assertEqual(
+            bundle.downloaders,
+            [
+                mock_zip.return_value,
+                mock_sha256.return_value,
+                mock_sig.return_value,
+                mock_pem.return_value,
+            ],
+        )
+        self.assertEqual(bundle.url, mock_zip.return_value.url)
+        self.assertEqual(bundle.destdir, mock_zip.return_value.destdir)
+        self.assertEqual(bundle.downloaded_len, 0)
+        self.assertEqual(bundle.content_len, 0)
+
+    def test_init_real_downloaders(self):
+        destdir = tempfile.gettempdir()
+        bundle = ReleaseBundle(version="v0.0.1", destdir=destdir)
+        base_url = "https://github.com/selfcustody/krux/releases/download/v0.0.1"
+
+        self.assertEqual(bundle.url, f"{base_url}/krux-v0.0.1.zip")
+        self.assertEqual(bundle.destdir, destdir)
+        self.assertEqual(
+            [d.url for d in bundle.downloaders[1:]],
+            [
+                f"{base_url}/krux-v0.0.1.zip.sha256.txt",
+                f"{base_url}/krux-v0.0.1.zip.sig",
+                "https://raw.githubusercontent.com/selfcustody/krux/main/selfcustody.pem",
+            ],
+        )
+
+    def test_download(self):
+        bundle = make_bundle(
+            [
+                mock_asset("krux-v0.0.1.zip", 1000),
+                mock_asset("krux-v0.0.1.zip.sha256.txt", 64),
+                mock_asset("krux-v0.0.1.zip.sig", 70),
+                mock_asset("selfcustody.pem", 200),
+            ]
+        )
+        progress = []
+
+        def on_data(_data: bytes):
+            progress.append((bundle.downloaded_len, bundle.content_len))
+
+        paths = bundle.download(on_data=on_data)
+
+        self.assertEqual(
+            paths,
+            [
+                "mockdir/krux-v0.0.1.zip",
+                "mockdir/krux-v0.0.1.zip.sha256.txt",
+                "mockdir/krux-v0.0.1.zip.sig",
+                "mockdir/selfcustody.pem",
+            ],
+        )
+
+        # progress is only reported with all sizes known,
+        # never goes backwards and reach 100% exactly once
+        self.assertTrue(len(progress) > 0)
+        self.assertTrue(all(content_len == 1334 for _, content_len in progress))
+        self.assertEqual(progress, sorted(progress))
+        self.assertEqual(progress.count((1334, 1334)), 1)
+        self.assertEqual(progress[-1], (1334, 1334))
+
+    def test_fail_download(self):
+        assets = [
+            mock_asset("krux-v0.0.1.zip", 1000),
+            mock_asset("krux-v0.0.1.zip.sha256.txt", 64),
+            mock_asset(
+                "krux-v0.0.1.zip.sig", 70, error=RuntimeError("Download interrupted")
+            ),
+            mock_asset("selfcustody.pem", 200),
+        ]
+        bundle = make_bundle(assets)
+
+        with self.assertRaises(RuntimeError) as exc_info:
+            bundle.download(on_data=MagicMock())
+
+        self.assertEqual(str(exc_info.exception), "Download interrupted")
+
+        # the other downloads are not abandoned
+        for asset in assets:
+            asset.download.assert_called_once()
+
+    def test_download_store_on_cache(self):
+        cache = MagicMock()
+        bundle = make_bundle(
+            [
+                mock_asset("krux-v0.0.1.zip", 1000),
+                mock_asset("krux-v0.0.1.zip.sha256.txt", 64),
+                mock_asset("krux-v0.0.1.zip.sig", 70),
+                mock_asset("selfcustody.pem", 200),
+            ],
+            cache=cache,
+        )
+
+        bundle.download(on_data=MagicMock())
+
+        self.assertIs(bundle.cache, cache)
+        cache.store.assert_has_calls(
+            [
+                call(
+                    url="https://mock/krux-v0.0.1.zip",
+                    path="mockdir/krux-v0.0.1.zip",
+                    version="v0.0.1",
+                ),
+                call(
+                    url="https://mock/krux-v0.0.1.zip.sha256.txt",
+                    path="mockdir/krux-v0.0.1.zip.sha256.txt",
+                    version="v0.0.1",
+                ),
+                call(
+                    url="https://mock/krux-v0.0.1.zip.sig",
+                    path="mockdir/krux-v0.0.1.zip.sig",
+                    version="v0.0.1",
+                ),
+                call(
+                    url="https://mock/selfcustody.pem",
+                    path="mockdir/selfcustody.pem",
+                    version=None,
+                ),
+            ]
+        )
+
+    def test_cancel(self):
+        bundle = ReleaseBundle(version="v0.0.1")
+        token = bundle.token
+
+        # all assets share the same token
+        self.assertTrue(all(d.token is token for d in bundle.downloaders))
+
+        bundle.cancel()
+        self.assertTrue(token.cancelled)
+
+    def test_set_token(self):
+        bundle = ReleaseBundle(version="v0.0.1")
+        token = MagicMock()
+        bundle.token = token
+        self.assertTrue(all(d.token is token for d in bundle.downloaders))
+
+    def test_set_on_retry(self):
+        bundle = ReleaseBundle(version="v0.0.1")
+        on_retry = MagicMock()
+        bundle.on_retry = on_retry
+        self.assertIs(bundle.on_retry, on_retry)
+        self.assertTrue(all(d.on_retry is on_retry for d in bundle.downloaders))
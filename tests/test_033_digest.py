@@ -0,0 +1,94 @@
+import os
+import hashlib
+import tempfile
+from unittest import TestCase
+from src.utils import digest
+from src.utils.digest import DigestObserver
+
+
+class TestDigest(TestCase):
+
+    def tearDown(self):
+        digest.forget()
+
+    def test_init_observer(self):
+        observer = DigestObserver()
+        self.assertEqual(observer.name, "sha256")
+        self.assertEqual(observer.size, 0)
+        self.assertEqual(observer.hexdigest, hashlib.sha256().hexdigest())
+
+    def test_fail_init_observer(self):
+        with self.assertRaises(ValueError) as exc_info:
+            DigestObserver(name="mock")
+
+        self.assertEqual(str(exc_info.exception), "Invalid digest: mock")
+
+    def test_update_observer(self):
+        observer = DigestObserver(name="sha256")
+        observer.update(b"kr")
+        observer.update(b"ux")
+
+        self.assertEqual(observer.size, 4)
+        self.assertEqual(observer.hexdigest, hashlib.sha256(b"krux").hexdigest())
+
+        observer.reset()
+        self.assertEqual(observer.size, 0)
+        self.assertEqual(observer.hexdigest, hashlib.sha256().hexdigest())
+
+    def test_recall(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "krux.zip")
+            with open(path, "wb") as file:
+                file.write(b"krux")
+
+            self.assertIsNone(digest.recall(path=path, name="sha256"))
+
+            digest.remember(path=path, name="sha256", hexdigest="mocked")
+            self.assertEqual(digest.recall(path=path, name="sha256"), "mocked")
+            self.assertIsNone(digest.recall(path=path, name="sha512"))
+
+    def test_recall_changed_size(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "krux.zip")
+            with open(path, "wb") as file:
+                file.write(b"krux")
+
+            digest.remember(path=path, name="sha256", hexdigest="mocked")
+            with open(path, "ab") as file:
+                file.write(b"!")
+
+            self.assertIsNone(digest.recall(path=path, name="sha256"))
+
+    def test_recall_changed_mtime(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "krux.zip")
+            with open(path, "wb") as file:
+                file.write(b"krux")
+
+            digest.remember(path=path, name="sha256", hexdigest="mocked")
+            stat = os.stat(path)
+            os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+            self.assertIsNone(digest.recall(path=path, name="sha256"))
+
+    def test_recall_removed(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "krux.zip")
+            with open(path, "wb") as file:
+                file.write(b"krux")
+
+            digest.remember(path=path, name="sha256", hexdigest="mocked")
+            os.remove(path)
+
+            self.assertIsNone(digest.recall(path=path, name="sha256"))
+
+    def test_forget(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "krux.zip")
+            with open(path, "wb") as file:
+                file.write(b"krux")
+
+            digest.remember(path=path, name="sha256", hexdigest="mocked")
+            digest.forget(path=path)
+
+            self.assertIsNone(digest.recall(path=path, name="sha256"))
@@ -0,0 +1,311 @@
+import os
+import json
+import hashlib
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from src.utils import digest
+from src.utils.cache import AssetCache, get_cache, set_cache
+
+ZIP_URL = "https://github.com/selfcustody/krux/releases/download/{0}/krux-{0}.zip"
+PEM_URL = "https://raw.githubusercontent.com/selfcustody/krux/main/selfcustody.pem"
+BETA_URL = "https://raw.githubusercontent.com/odudex/krux_binaries/main"
+
+
+def write(destdir: str, name: str, data: bytes) -> str:
+    path = os.path.join(destdir, name)
+    with open(path, "wb") as file:
+        file.write(data)
+    return path
+
+
+class TestAssetCache(TestCase):
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.destdir = self.tmpdir.name
+
+    def tearDown(self):
+        set_cache(self.destdir, None)
+        digest.forget()
+        self.tmpdir.cleanup()
+
+    def test_init(self):
+        cache = AssetCache(destdir=self.destdir)
+        self.assertEqual(cache.destdir, self.destdir)
+        self.assertEqual(cache.budget, AssetCache.DEFAULT_BUDGET)
+        self.assertEqual(cache.entries, {})
+        self.assertEqual(cache.size, 0)
+        self.assertTrue(os.path.isdir(os.path.join(self.destdir, ".cache", "objects")))
+
+    def test_fail_init_budget(self):
+        with self.assertRaises(ValueError) as exc_info:
+            AssetCache(destdir=self.destdir, budget=-1)
+
+        self.assertEqual(str(exc_info.exception), "Invalid cache budget: -1")
+
+    def test_get_cache(self):
+        cache = get_cache(destdir=self.destdir)
+        self.assertEqual(cache.budget, AssetCache.DEFAULT_BUDGET)
+
+        # a single cache (and lock) per destdir, with the last budget
+        self.assertIs(get_cache(destdir=f"{self.destdir}/", budget=1 << 20), cache)
+        self.assertEqual(cache.budget, 1 << 20)
+
+        other = AssetCache(destdir=self.destdir)
+        set_cache(self.destdir, other)
+        self.assertIs(get_cache(destdir=self.destdir, budget=1 << 20), other)
+        set_cache(self.destdir, None)
+        self.assertIsNot(get_cache(destdir=self.destdir), other)
+
+    def test_init_corrupted_index(self):
+        cache = AssetCache(destdir=self.destdir)
+        with open(cache.index_path, "w", encoding="utf8") as file:
+            file.write("{")
+
+        self.assertEqual(AssetCache(destdir=self.destdir).entries, {})
+
+    def test_store_and_find(self):
+        cache = AssetCache(destdir=self.destdir)
+        path = write(self.destdir, "krux-v0.0.1.zip", b"krux")
+        url = ZIP_URL.format("v0.0.1")
+
+        self.assertEqual(cache.store(url=url, path=path, version="v0.0.1"), path)
+
+        sha256 = hashlib.sha256(b"krux").hexdigest()
+        self.assertTrue(os.path.samefile(path, cache.object_path(sha256)))
+        self.assertEqual(cache.entries[url]["digest"], sha256)
+        self.assertEqual(cache.entries[url]["size"], 4)
+        self.assertEqual(cache.size, 4)
+
+        # a new instance reads the saved index
+        other = AssetCache(destdir=self.destdir)
+        self.assertEqual(other.find(version="v0.0.1", name="krux-v0.0.1.zip"), path)
+        self.assertEqual(other.lookup(url=url), path)
+        self.assertIsNone(other.find(version="v0.0.2", name="krux-v0.0.2.zip"))
+        self.assertIsNone(other.lookup(url=ZIP_URL.format("v0.0.2")))
+
+        # and a hit let the verifyers reuse the digest
+        self.assertEqual(digest.recall(path=path, name="sha256"), sha256)
+
+    def test_store_reuse_download_digest(self):
+        cache = AssetCache(destdir=self.destdir)
+        path = write(self.destdir, "krux-v0.0.1.zip", b"krux")
+        digest.remember(path=path, name="sha256", hexdigest="0" * 64)
+
+        with patch.object(AssetCache, "sha256") as mock_sha256:
+            cache.store(url=ZIP_URL.format("v0.0.1"), path=path, version="v0.0.1")
+
+        mock_sha256.assert_not_called()
+        self.assertTrue(os.path.exists(cache.object_path("0" * 64)))
+
+    def test_lookup_never_rehash(self):
+        cache = AssetCache(destdir=self.destdir)
+        path = write(self.destdir, "krux-v0.0.1.zip", b"krux")
+        cache.store(url=ZIP_URL.format("v0.0.1"), path=path, version="v0.0.1")
+
+        with patch.object(AssetCache, "sha256") as mock_sha256:
+            cache.lookup(url=ZIP_URL.format("v0.0.1"))
+
+        mock_sha256.assert_not_called()
+
+    def test_lookup_save_lazily(self):
+        cache = AssetCache(destdir=self.destdir)
+        path = write(self.destdir, "krux-v0.0.1.zip", b"krux")
+        url = ZIP_URL.format("v0.0.1")
+
+        with patch("src.utils.cache.asset_cache.time.time") as mock_time:
+            mock_time.return_value = 0
+            cache.store(url=url, path=path, version="v0.0.1")
+
+            with patch.object(AssetCache, "save") as mock_save:
+                mock_time.return_value = 10
+                cache.lookup(url=url)
+                mock_save.assert_not_called()
+                self.assertEqual(cache.entries[url]["last_access"], 10)
+
+                mock_time.return_value = 10 + AssetCache.ACCESS_RESOLUTION + 1
+                cache.lookup(url=url)
+                mock_save.assert_called_once()
+
+    def test_lookup_changed_file(self):
+        cache = AssetCache(destdir=self.destdir)
+        path = write(self.destdir, "krux-v0.0.1.zip", b"krux")
+        url = ZIP_URL.format("v0.0.1")
+        cache.store(url=url, path=path, version="v0.0.1")
+
+        # writing it in place changes the linked object too
+        os.remove(path)
+        write(self.destdir, "krux-v0.0.1.zip", b"krux!")
+
+        self.assertIsNone(cache.lookup(url=url))
+        self.assertNotIn(url, cache.entries)
+        self.assertFalse(os.path.exists(path))
+
+    def test_lookup_removed_file(self):
+        cache = AssetCache(destdir=self.destdir)
+        path = write(self.destdir, "krux-v0.0.1.zip", b"krux")
+        url = ZIP_URL.format("v0.0.1")
+        cache.store(url=url, path=path, version="v0.0.1")
+        os.remove(path)
+
+        self.assertIsNone(cache.lookup(url=url))
+        self.assertEqual(cache.size, 0)
+        self.assertEqual(
+            os.listdir(os.path.join(self.destdir, ".cache", "objects")), []
+        )
+
+    def test_store_dedupe(self):
+        cache = AssetCache(destdir=self.destdir)
+        first = write(self.destdir, "krux-v0.0.1.zip", b"same")
+        second = write(self.destdir, "krux-v0.0.2.zip", b"same")
+
+        cache.store(url=ZIP_URL.format("v0.0.1"), path=first, version="v0.0.1")
+        cache.store(url=ZIP_URL.format("v0.0.2"), path=second, version="v0.0.2")
+
+        self.assertTrue(os.path.samefile(first, second))
+        self.assertEqual(cache.size, 4)
+        self.assertEqual(
+            len(os.listdir(os.path.join(self.destdir, ".cache", "objects"))), 1
+        )
+
+    def test_store_replace_content(self):
+        cache = AssetCache(destdir=self.destdir)
+        path = write(self.destdir, "selfcustody.pem", b"old")
+        cache.store(url=PEM_URL, path=path)
+        old = cache.object_path(hashlib.sha256(b"old").hexdigest())
+
+        os.remove(path)
+        path = write(self.destdir, "selfcustody.pem", b"new")
+        cache.store(url=PEM_URL, path=path)
+
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(path))
+        self.assertEqual(cache.size, 3)
+        self.assertEqual(cache.lookup(url=PEM_URL), path)
+
+    def test_evict_least_recently_used_version(self):
+        cache = AssetCache(destdir=self.destdir, budget=16)
+
+        with patch("src.utils.cache.asset_cache.time.time") as mock_time:
+            for i, version in enumerate(("v0.0.1", "v0.0.2")):
+                mock_time.return_value = i
+                for name in (f"krux-{version}.zip", f"krux-{version}.zip.sig"):
+                    path = write(
+                        self.destdir, name, f"{version[-1]}{name[-3:]}".encode()
+                    )
+                    cache.store(url=f"{version}/{name}", path=path, version=version)
+
+            # touch the oldest version, so the other one is evicted
+            mock_time.return_value = 2
+            cache.find(version="v0.0.1", name="krux-v0.0.1.zip")
+
+            mock_time.return_value = 3
+            path = write(self.destdir, "krux-v0.0.3.zip", b"v3.z")
+            cache.store(url="v0.0.3/krux-v0.0.3.zip", path=path, version="v0.0.3")
+
+        self.assertEqual(
+            sorted(cache.entries),
+            [
+                "v0.0.1/krux-v0.0.1.zip",
+                "v0.0.1/krux-v0.0.1.zip.sig",
+                "v0.0.3/krux-v0.0.3.zip",
+            ],
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.destdir, "krux-v0.0.2.zip")))
+        self.assertTrue(os.path.exists(os.path.join(self.destdir, "krux-v0.0.1.zip")))
+        self.assertEqual(cache.size, 12)
+
+    def test_evict_keep_shared_pem(self):
+        cache = AssetCache(destdir=self.destdir, budget=3000)
+
+        with patch("src.utils.cache.asset_cache.time.time") as mock_time:
+            mock_time.return_value = 0
+            pem = write(self.destdir, "selfcustody.pem", b"p" * 100)
+            cache.store(url=PEM_URL, path=pem)
+            for i, size in enumerate((1000, 1000, 1500)):
+                mock_time.return_value = i + 1
+                version = f"v0.0.{i + 1}"
+                name = f"krux-{version}.zip"
+                path = write(self.destdir, name, version.encode().ljust(size, b"0"))
+                cache.store(url=ZIP_URL.format(version), path=path, version=version)
+
+            # as a release bundle does, after its zip
+            cache.store(url=PEM_URL, path=pem)
+
+        # the oldest version is evicted, but not the public key it shared
+        self.assertIsNone(cache.find(version="v0.0.1", name="krux-v0.0.1.zip"))
+        self.assertEqual(cache.lookup(url=PEM_URL), pem)
+        self.assertLessEqual(cache.size, 3000)
+
+        # with no version left, it is evicted as well
+        cache.budget = 0
+        cache.evict()
+        self.assertEqual(cache.entries, {})
+        self.assertFalse(os.path.exists(pem))
+
+    def test_evict_keep_stored(self):
+        cache = AssetCache(destdir=self.destdir, budget=1)
+        path = write(self.destdir, "krux-v0.0.1.zip", b"krux")
+        cache.store(url=ZIP_URL.format("v0.0.1"), path=path, version="v0.0.1")
+
+        self.assertEqual(cache.lookup(url=ZIP_URL.format("v0.0.1")), path)
+
+    def test_index_format(self):
+        cache = AssetCache(destdir=self.destdir)
+        path = write(self.destdir, "krux-v0.0.1.zip", b"krux")
+        cache.store(url=ZIP_URL.format("v0.0.1"), path=path, version="v0.0.1")
+
+        with open(cache.index_path, "r", encoding="utf8") as file:
+            entry = json.load(file)["entries"][ZIP_URL.format("v0.0.1")]
+
+        self.assertEqual(
+            sorted(entry),
+            ["digest", "last_access", "mtime_ns", "name", "size", "version"],
+        )
+        self.assertEqual(entry["name"], "krux-v0.0.1.zip")
+        self.assertEqual(entry["version"], "v0.0.1")
+
+    def test_store_in_subdir(self):
+        cache = AssetCache(destdir=self.destdir)
+        os.makedirs(os.path.join(self.destdir, "krux_binaries", "maixpy_amigo"))
+        name = os.path.join("krux_binaries", "maixpy_amigo", "kboot.kfpkg")
+        path = write(self.destdir, name, b"kboot")
+        url = f"{BETA_URL}/maixpy_amigo/kboot.kfpkg"
+        cache.store(url=url, path=path, version="odudex/krux_binaries")
+
+        self.assertEqual(cache.entries[url]["name"], name)
+        self.assertEqual(AssetCache(destdir=self.destdir).lookup(url=url), path)
+
+    def test_releases(self):
+        cache = AssetCache(destdir=self.destdir)
+        self.assertEqual(cache.releases(), [])
+
+        for version in ("v0.0.2", "v0.0.10", "v0.0.1"):
+            for ext in ("", ".sha256.txt", ".sig"):
+                # v0.0.1 is incomplete
+                if version == "v0.0.1" and ext == ".sig":
+                    continue
+
+                name = f"krux-{version}.zip{ext}"
+                path = write(self.destdir, name, name.encode())
+                url = f"{ZIP_URL.format(version)}{ext}"
+                cache.store(url=url, path=path, version=version)
+
+        # without a public key, no version can be verified
+        self.assertEqual(cache.releases(), [])
+
+        path = write(self.destdir, "selfcustody.pem", b"pem")
+        cache.store(url=PEM_URL, path=path)
+        self.assertEqual(cache.releases(), ["v0.0.10", "v0.0.2"])
+
+        path = write(self.destdir, "kboot.kfpkg", b"kboot")
+        cache.store(
+            url=f"{BETA_URL}/maixpy_amigo/kboot.kfpkg",
+            path=path,
+            version="odudex/krux_binaries",
+        )
+        self.assertEqual(
+            cache.releases(), ["v0.0.10", "v0.0.2", "odudex/krux_binaries"]
+        )
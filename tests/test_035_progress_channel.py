@@ -0,0 +1,168 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+from src.utils.downloader.progress_channel import ProgressChannel
+
+MODULE = "src.utils.downloader.progress_channel"
+
+
+class TestProgressChannel(TestCase):
+
+    @patch(f"{MODULE}.time.monotonic", return_value=0.0)
+    def test_init(self, mock_monotonic):
+        channel = ProgressChannel(downloader=MagicMock(), on_event=MagicMock())
+        self.assertEqual(channel.interval, 0.1)
+        self.assertEqual(channel.step, None)
+        self.assertFalse(channel.done)
+        mock_monotonic.assert_called_once()
+
+    def test_fail_init(self):
+        for rate in (0, -1.0):
+            with self.assertRaises(ValueError) as exc_info:
+                ProgressChannel(downloader=MagicMock(), on_event=MagicMock(), rate=rate)
+            self.assertEqual(str(exc_info.exception), f"Invalid rate: {rate}")
+
+        for step in (0, 1.5):
+            with self.assertRaises(ValueError) as exc_info:
+                ProgressChannel(downloader=MagicMock(), on_event=MagicMock(), step=step)
+            self.assertEqual(str(exc_info.exception), f"Invalid step: {step}")
+
+    @patch(f"{MODULE}.time.monotonic")
+    def test_coalesce_by_rate(self, mock_monotonic):
+        on_event = MagicMock()
+        mock_monotonic.side_effect = [0.0, 0.01, 0.02, 0.05, 0.15, 0.16]
+        channel = ProgressChannel(downloader=MagicMock(), on_event=on_event, rate=10)
+
+        # first chunk always emits, then only after 1/rate seconds
+        self.assertIsNotNone(channel.publish(10, 1000))
+        self.assertIsNone(channel.publish(20, 1000))
+        self.assertIsNone(channel.publish(30, 1000))
+        self.assertIsNotNone(channel.publish(40, 1000))
+        self.assertIsNone(channel.publish(50, 1000))
+
+        self.assertEqual(
+            [c.args[0]["downloaded_len"] for c in on_event.call_args_list], [10, 40]
+        )
+
+    @patch(f"{MODULE}.time.monotonic")
+    def test_emit_by_step(self, mock_monotonic):
+        on_event = MagicMock()
+        mock_monotonic.side_effect = [0.0, 0.01, 0.02, 0.03]
+        channel = ProgressChannel(
+            downloader=MagicMock(), on_event=on_event, rate=1, step=0.25
+        )
+
+        channel.publish(100, 1000)
+        channel.publish(200, 1000)
+        channel.publish(400, 1000)
+
+        self.assertEqual(
+            [c.args[0]["downloaded_len"] for c in on_event.call_args_list], [100, 400]
+        )
+
+    @patch(f"{MODULE}.time.monotonic")
+    def test_final_event_exactly_once(self, mock_monotonic):
+        on_event = MagicMock()
+        mock_monotonic.side_effect = [0.0, 0.01, 0.02, 0.03, 0.04]
+        channel = ProgressChannel(downloader=MagicMock(), on_event=on_event)
+
+        channel.publish(10, 1000)
+
+        # the final event is never coalesced, even inside the interval
+        event = channel.publish(1000, 1000)
+        self.assertEqual(event["downloaded_len"], 1000)
+        self.assertEqual(event["eta"], 0.0)
+        self.assertTrue(channel.done)
+
+        # and nothing is emitted after it
+        self.assertIsNone(channel.publish(1000, 1000))
+        self.assertIsNone(channel.publish(1000, 1000))
+        self.assertEqual(on_event.call_count, 2)
+
+    @patch(f"{MODULE}.time.monotonic")
+    def test_unknown_content_len(self, mock_monotonic):
+        on_event = MagicMock()
+        mock_monotonic.side_effect = [0.0, 0.0, 0.05, 1.0, 1.01]
+        channel = ProgressChannel(downloader=MagicMock(), on_event=on_event)
+
+        # without a size, events are still rate limited
+        # and report only the received bytes and throughput
+        channel.publish(10, 0)
+        channel.publish(20, 0)
+        event = channel.publish(110, 0)
+        self.assertEqual(event["content_len"], 0)
+        self.assertEqual(event["rate"], 100.0)
+        self.assertIsNone(event["eta"])
+        self.assertFalse(channel.done)
+
+        # until the end of stream set it
+        final = channel.publish(110, 110)
+        self.assertEqual(final["eta"], 0.0)
+        self.assertTrue(channel.done)
+        self.assertEqual(
+            [c.args[0]["downloaded_len"] for c in on_event.call_args_list],
+            [10, 110, 110],
+        )
+
+    @patch(f"{MODULE}.time.monotonic")
+    def test_rate_and_eta(self, mock_monotonic):
+        on_event = MagicMock()
+        mock_monotonic.side_effect = [0.0, 0.0, 1.0, 2.0]
+        channel = ProgressChannel(downloader=MagicMock(), on_event=on_event)
+
+        first = channel.publish(0, 1000)
+        self.assertEqual(first["rate"], 0.0)
+        self.assertIsNone(first["eta"])
+
+        second = channel.publish(100, 1000)
+        self.assertEqual(second["rate"], 100.0)
+        self.assertEqual(second["eta"], 9.0)
+        self.assertEqual(second["elapsed"], 1.0)
+
+        # smoothed with an exponential moving average
+        third = channel.publish(400, 1000)
+        self.assertAlmostEqual(third["rate"], 0.3 * 300 + 0.7 * 100)
+        self.assertAlmostEqual(third["eta"], 600 / 160)
+
+    @patch(f"{MODULE}.time.monotonic")
+    def test_on_data(self, mock_monotonic):
+        on_event = MagicMock()
+        mock_monotonic.side_effect = [0.0, 0.5]
+        downloader = MagicMock()
+        downloader.downloaded_len = 21
+        downloader.content_len = 21000000
+        channel = ProgressChannel(downloader=downloader, on_event=on_event)
+
+        channel.on_data(b"")
+
+        on_event.assert_called_once_with(
+            {
+                "downloaded_len": 21,
+                "content_len": 21000000,
+                "elapsed": 0.5,
+                "rate": 0.0,
+                "eta": None,
+            }
+        )
+
+    @patch(f"{MODULE}.time.monotonic")
+    def test_on_retry(self, mock_monotonic):
+        on_event = MagicMock()
+        mock_monotonic.side_effect = [0.0, 0.01, 0.02, 0.03]
+        downloader = MagicMock()
+        downloader.downloaded_len = 10
+        downloader.content_len = 1000
+        channel = ProgressChannel(downloader=downloader, on_event=on_event)
+
+        # retries are never coalesced
+        channel.on_data(b"0" * 10)
+        event = channel.on_retry(2, 5, 0.5, RuntimeError("mocked"))
+        self.assertEqual(event["retry"], 2)
+        self.assertEqual(event["attempts"], 5)
+        self.assertEqual(event["delay"], 0.5)
+        self.assertEqual(event["downloaded_len"], 10)
+        self.assertEqual(on_event.call_count, 2)
+
+        # nor delivered after the final event
+        channel.publish(1000, 1000)
+        self.assertIsNone(channel.on_retry(3, 5, 1.0, RuntimeError("mocked")))
+        self.assertEqual(on_event.call_count, 3)
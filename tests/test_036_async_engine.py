@@ -0,0 +1,360 @@
+import time
+import asyncio
+import threading
+from concurrent.futures import CancelledError
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+import requests
+from src.utils.downloader import async_engine
+from src.utils.downloader.async_engine import AsyncEngine, SyncStreamResponse
+from src.utils.downloader.async_http import AsyncResponse, open_stream
+from src.utils.downloader.async_stream_downloader import AsyncStreamDownloader
+from src.utils.downloader.stream_downloader import StreamDownloader
+
+URL = "https://github.com/selfcustody/krux/releases/download/v0.0.1/krux-v0.0.1.zip"
+
+BODY = bytes(range(256)) * 64
+
+
+class MockHandler(BaseHTTPRequestHandler):
+    """Serve a fixed body in the ways an asset server can answer"""
+
+    protocol_version = "HTTP/1.1"
+
+    # client address of each request, to tell reused connections apart
+    peers = []
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.peers.append(self.client_address)
+        if self.path == "/redirect":
+            self.send_response(302)
+            self.send_header("Location", "/file")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        elif self.path == "/missing":
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        elif self.path in ("/close", "/drop"):
+            # "/drop" hangs up a keep-alive connection, without telling,
+            # after the client sent its next request on it
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(BODY)))
+            if self.path == "/close":
+                self.send_header("Connection", "close")
+            self.end_headers()
+            self.wfile.write(BODY)
+            self.wfile.flush()
+            if self.path == "/drop":
+                time.sleep(0.2)
+            self.close_connection = True
+
+        elif self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            for i in range(0, len(BODY), 1000):
+                part = BODY[i : i + 1000]
+                self.wfile.write(f"{len(part):x}\r\n".encode() + part + b"\r\n")
+            self.wfile.write(b"0\r\n\r\n")
+
+        elif self.path == "/slow":
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(BODY)))
+            self.end_headers()
+            for i in range(0, len(BODY), 1024):
+                self.wfile.write(BODY[i : i + 1024])
+                self.wfile.flush()
+                time.sleep(0.05)
+
+        else:
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(BODY)))
+            self.send_header("ETag", '"mock"')
+            self.end_headers()
+            self.wfile.write(BODY)
+
+
+def make_reader(data: bytes) -> asyncio.StreamReader:
+    reader = asyncio.StreamReader()
+    reader.feed_data(data)
+    reader.feed_eof()
+    return reader
+
+
+async def read_all(res: AsyncResponse, size: int = 7) -> bytes:
+    data = b""
+    while True:
+        chunk = await res.read(size)
+        if not chunk:
+            return data
+        data += chunk
+
+
+class TestAsyncResponse(TestCase):
+
+    def test_read_content_length(self):
+        async def run():
+            res = AsyncResponse(
+                url="mock",
+                status_code=200,
+                headers={"Content-Length": "5"},
+                reader=make_reader(b"krux!trailing"),
+                writer=MagicMock(),
+            )
+            return await read_all(res, size=2)
+
+        self.assertEqual(asyncio.run(run()), b"krux!")
+
+    def test_read_chunked(self):
+        async def run():
+            res = AsyncResponse(
+                url="mock",
+                status_code=200,
+                headers={"Transfer-Encoding": "chunked"},
+                reader=make_reader(
+                    b"2\r\nkr\r\n3;ext\r\nux!\r\n0\r\nX-Mock: 1\r\n\r\n"
+                ),
+                writer=MagicMock(),
+            )
+            return await read_all(res)
+
+        self.assertEqual(asyncio.run(run()), b"krux!")
+
+    def test_read_until_eof(self):
+        async def run():
+            res = AsyncResponse(
+                url="mock",
+                status_code=200,
+                headers={},
+                reader=make_reader(b"krux!"),
+                writer=MagicMock(),
+            )
+            return await read_all(res)
+
+        self.assertEqual(asyncio.run(run()), b"krux!")
+
+    def test_no_body(self):
+        async def run():
+            res = AsyncResponse(
+                url="mock",
+                status_code=304,
+                headers={"Content-Length": "5"},
+                reader=make_reader(b""),
+                writer=MagicMock(),
+            )
+            return await res.read(5)
+
+        self.assertEqual(asyncio.run(run()), b"")
+
+    def test_fail_read_truncated(self):
+        async def run():
+            res = AsyncResponse(
+                url="mock",
+                status_code=200,
+                headers={"Content-Length": "10"},
+                reader=make_reader(b"krux!"),
+                writer=MagicMock(),
+            )
+            return await read_all(res)
+
+        with self.assertRaises(ConnectionError) as exc_info:
+            asyncio.run(run())
+
+        self.assertEqual(str(exc_info.exception), "Connection closed with 5 bytes left")
+
+    def test_fail_open_scheme(self):
+        with self.assertRaises(ValueError) as exc_info:
+            asyncio.run(open_stream(url="ftp://mock/file"))
+
+        self.assertEqual(str(exc_info.exception), "Unsupported scheme: ftp")
+
+
+class TestAsyncEngine(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), MockHandler)
+        cls.base = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.engine = AsyncEngine()
+
+    def tearDown(self):
+        async_engine.set_engine(None)
+        self.engine.close()
+
+    def test_loop_thread(self):
+        self.assertFalse(self.engine.running)
+        self.assertEqual(self.engine.run(asyncio.sleep(0, result=42)), 42)
+        self.assertTrue(self.engine.running)
+        self.engine.close()
+        self.assertFalse(self.engine.running)
+
+    def test_fail_run_timeout(self):
+        with self.assertRaises(TimeoutError):
+            self.engine.run(asyncio.sleep(1), timeout=0.01)
+
+    def test_open_redirect(self):
+        res = self.engine.open(url=f"{self.base}/redirect", headers={})
+        res.raise_for_status()
+        self.assertEqual(res.url, f"{self.base}/file")
+        self.assertEqual(res.headers["etag"], '"mock"')
+        self.assertIs(res.raw, res)
+        self.assertEqual(b"".join(res.iter_content(chunk_size=1000)), BODY)
+        res.close()
+
+    def fetch_twice(self, path: str) -> list:
+        MockHandler.peers.clear()
+        for _ in range(2):
+            res = self.engine.open(url=f"{self.base}/{path}", headers={})
+            self.assertEqual(b"".join(res.iter_content(chunk_size=1000)), BODY)
+            res.close()
+        return MockHandler.peers
+
+    def test_open_reuses_connection(self):
+        peers = self.fetch_twice("file")
+        self.assertEqual(len(peers), 2)
+        self.assertEqual(peers[0], peers[1])
+
+    def test_open_connection_close(self):
+        peers = self.fetch_twice("close")
+        self.assertEqual(len(peers), 2)
+        self.assertNotEqual(peers[0], peers[1])
+
+    def test_open_retries_dropped_connection(self):
+        peers = self.fetch_twice("drop")
+        self.assertEqual(len(peers), 2)
+        self.assertNotEqual(peers[0], peers[1])
+
+    def test_fail_raise_for_status(self):
+        res = self.engine.open(url=f"{self.base}/missing", headers={})
+        with self.assertRaises(requests.exceptions.HTTPError):
+            res.raise_for_status()
+        res.close()
+
+    def test_fail_open_connection(self):
+        with patch(
+            f"{async_engine.__name__}.open_stream",
+            side_effect=ConnectionRefusedError("mock"),
+        ):
+            with self.assertRaises(requests.exceptions.ConnectionError):
+                self.engine.open(url=f"{self.base}/file", headers={})
+
+    def test_fail_deadline(self):
+        res = self.engine.open(url=f"{self.base}/slow", headers={}, deadline=0.1)
+        with self.assertRaises(requests.exceptions.Timeout):
+            for _ in res.iter_content(chunk_size=1024):
+                pass
+        res.close()
+
+    def test_limit(self):
+        self.assertEqual(
+            SyncStreamResponse.limit(timeout=30, deadline=None), (30, None)
+        )
+        deadline = time.monotonic() + 10
+        timeout, _ = SyncStreamResponse.limit(timeout=30, deadline=deadline)
+        self.assertTrue(0 < timeout <= 10)
+
+        with self.assertRaises(requests.exceptions.Timeout):
+            SyncStreamResponse.limit(timeout=30, deadline=time.monotonic() - 1)
+
+    def test_set_engine(self):
+        old = MagicMock()
+        async_engine.set_engine(old)
+        self.assertIs(async_engine.get_engine(), old)
+        async_engine.set_engine(None)
+        old.close.assert_called_once()
+        self.assertIsNone(async_engine.get_engine())
+
+    def test_stream_downloader_facade(self):
+        async_engine.set_engine(self.engine)
+        for path in ("file", "chunked"):
+            sd = StreamDownloader(url=URL)
+            data = []
+            sd.on_data = lambda data, chunks=data: chunks.append(data)
+            self.assertTrue(sd.download_file_stream(url=f"{self.base}/{path}"))
+            self.assertEqual(b"".join(data), BODY)
+            self.assertEqual(sd.downloaded_len, len(BODY))
+            self.assertEqual(sd.content_len, len(BODY))
+
+    def test_stream_downloader_facade_adaptive(self):
+        async_engine.set_engine(self.engine)
+        sd = StreamDownloader(url=URL)
+        sd.adaptive = True
+        data = []
+        sd.on_data = lambda data, chunks=data: chunks.append(data)
+        sd.download_file_stream(url=f"{self.base}/file")
+        self.assertEqual(b"".join(data), BODY)
+
+    def test_many_transfers_on_one_loop(self):
+        downloaders = [AsyncStreamDownloader(url=URL) for _ in range(4)]
+        for d in downloaders:
+            d.on_data = MagicMock()
+
+        async def run():
+            return await asyncio.gather(
+                *[d.fetch(url=f"{self.base}/file") for d in downloaders]
+            )
+
+        self.assertEqual(self.engine.run(run()), [True] * 4)
+        for d in downloaders:
+            self.assertEqual(d.downloaded_len, len(BODY))
+            self.assertEqual(d.content_len, len(BODY))
+            self.assertFalse(d.running)
+
+    def test_fetch_chunked(self):
+        d = AsyncStreamDownloader(url=URL)
+        d.on_data = MagicMock()
+        self.engine.run(d.fetch(url=f"{self.base}/chunked"))
+        self.assertEqual(d.content_len, len(BODY))
+        self.assertEqual(d.on_data.call_args.kwargs, {"data": b""})
+
+    def test_fail_fetch_http_error(self):
+        d = AsyncStreamDownloader(url=URL)
+        d.on_data = MagicMock()
+        with self.assertRaises(RuntimeError) as exc_info:
+            self.engine.run(d.fetch(url=f"{self.base}/missing"))
+
+        self.assertEqual(
+            str(exc_info.exception), f"HTTP error 404: {self.base}/missing"
+        )
+
+    def test_fail_fetch_deadline(self):
+        d = AsyncStreamDownloader(url=URL, deadline=0.1)
+        d.on_data = MagicMock()
+        with self.assertRaises(RuntimeError) as exc_info:
+            self.engine.run(d.fetch(url=f"{self.base}/slow"))
+
+        self.assertTrue(
+            str(exc_info.exception).startswith("Download deadline of 0.1s exceeded")
+        )
+
+    def test_cancel_fetch(self):
+        d = AsyncStreamDownloader(url=URL)
+        d.on_data = MagicMock(side_effect=lambda data: d.cancel())
+        future = self.engine.submit(d.fetch(url=f"{self.base}/slow"))
+
+        with self.assertRaises(CancelledError):
+            future.result(timeout=5)
+
+        self.assertTrue(d.downloaded_len < len(BODY))
+        self.assertFalse(d.running)
+
+    def test_fail_deadline_setter(self):
+        with self.assertRaises(ValueError) as exc_info:
+            AsyncStreamDownloader(url=URL).deadline = 0
+
+        self.assertEqual(str(exc_info.exception), "Invalid deadline: 0")
@@ -0,0 +1,60 @@
+from unittest import TestCase
+from unittest.mock import MagicMock
+from src.utils.downloader.cancel_token import CancelToken, DownloadCancelled
+
+
+class TestCancelToken(TestCase):
+
+    def test_init(self):
+        token = CancelToken()
+        self.assertFalse(token.cancelled)
+        token.raise_if_cancelled()
+
+    def test_cancel(self):
+        token = CancelToken()
+        callback = MagicMock()
+        token.on_cancel(callback)
+
+        token.cancel()
+        token.cancel()
+
+        self.assertTrue(token.cancelled)
+        callback.assert_called_once()
+
+    def test_on_cancel_when_cancelled(self):
+        token = CancelToken()
+        token.cancel()
+
+        callback = MagicMock()
+        token.on_cancel(callback)
+        callback.assert_called_once()
+
+    def test_remove(self):
+        token = CancelToken()
+        callback = MagicMock()
+        token.on_cancel(callback)
+        token.remove(callback)
+        token.remove(callback)
+
+        token.cancel()
+        callback.assert_not_called()
+
+    def test_cancel_failed_callback(self):
+        token = CancelToken()
+        failed = MagicMock(side_effect=OSError("mocked"))
+        callback = MagicMock()
+        token.on_cancel(failed)
+        token.on_cancel(callback)
+
+        token.cancel()
+        callback.assert_called_once()
+
+    def test_fail_raise_if_cancelled(self):
+        token = CancelToken()
+        token.cancel()
+
+        with self.assertRaises(DownloadCancelled) as exc_info:
+            token.raise_if_cancelled("Download cancelled at 21")
+
+        self.assertIsInstance(exc_info.exception, RuntimeError)
+        self.assertEqual(str(exc_info.exception), "Download cancelled at 21")
@@ -0,0 +1,142 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+import requests
+from src.utils import mirror
+from src.utils.mirror import probe as unpatched_probe
+from src.utils.downloader import BetaDownloader
+
+URL = "https://github.com/selfcustody/krux/releases/download/v0.0.1/krux-v0.0.1.zip"
+
+PATH = "github.com/selfcustody/krux/releases/download/v0.0.1/krux-v0.0.1.zip"
+
+
+class TestMirror(TestCase):
+
+    def setUp(self):
+        mirror.set_mirrors([])
+
+    def tearDown(self):
+        mirror.set_mirrors([])
+
+    def test_parse_mirrors(self):
+        self.assertEqual(mirror.parse_mirrors(""), [])
+        self.assertEqual(mirror.parse_mirrors(None), [])
+        self.assertEqual(
+            mirror.parse_mirrors("http://cache.local/, file:///srv/krux\nhttp://a"),
+            ["http://cache.local/", "file:///srv/krux", "http://a"],
+        )
+
+    def test_set_mirrors(self):
+        mirror.set_mirrors(["http://cache.local/", "file:///srv/krux"])
+        self.assertEqual(
+            mirror.get_mirrors(), ["http://cache.local", "file:///srv/krux"]
+        )
+
+    def test_fail_set_mirrors(self):
+        with self.assertRaises(ValueError) as exc_info:
+            mirror.set_mirrors(["ftp://cache.local"])
+
+        self.assertEqual(str(exc_info.exception), "Invalid mirror: ftp://cache.local")
+
+    def test_candidates(self):
+        self.assertEqual(mirror.candidates(URL), [URL])
+
+        mirror.set_mirrors(["http://cache.local/krux/", "file:///srv/krux"])
+        self.assertEqual(
+            mirror.candidates(URL),
+            [
+                f"http://cache.local/krux/{PATH}",
+                f"file:///srv/krux/{PATH}",
+                URL,
+            ],
+        )
+
+    @patch("src.utils.mirror.race")
+    def test_sources_trust_anchor(self, mock_race):
+        pem = "https://raw.githubusercontent.com/selfcustody/krux/main/selfcustody.pem"
+        mirror.set_mirrors(["http://cache.local", "file:///srv/krux"])
+
+        # the certificate never comes from a mirror
+        self.assertEqual(mirror.candidates(pem), [pem])
+        self.assertEqual(mirror.sources(pem), [pem])
+        mock_race.assert_not_called()
+
+    @patch("src.utils.mirror.race")
+    def test_sources_unsigned(self, mock_race):
+        beta = BetaDownloader(device="amigo", binary_type="kboot.kfpkg").url
+        mirror.set_mirrors(["http://cache.local", "file:///srv/krux"])
+
+        # a mirror cant serve beta binaries, that arent signed
+        self.assertEqual(mirror.candidates(beta), [beta])
+        self.assertEqual(mirror.sources(beta), [beta])
+        mock_race.assert_not_called()
+
+    @patch("src.utils.mirror.get_session")
+    def test_probe(self, mock_get_session):
+        self.assertIsInstance(mirror.probe(URL), float)
+        mock_get_session.return_value.head.assert_called_once_with(
+            url=URL, allow_redirects=True, timeout=mirror.PROBE_TIMEOUT
+        )
+
+    @patch("src.utils.mirror.get_session")
+    def test_fail_probe(self, mock_get_session):
+        res = MagicMock()
+        res.raise_for_status.side_effect = requests.exceptions.HTTPError()
+        mock_get_session.return_value.head.return_value = res
+        self.assertIsNone(mirror.probe(URL))
+
+        mock_get_session.return_value.head.side_effect = (
+            requests.exceptions.ConnectionError()
+        )
+        self.assertIsNone(mirror.probe(URL))
+
+    def test_race_file_mirror(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, *PATH.split("/"))
+            os.makedirs(os.path.dirname(path))
+            with open(path, "wb") as file:
+                file.write(b"krux")
+
+            # the missing mirror is unhealthy, the local
+            # one answer before the (mocked) slow upstream
+            mirror.set_mirrors([f"file://{tmpdir}/missing", f"file://{tmpdir}"])
+            urls = mirror.candidates(URL)
+
+            with patch("src.utils.mirror.probe", side_effect=self.local_probe):
+                ordered = mirror.race(urls)
+
+        self.assertEqual(ordered, [urls[1], urls[0], urls[2]])
+
+    @staticmethod
+    def local_probe(url, timeout):
+        # upstream isnt reachable on tests, mirrors
+        # are probed through the session's FileAdapter
+        if url.startswith("https://"):
+            return None
+
+        return unpatched_probe(url, timeout)
+
+    @patch("src.utils.mirror.probe", return_value=None)
+    def test_race_none_healthy(self, mock_probe):
+        urls = ["http://a/f", "http://b/f"]
+        self.assertEqual(mirror.race(urls), urls)
+        self.assertEqual(mock_probe.call_count, 2)
+
+    @patch("src.utils.mirror.race")
+    def test_sources(self, mock_race):
+        self.assertEqual(mirror.sources(URL), [URL])
+        mock_race.assert_not_called()
+
+        mirror.set_mirrors(["http://cache.local"])
+        mock_race.return_value = [f"http://cache.local/{PATH}", URL]
+
+        # the race is reused for a while
+        self.assertEqual(mirror.sources(URL), mock_race.return_value)
+        self.assertEqual(mirror.sources(URL), mock_race.return_value)
+        mock_race.assert_called_once_with([f"http://cache.local/{PATH}", URL])
+
+        with patch("src.utils.mirror.time.monotonic", return_value=1e12):
+            mirror.sources(URL)
+        self.assertEqual(mock_race.call_count, 2)
@@ -0,0 +1,273 @@
+import os
+import io
+import json
+import hashlib
+import tarfile
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from src.utils import digest
+from src.utils.cache import AssetCache
+from src.utils.bundle import BundleImporter
+from src.utils.downloader.beta_sync import BetaSync
+
+BASE_URL = "https://github.com/selfcustody/krux/releases/download"
+PEM_URL = "https://raw.githubusercontent.com/selfcustody/krux/main/selfcustody.pem"
+BETA_URL = "https://raw.githubusercontent.com/odudex/krux_binaries/main"
+
+
+def make_key() -> tuple:
+    key = ec.generate_private_key(ec.SECP256K1())
+    pem = key.public_key().public_bytes(
+        serialization.Encoding.PEM, serialization.PublicFormat.SubjectPublicKeyInfo
+    )
+    return key, pem
+
+
+def make_release(key, version: str, data: bytes, sha256: str | None = None) -> dict:
+    zipname = f"krux-{version}.zip"
+    hexdigest = sha256 or hashlib.sha256(data).hexdigest()
+    return {
+        zipname: data,
+        f"{zipname}.sha256.txt": f"{hexdigest} {zipname}\n".encode(),
+        f"{zipname}.sig": key.sign(data, ec.ECDSA(hashes.SHA256())),
+    }
+
+
+def git_sha(data: bytes) -> str:
+    return hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+
+
+def write_dir(root: str, files: dict):
+    for name, data in files.items():
+        path = os.path.join(root, *name.split("/"))
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as file:
+            file.write(data)
+
+
+class TestBundleImporter(TestCase):
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.bundle = os.path.join(self.tmpdir.name, "bundle")
+        self.destdir = os.path.join(self.tmpdir.name, "assets")
+        os.makedirs(self.bundle)
+        self.cache = AssetCache(destdir=self.destdir)
+        self.key, self.pem = make_key()
+
+        # offline, unless a test gives the tree of the beta binaries
+        fetch_tree = patch.object(
+            BetaSync, "fetch_tree", side_effect=RuntimeError("offline")
+        )
+        self.mock_fetch_tree = fetch_tree.start()
+        self.addCleanup(fetch_tree.stop)
+
+    def tearDown(self):
+        digest.forget()
+        self.tmpdir.cleanup()
+
+    def write_manifest(self, manifest: dict):
+        """Write the blob SHAs of a previous beta sync of the station"""
+        write_dir(
+            self.destdir,
+            {f"krux_binaries/{BetaSync.MANIFEST}": json.dumps(manifest).encode()},
+        )
+
+    def import_bundle(self, path: str, **kwargs) -> dict:
+        importer = BundleImporter(cache=self.cache, **kwargs)
+        return importer.import_bundle(path=path)
+
+    def make_files(self) -> dict:
+        files = {"selfcustody.pem": self.pem, "README.md": b"not an asset"}
+        files.update(make_release(self.key, "v0.0.1", b"one" * 1000))
+        files.update(make_release(self.key, "v0.0.2", b"two", sha256="0" * 64))
+        files["v3/krux-v0.0.3.zip"] = b"three"
+        files["krux_binaries/maixpy_amigo/kboot.kfpkg"] = b"kboot"
+        files["maixpy_unknown/kboot.kfpkg"] = b"skipped"
+        return files
+
+    def assert_imported(self, summary: dict):
+        self.assertEqual(summary["versions"], ["v0.0.1"])
+        self.assertEqual(
+            summary["beta"],
+            [os.path.join("krux_binaries", "maixpy_amigo", "kboot.kfpkg")],
+        )
+        self.assertEqual(
+            summary["rejected"],
+            {
+                "v0.0.2": "sha256 mismatch",
+                "v0.0.3": "missing krux-v0.0.3.zip.sha256.txt, krux-v0.0.3.zip.sig",
+            },
+        )
+
+        # verified assets are placed under their usual names
+        # and stored on cache under their canonical urls
+        zipfile = os.path.join(self.destdir, "krux-v0.0.1.zip")
+        with open(zipfile, "rb") as file:
+            self.assertEqual(file.read(), b"one" * 1000)
+
+        cache = AssetCache(destdir=self.destdir)
+        self.assertEqual(cache.lookup(f"{BASE_URL}/v0.0.1/krux-v0.0.1.zip"), zipfile)
+        self.assertIsNotNone(cache.lookup(PEM_URL))
+        self.assertIsNotNone(cache.lookup(f"{BETA_URL}/maixpy_amigo/kboot.kfpkg"))
+        self.assertIsNone(cache.lookup(f"{BASE_URL}/v0.0.2/krux-v0.0.2.zip"))
+        self.assertFalse(os.path.exists(os.path.join(self.destdir, "krux-v0.0.2.zip")))
+        self.assertEqual(cache.releases(), ["v0.0.1", "odudex/krux_binaries"])
+
+        # and the staging directory is removed
+        self.assertEqual(
+            sorted(os.listdir(os.path.join(self.destdir, ".cache"))),
+            ["index.json", "objects"],
+        )
+
+    def test_import_dir(self):
+        write_dir(self.bundle, self.make_files())
+        self.write_manifest({"maixpy_amigo/kboot.kfpkg": git_sha(b"kboot")})
+        summary = self.import_bundle(path=self.bundle, trust_pem=True)
+        self.assert_imported(summary)
+        self.mock_fetch_tree.assert_not_called()
+
+        # the source is copied, not moved
+        self.assertTrue(os.path.exists(os.path.join(self.bundle, "krux-v0.0.1.zip")))
+
+    def test_import_tarball(self):
+        tarball = os.path.join(self.tmpdir.name, "bundle.tar.gz")
+        with tarfile.open(tarball, "w:gz") as tar:
+            for name, data in self.make_files().items():
+                info = tarfile.TarInfo(name=f"./{name}")
+                info.size = len(data)
+                tar.addfile(info, io.BytesIO(data))
+
+            # links are never followed
+            link = tarfile.TarInfo(name="krux-v0.0.4.zip")
+            link.type = tarfile.SYMTYPE
+            link.linkname = "/etc/passwd"
+            tar.addfile(link)
+
+        # the beta binary is verified on the tree of the repository
+        self.mock_fetch_tree.side_effect = None
+        self.mock_fetch_tree.return_value = {
+            "maixpy_amigo/kboot.kfpkg": git_sha(b"kboot")
+        }
+        summary = self.import_bundle(path=tarball, trust_pem=True)
+        self.assert_imported(summary)
+        self.mock_fetch_tree.assert_called_once()
+
+    def test_import_reuse_digest(self):
+        write_dir(self.bundle, make_release(self.key, "v0.0.1", b"one"))
+        write_dir(self.bundle, {"selfcustody.pem": self.pem})
+        self.import_bundle(path=self.bundle, trust_pem=True)
+
+        # verifyers dont read the imported zip again
+        zipfile = os.path.join(self.destdir, "krux-v0.0.1.zip")
+        self.assertEqual(
+            digest.recall(path=zipfile, name="sha256"),
+            hashlib.sha256(b"one").hexdigest(),
+        )
+
+    def test_import_prefer_cached_pem(self):
+        pem = os.path.join(self.destdir, "selfcustody.pem")
+        with open(pem, "wb") as file:
+            file.write(self.pem)
+        self.cache.store(url=PEM_URL, path=pem)
+
+        # a bundle signed by other key cant bring its own
+        other_key, other_pem = make_key()
+        write_dir(self.bundle, make_release(other_key, "v0.0.1", b"one"))
+        write_dir(self.bundle, {"selfcustody.pem": other_pem})
+        summary = BundleImporter(cache=self.cache).import_bundle(path=self.bundle)
+
+        self.assertEqual(summary["versions"], [])
+        self.assertEqual(summary["rejected"], {"v0.0.1": "invalid signature"})
+        with open(pem, "rb") as file:
+            self.assertEqual(file.read(), self.pem)
+
+    def test_import_untrusted_pem(self):
+        write_dir(self.bundle, make_release(self.key, "v0.0.1", b"one"))
+        write_dir(self.bundle, {"selfcustody.pem": self.pem})
+        summary = self.import_bundle(path=self.bundle)
+
+        # without an installed key, the bundle's one must be confirmed
+        self.assertEqual(summary["rejected"], {"v0.0.1": "untrusted selfcustody.pem"})
+        self.assertIsNone(self.cache.lookup(PEM_URL))
+        self.assertEqual(self.cache.releases(), [])
+
+    def test_import_unverified_beta(self):
+        name = os.path.join("krux_binaries", "maixpy_amigo", "kboot.kfpkg")
+        other = os.path.join("krux_binaries", "maixpy_dock", "kboot.kfpkg")
+        write_dir(
+            self.bundle,
+            {
+                "maixpy_amigo/kboot.kfpkg": b"forged",
+                "maixpy_dock/kboot.kfpkg": b"dock",
+                # the bundle's manifest is never trusted
+                f"maixpy_amigo/{BetaSync.MANIFEST}": b'{"maixpy_amigo/kboot.kfpkg": ""}',
+            },
+        )
+        self.write_manifest({"maixpy_amigo/kboot.kfpkg": git_sha(b"kboot")})
+        summary = self.import_bundle(path=self.bundle)
+
+        self.assertEqual(summary["beta"], [])
+        self.assertEqual(
+            summary["rejected"], {name: "blob mismatch", other: "unknown blob"}
+        )
+        self.assertFalse(os.path.exists(os.path.join(self.destdir, name)))
+        self.assertFalse(os.path.exists(os.path.join(self.destdir, other)))
+        self.assertEqual(self.cache.releases(), [])
+
+    def test_import_without_pem(self):
+        write_dir(self.bundle, make_release(self.key, "v0.0.1", b"one"))
+        summary = BundleImporter(cache=self.cache).import_bundle(path=self.bundle)
+        self.assertEqual(summary["rejected"], {"v0.0.1": "missing selfcustody.pem"})
+        self.assertEqual(self.cache.releases(), [])
+
+    def test_bulk_copy(self):
+        src = os.path.join(self.bundle, "src.bin")
+        dest = os.path.join(self.bundle, "dest.bin")
+        write_dir(self.bundle, {"src.bin": os.urandom(3 << 20)})
+        importer = BundleImporter(cache=self.cache)
+
+        self.assertEqual(importer.bulk_copy(src=src, dest=dest), 3 << 20)
+        with open(src, "rb") as fsrc, open(dest, "rb") as fdst:
+            self.assertEqual(fsrc.read(), fdst.read())
+
+    @patch("src.utils.bundle.bundle_importer.os.sendfile", create=True)
+    @patch("src.utils.bundle.bundle_importer.os.copy_file_range", create=True)
+    def test_bulk_copy_fallback(self, mock_copy_file_range, mock_sendfile):
+        mock_copy_file_range.side_effect = OSError(18, "Invalid cross-device link")
+        mock_sendfile.side_effect = OSError(22, "Invalid argument")
+        src = os.path.join(self.bundle, "src.bin")
+        dest = os.path.join(self.bundle, "dest.bin")
+        write_dir(self.bundle, {"src.bin": b"krux" * 1000})
+
+        importer = BundleImporter(cache=self.cache)
+        self.assertEqual(importer.bulk_copy(src=src, dest=dest), 4000)
+        with open(dest, "rb") as file:
+            self.assertEqual(file.read(), b"krux" * 1000)
+
+        mock_copy_file_range.assert_called_once()
+        mock_sendfile.assert_called_once()
+
+    def test_fail_import(self):
+        importer = BundleImporter(cache=self.cache)
+        missing = os.path.join(self.tmpdir.name, "missing")
+        with self.assertRaises(ValueError) as exc_info:
+            importer.import_bundle(path=missing)
+        self.assertEqual(str(exc_info.exception), f"Bundle {missing} do not exist")
+
+        invalid = os.path.join(self.bundle, "bundle.txt")
+        write_dir(self.bundle, {"bundle.txt": b"krux"})
+        with self.assertRaises(ValueError) as exc_info:
+            importer.import_bundle(path=invalid)
+        self.assertEqual(str(exc_info.exception), f"Invalid bundle: {invalid}")
+
+    def test_fail_workers(self):
+        for value in (0, -1, "4", 1.5):
+            with self.assertRaises(ValueError) as exc_info:
+                BundleImporter(cache=self.cache, workers=value)
+
+            self.assertEqual(str(exc_info.exception), f"Invalid workers: {value}")
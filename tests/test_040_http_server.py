@@ -0,0 +1,184 @@
+import os
+import time
+import hashlib
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from io import StringIO
+import requests
+from src.utils import digest
+from src.utils.downloader import ZipDownloader, BetaDownloader
+from src.utils.downloader.segmented_downloader import SegmentedDownloader
+from src.utils.retry import RetryPolicy
+from .http_server import StandInServer, parse_range, synthetic_zip
+from .benchmark_downloaders import run_case, print_result
+
+VERSION = "v0.0.1"
+ZIP_URL = f"https://github.com/selfcustody/krux/releases/download/{VERSION}/krux-{VERSION}.zip"
+BETA_URL = "https://raw.githubusercontent.com/odudex/krux_binaries/main/maixpy_amigo/kboot.kfpkg"
+
+
+class TestStandInServer(TestCase):
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.data = synthetic_zip(version=VERSION, size=1 << 20)
+        self.server = StandInServer().start()
+        self.local = self.server.add(ZIP_URL, self.data)
+
+    def tearDown(self):
+        self.server.stop()
+        digest.forget()
+        self.tmpdir.cleanup()
+
+    def download(self, **kwargs) -> str:
+        zip_downloader = ZipDownloader(
+            version=VERSION, destdir=self.tmpdir.name, **kwargs
+        )
+        with self.server.routing():
+            return zip_downloader.download(on_data=lambda data: None)
+
+    def assert_downloaded(self, path: str):
+        with open(path, "rb") as file:
+            self.assertEqual(file.read(), self.data)
+
+    def test_parse_range(self):
+        self.assertEqual(parse_range("bytes=0-", 10), (0, 9))
+        self.assertEqual(parse_range("bytes=2-4", 10), (2, 4))
+        self.assertEqual(parse_range("bytes=2-40", 10), (2, 9))
+        self.assertIsNone(parse_range("bytes=10-", 10))
+        self.assertIsNone(parse_range("bytes=-5", 10))
+        self.assertIsNone(parse_range("items=0-", 10))
+
+    def test_synthetic_zip(self):
+        self.assertEqual(synthetic_zip(VERSION, 1 << 20), self.data)
+        self.assertGreaterEqual(len(self.data), 1 << 20)
+        self.assertLess(len(self.data), (1 << 20) + (16 << 10))
+
+    def test_serve(self):
+        res = requests.get(self.local, headers={"Range": "bytes=10-19"}, timeout=5)
+        self.assertEqual(res.status_code, 206)
+        self.assertEqual(res.content, self.data[10:20])
+        self.assertEqual(res.headers["Content-Range"], f"bytes 10-19/{len(self.data)}")
+
+        etag = res.headers["ETag"]
+        res = requests.get(self.local, headers={"If-None-Match": etag}, timeout=5)
+        self.assertEqual(res.status_code, 304)
+
+        # a stale validator get the whole content
+        headers = {"Range": "bytes=10-", "If-Range": '"stale"'}
+        res = requests.get(self.local, headers=headers, timeout=5)
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(res.content), len(self.data))
+
+        res = requests.head(self.local, timeout=5)
+        self.assertEqual(res.headers["Content-Length"], str(len(self.data)))
+        self.assertEqual(res.headers["Accept-Ranges"], "bytes")
+
+        res = requests.get(f"{self.server.base_url}/missing", timeout=5)
+        self.assertEqual(res.status_code, 404)
+
+    def test_download(self):
+        path = self.download()
+        self.assert_downloaded(path)
+        self.assertEqual(
+            digest.recall(path=path, name="sha256"),
+            hashlib.sha256(self.data).hexdigest(),
+        )
+
+    def test_download_chunked(self):
+        self.server.options["chunked"] = True
+        self.assert_downloaded(self.download())
+
+        res = requests.get(self.local, timeout=5)
+        self.assertEqual(res.headers["Transfer-Encoding"], "chunked")
+        self.assertNotIn("Content-Length", res.headers)
+
+    @patch.object(SegmentedDownloader, "MIN_SEGMENT_SIZE", 128 << 10)
+    def test_download_segmented(self):
+        self.server.options["block"] = 4 << 10
+        self.assert_downloaded(self.download(connections=4))
+
+        ranges = [
+            headers["Range"]
+            for method, _, headers in self.server.requests
+            if method == "GET"
+        ]
+        self.assertEqual(len(ranges), 4)
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=1),
+    )
+    def test_resume_dropped_connection(self):
+        self.server.options["drop_after"] = 300 << 10
+        with self.assertRaises(RuntimeError):
+            self.download()
+
+        partfile = os.path.join(self.tmpdir.name, f"krux-{VERSION}.zip.part")
+        self.assertTrue(os.path.exists(partfile))
+
+        # the next call continues from the received data
+        path = self.download()
+        self.assert_downloaded(path)
+        headers = self.server.requests[-1][2]
+        self.assertEqual(headers["Range"], f"bytes={300 << 10}-")
+        self.assertIn("If-Range", headers)
+
+    def test_retry_dropped_connection(self):
+        self.server.options["drop_after"] = 300 << 10
+        retries = []
+        zip_downloader = ZipDownloader(version=VERSION, destdir=self.tmpdir.name)
+        zip_downloader.on_retry = lambda *args: retries.append(args[:2])
+        with self.server.routing():
+            self.assert_downloaded(zip_downloader.download(on_data=lambda data: None))
+
+        # the same call continues from the received data
+        self.assertEqual(retries, [(2, 5)])
+        headers = self.server.requests[-1][2]
+        self.assertEqual(headers["Range"], f"bytes={300 << 10}-")
+
+    def test_bandwidth_and_latency(self):
+        self.server.options["bandwidth"] = 4 << 20
+        self.server.options["latency"] = 0.1
+        started = time.perf_counter()
+        self.assert_downloaded(self.download())
+
+        # 1 MB at 4 MB/s, after the latency
+        self.assertGreaterEqual(time.perf_counter() - started, 0.3)
+
+    def test_beta_download(self):
+        self.server.add(BETA_URL, b"kboot" * 1000)
+        beta = BetaDownloader(
+            device="amigo", binary_type="kboot.kfpkg", destdir=self.tmpdir.name
+        )
+        with self.server.routing():
+            path = beta.download(on_data=lambda data: None)
+
+        with open(path, "rb") as file:
+            self.assertEqual(file.read(), b"kboot" * 1000)
+
+        # the next download is conditional
+        self.server.requests.clear()
+        with self.server.routing():
+            self.assertEqual(beta.download(on_data=lambda data: None), path)
+        self.assertIn("If-None-Match", self.server.requests[-1][2])
+
+    def test_run_case(self):
+        self.server.options["bandwidth"] = None
+        result = run_case(
+            base_url=self.server.base_url,
+            case={"asset": "zip", "size": len(self.data), "chunk_size": 64 << 10},
+        )
+        self.assertEqual(result["size"], len(self.data))
+        self.assertGreater(result["mbps"], 0)
+        self.assertGreaterEqual(result["cpu"], 0)
+        self.assertIn("rss_mb", result)
+        self.assertGreaterEqual(result["rss_delta_mb"], 0)
+
+        # the table shows how much the transfer raised the peak RSS
+        result.update(mode="stream", mb=1, rss_delta_mb=1.5)
+        with patch("sys.stdout", new_callable=StringIO) as stdout:
+            print_result(result)
+        self.assertIn("1.5 MB peak RSS growth", stdout.getvalue())
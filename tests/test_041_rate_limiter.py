@@ -0,0 +1,174 @@
+import time
+import threading
+from unittest import TestCase
+from unittest.mock import patch, MagicMock, call
+from src.utils.downloader import rate_limiter
+from src.utils.downloader.rate_limiter import (
+    RateLimiter,
+    Throttle,
+    get_limiter,
+    set_limiter,
+    get_background_rate,
+    set_background_rate,
+)
+from src.utils.downloader.stream_downloader import StreamDownloader
+
+URL = "https://github.com/selfcustody/krux"
+
+
+def consume_until(limiter: RateLimiter, stop: threading.Event, background: bool):
+    """Consume 5 KB chunks until stopped and count them"""
+    count = [0]
+
+    def _run():
+        while not stop.is_set():
+            limiter.consume(5000, background=background)
+            count[0] += 1
+
+    thread = threading.Thread(target=_run, daemon=True)
+    thread.start()
+    return thread, count
+
+
+class TestRateLimiter(TestCase):
+
+    def setUp(self):
+        set_limiter(RateLimiter())
+        set_background_rate(0)
+
+    def tearDown(self):
+        set_limiter(RateLimiter())
+        set_background_rate(0)
+
+    def test_init(self):
+        limiter = RateLimiter(rate=1000)
+        self.assertEqual(limiter.rate, 1000)
+        self.assertEqual(limiter.burst, 1000)
+
+        limiter = RateLimiter(rate=1000, burst=200)
+        self.assertEqual(limiter.burst, 200)
+
+    def test_fail_init(self):
+        for value in (-1, 1.5, "10"):
+            with self.assertRaises(ValueError) as exc_info:
+                RateLimiter(rate=value)
+            self.assertEqual(str(exc_info.exception), f"Invalid rate: {value}")
+
+        for value in (0, -1, 1.5):
+            with self.assertRaises(ValueError) as exc_info:
+                RateLimiter(rate=10, burst=value)
+            self.assertEqual(str(exc_info.exception), f"Invalid burst: {value}")
+
+    def test_consume_unlimited(self):
+        limiter = RateLimiter()
+        started = time.monotonic()
+        for _ in range(1000):
+            self.assertEqual(limiter.consume(1 << 20), 0.0)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_consume_rate(self):
+        limiter = RateLimiter(rate=100000, burst=10000)
+
+        # the bucket starts full
+        self.assertLess(limiter.consume(10000), 0.01)
+
+        started = time.monotonic()
+        for _ in range(3):
+            limiter.consume(10000)
+        self.assertGreaterEqual(time.monotonic() - started, 0.25)
+        self.assertLess(time.monotonic() - started, 1.0)
+
+    def test_consume_larger_than_burst(self):
+        limiter = RateLimiter(rate=100000, burst=10000)
+
+        # a large chunk goes through, but the next one pays its debt
+        self.assertLess(limiter.consume(30000), 0.01)
+        self.assertGreaterEqual(limiter.consume(1000), 0.15)
+
+    def test_unlimit_wakes_consumers(self):
+        limiter = RateLimiter(rate=1000, burst=1000)
+        limiter.consume(1000)
+        timer = threading.Timer(0.1, setattr, (limiter, "rate", 0))
+        timer.start()
+
+        # waiting for 10 seconds of tokens, but unlimited meanwhile
+        self.assertLess(limiter.consume(10000), 1.0)
+        timer.join()
+
+    @patch.object(rate_limiter, "FOREGROUND_GRACE", 0.1)
+    def test_background_priority(self):
+        limiter = RateLimiter(rate=200000, burst=10000)
+        stop = threading.Event()
+        foreground, fg_count = consume_until(limiter, stop, background=False)
+        background, bg_count = consume_until(limiter, stop, background=True)
+        time.sleep(0.5)
+        stop.set()
+        foreground.join()
+        background.join()
+
+        # a saturating foreground transfer starves the background one
+        self.assertGreater(fg_count[0], 10)
+        self.assertLess(bg_count[0], fg_count[0] / 4)
+
+        # without foreground transfers, the background
+        # one use the bandwidth left, after a grace period
+        time.sleep(0.1)
+        started = time.monotonic()
+        for _ in range(10):
+            limiter.consume(5000, background=True)
+        self.assertLess(time.monotonic() - started, 0.5)
+
+    def test_background_rate(self):
+        self.assertEqual(get_background_rate(), 0)
+        set_background_rate(2048)
+        self.assertEqual(get_background_rate(), 2048)
+
+        for value in (-1, 1.5):
+            with self.assertRaises(ValueError) as exc_info:
+                set_background_rate(value)
+            self.assertEqual(str(exc_info.exception), f"Invalid rate: {value}")
+
+    def test_throttle_defaults(self):
+        set_background_rate(2048)
+
+        throttle = Throttle()
+        self.assertFalse(throttle.background)
+        self.assertEqual(throttle.limiter.rate, 0)
+        self.assertFalse(throttle.limited)
+
+        throttle = Throttle(background=True)
+        self.assertTrue(throttle.background)
+        self.assertEqual(throttle.limiter.rate, 2048)
+        self.assertTrue(throttle.limited)
+
+        throttle = Throttle(rate=4096, background=True)
+        self.assertEqual(throttle.limiter.rate, 4096)
+
+        get_limiter().rate = 1024
+        self.assertTrue(Throttle().limited)
+
+    def test_throttle_consume(self):
+        shared = MagicMock()
+        shared.consume.return_value = 0.5
+        set_limiter(shared)
+
+        throttle = Throttle(background=True)
+        self.assertEqual(throttle.consume(100), 0.5)
+        shared.consume.assert_called_once_with(100, background=True)
+
+    @patch("src.utils.downloader.stream_downloader.get_session")
+    def test_stream_downloader_throttle(self, mock_get_session):
+        mock_response = MagicMock()
+        mock_response.status_code = 200
+        mock_response.headers = {"Content-Length": "7"}
+        mock_response.iter_content.return_value = [b"a" * 3, b"b" * 4]
+        mock_get_session.return_value.get.return_value = mock_response
+
+        sd = StreamDownloader(url=URL)
+        self.assertIsInstance(sd.throttle, Throttle)
+        self.assertFalse(sd.throttle.background)
+
+        sd.throttle = MagicMock()
+        sd.on_data = MagicMock()
+        sd.download_file_stream(url="https://any.call/test.zip")
+        sd.throttle.consume.assert_has_calls([call(3), call(4)])
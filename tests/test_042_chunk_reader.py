@@ -0,0 +1,96 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+from src.utils import session
+from src.utils.downloader.chunk_reader import raw_readinto, iter_into
+from src.utils.downloader.stream_downloader import StreamDownloader
+from src.utils.retry import RetryPolicy
+from .http_server import StandInServer
+
+URL = "https://github.com/selfcustody/krux/releases/download/v0.0.1/krux-v0.0.1.zip"
+
+
+class TestChunkReader(TestCase):
+
+    def setUp(self):
+        session.set_session(None)
+        self.data = os.urandom(300 << 10)
+        self.server = StandInServer().start()
+        self.local = self.server.add(URL, self.data)
+
+    def tearDown(self):
+        self.server.stop()
+        session.set_session(None)
+
+    def download(self, **kwargs) -> list:
+        """Stream from the server, keeping the given chunks and copies of them"""
+        chunks = []
+        sd = StreamDownloader(url=URL)
+        for key, value in kwargs.items():
+            setattr(sd, key, value)
+        sd.on_data = lambda data: chunks.append((data, bytes(data)))
+        with self.server.routing():
+            sd.download_file_stream(url=URL)
+        return chunks
+
+    def test_raw_readinto(self):
+        res = MagicMock()
+        res.headers = {}
+        self.assertIsNone(raw_readinto(res))
+
+        res = session.get_session().get(self.local, stream=True)
+        self.assertIsNotNone(raw_readinto(res))
+        res.close()
+
+        res.headers["Content-Encoding"] = "gzip"
+        self.assertIsNone(raw_readinto(res))
+
+    def test_iter_into_file(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "krux.bin")
+            with open(path, "wb") as file:
+                file.write(b"0123456789")
+
+            res = session.get_session().get(
+                f"file://{path}", stream=True, headers={"Range": "bytes=2-"}
+            )
+            chunks = [
+                bytes(c) for c in iter_into(res=res, readinto=raw_readinto(res), size=3)
+            ]
+            res.close()
+
+        self.assertEqual(chunks, [b"234", b"567", b"89"])
+
+    def test_download_reuse_buffer(self):
+        chunks = self.download(chunk_size=64 << 10)
+
+        # chunks are slices of the same buffer, valid while given
+        self.assertTrue(all(isinstance(c, memoryview) for c, _ in chunks))
+        self.assertEqual(len({id(c.obj) for c, _ in chunks}), 1)
+        self.assertEqual(b"".join(copy for _, copy in chunks), self.data)
+
+    def test_download_adaptive(self):
+        chunks = self.download(adaptive=True)
+        self.assertEqual(len({id(c.obj) for c, _ in chunks}), 1)
+        self.assertGreater(len({len(copy) for _, copy in chunks}), 1)
+        self.assertEqual(b"".join(copy for _, copy in chunks), self.data)
+
+    def test_download_keep_alive(self):
+        self.download()
+        self.download()
+
+        # the fully read responses gave their connection back
+        self.assertEqual(len(self.server.requests), 2)
+        self.assertEqual(self.server.connections, 1)
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        new=lambda: RetryPolicy(attempts=1),
+    )
+    def test_fail_download_dropped(self):
+        self.server.options["drop_after"] = 100 << 10
+        with self.assertRaises(RuntimeError) as exc_info:
+            self.download()
+
+        self.assertIn("Download interrupted at", str(exc_info.exception))
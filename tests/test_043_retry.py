@@ -0,0 +1,125 @@
+from unittest import TestCase
+from unittest.mock import MagicMock, patch
+import requests
+import urllib3
+from src.utils import retry
+from src.utils.retry import RetryPolicy
+
+
+def http_error(status: int) -> requests.exceptions.HTTPError:
+    """Make a HTTPError with a response of a given status"""
+    return requests.exceptions.HTTPError(response=MagicMock(status_code=status))
+
+
+class TestRetryPolicy(TestCase):
+
+    def tearDown(self):
+        retry.set_policy(RetryPolicy())
+
+    def test_init(self):
+        policy = RetryPolicy()
+        self.assertEqual(policy.attempts, 5)
+        self.assertEqual(policy.max_elapsed, 60.0)
+
+    def test_fail_init(self):
+        for value in (0, -1, 1.5):
+            with self.assertRaises(ValueError) as exc_info:
+                RetryPolicy(attempts=value)
+            self.assertEqual(str(exc_info.exception), f"Invalid attempts: {value}")
+
+        with self.assertRaises(ValueError) as exc_info:
+            RetryPolicy(base=0)
+        self.assertEqual(str(exc_info.exception), "Invalid base: 0")
+
+        with self.assertRaises(ValueError) as exc_info:
+            RetryPolicy(max_elapsed=-1)
+        self.assertEqual(str(exc_info.exception), "Invalid max_elapsed: -1")
+
+    def test_retryable(self):
+        policy = RetryPolicy()
+        for exc in (
+            requests.exceptions.Timeout(),
+            requests.exceptions.ConnectionError(),
+            requests.exceptions.ChunkedEncodingError(),
+            urllib3.exceptions.ProtocolError("Connection broken"),
+            TimeoutError(),
+            ConnectionResetError(),
+            http_error(429),
+            http_error(503),
+        ):
+            self.assertTrue(policy.retryable(exc), exc)
+
+        for exc in (
+            requests.exceptions.ContentDecodingError(),
+            requests.exceptions.HTTPError("no response"),
+            http_error(404),
+            http_error(501),
+            RuntimeError("Invalid Content-Range"),
+            ValueError(),
+        ):
+            self.assertFalse(policy.retryable(exc), exc)
+
+    def test_retryable_cause(self):
+        policy = RetryPolicy()
+        try:
+            try:
+                raise http_error(502)
+            except requests.exceptions.HTTPError as h_exc:
+                raise RuntimeError("HTTP error 502") from h_exc
+        except RuntimeError as exc:
+            self.assertTrue(policy.retryable(exc))
+
+    def test_backoff(self):
+        policy = RetryPolicy(base=0.5, cap=4.0)
+        for attempt, ceiling in ((1, 0.5), (2, 1.0), (3, 2.0), (4, 4.0), (8, 4.0)):
+            delays = [policy.backoff(attempt) for _ in range(50)]
+            self.assertTrue(all(0 <= d <= ceiling for d in delays))
+
+            # jittered, so concurrent clients dont retry together
+            self.assertGreater(len(set(delays)), 1)
+
+    def test_next_delay(self):
+        policy = RetryPolicy(attempts=3, max_elapsed=10.0)
+        exc = requests.exceptions.Timeout()
+
+        self.assertIsNotNone(policy.next_delay(exc=exc, attempt=1, elapsed=0))
+        self.assertIsNotNone(policy.next_delay(exc=exc, attempt=2, elapsed=0))
+
+        # no attempts left, budget exceeded or not retryable
+        self.assertIsNone(policy.next_delay(exc=exc, attempt=3, elapsed=0))
+        self.assertIsNone(policy.next_delay(exc=exc, attempt=1, elapsed=10.0))
+        self.assertIsNone(policy.next_delay(exc=http_error(404), attempt=1, elapsed=0))
+
+    @patch.object(RetryPolicy, "backoff", return_value=0.25)
+    def test_run(self, mock_backoff):
+        fn = MagicMock(side_effect=[requests.exceptions.Timeout(), "done"])
+        on_retry = MagicMock()
+        wait = MagicMock()
+
+        policy = RetryPolicy(attempts=3)
+        self.assertEqual(policy.run(fn=fn, on_retry=on_retry, wait=wait), "done")
+
+        self.assertEqual(fn.call_count, 2)
+        self.assertEqual(on_retry.call_args.args[:3], (2, 3, 0.25))
+        wait.assert_called_once_with(0.25)
+        mock_backoff.assert_called_once_with(1)
+
+    def test_fail_run(self):
+        wait = MagicMock()
+        policy = RetryPolicy(attempts=3)
+
+        fn = MagicMock(side_effect=requests.exceptions.Timeout("mocked"))
+        with self.assertRaises(requests.exceptions.Timeout):
+            policy.run(fn=fn, wait=wait)
+        self.assertEqual(fn.call_count, 3)
+        self.assertEqual(wait.call_count, 2)
+
+        fn = MagicMock(side_effect=KeyError("tag_name"))
+        with self.assertRaises(KeyError):
+            policy.run(fn=fn, wait=wait)
+        fn.assert_called_once()
+
+    def test_set_policy(self):
+        policy = RetryPolicy(attempts=2)
+        retry.set_policy(policy)
+        self.assertIs(retry.get_policy(), policy)
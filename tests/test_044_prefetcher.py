@@ -0,0 +1,160 @@
+import os
+import time
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from src.utils.downloader import BetaDownloader, ReleaseBundle, prefetcher
+from src.utils.downloader.cancel_token import CancelToken
+from src.utils.downloader.download_manager import (
+    INTERACTIVE,
+    PREFETCH,
+    DownloadManager,
+    Request,
+    set_manager,
+)
+from src.utils.downloader.prefetcher import prefetch
+from src.utils.downloader.rate_limiter import Throttle
+from src.utils.retry import RetryPolicy
+from .http_server import StandInServer
+
+URL = (
+    "https://raw.githubusercontent.com/odudex/krux_binaries/main/maixpy_{}/kboot.kfpkg"
+)
+
+
+class TestPrefetcher(TestCase):
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.data = os.urandom(256 << 10)
+        self.server = StandInServer(block=16 << 10).start()
+        for device in ("amigo", "dock"):
+            self.server.add(URL.format(device), self.data)
+        self.routing = self.server.routing()
+        self.routing.__enter__()
+        self.manager = DownloadManager()
+        set_manager(self.manager)
+        prefetcher.set_enabled(True)
+
+    def tearDown(self):
+        prefetcher.set_enabled(False)
+        set_manager(None)
+        self.routing.__exit__(None, None, None)
+        self.server.stop()
+        self.tmpdir.cleanup()
+
+    def beta(self, device: str = "amigo") -> BetaDownloader:
+        return BetaDownloader(
+            device=device,
+            binary_type="kboot.kfpkg",
+            destdir=os.path.join(self.tmpdir.name, device),
+        )
+
+    def wait_done(self, request: Request):
+        started = time.monotonic()
+        while not request.done and time.monotonic() - started < 5:
+            time.sleep(0.01)
+        self.assertTrue(request.done)
+
+    def assert_downloaded(self, path: str):
+        with open(path, "rb") as file:
+            self.assertEqual(file.read(), self.data)
+
+    def test_disabled(self):
+        prefetcher.set_enabled(False)
+        self.assertFalse(prefetcher.get_enabled())
+        self.assertIsNone(prefetch(self.beta()))
+        self.assertEqual(self.manager.transfers, {})
+
+    def test_attach_in_flight(self):
+        self.server.options["bandwidth"] = 1 << 20
+        current = prefetch(self.beta())
+        self.assertEqual(current.priority, PREFETCH)
+        self.assertTrue(current.transfer.downloader.throttle.background)
+        self.assertIs(prefetch(self.beta()), current)
+
+        # a download screen attaches to it
+        events = []
+        request = self.manager.request(self.beta())
+        request.token = CancelToken()
+        path = request.download(on_data=lambda data: events.append(len(data)))
+
+        # the transfer went on in the foreground, without starting over
+        self.assert_downloaded(path)
+        self.assertIs(request.transfer, current.transfer)
+        self.assertEqual(request.transfer.priority, INTERACTIVE)
+        self.assertFalse(request.transfer.downloader.throttle.background)
+        self.assertEqual(len(self.server.requests), 1)
+        self.assertGreater(len(events), 1)
+        self.assertEqual(events[-1], 0)
+        self.assertEqual(request.downloaded_len, request.content_len)
+
+    def test_keep_finished(self):
+        current = prefetch(self.beta())
+        self.wait_done(current)
+        self.assertFalse(current.failed)
+
+        # the same selection isnt downloaded again
+        self.assertIs(prefetch(self.beta()), current)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_leave_demotes(self):
+        self.server.options["bandwidth"] = 1 << 20
+        current = prefetch(self.beta())
+        request = self.manager.request(self.beta()).start()
+        self.assertFalse(current.transfer.downloader.throttle.background)
+
+        # the screen is left, the prefetch goes on in the background
+        request.cancel()
+        self.assertTrue(current.transfer.downloader.throttle.background)
+        self.wait_done(current)
+        self.assertIsNone(current.transfer.exception)
+
+    @patch(
+        "src.utils.downloader.stream_downloader.get_policy",
+        return_value=RetryPolicy(attempts=1),
+    )
+    def test_failed_prefetch(self, mock_get_policy):
+        local = self.server.local(URL.format("amigo"))
+        del self.server.assets[local[len(self.server.base_url) :]]
+        current = prefetch(self.beta())
+        self.wait_done(current)
+        self.assertIsInstance(current.transfer.exception, RuntimeError)
+        self.assertTrue(current.failed)
+        mock_get_policy.assert_called()
+
+        # a later request downloads it again
+        self.server.add(URL.format("amigo"), self.data)
+        request = self.manager.request(self.beta())
+        self.assert_downloaded(request.download(on_data=lambda data: None))
+        self.assertIsNot(request.transfer, current.transfer)
+
+        # and so does a new selection
+        self.assertIsNot(prefetch(self.beta()), current)
+
+    def test_last_selection(self):
+        self.server.options["bandwidth"] = 1 << 20
+        previous = prefetch(self.beta("amigo"))
+        current = prefetch(self.beta("dock"))
+        self.assertIsNot(previous, current)
+
+        # the previous selection is cancelled
+        self.wait_done(previous)
+        self.assertIsNotNone(previous.transfer.exception)
+        self.wait_done(current)
+        self.assertIsNone(current.transfer.exception)
+
+    def test_disable_cancels(self):
+        self.server.options["bandwidth"] = 1 << 20
+        current = prefetch(self.beta())
+        prefetcher.set_enabled(False)
+        self.wait_done(current)
+        self.assertIsNotNone(current.transfer.exception)
+
+    def test_release_bundle_throttle(self):
+        bundle = ReleaseBundle(version="v0.0.1", destdir=self.tmpdir.name)
+        throttle = Throttle(background=True)
+        bundle.throttle = throttle
+        self.assertIs(bundle.throttle, throttle)
+        self.assertTrue(all(d.throttle is throttle for d in bundle.downloaders))
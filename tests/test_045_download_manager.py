@@ -0,0 +1,320 @@
+import time
+import threading
+from unittest import TestCase
+from unittest.mock import MagicMock
+from src.utils.downloader.cancel_token import CancelToken, DownloadCancelled
+from src.utils.downloader.download_manager import (
+    INTERACTIVE,
+    PREFETCH,
+    SYNC,
+    DownloadManager,
+    get_manager,
+    set_manager,
+)
+
+URL = "https://github.com/selfcustody/krux/releases/download/v0.0.1/krux-v0.0.1.zip"
+
+
+class FakeDownloader:
+    """A downloader that waits for :attr:`release` and records its runs"""
+
+    # pylint: disable=too-many-instance-attributes
+    def __init__(self, url: str = URL, destdir: str = "mockdir", runs=None):
+        self.url = url
+        self.destdir = destdir
+        self.token = CancelToken()
+        self.throttle = None
+        self.on_retry = lambda *args: None
+        self.downloaded_len = 0
+        self.content_len = 4
+        self.runs = runs if runs is not None else []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.error = None
+
+    def download(self, on_data):
+        self.runs.append(self)
+        self.started.set()
+        while not self.release.wait(0.01):
+            self.token.raise_if_cancelled()
+        if self.error is not None:
+            raise self.error
+        self.downloaded_len = 4
+        on_data(b"data")
+        return f"{self.destdir}/{self.url}"
+
+    def cancel(self):
+        self.token.cancel()
+
+
+class BundleDownloader(FakeDownloader):
+    """Another kind of downloader, of the same url"""
+
+
+class StubbornDownloader(FakeDownloader):
+    """A downloader that, once cancelled, waits for :attr:`stop` to stop"""
+
+    def __init__(self):
+        super().__init__()
+        self.stop = threading.Event()
+
+    def download(self, on_data):
+        try:
+            return super().download(on_data)
+        except DownloadCancelled:
+            self.stop.wait(1)
+            raise
+
+
+class TestDownloadManager(TestCase):
+
+    def download(self, request, outcomes: dict, on_data=None) -> threading.Thread:
+        """Run a request's download on a thread, keeping its outcome on a dict"""
+
+        def _run():
+            try:
+                outcomes[request] = request.download(on_data=on_data or MagicMock())
+            except Exception as exc:  # pylint: disable=broad-exception-caught
+                outcomes[request] = exc
+
+        thread = threading.Thread(target=_run, daemon=True)
+        thread.start()
+        return thread
+
+    def wait_joined(self, request, count: int):
+        """Wait until :attr:`count` requests are attached to a request's transfer"""
+        for _ in range(100):
+            if request.transfer is not None and len(request.transfer.requests) == count:
+                return
+            time.sleep(0.01)
+        self.fail(f"{count} requests weren't attached")
+
+    def test_fail_init(self):
+        for value in (0, -1, 1.5):
+            with self.assertRaises(ValueError) as exc_info:
+                DownloadManager(workers=value)
+            self.assertEqual(str(exc_info.exception), f"Invalid workers: {value}")
+
+        with self.assertRaises(ValueError) as exc_info:
+            DownloadManager().request(FakeDownloader(), priority=3)
+        self.assertEqual(str(exc_info.exception), "Invalid priority: 3")
+
+    def test_single_flight(self):
+        manager = DownloadManager()
+        downloader = FakeDownloader()
+        first = manager.request(downloader)
+        second = manager.request(FakeDownloader())
+        on_data = MagicMock()
+        outcomes = {}
+        threads = [
+            self.download(first, outcomes),
+            self.download(second, outcomes, on_data=on_data),
+        ]
+        self.wait_joined(first, 2)
+        downloader.release.set()
+        for thread in threads:
+            thread.join(1)
+
+        # both got the result of a single transfer
+        self.assertEqual(downloader.runs, [downloader])
+        self.assertEqual(second.downloader.runs, [])
+        self.assertIs(first.transfer, second.transfer)
+        self.assertEqual(outcomes[first], f"mockdir/{URL}")
+        self.assertEqual(outcomes[second], outcomes[first])
+        self.assertEqual(second.downloaded_len, 4)
+        on_data.assert_called_with(b"")
+        self.assertEqual(manager.transfers, {})
+
+    def test_started_request(self):
+        manager = DownloadManager()
+        downloader = FakeDownloader()
+        downloader.release.set()
+        request = manager.request(downloader).start()
+        for _ in range(100):
+            if not manager.transfers:
+                break
+            time.sleep(0.01)
+
+        # the finished transfer is given, not run again
+        self.assertEqual(request.download(on_data=MagicMock()), f"mockdir/{URL}")
+        self.assertEqual(downloader.runs, [downloader])
+
+    def test_keys(self):
+        manager = DownloadManager()
+        requests = [
+            manager.request(FakeDownloader()),
+            manager.request(BundleDownloader()),
+            manager.request(FakeDownloader(destdir="otherdir")),
+        ]
+        for request in requests:
+            request.start()
+            request.downloader.release.set()
+
+        self.assertEqual(len({r.transfer for r in requests}), 3)
+
+    def test_priorities(self):
+        manager = DownloadManager(workers=1)
+        runs = []
+        blocker = manager.request(FakeDownloader(url="blocker", runs=runs)).start()
+        blocker.downloader.started.wait(1)
+
+        requests = [
+            manager.request(FakeDownloader(url=str(p), runs=runs), priority=p).start()
+            for p in (SYNC, PREFETCH, INTERACTIVE)
+        ]
+        for request in [blocker] + requests:
+            request.downloader.release.set()
+        for request in requests:
+            manager.wait(request.transfer, CancelToken())
+
+        self.assertEqual([d.url for d in runs], ["blocker", "0", "1", "2"])
+
+    def test_reserved_worker(self):
+        manager = DownloadManager(workers=2)
+        prefetches = [
+            manager.request(FakeDownloader(url=str(i)), priority=PREFETCH).start()
+            for i in range(2)
+        ]
+        prefetches[0].downloader.started.wait(1)
+
+        # an interactive transfer doesnt wait for the prefetches
+        interactive = manager.request(FakeDownloader(url="interactive")).start()
+        interactive.downloader.release.set()
+        self.assertTrue(interactive.downloader.started.wait(1))
+        self.assertFalse(prefetches[1].downloader.started.is_set())
+
+        for request in prefetches:
+            request.downloader.release.set()
+        manager.wait(prefetches[1].transfer, CancelToken())
+        self.assertEqual(prefetches[1].transfer.result, "mockdir/1")
+
+    def test_promote(self):
+        manager = DownloadManager(workers=1)
+        blocker = manager.request(FakeDownloader(url="blocker")).start()
+        blocker.downloader.started.wait(1)
+
+        prefetch = manager.request(FakeDownloader(), priority=PREFETCH).start()
+        self.assertTrue(prefetch.transfer.downloader.throttle.background)
+
+        interactive = manager.request(FakeDownloader()).start()
+        self.assertIs(interactive.transfer, prefetch.transfer)
+        self.assertEqual(prefetch.transfer.priority, INTERACTIVE)
+        self.assertFalse(prefetch.transfer.downloader.throttle.background)
+
+        # and back to the background once the interactive one leaves
+        interactive.cancel()
+        self.assertEqual(prefetch.transfer.priority, PREFETCH)
+        self.assertTrue(prefetch.transfer.downloader.throttle.background)
+        blocker.downloader.release.set()
+        prefetch.downloader.release.set()
+
+    def test_cancel(self):
+        manager = DownloadManager()
+        downloader = FakeDownloader()
+        first = manager.request(downloader)
+        second = manager.request(FakeDownloader())
+        outcomes = {}
+        threads = [self.download(first, outcomes), self.download(second, outcomes)]
+        self.wait_joined(first, 2)
+
+        # a requester left, the transfer goes on for the other
+        first.cancel()
+        threads[0].join(1)
+        self.assertIsInstance(outcomes[first], DownloadCancelled)
+        self.assertFalse(downloader.token.cancelled)
+
+        # the last requester left, so the transfer is cancelled
+        second.cancel()
+        threads[1].join(1)
+        self.assertIsInstance(outcomes[second], DownloadCancelled)
+        self.assertTrue(downloader.token.cancelled)
+        self.assertEqual(manager.transfers, {})
+
+    def test_reuse_running_downloader(self):
+        manager = DownloadManager()
+        downloader = StubbornDownloader()
+        first = manager.request(downloader).start()
+        downloader.started.wait(1)
+        token = downloader.token
+        first.cancel()
+        self.assertTrue(token.cancelled)
+
+        # the cancelled run isnt resumed by a new request of its downloader
+        second = manager.request(downloader)
+        outcomes = {}
+        thread = self.download(second, outcomes)
+        self.wait_joined(second, 1)
+        self.assertIsNot(second.transfer, first.transfer)
+        time.sleep(0.05)
+        self.assertIs(downloader.token, token)
+        self.assertEqual(len(downloader.runs), 1)
+
+        # but run once the cancelled one stopped
+        downloader.stop.set()
+        downloader.release.set()
+        thread.join(1)
+        self.assertEqual(outcomes[second], f"mockdir/{URL}")
+        self.assertEqual(len(downloader.runs), 2)
+        self.assertFalse(downloader.token.cancelled)
+
+    def test_abandoned_transfer(self):
+        manager = DownloadManager(workers=1)
+        blocker = manager.request(FakeDownloader(url="blocker")).start()
+        blocker.downloader.started.wait(1)
+
+        # a queued transfer left by its requester is never run
+        downloader = FakeDownloader()
+        downloader.release.set()
+        queued = manager.request(downloader).start()
+        queued.cancel()
+        self.assertTrue(queued.done)
+        self.assertIsInstance(queued.transfer.exception, DownloadCancelled)
+        self.assertFalse(downloader.token.cancelled)
+
+        blocker.downloader.release.set()
+        manager.wait(blocker.transfer, CancelToken())
+        time.sleep(0.05)
+        self.assertEqual(downloader.runs, [])
+        self.assertEqual(manager.transfers, {})
+
+    def test_error(self):
+        manager = DownloadManager()
+        downloader = FakeDownloader()
+        downloader.error = RuntimeError("Download interrupted at 0 of 4 bytes")
+        requests = [manager.request(downloader), manager.request(FakeDownloader())]
+        outcomes = {}
+        threads = [self.download(request, outcomes) for request in requests]
+        self.wait_joined(requests[0], 2)
+        downloader.release.set()
+        for thread in threads:
+            thread.join(1)
+
+        for request in requests:
+            self.assertIs(outcomes[request], downloader.error)
+
+    def test_on_retry(self):
+        manager = DownloadManager()
+        downloader = FakeDownloader()
+        requests = [manager.request(downloader), manager.request(FakeDownloader())]
+        for request in requests:
+            request.on_retry = MagicMock()
+            request.start()
+
+        # the callback is set once a worker takes the transfer
+        downloader.started.wait(1)
+        downloader.on_retry(2, 5, 0.5, None)
+        for request in requests:
+            request.on_retry.assert_called_once_with(2, 5, 0.5, None)
+        downloader.release.set()
+
+    def test_get_manager(self):
+        set_manager(None)
+        manager = get_manager()
+        self.assertIsInstance(manager, DownloadManager)
+        self.assertIs(get_manager(), manager)
+        self.assertEqual(manager.workers, DownloadManager.MAX_WORKERS)
+
+        other = DownloadManager(workers=1)
+        set_manager(other)
+        self.assertIs(get_manager(), other)
+        set_manager(None)
@@ -0,0 +1,117 @@
+import os
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from src.utils import session, warmup, mirror
+from src.utils.downloader import ZipDownloader
+from .http_server import StandInServer
+
+URL = "https://github.com/selfcustody/krux/releases/download/v0.0.1/krux-v0.0.1.zip"
+
+STORAGE = "https://objects.githubusercontent.com/krux-v0.0.1.zip?sig=abc"
+
+
+class TestWarmup(TestCase):
+
+    def setUp(self):
+        session.set_session(None)
+        warmup.forget()
+        mirror.set_mirrors([])
+        self.data = os.urandom(64 << 10)
+        self.server = StandInServer().start()
+        self.target = self.server.add(STORAGE.split("?", maxsplit=1)[0], self.data)
+        self.local = self.server.redirect(URL, self.target)
+
+    def tearDown(self):
+        self.server.stop()
+        session.set_session(None)
+        warmup.forget()
+
+    def test_warm(self):
+        self.assertTrue(warmup.warm(self.server.base_url))
+        self.assertEqual(self.server.requests[-1][:2], ("HEAD", "/"))
+        self.assertIn(self.server.base_url.split("//")[1], warmup.warmed())
+
+        # the first request reuses the warmed connection
+        res = session.get_session().get(self.target, timeout=5)
+        self.assertEqual(res.content, self.data)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_warm_fail(self):
+        self.assertFalse(warmup.warm("file:///srv/krux"))
+        self.assertFalse(warmup.warm("http://127.0.0.1:1", timeout=1))
+        self.assertEqual(warmup.warmed(), set())
+
+    def test_resolve(self):
+        self.assertEqual(warmup.resolve(self.local), self.target)
+        self.assertEqual(warmup.redirect_target(self.local), self.target)
+        self.assertEqual(
+            self.server.requests[-1][:2],
+            ("HEAD", self.local[len(self.server.base_url) :]),
+        )
+
+        # an asset that isnt redirected
+        self.assertIsNone(warmup.resolve(self.target))
+        self.assertIsNone(warmup.redirect_target(self.target))
+        self.assertIsNone(warmup.resolve("http://127.0.0.1:1/a.zip", timeout=1))
+
+    def test_redirect_ttl(self):
+        warmup.resolve(self.local)
+        with patch.object(warmup, "REDIRECT_TTL", 0):
+            self.assertIsNone(warmup.redirect_target(self.local))
+
+        # stale targets are dropped
+        self.assertIsNone(warmup.redirect_target(self.local))
+
+    def test_warm_up(self):
+        targets = warmup.warm_up(urls=["file:///srv/krux"], redirects=[self.local])
+        self.assertEqual(targets, {self.local: self.target})
+
+        # the host of the target was warmed, after the redirect was resolved
+        self.assertEqual(
+            [r[:2] for r in self.server.requests],
+            [("HEAD", self.local[len(self.server.base_url) :]), ("HEAD", "/")],
+        )
+        self.assertEqual(warmup.warm_up(), {})
+
+    def test_start_warm_up(self):
+        thread = warmup.start_warm_up(urls=[self.server.base_url])
+        thread.join(5)
+        self.assertFalse(thread.is_alive())
+        self.assertEqual(len(warmup.warmed()), 1)
+
+    def test_sources(self):
+        self.assertEqual(mirror.sources(self.local), [self.local])
+        warmup.resolve(self.local)
+        self.assertEqual(mirror.sources(self.local), [self.target, self.local])
+
+        with patch("src.utils.mirror.race", side_effect=lambda urls: urls):
+            mirror.set_mirrors(["file:///srv/krux"])
+            self.assertEqual(
+                mirror.sources(self.local),
+                [
+                    mirror.mirror_url("file:///srv/krux", self.local),
+                    self.target,
+                    self.local,
+                ],
+            )
+
+    def test_download_from_target(self):
+        warmup.resolve(self.local)
+        self.server.requests.clear()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            zip_downloader = ZipDownloader(version="v0.0.1", destdir=tmpdir)
+            with patch(
+                "src.utils.downloader.stream_downloader.sources",
+                side_effect=lambda url: mirror.redirected(self.local, [self.local]),
+            ):
+                path = zip_downloader.download(on_data=lambda data: None)
+
+            with open(path, "rb") as file:
+                self.assertEqual(file.read(), self.data)
+
+        # straight to the target, without the redirect
+        self.assertEqual(
+            [r[:2] for r in self.server.requests],
+            [("GET", self.target[len(self.server.base_url) :])],
+        )
@@ -0,0 +1,256 @@
+import io
+import os
+import json
+import random
+import zipfile
+import tempfile
+from unittest import TestCase
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec
+from src.utils.downloader import RemoteZip, PartialZipDownloader, PemDownloader
+from src.utils.downloader.zip_downloader import ZipDownloader
+from .http_server import StandInServer, DEVICES
+
+VERSION = "v0.0.1"
+ZIP_URL = ZipDownloader(version=VERSION).url
+PEM_URL = PemDownloader().url
+
+
+def kfpkg(firmware: bytes) -> bytes:
+    """Build a kboot package carrying :attr:`firmware` and a bootloader"""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as package:
+        package.writestr("flash-list.json", '{"version": "0.1.1"}')
+        package.writestr("bootloader_lo.bin", b"unsigned")
+        package.writestr("firmware.bin", firmware)
+    return buffer.getvalue()
+
+
+def signed_release(key: ec.EllipticCurvePrivateKey, **overrides) -> bytes:
+    """
+    Build a release zip with deflated members for each device, whose
+    firmwares are signed by :attr:`key`, unless a member is overridden
+    """
+    rng = random.Random(0)
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as release:
+        for device in DEVICES:
+            prefix = f"krux-{VERSION}/maixpy_{device}"
+            firmware = rng.randbytes(200 << 10)
+            members = {
+                "firmware.bin": firmware,
+                "firmware.bin.sig": key.sign(firmware, ec.ECDSA(hashes.SHA256())),
+                "kboot.kfpkg": kfpkg(firmware),
+            }
+            for name, data in members.items():
+                data = overrides.get(f"{prefix}/{name}", data)
+                release.writestr(f"{prefix}/{name}", data)
+    return buffer.getvalue()
+
+
+class TestRemoteZip(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.key = ec.generate_private_key(ec.SECP256K1())
+        cls.pem = cls.key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+        cls.data = signed_release(cls.key)
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.server = StandInServer().start()
+        self.server.add(ZIP_URL, self.data)
+        self.server.add(PEM_URL, self.pem)
+
+    def tearDown(self):
+        self.server.stop()
+        self.tmpdir.cleanup()
+
+    def received(self) -> int:
+        """Sum the bytes asked by the range requests to the server"""
+        total = 0
+        for method, _, headers in self.server.requests:
+            if method == "GET" and "Range" in headers:
+                start, end = headers["Range"][len("bytes=") :].split("-")
+                total += min(int(end), len(self.data) - 1) - int(start) + 1
+        return total
+
+    def download(self, device: str = "amigo") -> list:
+        downloader = PartialZipDownloader(
+            version=VERSION, device=device, destdir=self.tmpdir.name
+        )
+        with self.server.routing():
+            return downloader.download(on_data=lambda data: None)
+
+    def test_open(self):
+        remote = RemoteZip(url=ZIP_URL)
+        with self.server.routing():
+            entries = remote.open()
+
+        with zipfile.ZipFile(io.BytesIO(self.data)) as release:
+            self.assertEqual(remote.namelist(), release.namelist())
+            for info in release.infolist():
+                self.assertEqual(entries[info.filename].crc, info.CRC)
+                self.assertEqual(entries[info.filename].offset, info.header_offset)
+
+        self.assertEqual(remote.source, self.server.local(ZIP_URL))
+
+        # a HEAD and a single range for the tail with the central directory
+        methods = [method for method, _, _ in self.server.requests]
+        self.assertEqual(methods, ["HEAD", "GET"])
+
+    def test_read(self):
+        name = f"krux-{VERSION}/maixpy_dock/firmware.bin"
+        remote = RemoteZip(url=ZIP_URL)
+        with self.server.routing():
+            remote.open()
+            self.server.requests.clear()
+            content = remote.read(name)
+
+        with zipfile.ZipFile(io.BytesIO(self.data)) as release:
+            self.assertEqual(content, release.read(name))
+
+        # a single range for the local header and the data
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_fail_read(self):
+        remote = RemoteZip(url=ZIP_URL)
+        with self.server.routing():
+            remote.open()
+            with self.assertRaises(RuntimeError) as exc_info:
+                remote.read(f"krux-{VERSION}/maixpy_amigo/missing.bin")
+
+        self.assertIn("Member not found in", str(exc_info.exception))
+
+        with self.assertRaises(RuntimeError) as exc_info:
+            remote.extract(name="../firmware.bin", output=self.tmpdir.name)
+
+        self.assertEqual(str(exc_info.exception), "Unsafe member name: ../firmware.bin")
+
+    def test_fail_bad_crc(self):
+        name = f"krux-{VERSION}/maixpy_amigo/firmware.bin.sig"
+        remote = RemoteZip(url=ZIP_URL)
+        with self.server.routing():
+            remote.open()
+
+            # corrupt the last byte of the member
+            entry = remote.entries[name]
+            data = bytearray(self.data)
+            start = entry.offset + 30 + len(name)
+            data[start + entry.compressed_size - 1] ^= 0xFF
+            self.server.add(ZIP_URL, bytes(data))
+
+            with self.assertRaises(RuntimeError) as exc_info:
+                remote.read(name)
+
+        self.assertIn(name, str(exc_info.exception))
+
+    def test_fail_open_not_zip(self):
+        self.server.add(ZIP_URL, os.urandom(1 << 10))
+        with self.server.routing(), self.assertRaises(RuntimeError) as exc_info:
+            RemoteZip(url=ZIP_URL).open()
+
+        self.assertEqual(
+            str(exc_info.exception), f"End of central directory not found in {ZIP_URL}"
+        )
+
+    def test_retry_dropped_connection(self):
+        name = f"krux-{VERSION}/maixpy_bit/kboot.kfpkg"
+        retries = []
+        remote = RemoteZip(url=ZIP_URL)
+        remote.on_retry = lambda *args: retries.append(args[:2])
+        with self.server.routing():
+            remote.open()
+            self.server.requests.clear()
+            self.server.options["drop_after"] = 100 << 10
+            content = remote.read(name)
+
+        with zipfile.ZipFile(io.BytesIO(self.data)) as release:
+            self.assertEqual(content, release.read(name))
+
+        # the retry asks for the bytes not received yet
+        self.assertEqual(retries, [(2, 5)])
+        first, second = [headers["Range"] for _, _, headers in self.server.requests]
+        offset = remote.entries[name].offset
+        self.assertTrue(first.startswith(f"bytes={offset}-"))
+        self.assertTrue(second.startswith(f"bytes={offset + (100 << 10)}-"))
+
+    def test_partial_download(self):
+        progress = []
+        downloader = PartialZipDownloader(
+            version=VERSION, device="amigo", destdir=self.tmpdir.name
+        )
+        with self.server.routing():
+            paths = downloader.download(
+                on_data=lambda data: progress.append(
+                    (downloader.downloaded_len, downloader.content_len)
+                )
+            )
+
+        prefix = os.path.join(self.tmpdir.name, f"krux-{VERSION}", "maixpy_amigo")
+        self.assertEqual(
+            paths,
+            [
+                os.path.join(prefix, "kboot.kfpkg"),
+                os.path.join(prefix, "firmware.bin"),
+                os.path.join(prefix, "firmware.bin.sig"),
+            ],
+        )
+        with zipfile.ZipFile(io.BytesIO(self.data)) as release:
+            for name, path in zip(downloader.members[1:], paths[1:]):
+                with open(path, "rb") as file:
+                    self.assertEqual(file.read(), release.read(name))
+
+            # the package only flashes the signed firmware
+            with zipfile.ZipFile(paths[0]) as package:
+                self.assertEqual(
+                    sorted(package.namelist()), ["firmware.bin", "flash-list.json"]
+                )
+                self.assertEqual(
+                    package.read("firmware.bin"), release.read(downloader.members[1])
+                )
+                flash_list = json.loads(package.read("flash-list.json"))
+            self.assertEqual(
+                flash_list["files"],
+                [{"address": 0x80000, "bin": "firmware.bin", "sha256Prefix": True}],
+            )
+            self.assertFalse(os.path.exists(f"{paths[0]}.tmp"))
+
+        # only the last call reports the whole members
+        self.assertTrue(all(done < total for done, total in progress[:-1]))
+        self.assertEqual(progress[-1][0], progress[-1][1])
+
+        # far less than the whole zip was transferred
+        self.assertLess(self.received(), len(self.data) / 4)
+
+    def test_fail_partial_download_invalid_signature(self):
+        name = f"krux-{VERSION}/maixpy_amigo/firmware.bin.sig"
+        other = ec.generate_private_key(ec.SECP256K1())
+        forged = other.sign(b"firmware", ec.ECDSA(hashes.SHA256()))
+        self.server.add(ZIP_URL, signed_release(self.key, **{name: forged}))
+
+        with self.assertRaises(RuntimeError) as exc_info:
+            self.download()
+
+        self.assertIn("Invalid signature of", str(exc_info.exception))
+        prefix = os.path.join(self.tmpdir.name, f"krux-{VERSION}", "maixpy_amigo")
+        self.assertEqual(os.listdir(prefix), [])
+
+    def test_fail_partial_download_other_kboot(self):
+        name = f"krux-{VERSION}/maixpy_amigo/kboot.kfpkg"
+        self.server.add(ZIP_URL, signed_release(self.key, **{name: kfpkg(b"other")}))
+
+        with self.assertRaises(RuntimeError) as exc_info:
+            self.download()
+
+        self.assertIn("does not carry the signed firmware", str(exc_info.exception))
+
+    def test_fail_partial_download_missing_device(self):
+        with self.assertRaises(RuntimeError) as exc_info:
+            self.download(device="unknown")
+
+        self.assertIn("Members not found in", str(exc_info.exception))
@@ -0,0 +1,177 @@
+import os
+import json
+import hashlib
+import tempfile
+from unittest import TestCase
+from unittest.mock import patch
+from src.utils.downloader.beta_sync import BetaSync, blob_sha, start_sync
+from src.utils.downloader.download_manager import DownloadManager, set_manager
+from .http_server import StandInServer
+
+TREE_URL = "https://api.github.com/repos/odudex/krux_binaries/git/trees/main"
+RAW_URL = "https://raw.githubusercontent.com/odudex/krux_binaries/main"
+DEVICES = ("amigo", "dock")
+
+
+def git_sha(data: bytes) -> str:
+    return hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+
+
+class TestBetaSync(TestCase):
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.server = StandInServer().start()
+        self.routing = self.server.routing()
+        self.routing.__enter__()
+        self.tree_url = patch.object(BetaSync, "TREE_URL", self.server.local(TREE_URL))
+        self.tree_url.start()
+        set_manager(DownloadManager())
+        self.files = {}
+        for device in DEVICES:
+            for binary_type in ("firmware.bin", "kboot.kfpkg"):
+                self.publish(f"maixpy_{device}/{binary_type}", os.urandom(64 << 10))
+
+    def tearDown(self):
+        self.tree_url.stop()
+        self.routing.__exit__(None, None, None)
+        self.server.stop()
+        set_manager(None)
+        self.tmpdir.cleanup()
+
+    def publish(self, path: str, data: bytes, sha: str | None = None):
+        """Serve a binary and list it on the tree"""
+        self.files[path] = data
+        self.server.add(f"{RAW_URL}/{path}", data)
+        tree = [{"path": "README.md", "type": "blob", "sha": git_sha(b"readme")}]
+        tree += [
+            {"path": p, "type": "blob", "sha": git_sha(d), "size": len(d)}
+            for p, d in self.files.items()
+        ]
+        if sha is not None:
+            tree[-1]["sha"] = sha
+        self.server.add(
+            TREE_URL, json.dumps({"tree": tree, "truncated": False}).encode()
+        )
+
+    def downloads(self) -> list:
+        """Get the binaries asked to the server, without the tree"""
+        return [
+            path.split("/main/")[1]
+            for method, path, _ in self.server.requests
+            if method == "GET" and "/main/" in path
+        ]
+
+    def make_sync(self) -> BetaSync:
+        return BetaSync(destdir=self.tmpdir.name, devices=DEVICES)
+
+    def test_blob_sha(self):
+        path = os.path.join(self.tmpdir.name, "hello")
+        with open(path, "wb") as file:
+            file.write(b"hello\n")
+
+        # as `git hash-object hello`
+        self.assertEqual(blob_sha(path), "ce013625030ba8dba906f756967f9e9ca394464a")
+
+    def test_paths(self):
+        self.assertEqual(
+            self.make_sync().paths,
+            [
+                "maixpy_amigo/firmware.bin",
+                "maixpy_amigo/kboot.kfpkg",
+                "maixpy_dock/firmware.bin",
+                "maixpy_dock/kboot.kfpkg",
+            ],
+        )
+        self.assertEqual(len(BetaSync(destdir=self.tmpdir.name).paths), 14)
+
+    def test_first_sync(self):
+        summary = self.make_sync().sync()
+
+        self.assertEqual(sorted(summary["updated"]), sorted(self.files))
+        self.assertEqual(summary["unchanged"], [])
+        self.assertEqual(summary["failed"], {})
+        self.assertEqual(sorted(self.downloads()), sorted(self.files))
+        for path, data in self.files.items():
+            with open(os.path.join(self.tmpdir.name, path), "rb") as file:
+                self.assertEqual(file.read(), data)
+
+        self.assertEqual(
+            self.make_sync().load_manifest(),
+            {path: git_sha(data) for path, data in self.files.items()},
+        )
+
+    def test_sync_only_changed_blobs(self):
+        self.make_sync().sync()
+        self.server.requests.clear()
+
+        # nothing changed, so only the tree is asked
+        summary = self.make_sync().sync()
+        self.assertEqual(summary["updated"], [])
+        self.assertEqual(sorted(summary["unchanged"]), sorted(self.files))
+        self.assertEqual(self.downloads(), [])
+
+        self.publish("maixpy_dock/kboot.kfpkg", os.urandom(32 << 10))
+        summary = self.make_sync().sync()
+        self.assertEqual(summary["updated"], ["maixpy_dock/kboot.kfpkg"])
+        self.assertEqual(self.downloads(), ["maixpy_dock/kboot.kfpkg"])
+
+    def test_sync_adopts_existing_files(self):
+        for path, data in self.files.items():
+            os.makedirs(
+                os.path.dirname(os.path.join(self.tmpdir.name, path)), exist_ok=True
+            )
+            with open(os.path.join(self.tmpdir.name, path), "wb") as file:
+                file.write(data if "amigo" in path else b"old")
+
+        summary = self.make_sync().sync()
+        self.assertEqual(
+            sorted(summary["updated"]),
+            ["maixpy_dock/firmware.bin", "maixpy_dock/kboot.kfpkg"],
+        )
+        self.assertEqual(sorted(self.downloads()), sorted(summary["updated"]))
+        self.assertEqual(len(self.make_sync().load_manifest()), 4)
+
+    def test_sync_deleted_file(self):
+        self.make_sync().sync()
+        os.remove(os.path.join(self.tmpdir.name, "maixpy_amigo", "firmware.bin"))
+        self.server.requests.clear()
+
+        summary = self.make_sync().sync()
+        self.assertEqual(summary["updated"], ["maixpy_amigo/firmware.bin"])
+
+    def test_sync_blob_mismatch(self):
+        self.publish("maixpy_dock/kboot.kfpkg", b"kboot", sha=git_sha(b"other"))
+        summary = self.make_sync().sync()
+
+        self.assertIn("maixpy_dock/kboot.kfpkg", summary["failed"])
+        self.assertNotIn("maixpy_dock/kboot.kfpkg", summary["updated"])
+        self.assertNotIn("maixpy_dock/kboot.kfpkg", self.make_sync().load_manifest())
+
+        # the rejected binary isnt left to be flashed
+        destfile = os.path.join(self.tmpdir.name, "maixpy_dock", "kboot.kfpkg")
+        self.assertFalse(os.path.exists(destfile))
+        self.assertFalse(os.path.exists(f"{destfile}.validators.json"))
+
+    def test_sync_missing(self):
+        del self.files["maixpy_amigo/firmware.bin"]
+        self.publish("maixpy_amigo/kboot.kfpkg", self.files["maixpy_amigo/kboot.kfpkg"])
+
+        summary = self.make_sync().sync()
+        self.assertEqual(summary["missing"], ["maixpy_amigo/firmware.bin"])
+        self.assertEqual(len(summary["updated"]), 3)
+
+    def test_load_invalid_manifest(self):
+        with open(os.path.join(self.tmpdir.name, BetaSync.MANIFEST), "w") as file:
+            file.write("not json")
+
+        self.assertEqual(self.make_sync().load_manifest(), {})
+
+    @patch("src.utils.downloader.beta_sync.BetaSync.sync")
+    def test_start_sync(self, mock_sync):
+        thread = start_sync(destdir=self.tmpdir.name)
+        thread.join(5)
+
+        self.assertTrue(thread.daemon)
+        mock_sync.assert_called_once()
@@ -0,0 +1,240 @@
+import io
+import os
+import sys
+import json
+import hashlib
+import tempfile
+import subprocess
+from contextlib import redirect_stdout
+from unittest import TestCase
+from unittest.mock import patch
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import ec, utils
+from src.utils import digest
+from src.utils.mirror.mirror_sync import MirrorSync, main, parse_args
+from src.utils.selector import set_offline_releases
+from src.utils.downloader import (
+    ZipDownloader,
+    Sha256Downloader,
+    SigDownloader,
+    PemDownloader,
+    BetaSync,
+)
+from src.utils.downloader.download_manager import DownloadManager, set_manager
+from .http_server import StandInServer, synthetic_zip
+
+VERSIONS = ("v0.0.2", "v0.0.1")
+TREE_URL = "https://api.github.com/repos/odudex/krux_binaries/git/trees/main"
+BETA_URL = "https://raw.githubusercontent.com/odudex/krux_binaries/main/maixpy_amigo/kboot.kfpkg"
+
+
+class TestMirrorSync(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.key = ec.generate_private_key(ec.SECP256K1())
+        cls.pem = cls.key.public_key().public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo,
+        )
+
+    def setUp(self):
+        # pylint: disable=consider-using-with
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.server = StandInServer().start()
+        self.routing = self.server.routing()
+        self.routing.__enter__()
+        set_manager(DownloadManager())
+        self.server.add(PemDownloader().url, self.pem)
+        for version in VERSIONS:
+            self.publish(version)
+
+    def tearDown(self):
+        self.routing.__exit__(None, None, None)
+        self.server.stop()
+        set_manager(None)
+        set_offline_releases(None)
+        digest.forget()
+        self.tmpdir.cleanup()
+
+    def publish(self, version: str, sha256: str | None = None):
+        """Serve a release zip with its sha256 sum and signature"""
+        data = synthetic_zip(version=version, size=64 << 10)
+        hexdigest = hashlib.sha256(data).hexdigest()
+        signature = self.key.sign(
+            bytes.fromhex(hexdigest), ec.ECDSA(utils.Prehashed(hashes.SHA256()))
+        )
+        self.server.add(ZipDownloader(version=version).url, data)
+        self.server.add(
+            Sha256Downloader(version=version).url,
+            f"{sha256 or hexdigest}  krux-{version}.zip\n".encode(),
+        )
+        self.server.add(SigDownloader(version=version).url, signature)
+
+    def downloads(self) -> list:
+        return [path for method, path, _ in self.server.requests if method == "GET"]
+
+    def make_sync(self) -> MirrorSync:
+        return MirrorSync(base=self.tmpdir.name, workers=2)
+
+    def test_init(self):
+        with self.assertRaises(ValueError) as exc_info:
+            MirrorSync(base=self.tmpdir.name, workers=0)
+
+        self.assertEqual(str(exc_info.exception), "Invalid workers: 0")
+        self.assertEqual(
+            self.make_sync().devices,
+            ["m5stickv", "amigo", "dock", "bit", "yahboom", "cube", "wonder_mv"],
+        )
+
+    def test_local_path(self):
+        url = ZipDownloader(version="v0.0.1").url
+        self.assertEqual(
+            self.make_sync().local_path(url),
+            os.path.join(
+                self.tmpdir.name,
+                "github.com",
+                "selfcustody",
+                "krux",
+                "releases",
+                "download",
+                "v0.0.1",
+                "krux-v0.0.1.zip",
+            ),
+        )
+
+        # served as is, the mirror answers like the stand-in server
+        self.assertEqual(
+            self.server.local(url)[len(self.server.base_url) :],
+            self.make_sync().local_path(url)[len(self.tmpdir.name) :],
+        )
+
+    def test_sync(self):
+        summary = self.make_sync().sync(list(VERSIONS))
+
+        self.assertTrue(summary["ok"])
+        self.assertEqual(sorted(summary["releases"]["synced"]), sorted(VERSIONS))
+        self.assertEqual(summary["releases"]["failed"], {})
+        self.assertIsNone(summary["beta"])
+        for version in VERSIONS:
+            self.assertIsNone(self.make_sync().verified(version=version, pem=self.pem))
+
+        with open(summary["pem"], "rb") as file:
+            self.assertEqual(file.read(), self.pem)
+
+    def test_sync_skip_verified(self):
+        self.make_sync().sync(list(VERSIONS))
+        self.server.requests.clear()
+
+        summary = self.make_sync().sync(list(VERSIONS))
+
+        # only the certificate is asked again
+        self.assertEqual(sorted(summary["releases"]["skipped"]), sorted(VERSIONS))
+        self.assertEqual(
+            self.downloads(),
+            [self.server.local(PemDownloader().url)[len(self.server.base_url) :]],
+        )
+
+    def test_sync_replace_corrupted(self):
+        self.make_sync().sync(list(VERSIONS))
+        path = self.make_sync().local_path(ZipDownloader(version="v0.0.1").url)
+        with open(path, "wb") as file:
+            file.write(b"corrupted")
+        digest.forget()
+
+        summary = self.make_sync().sync(list(VERSIONS))
+        self.assertEqual(summary["releases"]["synced"], ["v0.0.1"])
+        self.assertEqual(summary["releases"]["skipped"], ["v0.0.2"])
+
+    def test_sync_failed(self):
+        self.publish("v0.0.1", sha256="0" * 64)
+        summary = self.make_sync().sync(list(VERSIONS))
+
+        self.assertFalse(summary["ok"])
+        self.assertEqual(summary["releases"]["failed"], {"v0.0.1": "sha256 mismatch"})
+        self.assertEqual(summary["releases"]["synced"], ["v0.0.2"])
+
+        # the unverified assets are not kept on the mirror
+        path = self.make_sync().local_path(ZipDownloader(version="v0.0.1").url)
+        self.assertEqual(os.listdir(os.path.dirname(path)), [])
+
+    def test_sync_beta(self):
+        data = os.urandom(32 << 10)
+        sha = hashlib.sha1(f"blob {len(data)}\0".encode() + data).hexdigest()
+        tree = [{"path": "maixpy_amigo/kboot.kfpkg", "type": "blob", "sha": sha}]
+        self.server.add(TREE_URL, json.dumps({"tree": tree}).encode())
+        self.server.add(BETA_URL, data)
+
+        with patch.object(BetaSync, "TREE_URL", self.server.local(TREE_URL)):
+            summary = self.make_sync().sync(["v0.0.1", "odudex/krux_binaries"])
+
+        self.assertTrue(summary["ok"])
+        self.assertEqual(summary["beta"]["updated"], ["maixpy_amigo/kboot.kfpkg"])
+        with open(self.make_sync().local_path(BETA_URL), "rb") as file:
+            self.assertEqual(file.read(), data)
+
+    def test_sync_beta_error(self):
+        summary = self.make_sync().sync(["v0.0.1", "odudex/krux_binaries"])
+
+        self.assertFalse(summary["ok"])
+        self.assertIn("error", summary["beta"])
+
+    def test_main(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            status = main(
+                [self.tmpdir.name, "--releases", "v0.0.2,v0.0.1", "--no-beta"]
+            )
+
+        summary = json.loads(stdout.getvalue())
+        self.assertEqual(status, 0)
+        self.assertEqual(sorted(summary["releases"]["synced"]), sorted(VERSIONS))
+
+        self.publish("v0.0.3", sha256="0" * 64)
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            status = main([self.tmpdir.name, "--releases", "v0.0.3", "--no-beta"])
+
+        self.assertEqual(status, 1)
+        self.assertIn("v0.0.3", json.loads(stdout.getvalue())["releases"]["failed"])
+
+    def test_main_error(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout):
+            status = main([self.tmpdir.name, "--releases", "v0.0.1", "--workers", "0"])
+
+        self.assertEqual(status, 1)
+        self.assertEqual(
+            json.loads(stdout.getvalue()),
+            {
+                "base": self.tmpdir.name,
+                "ok": False,
+                "error": "Invalid workers: 0",
+            },
+        )
+
+    def test_parse_args_help(self):
+        stdout = io.StringIO()
+        with redirect_stdout(stdout), self.assertRaises(SystemExit):
+            parse_args(["--help"])
+
+        # a plain text description, without the markup of the docstrings
+        self.assertIn("Fill a local mirror", stdout.getvalue())
+        self.assertNotIn(":mod:", stdout.getvalue())
+        self.assertNotIn(":class:", stdout.getvalue())
+
+    def test_headless_import(self):
+        code = (
+            "import sys\n"
+            "import src.utils.mirror.mirror_sync\n"
+            "print(any(m.split('.')[0] == 'kivy' for m in sys.modules))\n"
+        )
+        env = dict(os.environ, KRUX_INSTALLER_HEADLESS="1")
+        result = subprocess.run(
+            [sys.executable, "-c", code],
+            capture_output=True,
+            check=True,
+            env=env,
+            text=True,
+        )
+        self.assertEqual(result.stdout.strip(), "False")